@@ -1,3 +1,4 @@
+import atexit
 import os
 from flask import Flask
 from flask_cors import CORS
@@ -6,9 +7,24 @@ from datetime import datetime, timezone
 
 from app.config import config
 from app.models.message import db
+from app.models.migrations import run_migrations
+from app.repositories.message_id_filter import MessageIdFilter
 from app.repositories.message_repository import MessageRepository
+from app.repositories.sqlite_writer import GroupCommitWriter, configure_sqlite_connections
 from app.services.message_service import MessageService
+from app.services.blocklist import (
+    BlocklistManager,
+    ConfigBlocklistSource,
+    DatabaseBlocklistSource,
+    FileBlocklistSource
+)
+from app.services.ingest_queue import WriteBehindQueue
+from app.utils.auth import api_key_required
 from app.utils.exceptions import MessageProcessingError
+from app.utils.idempotency import IdempotencyCache
+from app.utils.json_provider import FastJSONProvider
+from app.utils.lru_cache import LRUCache
+from app.utils.validators import ContentFilter
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
@@ -29,30 +45,84 @@ def create_app(config_name=None):
     
     config_name = config_name or os.getenv('FLASK_ENV', 'development')
     app.config.from_object(config[config_name])
-    app.config['JSON_AS_ASCII'] = False
-    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
-    app.config['JSON_SORT_KEYS'] = False    
+    # Proveedor JSON rápido (orjson si está instalado), compacto fuera de debug
+    app.json = FastJSONProvider(app)
+    app.json.compact = app.config['JSON_COMPACT']
     
     CORS(app)
     
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite_connections(
+            db.engine, app.config['SQLITE_JOURNAL_MODE'], app.config['SQLITE_SYNCHRONOUS']
+        )
     socketio.init_app(app)
      # Inicializar la extensión Limiter con la app
     limiter.init_app(app)
     if app.config["TESTING"]:
         limiter.enabled = False
     
+    from app.controllers.admin_controller import AdminController
     from app.controllers.message_controller import MessageController
     from app.controllers.realtime_controller import broadcast_new_message, handle_connect, handle_disconnect
     
-    message_repository = MessageRepository()
+    writer = None
+    if app.config.get('GROUP_COMMIT_ENABLED'):
+        writer = GroupCommitWriter(
+            app,
+            max_batch=app.config.get('GROUP_COMMIT_MAX_BATCH', 256),
+            window=app.config.get('GROUP_COMMIT_WINDOW', 0.002)
+        )
+        writer.start()
+        atexit.register(writer.stop)
+    app.extensions['sqlite_writer'] = writer
+    
+    id_filter = None
+    if app.config.get('MESSAGE_ID_FILTER_ENABLED'):
+        id_filter = MessageIdFilter(app.config.get('MESSAGE_ID_FILTER_CAPACITY', 1000000))
+    app.extensions['message_id_filter'] = id_filter
+    
+    message_repository = MessageRepository(writer, id_filter)
+    app.extensions['message_repository'] = message_repository
+    inappropriate_words = app.config.get('INAPPROPRIATE_WORDS', [])
+    blocklist = BlocklistManager(
+        _blocklist_source(app),
+        word_boundary=app.config.get('CONTENT_FILTER_WORD_BOUNDARY', False),
+        mode=app.config.get('CONTENT_FILTER_MODE', ContentFilter.MODE_REJECT),
+        normalize=app.config.get('CONTENT_FILTER_NORMALIZE', False)
+    )
+    # Con origen 'database' la tabla puede no existir aún: se arranca con la
+    # lista de la configuración y se recarga después de crear las tablas
+    blocklist.load(fallback_words=inappropriate_words)
+    if app.config.get('BLOCKLIST_POLL_INTERVAL', 0) > 0:
+        blocklist.start_polling(socketio, app.config['BLOCKLIST_POLL_INTERVAL'])
+    app.extensions['blocklist'] = blocklist
+    message_cache = None
+    if app.config.get('MESSAGE_CACHE_ENABLED'):
+        message_cache = LRUCache(
+            max_entries=app.config.get('MESSAGE_CACHE_MAX_ENTRIES', 10000),
+            max_bytes=app.config.get('MESSAGE_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+            ttl=app.config.get('MESSAGE_CACHE_TTL', 300)
+        )
+    app.extensions['message_cache'] = message_cache
     message_service = MessageService(
-        message_repository,
-        app.config.get('INAPPROPRIATE_WORDS', [])
+        message_repository, inappropriate_words, blocklist=blocklist, message_cache=message_cache
     )
-    message_controller = MessageController(message_service)
+    app.extensions['message_service'] = message_service
+    ingest_queue = WriteBehindQueue(app, message_service, socketio, on_stored=broadcast_new_message)
+    app.extensions['ingest_queue'] = ingest_queue
+    if app.config.get('ASYNC_INGEST_ENABLED'):
+        ingest_queue.start()
+        atexit.register(ingest_queue.drain)
+    idempotency_cache = IdempotencyCache(
+        max_entries=app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000),
+        ttl=app.config.get('IDEMPOTENCY_TTL', 3600)
+    )
+    app.extensions['idempotency_cache'] = idempotency_cache
+    message_controller = MessageController(message_service, ingest_queue, idempotency_cache)
     
     app.register_blueprint(message_controller.blueprint)
+    app.register_blueprint(AdminController(blocklist).blueprint)
     
     # Registrar endpoint de salud
     @app.route('/health')
@@ -66,6 +136,39 @@ def create_app(config_name=None):
             'encoding': 'UTF-8 ✓'
         }
     
+    @app.route('/api/metrics')
+    @api_key_required
+    def metrics():
+        """Endpoint con métricas internas (filtro de IDs, escritor, cola de ingesta, cachés)."""
+        return {
+            'status': 'success',
+            'data': {
+                'message_id_filter': id_filter.stats() if id_filter is not None else None,
+                'group_commit': writer.stats() if writer is not None else None,
+                'ingest_queue': ingest_queue.stats(),
+                'idempotency_cache': idempotency_cache.stats(),
+                'message_cache': message_cache.stats() if message_cache is not None else None
+            }
+        }
+    
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Aplica las migraciones pendientes del esquema."""
+        applied = run_migrations()
+        print(f"Migraciones aplicadas: {', '.join(applied)}" if applied else "El esquema ya está al día")
+    
+    @app.cli.command('rebuild-session-counters')
+    def rebuild_session_counters():
+        """Recalcula session_counters y session_analytics desde los mensajes almacenados."""
+        sessions = message_repository.rebuild_session_counters()
+        print(f"Contadores y analíticas reconstruidos para {sessions} sesiones")
+    
+    @app.cli.command('backfill-search-index')
+    def backfill_search_index():
+        """Indexa en messages_fts y messages_trigram los mensajes anteriores a los índices de búsqueda."""
+        indexed = message_repository.backfill_search_index(app.config['SEARCH_BACKFILL_CHUNK_SIZE'])
+        print(f"Índice de búsqueda completo ({indexed} mensajes indexados)")
+    
     @app.route('/')
     def index():
         """Endpoint raíz con información de la API."""
@@ -75,15 +178,32 @@ def create_app(config_name=None):
             'description': 'API RESTful para procesamiento de mensajes de chat',
             'endpoints': {
                 'POST /api/messages': 'Crear un nuevo mensaje',
+                'POST /api/messages/batch': 'Crear varios mensajes en una sola transacción',
+                'POST /api/messages/lookup': 'Obtener varios mensajes por ID',
+                'POST /api/messages/ndjson': 'Importar mensajes en streaming (application/x-ndjson)',
+                'GET /api/ingest/status/<message_id>': 'Estado de un mensaje enviado en modo asíncrono',
                 'GET /api/messages/<session_id>': 'Obtener mensajes por sesión',
                 'GET /api/message/<message_id>': 'Obtener mensaje específico',
                 'GET /api/sessions/<session_id>/stats': 'Obtener estadísticas de sesión',
+                'GET /api/sessions/<session_id>/export': 'Exportar una sesión completa (NDJSON o CSV)',
+                'GET /api/metrics': 'Métricas internas',
+                'GET /api/admin/blocklist': 'Versión activa de la lista de palabras bloqueadas',
+                'POST /api/admin/blocklist/reload': 'Recargar la lista de palabras bloqueadas',
                 'GET /health': 'Estado de la aplicación'
             }
         }
     
     return app
 
+def _blocklist_source(app):
+    """Crea el origen de la lista de palabras según BLOCKLIST_SOURCE."""
+    source = app.config.get('BLOCKLIST_SOURCE', 'config')
+    if source == 'file':
+        return FileBlocklistSource(app.config['BLOCKLIST_PATH'])
+    if source == 'database':
+        return DatabaseBlocklistSource(app)
+    return ConfigBlocklistSource(app.config.get('INAPPROPRIATE_WORDS', []))
+
 def register_error_handlers(app):
     """
     Registra manejadores de error globales.
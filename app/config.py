@@ -24,11 +24,99 @@ class Config:
     DEFAULT_PAGE_SIZE = 10
     MAX_PAGE_SIZE = 100
     
+    # Ingesta por lotes (POST /api/messages/batch)
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 500))
+    
+    # Consulta de varios mensajes por ID (POST /api/messages/lookup)
+    LOOKUP_MAX_IDS = int(os.environ.get('LOOKUP_MAX_IDS', 1000))
+    
+    # Importación NDJSON en streaming (POST /api/messages/ndjson)
+    NDJSON_CHUNK_SIZE = int(os.environ.get('NDJSON_CHUNK_SIZE', 500))
+    NDJSON_MAX_CHUNK_SIZE = 5000
+    NDJSON_MAX_LINE_BYTES = 64 * 1024
+    
+    # Exportación en streaming (GET /api/sessions/<session_id>/export): filas
+    # leídas por consulta (cursor de paginación) y escritas a la respuesta por bloque
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    
+    # Relleno de los índices de la búsqueda global (mensajes anteriores a las
+    # migraciones 8 y 9): mensajes indexados por transacción
+    SEARCH_BACKFILL_CHUNK_SIZE = int(os.environ.get('SEARCH_BACKFILL_CHUNK_SIZE', 5000))
+    
+    # Búsqueda por expresión regular: candidatos del índice de trigramas que se
+    # verifican como máximo; un patrón que deja más se rechaza por demasiado amplio
+    SEARCH_REGEX_MAX_CANDIDATES = int(os.environ.get('SEARCH_REGEX_MAX_CANDIDATES', 10000))
+    
+    # Ingesta asíncrona (write-behind): POST /api/messages responde 202 y un
+    # green thread persiste la cola en lotes
+    ASYNC_INGEST_ENABLED = os.environ.get('ASYNC_INGEST_ENABLED', 'false').lower() == 'true'
+    ASYNC_INGEST_QUEUE_SIZE = int(os.environ.get('ASYNC_INGEST_QUEUE_SIZE', 10000))
+    ASYNC_INGEST_BATCH_SIZE = int(os.environ.get('ASYNC_INGEST_BATCH_SIZE', 500))
+    ASYNC_INGEST_FLUSH_INTERVAL = float(os.environ.get('ASYNC_INGEST_FLUSH_INTERVAL', 0.05))
+    ASYNC_INGEST_DRAIN_TIMEOUT = float(os.environ.get('ASYNC_INGEST_DRAIN_TIMEOUT', 30))
+    ASYNC_INGEST_STATUS_MAX = 100000
+    
+    # Escritor único con group commit: las escrituras de todas las peticiones
+    # se agrupan en una transacción por ventana de GROUP_COMMIT_WINDOW segundos
+    # o por cada GROUP_COMMIT_MAX_BATCH operaciones
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'true').lower() == 'true'
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 256))
+    GROUP_COMMIT_WINDOW = float(os.environ.get('GROUP_COMMIT_WINDOW', 0.002))
+    
+    # Modo de diario de SQLite fijado en cada conexión: con WAL las lecturas no
+    # bloquean al escritor ni el escritor a las lecturas, y synchronous=NORMAL
+    # solo sincroniza el WAL en los checkpoints
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'wal').lower()
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'normal').lower()
+    
+    # Idempotency-Key en POST /api/messages: respuestas 2xx guardadas durante
+    # IDEMPOTENCY_TTL segundos; los duplicados en curso esperan hasta
+    # IDEMPOTENCY_WAIT_TIMEOUT segundos a la petición original
+    IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', 3600))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+    
+    # Caché LRU (por proceso) de GET /api/message/<message_id>: se acota por
+    # número de entradas y por bytes; cada entrada caduca a los
+    # MESSAGE_CACHE_TTL segundos para acotar el tiempo que un proceso puede
+    # servir un mensaje borrado por otro
+    MESSAGE_CACHE_ENABLED = os.environ.get('MESSAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    MESSAGE_CACHE_MAX_ENTRIES = int(os.environ.get('MESSAGE_CACHE_MAX_ENTRIES', 10000))
+    MESSAGE_CACHE_MAX_BYTES = int(os.environ.get('MESSAGE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    MESSAGE_CACHE_TTL = float(os.environ.get('MESSAGE_CACHE_TTL', 300))
+    
+    # Filtro de cuckoo en memoria con los message_id almacenados: evita ir a la
+    # base de datos para IDs inexistentes. Solo es válido con un único proceso
+    # escritor; desactivarlo si varios procesos escriben en la misma base
+    MESSAGE_ID_FILTER_ENABLED = os.environ.get('MESSAGE_ID_FILTER_ENABLED', 'true').lower() == 'true'
+    MESSAGE_ID_FILTER_CAPACITY = int(os.environ.get('MESSAGE_ID_FILTER_CAPACITY', 1000000))
+    
     # Lista de palabras inapropiadas (filtro simple)
     INAPPROPRIATE_WORDS = [
         'spam', 'malware', 'virus', 'hack', 'phishing'
     ]
     
+    # Origen de la lista de palabras inapropiadas: 'config' (INAPPROPRIATE_WORDS),
+    # 'file' (BLOCKLIST_PATH, un término por línea) o 'database' (tabla
+    # blocklist_terms). Se recarga con POST /api/admin/blocklist/reload o, si
+    # BLOCKLIST_POLL_INTERVAL > 0, al detectar cambios en el origen
+    BLOCKLIST_SOURCE = os.environ.get('BLOCKLIST_SOURCE', 'config').lower()
+    BLOCKLIST_PATH = os.environ.get('BLOCKLIST_PATH', 'blocklist.txt')
+    BLOCKLIST_POLL_INTERVAL = float(os.environ.get('BLOCKLIST_POLL_INTERVAL', 0))
+    
+    # Filtro de contenido: 'reject' rechaza el mensaje y 'mask' guarda las
+    # palabras encontradas reemplazadas por asteriscos. Con WORD_BOUNDARY solo
+    # se detectan palabras completas ("spam" no coincide en "spammer")
+    CONTENT_FILTER_MODE = os.environ.get('CONTENT_FILTER_MODE', 'reject').lower()
+    CONTENT_FILTER_WORD_BOUNDARY = os.environ.get('CONTENT_FILTER_WORD_BOUNDARY', 'false').lower() == 'true'
+    # Normalización previa a la búsqueda: acentos ("vírus"), leetspeak
+    # ("m4lw4re") y letras separadas ("s p a m")
+    CONTENT_FILTER_NORMALIZE = os.environ.get('CONTENT_FILTER_NORMALIZE', 'true').lower() == 'true'
+    
+    # Respuestas JSON: compactas salvo en modo debug (None); JSON_COMPACT=false
+    # fuerza la salida sangrada
+    JSON_COMPACT = None if os.environ.get('JSON_COMPACT') is None else os.environ['JSON_COMPACT'].lower() == 'true'
+    
     RATELIMIT_DEFAULT = "100 per hour"
 
 class DevelopmentConfig(Config):
@@ -42,6 +130,9 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # La base en memoria comparte una única conexión: se escribe desde la petición
+    GROUP_COMMIT_ENABLED = False
+    MESSAGE_ID_FILTER_CAPACITY = 1024
 
 class ProductionConfig(Config):
     """Configuración para producción."""
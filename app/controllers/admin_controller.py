@@ -0,0 +1,92 @@
+"""
+Controladores de administración de la API
+Este módulo expone operaciones internas como la recarga de la lista de palabras bloqueadas.
+"""
+from flask import Blueprint, request
+from typing import Tuple
+import traceback
+
+from app.services.blocklist import BlocklistManager
+from app.utils.auth import api_key_required
+from app.utils.exceptions import BlocklistLoadError
+
+
+class AdminController:
+    """Controlador para operaciones de administración."""
+
+    def __init__(self, blocklist: BlocklistManager):
+        """
+        Inicializa el controlador.
+
+        Args:
+            blocklist: Gestor de la lista de palabras bloqueadas
+        """
+        self.blocklist = blocklist
+        self.blueprint = Blueprint('admin', __name__, url_prefix='/api/admin')
+        self._register_routes()
+
+    def _register_routes(self):
+        """Registra las rutas del controlador."""
+        self.blueprint.route('/blocklist', methods=['GET'])(
+            api_key_required(self.get_blocklist_status)
+        )
+
+        self.blueprint.route('/blocklist/reload', methods=['POST'])(
+            api_key_required(self.reload_blocklist)
+        )
+
+    def get_blocklist_status(self) -> Tuple[dict, int]:
+        """
+        Endpoint GET /api/admin/blocklist
+        Devuelve la versión activa de la lista, su tiempo de compilación y el
+        estado de la última recarga.
+        """
+        return {
+            'status': 'success',
+            'data': self.blocklist.status()
+        }, 200
+
+    def reload_blocklist(self) -> Tuple[dict, int]:
+        """
+        Endpoint POST /api/admin/blocklist/reload
+        Recarga la lista de palabras desde su origen.
+
+        Por defecto la recarga se hace en segundo plano y se responde 202; con
+        ?wait=true se espera a que termine y se responde con la versión activa.
+        """
+        try:
+            if request.args.get('wait', 'false').lower() != 'true':
+                started = self.blocklist.reload_in_background()
+                return {
+                    'status': 'accepted',
+                    'data': {**self.blocklist.status(), 'reload_started': started}
+                }, 202
+
+            previous_version = self.blocklist.active.version
+            snapshot = self.blocklist.reload()
+            return {
+                'status': 'success',
+                'data': {**self.blocklist.status(), 'changed': snapshot.version != previous_version}
+            }, 200
+
+        except BlocklistLoadError as e:
+            return self._error_response(e.code, e.message, self.blocklist.status()), e.status_code
+        except Exception as e:
+            print(f"Error inesperado en reload_blocklist: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+
+            return self._error_response(
+                "INTERNAL_ERROR",
+                f"Error interno del servidor: {str(e)}"
+            ), 500
+
+    def _error_response(self, code: str, message: str, details=None) -> dict:
+        """Crea una respuesta de error estandarizada."""
+        return {
+            'status': 'error',
+            'error': {
+                'code': code,
+                'message': message,
+                'details': details
+            }
+        }
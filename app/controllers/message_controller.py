@@ -2,22 +2,28 @@
 Controladores para la API de mensajes
 Este módulo maneja las peticiones HTTP y coordina las respuestas.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from marshmallow import ValidationError as MarshmallowValidationError
-from typing import Tuple
+from functools import wraps
+from typing import Optional, Tuple, Union
+import hashlib
 import json
 import traceback
 from app import limiter
 from werkzeug.exceptions import BadRequest
 from app.utils.auth import api_key_required
+from app.utils import json_provider
+from app.utils.idempotency import CachedResponse, IdempotencyCache
+from app.utils.ndjson import NDJSON_MIMETYPE, chunked, dumps_line, iter_ndjson_lines
 from app.controllers.realtime_controller import broadcast_new_message
 from flask import current_app
 
 from app.services.message_service import MessageService
+from app.services.ingest_queue import WriteBehindQueue
 from app.schemas.message_schema import (
     message_input_schema, 
+    message_lookup_schema,
     message_response_schema, 
-    message_list_response_schema,
     error_response_schema
 )
 from app.utils.exceptions import (
@@ -26,27 +32,59 @@ from app.utils.exceptions import (
     InvalidFormatError, 
     InappropriateContentError,
     MessageNotFoundError,
-    DatabaseError
+    DatabaseError,
+    QueueFullError,
+    DuplicateMessageError,
+    IdempotencyKeyReuseError,
+    IdempotencyInProgressError,
+    SearchIndexNotReadyError
 )
 
 class MessageController:
     """Controlador para operaciones de mensajes."""
     
-    def __init__(self, message_service: MessageService):
+    def __init__(
+        self,
+        message_service: MessageService,
+        ingest_queue: Optional[WriteBehindQueue] = None,
+        idempotency_cache: Optional[IdempotencyCache] = None
+    ):
         """
         Inicializa el controlador.
         
         Args:
             message_service: Servicio de procesamiento de mensajes
+            ingest_queue: Cola write-behind usada cuando ASYNC_INGEST_ENABLED está activo
+            idempotency_cache: Caché de respuestas para la cabecera Idempotency-Key
         """
         self.message_service = message_service
+        self.ingest_queue = ingest_queue
+        self.idempotency_cache = idempotency_cache
         self.blueprint = Blueprint('messages', __name__, url_prefix='/api')
         self._register_routes()
     
     def _register_routes(self):
         """Registra las rutas del controlador."""
         self.blueprint.route('/messages', methods=['POST'])(
-            api_key_required(limiter.limit(lambda: current_app.config.get("RATELIMIT_DEFAULT", "100 per hour"))(self.create_message))
+            api_key_required(self._idempotent(
+                limiter.limit(lambda: current_app.config.get("RATELIMIT_DEFAULT", "100 per hour"))(self.create_message)
+            ))
+        )
+
+        self.blueprint.route('/messages/batch', methods=['POST'])(
+            api_key_required(limiter.limit(lambda: current_app.config.get("RATELIMIT_DEFAULT", "100 per hour"))(self.create_messages_batch))
+        )
+
+        self.blueprint.route('/messages/lookup', methods=['POST'])(
+            api_key_required(self.lookup_messages)
+        )
+
+        self.blueprint.route('/messages/ndjson', methods=['POST'])(
+            api_key_required(self.import_messages_ndjson)
+        )
+
+        self.blueprint.route('/ingest/status/<message_id>', methods=['GET'])(
+            api_key_required(self.get_ingest_status)
         )
 
         self.blueprint.route('/messages/<session_id>', methods=['GET'])(
@@ -61,10 +99,67 @@ class MessageController:
             api_key_required(self.get_session_stats)
         )
 
+        self.blueprint.route('/sessions/<session_id>/export', methods=['GET'])(
+            api_key_required(self.export_session)
+        )
+
         self.blueprint.route('/messages/search/all', methods=['GET'])(
             api_key_required(self.search_messages_globally)
         ) 
     
+    def _idempotent(self, view):
+        """
+        Envuelve un endpoint para soportar la cabecera Idempotency-Key.
+        
+        La primera petición con una clave se procesa y, si responde 2xx, su
+        respuesta serializada se guarda; los reintentos con la misma clave y el
+        mismo cuerpo la reciben byte a byte (con Idempotent-Replayed: true) sin
+        llegar al servicio ni a la base de datos. Los duplicados concurrentes
+        esperan a la primera petición. Las claves se acotan por API key.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None or self.idempotency_cache is None:
+                return view(*args, **kwargs)
+            
+            key = key.strip()
+            if not key or len(key) > 255:
+                return self._error_response(
+                    "INVALID_IDEMPOTENCY_KEY",
+                    "Idempotency-Key debe tener entre 1 y 255 caracteres"
+                ), 400
+            
+            scoped_key = f"{request.headers.get('Authorization', '')}\n{key}"
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            try:
+                cached = self.idempotency_cache.acquire(
+                    scoped_key, fingerprint, current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+                )
+            except (IdempotencyKeyReuseError, IdempotencyInProgressError) as e:
+                return self._error_response(e.code, e.message), e.status_code
+            
+            if cached is not None:
+                response = Response(cached.body, status=cached.status, headers=cached.headers)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except BaseException:
+                self.idempotency_cache.release(scoped_key)
+                raise
+            
+            if 200 <= response.status_code < 300:
+                self.idempotency_cache.complete(
+                    scoped_key, CachedResponse(response.get_data(), response.status_code, list(response.headers))
+                )
+            else:
+                self.idempotency_cache.release(scoped_key)
+            return response
+        
+        return wrapper
+    
     def create_message(self) -> Tuple[dict, int]:
         """
         Endpoint POST /api/messages
@@ -103,6 +198,14 @@ class MessageController:
                     e.messages
                 ), 400
             
+            # 4a. Modo asíncrono: validar, encolar y responder 202
+            if self.ingest_queue is not None and current_app.config.get('ASYNC_INGEST_ENABLED'):
+                queued = self.ingest_queue.submit(validated_data)
+                return {
+                    'status': 'accepted',
+                    'data': queued
+                }, 202, {'Location': f"/api/ingest/status/{queued['message_id']}"}
+            
             # 4. Procesar mensaje a través del servicio
             processed_message = self.message_service.process_message(validated_data)
             
@@ -123,12 +226,22 @@ class MessageController:
                 "JSON malformado en el cuerpo de la petición"
             ), 400
         
+        except DuplicateMessageError as e:
+            # Un reintento idéntico devuelve el mensaje almacenado sin volver a transmitirlo
+            if e.is_replay:
+                return {
+                    'status': 'success',
+                    'data': e.existing.to_dict()
+                }, 200
+            return self._error_response(e.code, e.message, getattr(e, 'details', None)), e.status_code
         except ValidationError as e:
             return self._error_response(e.code, e.message, getattr(e, 'details', None)), e.status_code
         except InvalidFormatError as e:
             return self._error_response(e.code, e.message, getattr(e, 'details', None)), e.status_code
         except InappropriateContentError as e:
             return self._error_response(e.code, e.message, getattr(e, 'details', None)), e.status_code
+        except QueueFullError as e:
+            return self._error_response(e.code, e.message), e.status_code, {'Retry-After': '1'}
         except DatabaseError as e:
             return self._error_response(e.code, e.message), 500
         except Exception as e:
@@ -141,22 +254,298 @@ class MessageController:
                 f"Error interno del servidor: {str(e)}"
             ), 500
     
-    def get_messages_by_session(self, session_id: str) -> Tuple[dict, int]:
+    def create_messages_batch(self) -> Tuple[dict, int]:
+        """
+        Endpoint POST /api/messages/batch
+        Crea varios mensajes en una sola petición y una sola transacción.
+        
+        Responde 201 si no hubo errores (200 si todos eran reintentos idénticos
+        de mensajes ya almacenados), 207 si el resultado es parcial y 400 si no
+        se pudo crear ninguno. Cada elemento tiene su resultado.
+        """
+        try:
+            # 1. Validar que el contenido sea JSON
+            if not request.is_json:
+                return self._error_response(
+                    "INVALID_CONTENT_TYPE",
+                    "Content-Type debe ser application/json"
+                ), 400
+            
+            # 2. Obtener datos de la petición con manejo de JSON inválido
+            try:
+                json_data = request.get_json()
+            except (json.JSONDecodeError, BadRequest):
+                return self._error_response(
+                    "INVALID_JSON",
+                    "JSON malformado en el cuerpo de la petición"
+                ), 400
+            
+            if not isinstance(json_data, list):
+                return self._error_response(
+                    "INVALID_PAYLOAD",
+                    "El cuerpo de la petición debe ser un arreglo de mensajes"
+                ), 400
+            
+            if not json_data:
+                return self._error_response(
+                    "EMPTY_PAYLOAD",
+                    "El cuerpo de la petición está vacío"
+                ), 400
+            
+            max_size = current_app.config.get('BATCH_MAX_SIZE', 500)
+            if len(json_data) > max_size:
+                return self._error_response(
+                    "BATCH_TOO_LARGE",
+                    f"El lote no puede superar {max_size} mensajes",
+                    {"max_batch_size": max_size, "received": len(json_data)}
+                ), 400
+            
+            # 3. Validar esquema y procesar el lote
+            results = self._process_batch(json_data)
+            
+            # 4. Transmitir los mensajes creados a través del WebSocket
+            for result in results:
+                if result['status'] == 'created':
+                    broadcast_new_message(result['data'])
+            
+            summary = self._batch_summary(results)
+            if summary['failed'] == 0:
+                status, status_code = 'success', 201 if summary['created'] else 200
+            elif summary['created'] + summary['replayed'] == 0:
+                status, status_code = 'error', 400
+            else:
+                status, status_code = 'partial', 207
+            
+            return {
+                'status': status,
+                'data': results,
+                'summary': summary
+            }, status_code
+        
+        except BadRequest:
+            return self._error_response(
+                "INVALID_JSON",
+                "JSON malformado en el cuerpo de la petición"
+            ), 400
+        except DatabaseError as e:
+            return self._error_response(e.code, e.message), 500
+        except Exception as e:
+            print(f"Error inesperado en create_messages_batch: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            
+            return self._error_response(
+                "INTERNAL_ERROR",
+                f"Error interno del servidor: {str(e)}"
+            ), 500
+    
+    def import_messages_ndjson(self):
+        """
+        Endpoint POST /api/messages/ndjson
+        Importa mensajes desde un cuerpo application/x-ndjson de tamaño arbitrario.
+        
+        El cuerpo se lee línea a línea y se confirma en bloques de chunk_size
+        mensajes (query param, por defecto NDJSON_CHUNK_SIZE). La respuesta es a
+        su vez NDJSON: una línea de reporte por bloque y una línea final de resumen,
+        de modo que la memoria usada no depende del tamaño de la importación.
+        Los mensajes importados no se transmiten por WebSocket.
+        """
+        if request.mimetype != NDJSON_MIMETYPE:
+            return self._error_response(
+                "INVALID_CONTENT_TYPE",
+                f"Content-Type debe ser {NDJSON_MIMETYPE}"
+            ), 400
+        
+        config = current_app.config
+        chunk_size = request.args.get('chunk_size', config['NDJSON_CHUNK_SIZE'], type=int)
+        chunk_size = max(1, min(chunk_size, config['NDJSON_MAX_CHUNK_SIZE']))
+        lines = iter_ndjson_lines(request.stream, config['NDJSON_MAX_LINE_BYTES'])
+        
+        def generate():
+            summary = {'lines': 0, 'created': 0, 'replayed': 0, 'failed': 0, 'chunks': 0}
+            try:
+                for chunk in chunked(lines, chunk_size):
+                    report = self._import_ndjson_chunk(chunk)
+                    summary['chunks'] += 1
+                    report['chunk'] = summary['chunks']
+                    summary['lines'] += len(chunk)
+                    summary['created'] += report['created']
+                    summary['replayed'] += report['replayed']
+                    summary['failed'] += report['failed']
+                    yield dumps_line(report)
+            except DatabaseError as e:
+                yield dumps_line({**self._error_response(e.code, e.message), 'summary': summary})
+                return
+            except Exception as e:
+                print(f"Error inesperado en import_messages_ndjson: {str(e)}")
+                print(f"Traceback: {traceback.format_exc()}")
+                yield dumps_line({
+                    **self._error_response("INTERNAL_ERROR", f"Error interno del servidor: {str(e)}"),
+                    'summary': summary
+                })
+                return
+            
+            yield dumps_line({'status': 'completed', 'summary': summary})
+        
+        return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    
+    def _import_ndjson_chunk(self, chunk: list) -> dict:
+        """
+        Procesa y confirma un bloque de líneas NDJSON.
+        
+        Args:
+            chunk: Lista de NDJSONLine
+            
+        Returns:
+            dict: Reporte del bloque con los errores por número de línea
+        """
+        errors = []
+        parsed_lines = []
+        for line in chunk:
+            if line.error:
+                errors.append({
+                    'line': line.line_number,
+                    'message_id': None,
+                    'error': {'code': 'INVALID_JSON', 'message': line.error, 'details': None}
+                })
+            else:
+                parsed_lines.append(line)
+        
+        results = self._process_batch([line.data for line in parsed_lines])
+        replayed = 0
+        for line, result in zip(parsed_lines, results):
+            if result['status'] == 'replayed':
+                replayed += 1
+            elif result['status'] == 'error':
+                errors.append({
+                    'line': line.line_number,
+                    'message_id': result['message_id'],
+                    'error': result['error']
+                })
+        errors.sort(key=lambda error: error['line'])
+        
+        return {
+            'status': 'chunk',
+            'first_line': chunk[0].line_number,
+            'last_line': chunk[-1].line_number,
+            'created': len(chunk) - len(errors) - replayed,
+            'replayed': replayed,
+            'failed': len(errors),
+            'errors': errors
+        }
+    
+    def _process_batch(self, items: list) -> list:
+        """
+        Valida con Marshmallow cada elemento de un lote y procesa los válidos
+        a través del servicio, conservando el orden de entrada.
+        
+        Args:
+            items: Elementos recibidos (sin validar)
+            
+        Returns:
+            list: Un resultado por elemento
+        """
+        results = [None] * len(items)
+        valid_indexes = []
+        valid_items = []
+        
+        for index, item in enumerate(items):
+            try:
+                valid_items.append(message_input_schema.load(item))
+                valid_indexes.append(index)
+            except MarshmallowValidationError as e:
+                results[index] = {
+                    'index': index,
+                    'message_id': item.get('message_id') if isinstance(item, dict) else None,
+                    'status': 'error',
+                    'error': {
+                        'code': 'SCHEMA_VALIDATION_ERROR',
+                        'message': 'Errores de validación de esquema',
+                        'details': e.messages
+                    }
+                }
+        
+        if valid_items:
+            service_results = self.message_service.process_message_batch(valid_items)
+            for index, result in zip(valid_indexes, service_results):
+                result['index'] = index
+                results[index] = result
+        
+        return results
+    
+    def _batch_summary(self, results: list) -> dict:
+        """Resume los resultados de un lote."""
+        created = sum(1 for result in results if result['status'] == 'created')
+        replayed = sum(1 for result in results if result['status'] == 'replayed')
+        return {
+            'total': len(results),
+            'created': created,
+            'replayed': replayed,
+            'failed': len(results) - created - replayed
+        }
+    
+    def get_ingest_status(self, message_id: str) -> Tuple[dict, int]:
+        """
+        Endpoint GET /api/ingest/status/<message_id>
+        Consulta el estado (queued, stored o failed) de un mensaje enviado en
+        modo asíncrono. Si la cola ya no lo recuerda, se consulta la base de datos.
+        
+        Args:
+            message_id: ID del mensaje
+            
+        Returns:
+            tuple: (response_data, status_code)
+        """
+        try:
+            status = self.ingest_queue.get_status(message_id) if self.ingest_queue is not None else None
+            
+            if status is None:
+                if not self.message_service.message_repository.exists_by_message_id(message_id):
+                    return self._error_response(
+                        "NOT_FOUND",
+                        f"No se encontró mensaje con ID: {message_id}"
+                    ), 404
+                status = {'message_id': message_id, 'status': 'stored'}
+            
+            return {
+                'status': 'success',
+                'data': status
+            }, 200
+        
+        except DatabaseError as e:
+            return self._error_response(e.code, e.message), 500
+        except Exception as e:
+            print(f"Error inesperado en get_ingest_status: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            
+            return self._error_response(
+                "INTERNAL_ERROR",
+                f"Error interno del servidor: {str(e)}"
+            ), 500
+    
+    def get_messages_by_session(self, session_id: str) -> Union[Response, Tuple[dict, int]]:
         """
         Endpoint GET /api/messages/<session_id>
         Obtiene mensajes por session_id con paginación.
         
+        Responde 304 si If-None-Match coincide con la ETag de la página, que se
+        deriva de la versión de la sesión sin leer sus mensajes. El cuerpo se
+        compone con el JSON guardado de cada mensaje (columna rendered_json).
+        
         Args:
             session_id: ID de la sesión
             
         Returns:
-            tuple: (response_data, status_code)
+            Response con la página (o 304), o tuple (response_data, status_code) en caso de error
         """
         try:
             # 1. Obtener parámetros de query
             limit = request.args.get('limit', 10, type=int)
             offset = request.args.get('offset', 0, type=int)
             sender = request.args.get('sender', None, type=str)
+            after = request.args.get('after', None, type=str)
+            before = request.args.get('before', None, type=str)
+            tail = request.args.get('tail', 'false').lower() == 'true'
+            fields = request.args.get('fields', None, type=str)
             
             # 2. Validar session_id
             if not session_id or not session_id.strip():
@@ -165,19 +554,33 @@ class MessageController:
                     "session_id no puede estar vacío"
                 ), 400
             
-            # 3. Obtener mensajes del servicio
+            # 3. Validar la ETag antes de leer ningún mensaje
+            etag = self.message_service.get_session_etag(session_id, request.query_string)
+            if request.if_none_match.contains_weak(etag):
+                return self._not_modified(etag)
+            
+            # 4. Obtener mensajes del servicio: JSON ya renderizado por mensaje
+            # o, con fields, solo los campos pedidos
             result = self.message_service.get_messages_by_session(
-                session_id, limit, offset, sender
+                session_id, limit, offset, sender, after=after, before=before, tail=tail,
+                rendered=not fields, fields=fields
             )
             
-            # 4. Preparar respuesta
-            response_data = {
-                'status': 'success',
-                'data': result['messages'],
-                'pagination': result['pagination']
-            }
-            
-            return response_data, 200
+            # 5. Preparar respuesta concatenando el JSON de cada mensaje
+            messages = result['messages'] if not fields else [json_provider.dumps(m) for m in result['messages']]
+            body = ''.join([
+                '{"status":"success","data":[',
+                ','.join(messages),
+                '],"pagination":',
+                json_provider.dumps(result['pagination']),
+                '}'
+            ])
+            return Response(
+                body.encode('utf-8'),
+                status=200,
+                mimetype='application/json',
+                headers=self._etag_headers(etag)
+            )
             
         except ValidationError as e:
             return self._error_response(e.code, e.message, getattr(e, 'details', None)), e.status_code
@@ -192,16 +595,18 @@ class MessageController:
                 f"Error interno del servidor: {str(e)}"
             ), 500
     
-    def get_message_by_id(self, message_id: str) -> Tuple[dict, int]:
+    def get_message_by_id(self, message_id: str) -> Union[Response, Tuple[dict, int]]:
         """
         Endpoint GET /api/message/<message_id>
         Obtiene un mensaje específico por ID.
         
+        Responde 304 si If-None-Match coincide con la ETag del mensaje.
+        
         Args:
             message_id: ID del mensaje
             
         Returns:
-            tuple: (response_data, status_code)
+            Response con el mensaje (o 304), o tuple (response_data, status_code) en caso de error
         """
         try:
             # 1. Validar message_id
@@ -211,19 +616,27 @@ class MessageController:
                     "message_id no puede estar vacío"
                 ), 400
             
-            # 2. Obtener mensaje del servicio
-            message_data = self.message_service.get_message_by_id(message_id)
+            fields = request.args.get('fields', None, type=str)
             
-            # 3. Preparar respuesta
-            response_data = {
-                'status': 'success',
-                'data': message_data
-            }
+            # 2. Validar la ETag sin cargar ni serializar el mensaje
+            if request.if_none_match:
+                etag = self.message_service.get_message_etag(message_id, fields)
+                if etag is not None and request.if_none_match.contains_weak(etag):
+                    return self._not_modified(etag)
             
-            return response_data, 200
+            # 3. Obtener el mensaje ya serializado (caché LRU del servicio)
+            message = self.message_service.get_message_json(message_id, fields)
             
-        except MessageNotFoundError as e:
-            return self._error_response(e.code, e.message), e.status_code
+            # 4. Preparar respuesta sin volver a serializar el mensaje
+            return Response(
+                b'{"status":"success","data":' + message.body + b'}',
+                status=200,
+                mimetype='application/json',
+                headers=self._etag_headers(message.etag)
+            )
+            
+        except (MessageNotFoundError, ValidationError) as e:
+            return self._error_response(e.code, e.message, getattr(e, 'details', None)), e.status_code
         except DatabaseError as e:
             return self._error_response(e.code, e.message), 500
         except Exception as e:
@@ -235,16 +648,94 @@ class MessageController:
                 f"Error interno del servidor: {str(e)}"
             ), 500
     
-    def get_session_stats(self, session_id: str) -> Tuple[dict, int]:
+    def lookup_messages(self) -> Union[Response, Tuple[dict, int]]:
+        """
+        Endpoint POST /api/messages/lookup
+        Resuelve hasta LOOKUP_MAX_IDS mensajes por ID en una sola petición.
+        
+        Cuerpo: {"message_ids": [...]}. La respuesta tiene un elemento por ID
+        distinto, en el orden recibido, con status 'found' (y el mensaje en
+        data) o 'not_found'. Los mensajes se copian tal cual desde la caché o
+        desde el JSON guardado, sin volver a serializarlos.
+        
+        Returns:
+            Response con los resultados, o tuple (response_data, status_code) en caso de error
+        """
+        try:
+            # 1. Validar que el contenido sea JSON
+            if not request.is_json:
+                return self._error_response(
+                    "INVALID_CONTENT_TYPE",
+                    "Content-Type debe ser application/json"
+                ), 400
+            
+            # 2. Validar esquema y tamaño
+            try:
+                message_ids = message_lookup_schema.load(request.get_json())['message_ids']
+            except MarshmallowValidationError as e:
+                return self._error_response(
+                    "SCHEMA_VALIDATION_ERROR",
+                    "Errores de validación de esquema",
+                    e.messages
+                ), 400
+            
+            max_ids = current_app.config['LOOKUP_MAX_IDS']
+            if len(message_ids) > max_ids:
+                return self._error_response(
+                    "LOOKUP_TOO_LARGE",
+                    f"No se pueden consultar más de {max_ids} mensajes por petición",
+                    {"max_ids": max_ids, "received": len(message_ids)}
+                ), 400
+            
+            # 3. Resolver los mensajes (caché + una consulta IN)
+            results = self.message_service.lookup_messages(message_ids)
+            
+            # 4. Ensamblar la respuesta sin volver a serializar los mensajes
+            entries = []
+            found = 0
+            for message_id, message in results.items():
+                key = json_provider.dumps_bytes(message_id)
+                if message is None:
+                    entries.append(key + b':{"status":"not_found","data":null}')
+                else:
+                    found += 1
+                    entries.append(key + b':{"status":"found","data":' + message.body + b'}')
+            summary = {'requested': len(results), 'found': found, 'not_found': len(results) - found}
+            return Response(
+                b'{"status":"success","data":{' + b','.join(entries)
+                + b'},"summary":' + json_provider.dumps_bytes(summary) + b'}',
+                status=200,
+                mimetype='application/json'
+            )
+            
+        except BadRequest:
+            return self._error_response(
+                "INVALID_JSON",
+                "JSON malformado en el cuerpo de la petición"
+            ), 400
+        except DatabaseError as e:
+            return self._error_response(e.code, e.message), 500
+        except Exception as e:
+            print(f"Error inesperado en lookup_messages: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            
+            return self._error_response(
+                "INTERNAL_ERROR",
+                f"Error interno del servidor: {str(e)}"
+            ), 500
+    
+    def get_session_stats(self, session_id: str) -> Union[Response, Tuple[dict, int]]:
         """
         Endpoint GET /api/sessions/<session_id>/stats
         Obtiene estadísticas de una sesión.
         
+        Responde 304 si If-None-Match coincide con la versión de la sesión.
+        
         Args:
             session_id: ID de la sesión
             
         Returns:
-            tuple: (response_data, status_code)
+            tuple: (response_data, status_code, headers), o Response 304
         """
         try:
             # 1. Validar session_id
@@ -254,16 +745,21 @@ class MessageController:
                     "session_id no puede estar vacío"
                 ), 400
             
-            # 2. Obtener estadísticas del servicio
+            # 2. Validar la ETag antes de calcular las estadísticas
+            etag = self.message_service.get_session_etag(session_id)
+            if request.if_none_match.contains_weak(etag):
+                return self._not_modified(etag)
+            
+            # 3. Obtener estadísticas del servicio
             stats = self.message_service.get_session_statistics(session_id)
             
-            # 3. Preparar respuesta
+            # 4. Preparar respuesta
             response_data = {
                 'status': 'success',
                 'data': stats
             }
             
-            return response_data, 200
+            return response_data, 200, self._etag_headers(etag)
             
         except DatabaseError as e:
             return self._error_response(e.code, e.message), 500
@@ -276,6 +772,88 @@ class MessageController:
                 f"Error interno del servidor: {str(e)}"
             ), 500
     
+    def export_session(self, session_id: str) -> Union[Response, Tuple[dict, int]]:
+        """
+        Endpoint GET /api/sessions/<session_id>/export
+        Descarga todos los mensajes de una sesión en orden cronológico.
+        
+        Query params: format ('ndjson' por defecto o 'csv') y fields. La
+        respuesta se transmite por bloques de EXPORT_BATCH_SIZE mensajes, cada
+        uno leído con una consulta corta por cursor, así que la memoria no
+        depende del tamaño de la sesión ni la descarga bloquea las escrituras.
+        Un error a mitad de la transmisión se notifica con una línea de
+        error NDJSON (en CSV la descarga termina incompleta).
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            Response: Documento en streaming, o tuple (response_data, status_code)
+        """
+        try:
+            # 1. Validar session_id
+            if not session_id or not session_id.strip():
+                return self._error_response(
+                    "INVALID_SESSION_ID",
+                    "session_id no puede estar vacío"
+                ), 400
+            
+            # 2. Validar parámetros y existencia antes de enviar cabeceras
+            export_format = request.args.get('format', 'ndjson').lower()
+            chunks = self.message_service.export_session(
+                session_id,
+                export_format,
+                fields=request.args.get('fields'),
+                batch_size=current_app.config['EXPORT_BATCH_SIZE']
+            )
+            
+        except (ValidationError, InvalidFormatError) as e:
+            return self._error_response(e.code, e.message, e.details), 400
+        except MessageNotFoundError as e:
+            return self._error_response(e.code, e.message), 404
+        except DatabaseError as e:
+            return self._error_response(e.code, e.message), 500
+        except Exception as e:
+            print(f"Error inesperado en export_session: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            
+            return self._error_response(
+                "INTERNAL_ERROR",
+                f"Error interno del servidor: {str(e)}"
+            ), 500
+        
+        # 3. Transmitir el documento
+        def generate():
+            try:
+                yield from chunks
+            except DatabaseError as e:
+                if export_format == 'ndjson':
+                    yield dumps_line(self._error_response(e.code, e.message))
+            except Exception as e:
+                print(f"Error inesperado en export_session: {str(e)}")
+                print(f"Traceback: {traceback.format_exc()}")
+                if export_format == 'ndjson':
+                    yield dumps_line(self._error_response(
+                        "INTERNAL_ERROR", f"Error interno del servidor: {str(e)}"
+                    ))
+        
+        mimetype = NDJSON_MIMETYPE if export_format == 'ndjson' else 'text/csv'
+        filename = f"session-export.{export_format}"
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
+    @staticmethod
+    def _etag_headers(etag: str) -> dict:
+        """Cabeceras de una lectura con ETag: el cliente debe revalidar siempre."""
+        return {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    
+    def _not_modified(self, etag: str) -> Response:
+        """Respuesta 304 sin cuerpo para un If-None-Match que coincide."""
+        return Response(status=304, headers=self._etag_headers(etag))
+    
     def _error_response(self, code: str, message: str, details=None) -> dict:
         """
         Crea una respuesta de error estandarizada.
@@ -306,15 +884,32 @@ class MessageController:
             # Obtener parámetros de paginación
             limit = int(request.args.get('limit', 10))
             offset = int(request.args.get('offset', 0))
+            fields = request.args.get('fields')
+            mode = request.args.get('mode', 'words')
+            sort = request.args.get('sort', 'recent')
+            snippets = request.args.get('snippets', 'false').lower() == 'true'
+            count = request.args.get('count', 'exact')
 
             # Obtener resultados del servicio
-            results = self.message_service.search_messages_globally(query, limit, offset)
+            results = self.message_service.search_messages_globally(
+                query, limit, offset, fields=fields, mode=mode,
+                max_candidates=current_app.config['SEARCH_REGEX_MAX_CANDIDATES'],
+                sort=sort, snippets=snippets, count=count
+            )
             
-            # Serializar y devolver la respuesta
-            return message_list_response_schema.dump(results), 200
+            # Devolver la respuesta (to_dict ya da la forma pública de cada mensaje)
+            return {
+                'status': 'success',
+                'data': results['data'],
+                'pagination': results['pagination']
+            }, 200
 
         except ValidationError as e:
             return self._error_response(e.code, e.message, e.details), 400
+        except SearchIndexNotReadyError as e:
+            return self._error_response(e.code, e.message), e.status_code, {'Retry-After': '60'}
+        except DatabaseError as e:
+            return self._error_response(e.code, e.message), e.status_code
         except Exception as e:
             print(f"Error inesperado en search_messages_globally: {str(e)}")
             print(f"Traceback: {traceback.format_exc()}")
@@ -0,0 +1,22 @@
+"""
+Modelo de la lista de palabras bloqueadas.
+Este módulo define la tabla desde la que se puede cargar el filtro de contenido.
+"""
+from datetime import datetime, timezone
+
+from app.models.message import db
+
+
+class BlocklistTerm(db.Model):
+    """Término de la lista de palabras inapropiadas."""
+    __tablename__ = 'blocklist_terms'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    term = db.Column(db.String(255), nullable=False, unique=True)
+    created_at = db.Column(
+        db.DateTime, nullable=False,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+
+    def __repr__(self):
+        return f'<BlocklistTerm {self.term}>'
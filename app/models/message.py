@@ -4,10 +4,108 @@ Este módulo define las entidades de base de datos usando SQLAlchemy.
 """
 from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event, func, literal_column, select, text, tuple_
+from typing import Dict, List, NamedTuple, Optional, Sequence
 import uuid
 
-# Instancia global de SQLAlchemy
-db = SQLAlchemy()
+from app.models.message_search import (
+    DROP_STATEMENTS as SEARCH_DROP_STATEMENTS,
+    ESTIMATE_MIN_HITS,
+    ESTIMATE_SAMPLE_ROWS,
+    MODE_INDEXES,
+    RECENT_SCAN_BATCH,
+    RECENT_SCAN_LIMIT,
+    RECENT_SCAN_MAX_BATCH,
+    SEARCH_INDEXES,
+    TRIGRAM_TABLE,
+    create_search_index,
+    match_expression,
+    render_snippet,
+    search_index_ready,
+    snippet_sql,
+    substring_expression
+)
+from app.utils import json_provider
+
+# Instancia global de SQLAlchemy.
+# expire_on_commit=False evita que cada commit obligue a recargar (un SELECT por
+# objeto) los mensajes recién insertados antes de serializarlos.
+db = SQLAlchemy(session_options={'expire_on_commit': False})
+
+
+def _to_naive_utc(value):
+    """Normaliza un datetime a UTC sin tzinfo, tal y como lo almacena SQLite."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# Campos públicos de un mensaje para ?fields=: ruta en la respuesta -> columna
+MESSAGE_FIELDS = {
+    'message_id': 'message_id',
+    'session_id': 'session_id',
+    'content': 'content',
+    'timestamp': 'timestamp',
+    'sender': 'sender',
+    'metadata.word_count': 'word_count',
+    'metadata.character_count': 'character_count',
+    'metadata.processed_at': 'processed_at',
+    'metadata.updated_at': 'updated_at',
+}
+
+_DATETIME_COLUMNS = frozenset(['timestamp', 'processed_at', 'updated_at'])
+
+
+def message_dict(row, fields=None):
+    """
+    Representación pública de un mensaje.
+    
+    Args:
+        row: Message o fila de la tabla messages (acceso por atributo); con
+            fields basta con que tenga las columnas de esos campos
+        fields: Rutas de MESSAGE_FIELDS a incluir, en orden (None = todas)
+        
+    Returns:
+        dict: Datos del mensaje tal y como los devuelve la API
+    """
+    if fields is not None:
+        result = {}
+        for field in fields:
+            column = MESSAGE_FIELDS[field]
+            value = getattr(row, column)
+            if column in _DATETIME_COLUMNS:
+                value = value.isoformat() + 'Z'
+            if field.startswith('metadata.'):
+                result.setdefault('metadata', {})[field[9:]] = value
+            else:
+                result[field] = value
+        return result
+    
+    return {
+        "message_id": row.message_id,
+        "session_id": row.session_id,
+        "content": row.content,
+        "timestamp": row.timestamp.isoformat() + 'Z',
+        "sender": row.sender,
+        "metadata": {
+            "word_count": row.word_count,
+            "character_count": row.character_count,
+            "processed_at": row.processed_at.isoformat() + 'Z',
+            "updated_at": row.updated_at.isoformat() + 'Z'
+        }
+    }
+
+
+class RenderedMessage(NamedTuple):
+    """Mensaje de una página leído solo como su JSON ya renderizado."""
+    id: int
+    timestamp: datetime
+    json: str
+
+
+def render_message_json(row):
+    """JSON compacto (UTF-8 sin escapar) de message_dict; es el que guarda rendered_json."""
+    return json_provider.dumps(message_dict(row))
 
 class Message(db.Model):
     """
@@ -16,13 +114,21 @@ class Message(db.Model):
     Representa un mensaje en el sistema con todos sus metadatos.
     """
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Sirve la paginación por cursor de una sesión en ambos sentidos
+        db.Index('ix_messages_session_timestamp_id', 'session_id', 'timestamp', 'id'),
+        # Filtro por remitente dentro de una sesión (páginas y recuentos)
+        db.Index('ix_messages_session_sender_timestamp', 'session_id', 'sender', 'timestamp'),
+        # Orden por fecha de la búsqueda global (ver Message._recent_matches)
+        db.Index('ix_messages_timestamp_id', 'timestamp', 'id'),
+    )
     
     # Clave primaria autoincremental
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
     # Campos principales del mensaje
-    message_id = db.Column(db.String(255), nullable=False, index=True)
-    session_id = db.Column(db.String(255), nullable=False, index=True)
+    message_id = db.Column(db.String(255), nullable=False, index=True, unique=True)
+    session_id = db.Column(db.String(255), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
     sender = db.Column(db.String(10), nullable=False)
@@ -33,6 +139,12 @@ class Message(db.Model):
     processed_at = db.Column(db.DateTime, nullable=False)
     updated_at = db.Column(db.DateTime, nullable=False)
     
+    # JSON del mensaje renderizado al insertarlo (ver render_message_json). Las
+    # páginas lo concatenan sin construir objetos; es NULL en filas modificadas
+    # después (trigger) y entonces se renderiza al leer. Diferida: las lecturas
+    # de objetos Message no la cargan
+    rendered_json = db.deferred(db.Column(db.Text, nullable=True))
+    
     def __init__(self, message_id, session_id, content, timestamp, sender, word_count=None, character_count=None):
         """
         Inicializa un nuevo mensaje.
@@ -49,16 +161,47 @@ class Message(db.Model):
         self.message_id = message_id
         self.session_id = session_id
         self.content = content
-        self.timestamp = timestamp
+        self.timestamp = _to_naive_utc(timestamp)
         self.sender = sender
         self.word_count = word_count if word_count is not None else self._calculate_word_count(content)
         self.character_count = character_count if character_count is not None else len(content)
         
         # Timestamps automáticos para metadatos
-        current_time = datetime.now(timezone.utc)
+        current_time = _to_naive_utc(datetime.now(timezone.utc))
         self.processed_at = current_time
         self.updated_at = current_time
     
+    def to_row(self):
+        """
+        Devuelve los valores de las columnas (sin la clave primaria) para
+        inserciones con SQL Core, con el JSON del mensaje ya renderizado.
+        
+        Returns:
+            dict: Columna -> valor
+        """
+        row = {
+            column.key: getattr(self, column.key)
+            for column in self.__table__.columns
+            if not column.primary_key
+        }
+        row['rendered_json'] = render_message_json(self)
+        return row
+    
+    def is_same_message(self, other):
+        """
+        Indica si otro mensaje tiene el mismo contenido que este (un reintento).
+        
+        Se comparan los campos enviados por el cliente, no los metadatos de
+        procesamiento.
+        """
+        return (
+            self.message_id == other.message_id
+            and self.session_id == other.session_id
+            and self.content == other.content
+            and self.sender == other.sender
+            and _to_naive_utc(self.timestamp) == _to_naive_utc(other.timestamp)
+        )
+    
     def _calculate_word_count(self, content):
         """Calcula el número de palabras en el contenido."""
         if not content:
@@ -72,19 +215,7 @@ class Message(db.Model):
         Returns:
             dict: Representación en diccionario del mensaje
         """
-        return {
-            "message_id": self.message_id,
-            "session_id": self.session_id,
-            "content": self.content,
-            "timestamp": self.timestamp.isoformat() + 'Z',
-            "sender": self.sender,
-            "metadata": {
-                "word_count": self.word_count,
-                "character_count": self.character_count,
-                "processed_at": self.processed_at.isoformat() + 'Z',
-                "updated_at": self.updated_at.isoformat() + 'Z'
-            }
-        }
+        return message_dict(self)
     
     def __repr__(self):
         """Representación string del mensaje."""
@@ -136,35 +267,286 @@ class Message(db.Model):
         return query.count()
     
     @classmethod
-    def search_globally(cls, query: str, limit: int, offset: int) -> list:
+    def search_globally(cls, query: str, limit: int, offset: int, columns=None, mode: str = 'words') -> list:
         """
         Realiza una búsqueda global de mensajes paginada.
 
+        Con mode='words' se buscan las palabras del texto en el índice de texto
+        completo (messages_fts); con mode='substring', el texto tal cual, como
+        subcadena, en el índice de trigramas (messages_trigram). Mientras el
+        índice se rellena, o si el texto no da ninguna palabra o trigrama, se
+        resuelve con un LIKE sobre el contenido.
+
+        Con el índice, la página se busca primero entre los mensajes más
+        recientes (ver _recent_matches), de modo que con términos frecuentes el
+        coste depende del tamaño de la página y no del número de coincidencias.
+
         Args:
             query: El texto a buscar en el contenido.
             limit: El número de resultados a devolver.
             offset: El desplazamiento para la paginación.
+            columns: Columnas a leer (None = objetos Message completos).
+            mode: 'words' o 'substring'.
 
         Returns:
-            list: Una lista de objetos Message.
+            list: Una lista de objetos Message (o de filas con esas columnas).
         """
-        search_term = f"%{query.lower()}%"
-        return cls.query.filter(cls.content.ilike(search_term))\
-                        .order_by(cls.timestamp.desc())\
+        base = cls.query if columns is None else db.session.query(*columns)
+        index = cls._search_index(query, mode)
+        if index is not None:
+            ids = cls._recent_matches(*index, offset + limit)
+            if ids is not None:
+                ids = ids[offset:]
+                position = {row_id: i for i, row_id in enumerate(ids)}
+                rows = base.filter(cls.id.in_(ids)).all() if ids else []
+                return sorted(rows, key=lambda row: position[row.id])
+        condition = cls._like_condition(query) if index is None else cls.id.in_(cls._index_matches(*index))
+        return base.filter(condition)\
+                        .order_by(cls.timestamp.desc(), cls.id.desc())\
                         .offset(offset)\
                         .limit(limit)\
                         .all()
 
     @classmethod
-    def count_global_search_results(cls, query: str) -> int:
+    def count_global_search_results(cls, query: str, mode: str = 'words') -> int:
         """
         Cuenta el total de resultados para una búsqueda global.
 
+        Con el índice completo el recuento se hace solo sobre el índice.
+
         Args:
             query: El texto a buscar en el contenido.
+            mode: 'words' o 'substring'.
 
         Returns:
             int: El número total de mensajes que coinciden.
         """
-        search_term = f"%{query.lower()}%"
-        return cls.query.filter(cls.content.ilike(search_term)).count()
\ No newline at end of file
+        index = cls._search_index(query, mode)
+        if index is not None:
+            table, expression = index
+            return db.session.execute(
+                text(f"SELECT COUNT(*) FROM {table} WHERE {table} MATCH :match"),
+                {'match': expression}
+            ).scalar()
+        return cls.query.filter(cls._like_condition(query)).count()
+
+    @classmethod
+    def estimate_global_search_results(cls, query: str, mode: str = 'words') -> int:
+        """
+        Estima el total de resultados de una búsqueda global sin contarlos todos.
+
+        Cuenta las coincidencias entre los últimos ESTIMATE_SAMPLE_ROWS ids y
+        las extrapola al rango de ids de la tabla. Si en la muestra hay menos
+        de ESTIMATE_MIN_HITS se cuentan en el índice, que con pocas
+        coincidencias es barato; sin índice (LIKE) se extrapola igualmente,
+        porque el recuento exacto recorrería la tabla.
+
+        Args:
+            query: El texto a buscar en el contenido.
+            mode: 'words' o 'substring'.
+
+        Returns:
+            int: El número aproximado de mensajes que coinciden.
+        """
+        # Por separado: SQLite solo resuelve MIN o MAX con la clave primaria
+        # si es el único agregado de la consulta
+        last = db.session.execute(select(func.max(cls.id))).scalar()
+        first = db.session.execute(select(func.min(cls.id))).scalar()
+        if last is None:
+            return 0
+        floor = last - ESTIMATE_SAMPLE_ROWS
+        if floor < first:
+            # La muestra abarca toda la tabla
+            return cls.count_global_search_results(query, mode)
+        
+        index = cls._search_index(query, mode)
+        if index is None:
+            hits = cls.query.filter(cls.id > floor, cls._like_condition(query)).count()
+        else:
+            table, expression = index
+            hits = db.session.execute(
+                text(f"SELECT COUNT(*) FROM {table} WHERE {table} MATCH :match AND rowid > :floor"),
+                {'match': expression, 'floor': floor}
+            ).scalar()
+            if hits < ESTIMATE_MIN_HITS:
+                return cls.count_global_search_results(query, mode)
+        return round(hits * (last - first + 1) / ESTIMATE_SAMPLE_ROWS)
+
+    @classmethod
+    def rank_search_results(cls, query: str, limit: int, offset: int, mode: str = 'words') -> Optional[List[int]]:
+        """
+        Ids de una página de la búsqueda global ordenada por relevancia (BM25),
+        la más relevante primero.
+
+        FTS5 calcula bm25() a partir de las listas de apariciones de los
+        términos en el índice, sin leer la tabla messages: el coste depende de
+        cuántos mensajes contienen los términos, no del tamaño de la tabla, y
+        solo se leen después las filas de la página.
+
+        Args:
+            query: El texto a buscar en el contenido.
+            limit: El número de resultados a devolver.
+            offset: El desplazamiento para la paginación.
+            mode: 'words' o 'substring'.
+
+        Returns:
+            Optional[List[int]]: Los ids, o None si la búsqueda no se resuelve
+                con el índice (índice incompleto o texto sin palabras ni trigramas).
+        """
+        index = cls._search_index(query, mode)
+        if index is None:
+            return None
+        table, expression = index
+        return db.session.execute(
+            text(f"SELECT rowid FROM {table} WHERE {table} MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"),
+            {'match': expression, 'limit': limit, 'offset': offset}
+        ).scalars().all()
+
+    @classmethod
+    def search_snippets(cls, query: str, ids: Sequence[int], mode: str = 'words') -> Dict[int, str]:
+        """
+        Fragmentos del contenido con las coincidencias de la búsqueda marcadas
+        con <mark> (y el resto escapado como HTML).
+
+        snippet() de FTS5 elige el fragmento con las posiciones de las
+        coincidencias que guarda el índice, y solo lee el contenido de ids.
+
+        Args:
+            query: El texto buscado.
+            ids: Ids de los mensajes de la página de resultados.
+            mode: 'words' o 'substring'.
+
+        Returns:
+            Dict[int, str]: Fragmento de cada id (vacío si la búsqueda no se
+                resuelve con el índice).
+        """
+        index = cls._search_index(query, mode)
+        if index is None or not ids:
+            return {}
+        table, expression = index
+        rows = db.session.execute(cls._restrict_to_ids(
+            select(literal_column('rowid'), literal_column(snippet_sql(table)))
+            .select_from(text(table))
+            .where(text(f"{table} MATCH :match").bindparams(match=expression)),
+            ids
+        )).all()
+        return {row_id: render_snippet(fragment) for row_id, fragment in rows}
+
+    @classmethod
+    def find_regex_candidates(cls, expression: str, limit: int) -> list:
+        """
+        Candidatos de una búsqueda por expresión regular: los mensajes del
+        índice de trigramas que coinciden con expression, más recientes primero.
+
+        Args:
+            expression: Expresión MATCH con los literales que exige el patrón.
+            limit: Número máximo de candidatos a devolver.
+
+        Returns:
+            list: Filas (id, content).
+        """
+        return db.session.execute(
+            select(cls.id, cls.content)
+            .where(cls.id.in_(cls._index_matches(TRIGRAM_TABLE, expression)))
+            .order_by(cls.timestamp.desc(), cls.id.desc())
+            .limit(limit)
+        ).all()
+
+    @classmethod
+    def _search_index(cls, query: str, mode: str):
+        """(tabla, expresión MATCH) del índice que resuelve la búsqueda, o None si toca LIKE."""
+        table = MODE_INDEXES[mode]
+        expression = substring_expression(query) if mode == 'substring' else match_expression(query)
+        if expression is None or not search_index_ready(db.session, table):
+            return None
+        return table, expression
+
+    @staticmethod
+    def _index_matches(table: str, expression: str):
+        """SELECT de los rowid (ids de mensaje) del índice table que coinciden con expression."""
+        return select(literal_column('rowid'))\
+            .select_from(text(table))\
+            .where(text(f"{table} MATCH :match").bindparams(match=expression))
+
+    @staticmethod
+    def _restrict_to_ids(statement, ids: Sequence[int]):
+        """
+        Limita una consulta sobre un índice FTS5 a los rowid de ids: un rango
+        que FTS5 recorre una sola vez más un IN que no puede usar (+rowid). Con
+        rowid IN (...) FTS5 repite la consulta por cada id, y con términos por
+        prefijo eso vuelve a fusionar sus listas de apariciones cada vez.
+        """
+        return statement\
+            .where(literal_column('rowid').between(min(ids), max(ids)))\
+            .where(literal_column('+rowid').in_(list(ids)))
+
+    @classmethod
+    def _recent_matches(cls, table: str, expression: str, count: int) -> Optional[List[int]]:
+        """
+        Ids de los count mensajes más recientes (timestamp, id descendentes)
+        que coinciden con expression en el índice table.
+
+        Recorre ix_messages_timestamp_id desde el final en bloques que doblan
+        su tamaño y cruza cada bloque con el índice en una sola consulta, en
+        lugar de reunir y ordenar todas las coincidencias. Con términos
+        frecuentes basta el primer bloque. Si al ritmo de coincidencias de lo
+        recorrido harían falta más de RECENT_SCAN_LIMIT mensajes (términos
+        raros, o ninguna coincidencia en el primer bloque) se devuelve None:
+        entonces es más barato ordenar todas.
+
+        Returns:
+            Optional[List[int]]: Los ids en orden (menos de count si la tabla
+                se acaba), o None si la página no cabe en el recorrido.
+        """
+        matches: List[int] = []
+        position = None
+        batch = RECENT_SCAN_BATCH
+        scanned = 0
+        while True:
+            page = select(cls.timestamp, cls.id).order_by(cls.timestamp.desc(), cls.id.desc()).limit(batch)
+            if position is not None:
+                page = page.where(tuple_(cls.timestamp, cls.id) < tuple_(*position))
+            rows = db.session.execute(page).all()
+            if rows:
+                ids = [row.id for row in rows]
+                found = set(db.session.execute(
+                    cls._restrict_to_ids(cls._index_matches(table, expression), ids)
+                ).scalars())
+                matches.extend(row_id for row_id in ids if row_id in found)
+            if len(matches) >= count or len(rows) < batch:
+                return matches[:count]
+            scanned += batch
+            # Al ritmo de coincidencias visto, la página no cabe en el recorrido
+            if len(matches) * RECENT_SCAN_LIMIT < count * scanned:
+                return None
+            position = rows[-1]
+            batch = min(batch * 2, RECENT_SCAN_MAX_BATCH)
+
+    @classmethod
+    def _like_condition(cls, query: str):
+        """content ILIKE '%query%', con los comodines del texto escapados."""
+        escaped = query.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return cls.content.ilike(f"%{escaped}%", escape='\\')
+
+
+# Cualquier UPDATE de los campos publicados invalida el JSON guardado (la fila
+# vuelve a renderizarse al leerla); el trigger no se dispara a sí mismo porque
+# rendered_json no está en la lista de columnas
+RENDERED_JSON_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS trg_messages_rendered_json_update "
+    "AFTER UPDATE OF message_id, session_id, content, timestamp, sender, word_count, "
+    "character_count, processed_at, updated_at ON messages "
+    "BEGIN UPDATE messages SET rendered_json = NULL WHERE id = NEW.id; END"
+)
+
+event.listen(Message.__table__, 'after_create', DDL(RENDERED_JSON_TRIGGER))
+
+# Índices de búsqueda: se crean con la tabla (completos, porque nace vacía) y
+# se eliminan antes que ella
+for _name in SEARCH_INDEXES:
+    event.listen(
+        Message.__table__, 'after_create',
+        lambda target, connection, name=_name, **kw: create_search_index(connection, name)
+    )
+for _statement in SEARCH_DROP_STATEMENTS:
+    event.listen(Message.__table__, 'before_drop', DDL(_statement))
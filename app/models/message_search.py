@@ -0,0 +1,274 @@
+"""
+Índices de texto completo de los mensajes (SQLite FTS5).
+Este módulo define las tablas virtuales que indexan messages.content sin
+duplicarlo (tablas de contenido externo), los triggers que las mantienen al
+día en la misma transacción que cada escritura, y el relleno por bloques de
+los índices para bases de datos que ya tenían mensajes:
+
+- messages_fts: palabras, para la búsqueda por defecto.
+- messages_trigram: trigramas, para subcadenas dentro de las palabras
+  (números de pedido, fragmentos de correos) y para filtrar los candidatos
+  de la búsqueda por expresión regular.
+
+Un mensaje está indexado si y solo si su id es menor o igual que la marca
+search_indexes.indexed_upto del índice: los triggers solo tocan el índice para
+esas filas y el relleno avanza la marca bloque a bloque, cada uno en su
+transacción, de modo que la aplicación puede seguir escribiendo mientras se
+rellena. Cuando el relleno termina la marca pasa a INDEX_COMPLETE y el índice
+cubre cualquier id.
+"""
+import html
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+FTS_TABLE = 'messages_fts'
+TRIGRAM_TABLE = 'messages_trigram'
+
+# unicode61 separa por cualquier carácter que no sea letra o número y pasa a
+# minúsculas; remove_diacritics 2 pliega acentos y diéresis ("canción" =
+# "cancion", "pingüino" = "pinguino"). El índice de prefijos de 3 caracteres
+# acelera las consultas más cortas, que son las que más términos abarcan
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Opciones de cada tabla virtual. trigram indexa cada secuencia de tres
+# caracteres sin distinguir mayúsculas: una frase de N caracteres coincide
+# exactamente con los mensajes que la contienen como subcadena
+SEARCH_INDEXES = {
+    FTS_TABLE: f"tokenize='{FTS_TOKENIZER}', prefix='3'",
+    TRIGRAM_TABLE: "tokenize='trigram'",
+}
+
+SEARCH_MODES = ('words', 'substring', 'regex')
+SEARCH_SORTS = ('recent', 'relevance')
+SEARCH_COUNTS = ('exact', 'estimate', 'none')
+
+# Índice que resuelve cada modo de búsqueda
+MODE_INDEXES = {'words': FTS_TABLE, 'substring': TRIGRAM_TABLE, 'regex': TRIGRAM_TABLE}
+
+# Longitud de los fragmentos resaltados, en tokens del índice (en el de
+# trigramas cada carácter empieza un token)
+SNIPPET_TOKENS = {FTS_TABLE: 16, TRIGRAM_TABLE: 48}
+# FTS5 no escapa el texto: las coincidencias se delimitan con dos no-caracteres
+# de Unicode y se convierten en <mark> después de escapar el fragmento. JSON los
+# admite, así que MessageValidator rechaza el contenido que los incluya
+_MARK_OPEN = '\ufdd0'
+_MARK_CLOSE = '\ufdd1'
+SNIPPET_MARKERS = _MARK_OPEN + _MARK_CLOSE
+
+# Orden por fecha: los mensajes se recorren de los más recientes hacia atrás,
+# en bloques que doblan su tamaño, buscando las coincidencias de la página. Si
+# al ritmo de coincidencias visto harían falta más de RECENT_SCAN_LIMIT
+# mensajes (términos raros) se ordenan todas las coincidencias
+RECENT_SCAN_BATCH = 512
+RECENT_SCAN_MAX_BATCH = 8000
+RECENT_SCAN_LIMIT = 50000
+
+# Estimación del total: coincidencias entre los últimos ESTIMATE_SAMPLE_ROWS
+# ids, extrapoladas al resto de la tabla. Con menos de ESTIMATE_MIN_HITS la
+# muestra no basta y se cuenta en el índice (barato con pocas coincidencias)
+ESTIMATE_SAMPLE_ROWS = 10000
+ESTIMATE_MIN_HITS = 100
+
+INDEX_COMPLETE = 2 ** 63 - 1
+
+STATE_TABLE = (
+    "CREATE TABLE IF NOT EXISTS search_indexes ("
+    "name VARCHAR(64) NOT NULL PRIMARY KEY, indexed_upto INTEGER NOT NULL)"
+)
+
+
+def index_statements(name: str) -> list:
+    """Tabla virtual y triggers del índice name."""
+    indexed = f"(SELECT indexed_upto FROM search_indexes WHERE name = '{name}')"
+    insert_new = f"INSERT INTO {name} (rowid, content) VALUES (NEW.id, NEW.content);"
+    delete_old = f"INSERT INTO {name} ({name}, rowid, content) VALUES ('delete', OLD.id, OLD.content);"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+        f"content, content='messages', content_rowid='id', {SEARCH_INDEXES[name]})",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{name}_insert AFTER INSERT ON messages "
+        f"WHEN NEW.id <= {indexed} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{name}_delete AFTER DELETE ON messages "
+        f"WHEN OLD.id <= {indexed} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{name}_update AFTER UPDATE OF content ON messages "
+        f"WHEN OLD.id <= {indexed} BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+DROP_STATEMENTS = [f"DROP TABLE IF EXISTS {name}" for name in SEARCH_INDEXES] + [
+    "DROP TABLE IF EXISTS search_indexes",
+]
+
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def create_search_index(connection, name: str = FTS_TABLE) -> None:
+    """
+    Crea el índice name, su marca y sus triggers si no existen.
+
+    Con la tabla messages vacía el índice nace completo; si ya tiene mensajes
+    la marca empieza en 0 y hay que rellenarlo con index_search_chunk.
+
+    Args:
+        connection: Conexión o sesión con una transacción abierta
+        name: Tabla del índice (una clave de SEARCH_INDEXES)
+    """
+    for statement in [STATE_TABLE] + index_statements(name):
+        connection.execute(text(statement))
+    connection.execute(text(
+        "INSERT OR IGNORE INTO search_indexes (name, indexed_upto) "
+        "SELECT :name, CASE WHEN EXISTS (SELECT 1 FROM messages) THEN 0 ELSE :complete END"
+    ), {'name': name, 'complete': INDEX_COMPLETE})
+
+
+def index_search_chunk(connection, chunk_size: int = 5000, name: str = FTS_TABLE) -> Optional[int]:
+    """
+    Indexa el siguiente bloque de hasta chunk_size mensajes pendientes y avanza
+    la marca; cuando no quedan pendientes la marca pasa a INDEX_COMPLETE.
+
+    Cada llamada debe ejecutarse en su propia transacción para que el relleno
+    no bloquee al resto de escrituras.
+
+    Args:
+        connection: Conexión o sesión con una transacción abierta
+        chunk_size: Filas por bloque
+        name: Tabla del índice
+
+    Returns:
+        Optional[int]: Mensajes indexados, o None si el índice ya estaba completo
+    """
+    # Tomar el bloqueo de escritura antes de leer la marca: una lectura previa
+    # no podría promocionarse si otro escritor confirma antes
+    connection.execute(text(
+        "UPDATE search_indexes SET indexed_upto = indexed_upto WHERE name = :name"
+    ), {'name': name})
+    upto = connection.execute(text(
+        "SELECT indexed_upto FROM search_indexes WHERE name = :name"
+    ), {'name': name}).scalar()
+    if upto is None or upto == INDEX_COMPLETE:
+        return None
+
+    last_id = connection.execute(text(
+        "SELECT MAX(id) FROM (SELECT id FROM messages WHERE id > :upto ORDER BY id LIMIT :limit)"
+    ), {'upto': upto, 'limit': chunk_size}).scalar()
+    indexed = 0
+    if last_id is not None:
+        indexed = connection.execute(text(
+            f"INSERT INTO {name} (rowid, content) "
+            "SELECT id, content FROM messages WHERE id > :upto AND id <= :last_id"
+        ), {'upto': upto, 'last_id': last_id}).rowcount
+    connection.execute(text(
+        "UPDATE search_indexes SET indexed_upto = :upto WHERE name = :name"
+    ), {'upto': INDEX_COMPLETE if last_id is None else last_id, 'name': name})
+    return indexed
+
+
+def search_index_ready(connection, name: str = FTS_TABLE) -> bool:
+    """True si el índice name cubre todos los mensajes (existe y el relleno terminó)."""
+    try:
+        upto = connection.execute(text(
+            "SELECT indexed_upto FROM search_indexes WHERE name = :name"
+        ), {'name': name}).scalar()
+    except OperationalError:
+        # Base de datos anterior a la migración: aún no hay índice
+        return False
+    return upto == INDEX_COMPLETE
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Traduce el texto de búsqueda a una expresión MATCH de FTS5.
+
+    Cada palabra se busca como prefijo ("pedido" encuentra "pedidos") y todas
+    deben aparecer en el mensaje, en cualquier orden. Se tokeniza igual que el
+    índice, así que los signos de puntuación del texto no llegan a FTS5.
+
+    Args:
+        query: Texto de búsqueda
+
+    Returns:
+        Optional[str]: La expresión, o None si el texto no tiene palabras
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _phrase(value: str) -> str:
+    """Cadena FTS5 entre comillas (las comillas internas se duplican)."""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def substring_expression(query: str) -> Optional[str]:
+    """
+    Traduce el texto de búsqueda a una expresión MATCH del índice de trigramas
+    que encuentra los mensajes que lo contienen tal cual, como subcadena.
+
+    Args:
+        query: Texto de búsqueda
+
+    Returns:
+        Optional[str]: La expresión, o None si el texto tiene menos de tres
+            caracteres (no contiene ningún trigrama)
+    """
+    if len(query) < 3:
+        return None
+    return _phrase(query)
+
+
+def requirement_expression(requirement) -> Optional[str]:
+    """
+    Traduce los literales que exige una expresión regular (SafeRegex.requirement)
+    a una expresión MATCH del índice de trigramas.
+
+    La expresión selecciona un superconjunto de los mensajes que coinciden con
+    la expresión regular; cada candidato se verifica después con el autómata.
+
+    Args:
+        requirement: ('lit', texto), ('and', [...]), ('or', [...]) o None
+
+    Returns:
+        Optional[str]: La expresión, o None si el patrón no exige ningún literal
+    """
+    if requirement is None:
+        return None
+    kind, value = requirement
+    if kind == 'lit':
+        return _phrase(value)
+    operator = ' AND ' if kind == 'and' else ' OR '
+    return operator.join(f'({requirement_expression(part)})' for part in value)
+
+
+def snippet_sql(table: str) -> str:
+    """Llamada a snippet() de FTS5 que da el fragmento resaltado de cada fila del índice table."""
+    return f"snippet({table}, 0, char({ord(_MARK_OPEN)}), char({ord(_MARK_CLOSE)}), '…', {SNIPPET_TOKENS[table]})"
+
+
+def render_snippet(fragment: str) -> str:
+    """
+    Escapa un fragmento de snippet_sql() como HTML y marca las coincidencias con <mark>.
+
+    Los mensajes guardados antes de rechazar los marcadores pueden contenerlos:
+    cada cierre se empareja con la última apertura y se descartan los marcadores
+    sueltos, de modo que las etiquetas siempre quedan equilibradas.
+    """
+    parts = []
+    open_at = None
+    for char in html.escape(fragment, quote=False):
+        if char == _MARK_OPEN:
+            if open_at is not None:
+                parts[open_at] = ''
+            open_at = len(parts)
+            parts.append('<mark>')
+        elif char == _MARK_CLOSE:
+            if open_at is not None:
+                parts.append('</mark>')
+                open_at = None
+        else:
+            parts.append(char)
+    if open_at is not None:
+        parts[open_at] = ''
+    return ''.join(parts)
@@ -0,0 +1,221 @@
+"""
+Migraciones del esquema de la base de datos.
+Este módulo aplica, en orden y una sola vez, los pasos que llevan una base de
+datos existente al esquema actual de los modelos. Cada paso aplicado queda
+registrado en la tabla schema_migrations.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+from app.models.message import RENDERED_JSON_TRIGGER, Message, db, render_message_json
+from app.models.message_search import TRIGRAM_TABLE, create_search_index
+# Registra BlocklistTerm en los metadatos antes de crear las tablas
+from app.models.blocklist_term import BlocklistTerm  # noqa: F401
+from app.models.session_analytics import SessionAnalytics, rebuild_session_analytics
+from app.models.session_counter import TRIGGERS, SessionCounter, rebuild_session_counters
+from app.utils.exceptions import MigrationError
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    """Paso de migración: version creciente, nombre y función que lo aplica."""
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def _create_tables(connection: Connection) -> None:
+    """Crea las tablas que falten (en una base de datos nueva, el esquema completo)."""
+    db.metadata.create_all(bind=connection)
+
+
+def _unique_message_id(connection: Connection) -> None:
+    """
+    Convierte el índice de message_id en único (bases de datos anteriores a
+    INSERT ... ON CONFLICT(message_id)).
+    """
+    indexes = connection.execute(text("PRAGMA index_list('messages')")).mappings().all()
+    if any(index['name'] == 'ix_messages_message_id' and index['unique'] for index in indexes):
+        return
+
+    duplicates = connection.execute(text(
+        "SELECT message_id FROM messages GROUP BY message_id HAVING COUNT(*) > 1 LIMIT 10"
+    )).scalars().all()
+    if duplicates:
+        raise MigrationError(
+            "No se puede crear el índice único de message_id: hay mensajes repetidos "
+            f"({', '.join(duplicates)}). Elimine los duplicados y vuelva a ejecutar la migración."
+        )
+
+    connection.execute(text("DROP INDEX IF EXISTS ix_messages_message_id"))
+    connection.execute(text("CREATE UNIQUE INDEX ix_messages_message_id ON messages (message_id)"))
+
+
+def _session_indexes(connection: Connection) -> None:
+    """
+    Índices compuestos por sesión: (session_id, timestamp, id) para la
+    paginación y (session_id, sender, timestamp) para el filtro por remitente y
+    los recuentos. El índice simple de session_id queda cubierto por ambos.
+    """
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_timestamp_id "
+        "ON messages (session_id, timestamp, id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_sender_timestamp "
+        "ON messages (session_id, sender, timestamp)"
+    ))
+    connection.execute(text("DROP INDEX IF EXISTS ix_messages_session_id"))
+
+
+def _session_counters(connection: Connection) -> None:
+    """Crea session_counters con sus triggers y la llena con los mensajes existentes."""
+    SessionCounter.__table__.create(bind=connection, checkfirst=True)
+    rebuild_session_counters(connection)
+
+
+def _session_analytics(connection: Connection) -> None:
+    """Crea session_analytics y calcula los agregados de los mensajes existentes."""
+    SessionAnalytics.__table__.create(bind=connection, checkfirst=True)
+    rebuild_session_analytics(connection)
+
+
+def _session_versions(connection: Connection) -> None:
+    """
+    Añade session_counters.version y recrea los triggers para que la aumenten
+    y conserven la fila de las sesiones vacías.
+    """
+    columns = connection.execute(text("PRAGMA table_info('session_counters')")).mappings().all()
+    if not any(column['name'] == 'version' for column in columns):
+        connection.execute(text(
+            "ALTER TABLE session_counters ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+        ))
+    for name in ('insert', 'delete', 'update'):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS trg_messages_counters_{name}"))
+    for trigger in TRIGGERS:
+        connection.execute(text(trigger))
+    rebuild_session_counters(connection)
+
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _rendered_json(connection: Connection) -> None:
+    """
+    Añade messages.rendered_json, su trigger de invalidación, y renderiza los
+    mensajes existentes por bloques de BACKFILL_CHUNK_SIZE filas.
+    """
+    columns = connection.execute(text("PRAGMA table_info('messages')")).mappings().all()
+    if not any(column['name'] == 'rendered_json' for column in columns):
+        connection.execute(text("ALTER TABLE messages ADD COLUMN rendered_json TEXT"))
+    connection.execute(text(RENDERED_JSON_TRIGGER))
+    
+    table = Message.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            table.select()
+            .where(table.c.id > last_id, table.c.rendered_json.is_(None))
+            .order_by(table.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            table.update().where(table.c.id == bindparam('row_id')).values(rendered_json=bindparam('rendered')),
+            [{'row_id': row.id, 'rendered': render_message_json(row)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def _search_index(connection: Connection) -> None:
+    """
+    Crea el índice de texto completo messages_fts y sus triggers. Los mensajes
+    existentes no se indexan aquí sino con MessageRepository.backfill_search_index,
+    por bloques y con la aplicación en marcha; hasta entonces la búsqueda usa LIKE.
+    """
+    create_search_index(connection)
+
+
+def _trigram_index(connection: Connection) -> None:
+    """
+    Crea el índice de trigramas messages_trigram (búsqueda por subcadena y por
+    expresión regular) y sus triggers; se rellena igual que messages_fts.
+    """
+    create_search_index(connection, TRIGRAM_TABLE)
+
+
+def _timestamp_index(connection: Connection) -> None:
+    """
+    Índice (timestamp, id) para la búsqueda global por fecha, que recorre los
+    mensajes más recientes en lugar de ordenar todas las coincidencias.
+    """
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_timestamp_id ON messages (timestamp, id)"
+    ))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'create_tables', _create_tables),
+    Migration(2, 'unique_message_id', _unique_message_id),
+    Migration(3, 'session_indexes', _session_indexes),
+    Migration(4, 'session_counters', _session_counters),
+    Migration(5, 'session_analytics', _session_analytics),
+    Migration(6, 'session_versions', _session_versions),
+    Migration(7, 'rendered_json', _rendered_json),
+    Migration(8, 'search_index', _search_index),
+    Migration(9, 'trigram_index', _trigram_index),
+    Migration(10, 'timestamp_index', _timestamp_index),
+]
+
+
+def _ensure_migrations_table(connection: Connection) -> None:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+
+
+def applied_versions() -> List[int]:
+    """Versiones ya aplicadas en la base de datos de la aplicación actual."""
+    with db.engine.begin() as connection:
+        _ensure_migrations_table(connection)
+        return connection.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+
+
+def run_migrations() -> List[str]:
+    """
+    Aplica las migraciones pendientes (requiere contexto de aplicación).
+
+    Cada paso se ejecuta en su propia transacción junto con su registro en
+    schema_migrations: si falla, la base de datos queda en el paso anterior.
+
+    Returns:
+        List[str]: Nombres de los pasos aplicados (vacía si ya estaba al día)
+
+    Raises:
+        MigrationError: Si un paso no se puede aplicar
+    """
+    done = set(applied_versions())
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version in done:
+            continue
+        with db.engine.begin() as connection:
+            migration.apply(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {
+                    'version': migration.version,
+                    'name': migration.name,
+                    'applied_at': datetime.now(timezone.utc).replace(tzinfo=None)
+                }
+            )
+        logger.info("Migración %s (%s) aplicada", migration.version, migration.name)
+        applied.append(migration.name)
+    return applied
@@ -0,0 +1,182 @@
+"""
+Modelo de analíticas por sesión.
+Este módulo define la tabla session_analytics, que guarda por sesión los
+agregados incrementales (momentos y sketches de cuantiles) con los que se
+calculan las estadísticas sin recorrer los mensajes.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.message import Message, db
+from app.utils.streaming_stats import QuantileSketch, RunningMoments
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class SessionAnalytics(db.Model):
+    """Estado serializado de los agregados de una sesión."""
+    __tablename__ = 'session_analytics'
+
+    session_id = db.Column(db.String(255), primary_key=True)
+    state = db.Column(db.JSON, nullable=False)
+
+    def __repr__(self):
+        return f'<SessionAnalytics {self.session_id}>'
+
+
+class SessionAggregate:
+    """
+    Agregados de una sesión que se actualizan mensaje a mensaje.
+
+    - Longitud de los mensajes (caracteres): momentos y sketch de cuantiles.
+    - Palabras y mensajes por remitente.
+    - Tiempo de respuesta: segundos entre un mensaje 'user' y el mensaje
+      'system' que lo sigue. Se calcula al llegar cada mensaje frente al último
+      de la sesión; los mensajes que llegan con un timestamp anterior al último
+      cuentan en el resto de agregados pero no generan tiempo de respuesta.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.length = RunningMoments.from_dict(state.get('length'))
+        self.length_sketch = QuantileSketch.from_dict(state.get('length_sketch'))
+        self.words_by_sender: Dict[str, int] = dict(state.get('words_by_sender', {}))
+        self.messages_by_sender: Dict[str, int] = dict(state.get('messages_by_sender', {}))
+        self.response_time = RunningMoments.from_dict(state.get('response_time'))
+        self.response_time_sketch = QuantileSketch.from_dict(state.get('response_time_sketch'))
+        last_timestamp = state.get('last_timestamp')
+        self.last_timestamp = datetime.fromisoformat(last_timestamp) if last_timestamp else None
+        self.last_sender = state.get('last_sender')
+
+    def add(self, message) -> None:
+        """Incorpora un mensaje recién insertado."""
+        self.length.add(message.character_count)
+        self.length_sketch.add(message.character_count)
+        self.words_by_sender[message.sender] = self.words_by_sender.get(message.sender, 0) + message.word_count
+        self.messages_by_sender[message.sender] = self.messages_by_sender.get(message.sender, 0) + 1
+
+        if self.last_timestamp is not None and message.timestamp < self.last_timestamp:
+            return
+        if message.sender == 'system' and self.last_sender == 'user':
+            gap = (message.timestamp - self.last_timestamp).total_seconds()
+            self.response_time.add(gap)
+            self.response_time_sketch.add(gap)
+        self.last_timestamp = message.timestamp
+        self.last_sender = message.sender
+
+    def add_all(self, messages: Iterable) -> None:
+        """Incorpora varios mensajes en orden cronológico."""
+        for message in sorted(messages, key=lambda m: (m.timestamp, m.id or 0)):
+            self.add(message)
+
+    def remove(self, message) -> None:
+        """
+        Retira un mensaje borrado. Los tiempos de respuesta ya registrados se
+        conservan (reflejan la conversación tal como se recibió).
+        """
+        self.length.remove(message.character_count)
+        self.length_sketch.remove(message.character_count)
+        self.words_by_sender[message.sender] = max(self.words_by_sender.get(message.sender, 0) - message.word_count, 0)
+        self.messages_by_sender[message.sender] = max(self.messages_by_sender.get(message.sender, 0) - 1, 0)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'length': self.length.to_dict(),
+            'length_sketch': self.length_sketch.to_dict(),
+            'words_by_sender': self.words_by_sender,
+            'messages_by_sender': self.messages_by_sender,
+            'response_time': self.response_time.to_dict(),
+            'response_time_sketch': self.response_time_sketch.to_dict(),
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+            'last_sender': self.last_sender
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Estadísticas listas para la respuesta de la API."""
+        return {
+            'message_length': _distribution(self.length, self.length_sketch),
+            'words_by_sender': {sender: words for sender, words in self.words_by_sender.items() if words},
+            'response_time_seconds': _distribution(self.response_time, self.response_time_sketch)
+        }
+
+
+def _distribution(moments: RunningMoments, sketch: QuantileSketch) -> Dict[str, Any]:
+    if moments.count == 0:
+        return {'count': 0, 'mean': None, 'stddev': None, **{f'p{round(q * 100)}': None for q in QUANTILES}}
+    return {
+        'count': moments.count,
+        'mean': round(moments.mean, 2),
+        'stddev': round(moments.stddev, 2),
+        **{f'p{round(q * 100)}': round(sketch.quantile(q), 2) for q in QUANTILES}
+    }
+
+
+def load_aggregates(connection, session_ids: Iterable[str]) -> Dict[str, SessionAggregate]:
+    """
+    Lee los agregados de varias sesiones (las que no tienen fila empiezan vacías).
+
+    Args:
+        connection: Conexión o sesión (dentro de la transacción de escritura)
+        session_ids: IDs de las sesiones
+    """
+    session_ids = set(session_ids)
+    rows = connection.execute(
+        select(SessionAnalytics.session_id, SessionAnalytics.state)
+        .where(SessionAnalytics.session_id.in_(session_ids))
+    )
+    aggregates = {session_id: SessionAggregate(state) for session_id, state in rows}
+    for session_id in session_ids - aggregates.keys():
+        aggregates[session_id] = SessionAggregate()
+    return aggregates
+
+
+def store_aggregates(connection, aggregates: Dict[str, SessionAggregate]) -> None:
+    """Guarda los agregados (las sesiones sin mensajes pierden su fila)."""
+    empty = [session_id for session_id, aggregate in aggregates.items() if aggregate.length.count == 0]
+    rows = [
+        {'session_id': session_id, 'state': aggregate.to_state()}
+        for session_id, aggregate in aggregates.items()
+        if aggregate.length.count > 0
+    ]
+    if empty:
+        connection.execute(delete(SessionAnalytics).where(SessionAnalytics.session_id.in_(empty)))
+    if rows:
+        statement = sqlite_insert(SessionAnalytics)
+        connection.execute(
+            statement.on_conflict_do_update(index_elements=['session_id'], set_={'state': statement.excluded.state}),
+            rows
+        )
+
+
+def rebuild_session_analytics(connection, chunk_size: int = 1000) -> int:
+    """
+    Recalcula session_analytics recorriendo los mensajes por sesión y en orden
+    cronológico (índice (session_id, timestamp, id)).
+
+    Returns:
+        int: Número de sesiones
+    """
+    connection.execute(delete(SessionAnalytics))
+    rows = connection.execute(
+        select(
+            Message.session_id, Message.timestamp, Message.id, Message.sender,
+            Message.word_count, Message.character_count
+        ).order_by(Message.session_id, Message.timestamp, Message.id)
+    )
+    sessions = 0
+    pending: Dict[str, SessionAggregate] = {}
+    current_id, current = None, None
+    for row in rows:
+        if row.session_id != current_id:
+            if len(pending) >= chunk_size:
+                store_aggregates(connection, pending)
+                pending = {}
+            current_id, current = row.session_id, SessionAggregate()
+            pending[current_id] = current
+            sessions += 1
+        current.add(row)
+    store_aggregates(connection, pending)
+    return sessions
@@ -0,0 +1,133 @@
+"""
+Modelo de contadores por sesión.
+Este módulo define la tabla session_counters y los triggers que la mantienen
+al día en la misma transacción que cada inserción, borrado o actualización de
+la tabla messages. La columna version aumenta con cada cambio de la sesión y
+nunca retrocede (la fila se conserva aunque la sesión quede vacía), por lo que
+sirve como ETag de las lecturas de la sesión.
+"""
+from sqlalchemy import DDL, event, text
+
+from app.models.message import db
+
+
+class SessionCounter(db.Model):
+    """Totales precalculados de una sesión (una fila por sesión que tuvo mensajes)."""
+    __tablename__ = 'session_counters'
+
+    session_id = db.Column(db.String(255), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    user_messages = db.Column(db.Integer, nullable=False, default=0)
+    system_messages = db.Column(db.Integer, nullable=False, default=0)
+    word_count_sum = db.Column(db.Integer, nullable=False, default=0)
+    character_count_sum = db.Column(db.Integer, nullable=False, default=0)
+    first_timestamp = db.Column(db.DateTime, nullable=True)
+    last_timestamp = db.Column(db.DateTime, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def count_for_sender(self, sender):
+        """Número de mensajes del remitente ('user' o 'system'); None para otros."""
+        if sender == 'user':
+            return self.user_messages
+        if sender == 'system':
+            return self.system_messages
+        return None
+
+    def __repr__(self):
+        return f'<SessionCounter {self.session_id}: {self.total}>'
+
+
+# Suma la fila NEW a los contadores de su sesión (crea la fila si no existe)
+_ADD_NEW = """
+    INSERT INTO session_counters (
+        session_id, total, user_messages, system_messages,
+        word_count_sum, character_count_sum, first_timestamp, last_timestamp, version
+    ) VALUES (
+        NEW.session_id, 1, NEW.sender = 'user', NEW.sender = 'system',
+        NEW.word_count, NEW.character_count, NEW.timestamp, NEW.timestamp, 1
+    )
+    ON CONFLICT (session_id) DO UPDATE SET
+        version = version + 1,
+        total = total + 1,
+        user_messages = user_messages + excluded.user_messages,
+        system_messages = system_messages + excluded.system_messages,
+        word_count_sum = word_count_sum + excluded.word_count_sum,
+        character_count_sum = character_count_sum + excluded.character_count_sum,
+        first_timestamp = MIN(COALESCE(first_timestamp, excluded.first_timestamp), excluded.first_timestamp),
+        last_timestamp = MAX(COALESCE(last_timestamp, excluded.last_timestamp), excluded.last_timestamp);
+"""
+
+# Resta la fila OLD; el primer y último timestamp se releen del índice
+# (session_id, timestamp, id). La fila se conserva con total 0 para no
+# reiniciar version
+_SUBTRACT_OLD = """
+    UPDATE session_counters SET
+        version = version + 1,
+        total = total - 1,
+        user_messages = user_messages - (OLD.sender = 'user'),
+        system_messages = system_messages - (OLD.sender = 'system'),
+        word_count_sum = word_count_sum - OLD.word_count,
+        character_count_sum = character_count_sum - OLD.character_count,
+        first_timestamp = (SELECT MIN(timestamp) FROM messages WHERE session_id = OLD.session_id),
+        last_timestamp = (SELECT MAX(timestamp) FROM messages WHERE session_id = OLD.session_id)
+    WHERE session_id = OLD.session_id;
+"""
+
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_messages_counters_insert AFTER INSERT ON messages "
+    f"BEGIN {_ADD_NEW} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_messages_counters_delete AFTER DELETE ON messages "
+    f"BEGIN {_SUBTRACT_OLD} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_messages_counters_update "
+    f"AFTER UPDATE OF session_id, sender, word_count, character_count, timestamp ON messages "
+    f"BEGIN {_SUBTRACT_OLD} {_ADD_NEW} END",
+]
+
+# La reconstrucción no borra filas: vacía los totales, los recalcula y
+# aumenta version para que ninguna ETag anterior vuelva a coincidir
+REBUILD_STATEMENTS = [
+    """
+    UPDATE session_counters SET
+        version = version + 1, total = 0, user_messages = 0, system_messages = 0,
+        word_count_sum = 0, character_count_sum = 0, first_timestamp = NULL, last_timestamp = NULL
+    """,
+    """
+    INSERT INTO session_counters (
+        session_id, total, user_messages, system_messages,
+        word_count_sum, character_count_sum, first_timestamp, last_timestamp, version
+    )
+    SELECT session_id, COUNT(*), SUM(sender = 'user'), SUM(sender = 'system'),
+           SUM(word_count), SUM(character_count), MIN(timestamp), MAX(timestamp), 1
+    FROM messages
+    WHERE true
+    GROUP BY session_id
+    ON CONFLICT (session_id) DO UPDATE SET
+        total = excluded.total,
+        user_messages = excluded.user_messages,
+        system_messages = excluded.system_messages,
+        word_count_sum = excluded.word_count_sum,
+        character_count_sum = excluded.character_count_sum,
+        first_timestamp = excluded.first_timestamp,
+        last_timestamp = excluded.last_timestamp
+    """,
+]
+
+
+def rebuild_session_counters(connection) -> int:
+    """
+    Recalcula session_counters desde la tabla messages.
+
+    Args:
+        connection: Conexión o sesión con una transacción abierta
+
+    Returns:
+        int: Número de sesiones con mensajes
+    """
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
+    return connection.execute(text("SELECT COUNT(*) FROM session_counters WHERE total > 0")).scalar()
+
+
+# Los triggers se crean junto con la tabla (db.create_all y migraciones)
+for _trigger in TRIGGERS:
+    event.listen(SessionCounter.__table__, 'after_create', DDL(_trigger))
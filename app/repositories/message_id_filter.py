@@ -0,0 +1,134 @@
+"""
+Filtro en memoria de los message_id almacenados.
+Este módulo evita consultas a SQLite para message_id que con certeza no existen.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable
+
+from app.utils.cuckoo_filter import CuckooFilter
+
+logger = logging.getLogger(__name__)
+
+
+class MessageIdFilter:
+    """
+    Filtro de cuckoo con los message_id de la tabla messages.
+
+    Se calienta leyendo todos los message_id la primera vez que se usa (o al
+    arrancar) y el repositorio lo actualiza tras cada inserción o borrado
+    confirmado. Una respuesta negativa es definitiva y ahorra la consulta; una
+    positiva solo indica que hay que consultar la base de datos.
+
+    Mientras no está caliente, o si se satura, responde siempre que sí, de modo
+    que nunca produce falsos negativos. Solo es válido si este proceso es el
+    único que escribe en la base de datos.
+    """
+
+    def __init__(self, capacity: int = 1000000):
+        """
+        Inicializa el filtro (vacío y sin calentar).
+
+        Args:
+            capacity: Número de message_id que se espera almacenar
+        """
+        self.initial_capacity = capacity
+        self._filter = None
+        self._lock = threading.Lock()
+        self._saturated = False
+        self._lookups = 0
+        self._negatives = 0
+        self._false_positives = 0
+        self._rebuilds = 0
+
+    @property
+    def ready(self) -> bool:
+        """Indica si el filtro está caliente y puede descartar consultas."""
+        return self._filter is not None and not self._saturated
+
+    def warm(self, load_ids: Callable[[], Iterable[str]], expected: int = 0, force: bool = True) -> None:
+        """
+        Reconstruye el filtro con los message_id existentes.
+
+        Args:
+            load_ids: Función que devuelve un iterable con todos los message_id
+            expected: Número de message_id almacenados (para dimensionar)
+            force: Si es False y otro hilo ya lo calentó, no se reconstruye
+        """
+        with self._lock:
+            if not force and self.ready:
+                return
+            capacity = max(self.initial_capacity, 2 * expected)
+            if self._saturated and self._filter is not None:
+                capacity = max(capacity, 2 * self._filter.capacity)
+
+            cuckoo = CuckooFilter(capacity)
+            saturated = not all(cuckoo.add(message_id) for message_id in load_ids())
+            if self._filter is not None:
+                self._rebuilds += 1
+            self._filter = cuckoo
+            self._saturated = saturated
+
+        if saturated:
+            logger.warning("Filtro de message_id saturado al calentarlo (capacidad %s)", capacity)
+        else:
+            logger.info("Filtro de message_id caliente con %s IDs", len(cuckoo))
+
+    def might_contain(self, message_id: str) -> bool:
+        """
+        Indica si el message_id puede existir.
+
+        Returns:
+            bool: False solo si con certeza no está almacenado
+        """
+        with self._lock:
+            self._lookups += 1
+            if not self.ready or message_id in self._filter:
+                return True
+            self._negatives += 1
+            return False
+
+    def record_false_positives(self, count: int = 1) -> None:
+        """Registra positivos del filtro que la base de datos desmintió."""
+        with self._lock:
+            if self.ready:
+                self._false_positives += count
+
+    def add_all(self, message_ids: Iterable[str]) -> None:
+        """Añade message_id recién confirmados."""
+        with self._lock:
+            if self._filter is None:
+                return
+            for message_id in message_ids:
+                if not self._filter.add(message_id):
+                    self._saturated = True
+                    logger.warning("Filtro de message_id saturado; se reconstruirá al próximo uso")
+                    return
+
+    def remove(self, message_id: str) -> None:
+        """Elimina un message_id cuyo borrado ya se confirmó."""
+        with self._lock:
+            if self._filter is not None and not self._saturated:
+                self._filter.remove(message_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Métricas del filtro, con la tasa de falsos positivos observada: de las
+        búsquedas de IDs inexistentes, la fracción que el filtro no descartó.
+        """
+        with self._lock:
+            absent_lookups = self._negatives + self._false_positives
+            stats = {
+                'ready': self.ready,
+                'saturated': self._saturated,
+                'lookups': self._lookups,
+                'negatives': self._negatives,
+                'false_positives': self._false_positives,
+                'observed_false_positive_rate': (
+                    self._false_positives / absent_lookups if absent_lookups else 0.0
+                ),
+                'rebuilds': self._rebuilds
+            }
+            if self._filter is not None:
+                stats.update(self._filter.stats())
+            return stats
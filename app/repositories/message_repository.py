@@ -2,17 +2,62 @@
 Repositorio para operaciones de base de datos de mensajes.
 Este módulo maneja toda la persistencia de datos siguiendo el patrón Repository.
 """
-from typing import List, Optional, Tuple
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
-from app.models.message import Message, db
-from app.utils.exceptions import DatabaseError, MessageNotFoundError
+from app.models.message import MESSAGE_FIELDS, Message, RenderedMessage, db, render_message_json
+from app.models.message_search import (
+    MODE_INDEXES,
+    SEARCH_INDEXES,
+    TRIGRAM_TABLE,
+    index_search_chunk,
+    search_index_ready
+)
+from app.models.session_analytics import (
+    SessionAggregate,
+    SessionAnalytics,
+    load_aggregates,
+    rebuild_session_analytics,
+    store_aggregates
+)
+from app.models.session_counter import SessionCounter, rebuild_session_counters
+from app.repositories.message_id_filter import MessageIdFilter
+from app.repositories.sqlite_writer import GroupCommitWriter
+from app.utils.exceptions import (
+    DatabaseError,
+    DuplicateMessageError,
+    MessageNotFoundError,
+    MessageProcessingError,
+    SearchIndexNotReadyError
+)
 
 class MessageRepository:
     """Repositorio para operaciones de mensajes en base de datos."""
     
+    def __init__(self, writer: Optional[GroupCommitWriter] = None, id_filter: Optional[MessageIdFilter] = None):
+        """
+        Inicializa el repositorio.
+        
+        Args:
+            writer: Escritor con group commit; si se proporciona, todas las
+                escrituras se delegan en él en lugar de hacer commit en la
+                sesión de la petición
+            id_filter: Filtro de message_id almacenados; si se proporciona, las
+                búsquedas por message_id que con certeza no existen no llegan
+                a la base de datos
+        """
+        self.writer = writer
+        self.id_filter = id_filter
+    
     def save(self, message: Message) -> Message:
         """
-        Guarda un mensaje en la base de datos.
+        Guarda un mensaje en la base de datos de forma atómica.
+        
+        Usa INSERT ... ON CONFLICT(message_id) DO NOTHING: el índice único sobre
+        message_id detecta el duplicado en la misma sentencia, sin consulta
+        previa y sin carreras entre peticiones concurrentes.
         
         Args:
             message: Instancia del mensaje a guardar
@@ -21,41 +66,324 @@ class MessageRepository:
             Message: El mensaje guardado con ID asignado
             
         Raises:
+            DuplicateMessageError: Si ya existe un mensaje con ese message_id
+                (incluye el mensaje almacenado en `existing`)
             DatabaseError: Si ocurre un error en la base de datos
         """
+        def operation(session) -> Message:
+            if self._insert(session, [message]):
+                return message
+            
+            existing = self.find_by_message_id(message.message_id, session=session)
+            if existing is not None:
+                session.expunge(existing)
+            raise DuplicateMessageError(message.message_id, existing=existing)
+        
+        saved = self._write(operation, "guardar mensaje")
+        self._track_inserted([saved])
+        return saved
+    
+    def save_all(self, messages: List[Message]) -> List[Message]:
+        """
+        Guarda un lote de mensajes en una única transacción.
+        
+        Todos los INSERT se envían como una sola sentencia executemany con
+        ON CONFLICT(message_id) DO NOTHING, por lo que el lote completo cuesta
+        un solo commit y los message_id ya existentes se omiten sin error.
+        
+        Args:
+            messages: Mensajes a guardar
+            
+        Returns:
+            List[Message]: Los mensajes efectivamente insertados (con ID
+            asignado), en el orden de entrada
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos (no se guarda ninguno)
+        """
+        if not messages:
+            return []
+        
+        inserted = self._write(lambda session: self._insert(session, messages), "guardar lote de mensajes")
+        self._track_inserted(inserted)
+        return inserted
+    
+    def _insert(self, session, messages: List[Message]) -> List[Message]:
+        """
+        Operación de escritura: inserta los mensajes omitiendo message_id existentes.
+        
+        Returns:
+            List[Message]: Los mensajes insertados, con su ID asignado
+        """
+        statement = sqlite_insert(Message)\
+            .on_conflict_do_nothing(index_elements=['message_id'])\
+            .returning(Message.id, Message.message_id)
+        inserted_ids = {
+            message_id: row_id
+            for row_id, message_id in session.execute(statement, [m.to_row() for m in messages])
+        }
+        
+        inserted = []
+        for message in messages:
+            if message.message_id in inserted_ids:
+                message.id = inserted_ids[message.message_id]
+                inserted.append(message)
+        if inserted:
+            self._update_analytics(session, added=inserted)
+        return inserted
+    
+    def _update_analytics(self, session, added: Iterable[Message] = (), removed: Iterable[Message] = ()) -> None:
+        """
+        Actualiza los agregados de session_analytics en la misma transacción
+        que la escritura (una lectura y un upsert por sesión afectada).
+        """
+        by_session = {}
+        for message in added:
+            by_session.setdefault(message.session_id, ([], []))[0].append(message)
+        for message in removed:
+            by_session.setdefault(message.session_id, ([], []))[1].append(message)
+        
+        aggregates = load_aggregates(session, by_session)
+        for session_id, (session_added, session_removed) in by_session.items():
+            aggregates[session_id].add_all(session_added)
+            for message in session_removed:
+                aggregates[session_id].remove(message)
+        store_aggregates(session, aggregates)
+    
+    def _write(self, operation: Callable[[Any], Any], action: str) -> Any:
+        """
+        Ejecuta una operación de escritura y la confirma.
+        
+        Con escritor configurado la operación se entrega al hilo escritor, que
+        la agrupa con las de otras peticiones en una sola transacción; si no,
+        se ejecuta en la sesión de la petición seguida de su propio commit.
+        
+        Args:
+            operation: Función que recibe la sesión y realiza la escritura
+            action: Descripción de la acción para los mensajes de error
+            
+        Returns:
+            Any: El resultado de la operación
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        if self.writer is not None:
+            try:
+                return self.writer.execute(operation)
+            except MessageProcessingError:
+                raise
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Error al {action}: {str(e)}")
+            except Exception as e:
+                raise DatabaseError(f"Error inesperado al {action}: {str(e)}")
+        
         try:
-            db.session.add(message)
+            result = operation(db.session)
             db.session.commit()  # Confirma la transacción
-            return message
+            return result
+        except MessageProcessingError:
+            db.session.rollback()
+            raise
         except SQLAlchemyError as e:
             db.session.rollback()
-            raise DatabaseError(f"Error al guardar mensaje: {str(e)}")
+            raise DatabaseError(f"Error al {action}: {str(e)}")
         except Exception as e:
             db.session.rollback()
-            raise DatabaseError(f"Error inesperado al guardar mensaje: {str(e)}")
+            raise DatabaseError(f"Error inesperado al {action}: {str(e)}")
+    
+    def warm_id_filter(self, force: bool = True) -> None:
+        """
+        Carga en el filtro de message_id todos los IDs almacenados.
+        
+        Args:
+            force: Si es False solo se carga cuando el filtro no está listo
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        if self.id_filter is None:
+            return
+        
+        try:
+            expected = db.session.query(func.count(Message.id)).scalar()
+            self.id_filter.warm(
+                lambda: (row[0] for row in db.session.query(Message.message_id).yield_per(10000)),
+                expected,
+                force
+            )
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al cargar el filtro de message_id: {str(e)}")
+    
+    def _filter_candidates(self, message_ids: Iterable[str]) -> List[str]:
+        """
+        Descarta los message_id que con certeza no existen según el filtro.
+        
+        Args:
+            message_ids: IDs a consultar
+            
+        Returns:
+            List[str]: IDs únicos que sí hay que buscar en la base de datos
+        """
+        message_ids = list(set(message_ids))
+        if self.id_filter is None:
+            return message_ids
+        
+        if not self.id_filter.ready:
+            self.warm_id_filter(force=False)
+        return [message_id for message_id in message_ids if self.id_filter.might_contain(message_id)]
+    
+    def _record_misses(self, candidates: int, found: int) -> None:
+        """Registra como falsos positivos del filtro los IDs que no se encontraron."""
+        if self.id_filter is not None and candidates > found:
+            self.id_filter.record_false_positives(candidates - found)
     
-    def find_by_message_id(self, message_id: str) -> Optional[Message]:
+    def _track_inserted(self, messages: List[Message]) -> None:
+        """Añade al filtro los message_id cuya inserción ya se confirmó."""
+        if self.id_filter is not None and messages:
+            self.id_filter.add_all(message.message_id for message in messages)
+    
+    def find_by_message_id(self, message_id: str, session=None) -> Optional[Message]:
         """
         Busca un mensaje por su message_id.
         
         Args:
             message_id: ID del mensaje a buscar
+            session: Sesión a usar (por defecto la de la petición)
             
         Returns:
             Message or None: El mensaje encontrado o None si no existe
         """
+        use_filter = session is None
+        if use_filter and not self._filter_candidates([message_id]):
+            return None
+        
+        try:
+            query = Message.query if session is None or session is db.session else session.query(Message)
+            message = query.filter_by(message_id=message_id).first()
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensaje: {str(e)}")
+        
+        if use_filter:
+            self._record_misses(1, int(message is not None))
+        return message
+    
+    def find_message_fields(self, message_id: str, fields: Sequence[str]) -> Optional[Any]:
+        """
+        Busca un mensaje leyendo solo las columnas de los campos pedidos y
+        updated_at (que da su ETag).
+        
+        Args:
+            message_id: ID del mensaje
+            fields: Rutas de MESSAGE_FIELDS
+            
+        Returns:
+            Fila con esas columnas, o None si el mensaje no existe
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        if not self._filter_candidates([message_id]):
+            return None
+        
         try:
-            return Message.query.filter_by(message_id=message_id).first()
+            row = db.session.execute(
+                select(*self._field_columns(fields, Message.updated_at)).where(Message.message_id == message_id)
+            ).first()
         except SQLAlchemyError as e:
             raise DatabaseError(f"Error al buscar mensaje: {str(e)}")
+        
+        self._record_misses(1, int(row is not None))
+        return row
+    
+    def get_message_updated_at(self, message_id: str) -> Optional[datetime]:
+        """
+        Obtiene solo el updated_at de un mensaje, sin cargarlo.
+        
+        Args:
+            message_id: ID del mensaje
+            
+        Returns:
+            Optional[datetime]: updated_at, o None si el mensaje no existe
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        if not self._filter_candidates([message_id]):
+            return None
+        
+        try:
+            updated_at = db.session.execute(
+                select(Message.updated_at).where(Message.message_id == message_id)
+            ).scalar()
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensaje: {str(e)}")
+        
+        self._record_misses(1, int(updated_at is not None))
+        return updated_at
+    
+    def find_by_message_ids(self, message_ids: Iterable[str]) -> List[Message]:
+        """
+        Busca varios mensajes por message_id con una sola consulta IN.
+        
+        Args:
+            message_ids: IDs de los mensajes a buscar
+            
+        Returns:
+            List[Message]: Los mensajes encontrados (sin orden garantizado)
+        """
+        message_ids = self._filter_candidates(message_ids)
+        if not message_ids:
+            return []
+        
+        try:
+            messages = Message.query.filter(Message.message_id.in_(message_ids)).all()
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensajes: {str(e)}")
+        
+        self._record_misses(len(message_ids), len(messages))
+        return messages
+    
+    def find_rendered_by_message_ids(self, message_ids: Iterable[str]) -> List[Tuple[str, datetime, str]]:
+        """
+        Busca varios mensajes por message_id con una sola consulta IN y
+        devuelve su JSON guardado, sin construir objetos Message.
+        
+        Args:
+            message_ids: IDs de los mensajes a buscar
+            
+        Returns:
+            List[Tuple[str, datetime, str]]: (message_id, updated_at, JSON) de
+                los mensajes encontrados (sin orden garantizado)
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        message_ids = self._filter_candidates(message_ids)
+        if not message_ids:
+            return []
+        
+        try:
+            rows = db.session.execute(
+                select(Message.message_id, Message.updated_at, Message.id, Message.timestamp, Message.rendered_json)
+                .where(Message.message_id.in_(message_ids))
+            ).all()
+            rendered = self._with_rendered_json(rows)
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensajes: {str(e)}")
+        
+        self._record_misses(len(message_ids), len(rows))
+        return [(row.message_id, row.updated_at, message.json) for row, message in zip(rows, rendered)]
     
     def find_by_session_id(
         self, 
         session_id: str, 
         limit: int = 10, 
         offset: int = 0, 
-        sender: Optional[str] = None
-    ) -> Tuple[List[Message], int]:
+        sender: Optional[str] = None,
+        rendered: bool = False,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Union[Message, RenderedMessage, Any]], int]:
         """
         Busca mensajes por session_id con paginación y filtros.
         
@@ -64,6 +392,10 @@ class MessageRepository:
             limit: Límite de resultados por página
             offset: Desplazamiento para paginación
             sender: Filtro opcional por remitente
+            rendered: Si es True devuelve RenderedMessage (solo id, timestamp y
+                JSON guardado) en lugar de objetos Message
+            fields: Rutas de MESSAGE_FIELDS; si se indican se devuelven filas
+                con solo id, timestamp y sus columnas
             
         Returns:
             tuple: (lista_de_mensajes, total_count)
@@ -72,24 +404,181 @@ class MessageRepository:
             DatabaseError: Si ocurre un error en la base de datos
         """
         try:
-            # Construir query base
-            query = Message.query.filter_by(session_id=session_id)
-            
-            # Aplicar filtro por sender si se proporciona
-            if sender:
-                query = query.filter_by(sender=sender)
+            # Construir query base con el filtro opcional por sender
+            query = self._session_query(session_id, sender, rendered, fields)
             
-            # Obtener total de resultados para paginación
-            total_count = query.count()
+            # Obtener total de resultados para paginación (fila de session_counters)
+            total_count = self.count_by_session_id(session_id, sender)
             
             # Aplicar paginación y ordenamiento
-            messages = query.order_by(Message.timestamp.asc()).offset(offset).limit(limit).all()
+            messages = query.order_by(Message.timestamp.asc(), Message.id.asc()).offset(offset).limit(limit).all()
+            if rendered and fields is None:
+                messages = self._with_rendered_json(messages)
             
             return messages, total_count
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"Error al buscar mensajes por sesión: {str(e)}")
     
+    def find_by_session_keyset(
+        self,
+        session_id: str,
+        limit: int = 10,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        backward: bool = False,
+        sender: Optional[str] = None,
+        rendered: bool = False,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Union[Message, RenderedMessage, Any]], bool]:
+        """
+        Busca mensajes de una sesión a partir de una posición (timestamp, id).
+        
+        La consulta recorre el índice (session_id, timestamp, id) desde la
+        posición dada, por lo que su coste no depende de la profundidad de la
+        página ni se cuenta el total.
+        
+        Args:
+            session_id: ID de la sesión
+            limit: Límite de resultados por página
+            cursor: Posición de partida, excluida (None = desde el extremo)
+            backward: Si es True se leen los mensajes anteriores a cursor (o
+                los últimos de la sesión); si no, los posteriores
+            sender: Filtro opcional por remitente
+            rendered: Si es True devuelve RenderedMessage en lugar de objetos Message
+            fields: Rutas de MESSAGE_FIELDS; si se indican se devuelven filas
+                con solo id, timestamp y sus columnas
+            
+        Returns:
+            tuple: (mensajes en orden cronológico, hay_más_en_el_sentido_leído)
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        try:
+            query = self._session_query(session_id, sender, rendered, fields)
+            
+            position = tuple_(Message.timestamp, Message.id)
+            if backward:
+                if cursor is not None:
+                    query = query.filter(position < tuple_(*cursor))
+                query = query.order_by(Message.timestamp.desc(), Message.id.desc())
+            else:
+                if cursor is not None:
+                    query = query.filter(position > tuple_(*cursor))
+                query = query.order_by(Message.timestamp.asc(), Message.id.asc())
+            
+            # Se pide un mensaje de más para saber si hay otra página
+            messages = query.limit(limit + 1).all()
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            if backward:
+                messages.reverse()
+            if rendered and fields is None:
+                messages = self._with_rendered_json(messages)
+            return messages, has_more
+            
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensajes por sesión: {str(e)}")
+    
+    @staticmethod
+    def _field_columns(fields: Sequence[str], *required) -> list:
+        """Columnas que necesitan los campos pedidos, tras las obligatorias y sin repetir."""
+        columns = list(required)
+        for field in fields:
+            column = getattr(Message, MESSAGE_FIELDS[field])
+            if not any(column is existing for existing in columns):
+                columns.append(column)
+        return columns
+    
+    def _session_query(self, session_id: str, sender: Optional[str], rendered: bool, fields: Optional[Sequence[str]] = None):
+        """
+        Consulta de los mensajes de una sesión: objetos Message, solo las
+        columnas de RenderedMessage o solo las de los campos pedidos (más id y
+        timestamp, que dan los cursores).
+        """
+        if fields is not None:
+            query = db.session.query(*self._field_columns(fields, Message.id, Message.timestamp))
+        elif rendered:
+            query = db.session.query(Message.id, Message.timestamp, Message.rendered_json)
+        else:
+            query = Message.query
+        query = query.filter_by(session_id=session_id)
+        if sender:
+            query = query.filter_by(sender=sender)
+        return query
+    
+    @staticmethod
+    def _with_rendered_json(rows) -> List[RenderedMessage]:
+        """
+        Convierte filas (id, timestamp, rendered_json) en RenderedMessage.
+        
+        Las filas sin JSON guardado (modificadas tras insertarse) se leen
+        completas con una sola consulta y se renderizan.
+        """
+        missing = [row.id for row in rows if row.rendered_json is None]
+        rendered = {}
+        if missing:
+            table = Message.__table__
+            for row in db.session.execute(table.select().where(table.c.id.in_(missing))):
+                rendered[row.id] = render_message_json(row)
+        return [
+            RenderedMessage(row.id, row.timestamp, row.rendered_json if row.rendered_json is not None else rendered[row.id])
+            for row in rows
+        ]
+    
+    def iter_session_messages(
+        self,
+        session_id: str,
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 1000
+    ) -> Iterator[List[Any]]:
+        """
+        Recorre todos los mensajes de una sesión en orden cronológico, por bloques.
+        
+        Cada bloque es una consulta corta por cursor (timestamp, id) que se lee
+        completa antes de entregarlo, de modo que entre bloques no queda ninguna
+        lectura abierta que bloquee a los escritores, por larga que sea la
+        exportación, y la memoria no depende del tamaño de la sesión. Los
+        mensajes presentes durante toda la exportación salen una sola vez y sin
+        huecos; los insertados o borrados mientras tanto pueden aparecer o no.
+        
+        Args:
+            session_id: ID de la sesión
+            fields: Rutas de MESSAGE_FIELDS; si se indican se devuelven filas con
+                id, timestamp y sus columnas. Si no, RenderedMessage
+            batch_size: Filas por bloque
+            
+        Yields:
+            List: Bloque de hasta batch_size filas
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        if fields is not None:
+            columns = self._field_columns(fields, Message.id, Message.timestamp)
+        else:
+            columns = [Message.id, Message.timestamp, Message.rendered_json]
+        position = tuple_(Message.timestamp, Message.id)
+        statement = select(*columns)\
+            .where(Message.session_id == session_id)\
+            .order_by(Message.timestamp.asc(), Message.id.asc())\
+            .limit(batch_size)
+        
+        cursor = None
+        while True:
+            query = statement if cursor is None else statement.where(position > tuple_(*cursor))
+            try:
+                rows = db.session.execute(query).all()
+                batch = rows if fields is not None else self._with_rendered_json(rows)
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Error al exportar la sesión: {str(e)}")
+            if not rows:
+                return
+            yield batch
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1].timestamp, rows[-1].id)
+    
     def exists_by_message_id(self, message_id: str) -> bool:
         """
         Verifica si existe un mensaje con el message_id dado.
@@ -100,10 +589,16 @@ class MessageRepository:
         Returns:
             bool: True si existe, False en caso contrario
         """
+        if not self._filter_candidates([message_id]):
+            return False
+        
         try:
-            return db.session.query(Message.query.filter_by(message_id=message_id).exists()).scalar()
+            exists = db.session.query(Message.query.filter_by(message_id=message_id).exists()).scalar()
         except SQLAlchemyError as e:
             raise DatabaseError(f"Error al verificar existencia de mensaje: {str(e)}")
+        
+        self._record_misses(1, int(exists))
+        return exists
     
     def delete_by_message_id(self, message_id: str) -> bool:
         """
@@ -118,23 +613,32 @@ class MessageRepository:
         Raises:
             DatabaseError: Si ocurre un error en la base de datos
         """
-        try:
-            message = self.find_by_message_id(message_id)
+        if not self._filter_candidates([message_id]):
+            return False
+        
+        def operation(session) -> bool:
+            message = self.find_by_message_id(message_id, session=session)
             if not message:
                 return False
             
-            db.session.delete(message)
-            db.session.commit()
+            session.delete(message)
+            self._update_analytics(session, removed=[message])
             return True
-            
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            raise DatabaseError(f"Error al eliminar mensaje: {str(e)}")
+        
+        deleted = self._write(operation, "eliminar mensaje")
+        if not deleted:
+            self._record_misses(1, 0)
+        elif self.id_filter is not None:
+            self.id_filter.remove(message_id)
+        return deleted
     
     def count_by_session_id(self, session_id: str, sender: Optional[str] = None) -> int:
         """
         Cuenta mensajes por session_id.
         
+        El total y los recuentos de 'user' y 'system' se leen de la fila de
+        session_counters; solo otros remitentes requieren contar.
+        
         Args:
             session_id: ID de la sesión
             sender: Filtro opcional por remitente
@@ -142,17 +646,137 @@ class MessageRepository:
         Returns:
             int: Número total de mensajes
         """
+        counters = self.get_session_counters(session_id)
+        if counters is None:
+            return 0
+        if not sender:
+            return counters.total
+        count = counters.count_for_sender(sender)
+        if count is not None:
+            return count
+        
         try:
-            query = Message.query.filter_by(session_id=session_id)
-            
-            if sender:
-                query = query.filter_by(sender=sender)
-                
-            return query.count()
+            return Message.query.filter_by(session_id=session_id, sender=sender).count()
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"Error al contar mensajes: {str(e)}")
     
+    def get_session_counters(self, session_id: str) -> Optional[SessionCounter]:
+        """
+        Obtiene los contadores precalculados de una sesión.
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            Optional[SessionCounter]: La fila de contadores (total 0 si se borraron todos sus
+                mensajes), o None si la sesión nunca tuvo mensajes
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        try:
+            # populate_existing: los triggers cambian la fila sin pasar por la sesión
+            return db.session.query(SessionCounter).populate_existing().filter_by(session_id=session_id).first()
+            
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al leer los contadores de la sesión: {str(e)}")
+    
+    def get_session_version(self, session_id: str) -> int:
+        """
+        Obtiene la version de la sesión (aumenta con cada escritura en ella).
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            int: La version, o 0 si la sesión nunca tuvo mensajes
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        try:
+            version = db.session.execute(
+                select(SessionCounter.version).where(SessionCounter.session_id == session_id)
+            ).scalar()
+            return version or 0
+            
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al leer la versión de la sesión: {str(e)}")
+    
+    def rebuild_session_counters(self) -> int:
+        """
+        Recalcula session_counters y session_analytics desde cero a partir de
+        la tabla messages.
+        
+        Returns:
+            int: Número de sesiones con contadores
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        def operation(session) -> int:
+            rebuild_session_analytics(session)
+            return rebuild_session_counters(session)
+        
+        return self._write(operation, "reconstruir los contadores de sesión")
+    
+    def backfill_search_index(self, chunk_size: int = 5000, max_chunks: Optional[int] = None) -> int:
+        """
+        Rellena los índices de búsqueda (palabras y trigramas) con los mensajes
+        anteriores a su creación, uno tras otro y un bloque por transacción.
+        
+        Cada bloque es una escritura más (con escritor, se encola junto a las
+        de las peticiones), así que puede ejecutarse con la aplicación en
+        marcha; si se interrumpe, la siguiente llamada continúa desde la marca.
+        
+        Args:
+            chunk_size: Mensajes por bloque
+            max_chunks: Bloques a procesar como máximo entre todos los índices
+                (None = hasta terminar)
+            
+        Returns:
+            int: Número de mensajes indexados en esta llamada (sumando índices)
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        indexed = 0
+        chunks = 0
+        for name in SEARCH_INDEXES:
+            while max_chunks is None or chunks < max_chunks:
+                chunk = self._write(
+                    lambda session: index_search_chunk(session, chunk_size, name),
+                    "rellenar el índice de búsqueda"
+                )
+                if chunk is None:
+                    break
+                indexed += chunk
+                chunks += 1
+        return indexed
+    
+    def get_session_analytics(self, session_id: str) -> Optional[SessionAggregate]:
+        """
+        Obtiene los agregados incrementales de una sesión.
+        
+        Args:
+            session_id: ID de la sesión
+            
+        Returns:
+            Optional[SessionAggregate]: Los agregados, o None si la sesión no tiene mensajes
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        try:
+            state = db.session.execute(
+                select(SessionAnalytics.state).where(SessionAnalytics.session_id == session_id)
+            ).scalar()
+            return SessionAggregate(state) if state is not None else None
+            
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al leer las analíticas de la sesión: {str(e)}")
+    
     def get_session_ids(self, limit: int = 100) -> List[str]:
         """
         Obtiene lista de session_ids únicos.
@@ -170,7 +794,15 @@ class MessageRepository:
         except SQLAlchemyError as e:
             raise DatabaseError(f"Error al obtener session_ids: {str(e)}")
     
-    def search_globally(self, query: str, limit: int, offset: int) -> Tuple[List[Message], int]:
+    def search_globally(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        fields: Optional[Sequence[str]] = None,
+        mode: str = 'words',
+        count: str = 'exact'
+    ) -> Tuple[List[Any], Optional[int]]:
         """
         Realiza una búsqueda global paginada de mensajes en todas las sesiones.
         
@@ -178,17 +810,155 @@ class MessageRepository:
             query: Texto a buscar.
             limit: Límite de resultados.
             offset: Desplazamiento de resultados.
+            fields: Rutas de MESSAGE_FIELDS; si se indican se devuelven filas
+                con solo sus columnas (más id) en lugar de objetos Message.
+            mode: 'words' (palabras) o 'substring' (el texto tal cual).
+            count: Cómo se obtiene el total: 'exact', 'estimate' o 'none'.
             
         Returns:
-            Tuple: Una tupla con (lista de mensajes, total de resultados).
+            Tuple: Una tupla con (lista de mensajes, total de resultados o
+                None con count='none').
         """
+        options = {} if mode == 'words' else {'mode': mode}
         try:
-            messages = Message.search_globally(query, limit, offset)
-            total_results = Message.count_global_search_results(query)
+            if fields is None:
+                messages = Message.search_globally(query, limit, offset, **options)
+            else:
+                messages = Message.search_globally(
+                    query, limit, offset, columns=self._field_columns(fields, Message.id), **options
+                )
+            total_results = self._count_search_results(query, count, options)
             return messages, total_results
         except SQLAlchemyError as e:
             raise DatabaseError(f"Error al buscar mensajes globalmente: {str(e)}")
-
+    
+    def search_ranked(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        fields: Optional[Sequence[str]] = None,
+        mode: str = 'words',
+        count: str = 'exact'
+    ) -> Tuple[List[Any], Optional[int]]:
+        """
+        Búsqueda global paginada ordenada por relevancia (BM25) en lugar de
+        por fecha. Un texto sin palabras ni trigramas no se puede puntuar y se
+        devuelve ordenado por fecha, como search_globally.
+        
+        Args:
+            query: Texto a buscar.
+            limit: Límite de resultados.
+            offset: Desplazamiento de resultados.
+            fields: Rutas de MESSAGE_FIELDS; si se indican se devuelven filas
+                con solo sus columnas (más id) en lugar de objetos Message.
+            mode: 'words' (palabras) o 'substring' (el texto tal cual).
+            count: Cómo se obtiene el total: 'exact', 'estimate' o 'none'.
+            
+        Returns:
+            Tuple: Una tupla con (lista de mensajes, total de resultados o
+                None con count='none').
+            
+        Raises:
+            SearchIndexNotReadyError: Si el índice del modo aún se está rellenando
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        options = {} if mode == 'words' else {'mode': mode}
+        try:
+            if not search_index_ready(db.session, MODE_INDEXES[mode]):
+                raise SearchIndexNotReadyError()
+            ids = Message.rank_search_results(query, limit, offset, **options)
+            if ids is None:
+                return self.search_globally(query, limit, offset, fields, mode, count)
+            total_results = self._count_search_results(query, count, options)
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensajes globalmente: {str(e)}")
+        return self.find_by_ids(ids, fields), total_results
+    
+    @staticmethod
+    def _count_search_results(query: str, count: str, options: Dict[str, str]) -> Optional[int]:
+        """Total de una búsqueda global según count: exacto, estimado o ninguno (None)."""
+        if count == 'none':
+            return None
+        if count == 'estimate':
+            return Message.estimate_global_search_results(query, **options)
+        return Message.count_global_search_results(query, **options)
+    
+    def find_search_snippets(self, query: str, ids: Sequence[int], mode: str = 'words') -> Dict[int, str]:
+        """
+        Fragmentos resaltados de los mensajes de una página de resultados.
+        
+        Args:
+            query: Texto buscado
+            ids: Ids de los mensajes
+            mode: 'words' o 'substring'
+            
+        Returns:
+            Dict[int, str]: Fragmento de cada id; vacío mientras el índice del
+                modo se rellena (la búsqueda usa LIKE y no hay posiciones)
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        try:
+            return Message.search_snippets(query, ids, mode)
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al obtener los fragmentos de la búsqueda: {str(e)}")
+    
+    def find_regex_candidates(self, expression: str, limit: int) -> List[Tuple[int, str]]:
+        """
+        Busca en el índice de trigramas los candidatos de una búsqueda por
+        expresión regular, más recientes primero.
+        
+        Args:
+            expression: Expresión MATCH con los literales que exige el patrón
+            limit: Número máximo de candidatos a devolver
+            
+        Returns:
+            List[Tuple[int, str]]: (id, contenido) de cada candidato
+            
+        Raises:
+            SearchIndexNotReadyError: Si el índice de trigramas aún se está rellenando
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        try:
+            # Sin índice completo solo quedaría recorrer toda la tabla
+            if not search_index_ready(db.session, TRIGRAM_TABLE):
+                raise SearchIndexNotReadyError()
+            return [tuple(row) for row in Message.find_regex_candidates(expression, limit)]
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensajes globalmente: {str(e)}")
+    
+    def find_by_ids(self, ids: Sequence[int], fields: Optional[Sequence[str]] = None) -> List[Any]:
+        """
+        Busca mensajes por su id interno con una sola consulta IN.
+        
+        Args:
+            ids: Ids de los mensajes
+            fields: Rutas de MESSAGE_FIELDS; si se indican se devuelven filas
+                con solo sus columnas en lugar de objetos Message.
+            
+        Returns:
+            List[Any]: Los mensajes encontrados, en el orden de ids
+            
+        Raises:
+            DatabaseError: Si ocurre un error en la base de datos
+        """
+        if not ids:
+            return []
+        
+        try:
+            if fields is None:
+                rows = Message.query.filter(Message.id.in_(ids)).all()
+            else:
+                rows = db.session.query(*self._field_columns(fields, Message.id))\
+                    .filter(Message.id.in_(ids)).all()
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"Error al buscar mensajes: {str(e)}")
+        
+        by_id = {row.id: row for row in rows}
+        return [by_id[row_id] for row_id in ids if row_id in by_id]
+    
     def verify_persistence(self, message_id: str) -> bool:
         """
         Verifica que un mensaje esté realmente persistido en la BD.
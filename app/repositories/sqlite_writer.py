@@ -0,0 +1,210 @@
+"""
+Escritor único con group commit para SQLite.
+Este módulo serializa todas las escrituras en un hilo dedicado que agrupa
+las operaciones recibidas en una misma transacción.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.message import db
+
+logger = logging.getLogger(__name__)
+
+WriteOperation = Callable[[Session], Any]
+
+_STOP = object()
+
+
+def configure_sqlite_connections(engine, journal_mode: str = 'wal', synchronous: str = 'normal') -> None:
+    """
+    Fija el modo de diario y synchronous en cada conexión nueva del engine.
+
+    En modo rollback (el de SQLite por defecto) una lectura en curso bloquea el
+    BEGIN IMMEDIATE y el COMMIT del escritor, que espera sin ceder el control
+    (bajo eventlet, todo el servidor) hasta agotar el timeout con "database is
+    locked". Con WAL lectores y escritor no se bloquean entre sí.
+
+    Args:
+        engine: Engine de SQLAlchemy (se ignora si no es SQLite)
+        journal_mode: Valor de PRAGMA journal_mode
+        synchronous: Valor de PRAGMA synchronous
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+        finally:
+            cursor.close()
+
+
+class _PendingWrite:
+    """Operación encolada junto con el future que espera la petición."""
+
+    __slots__ = ('operation', 'future')
+
+    def __init__(self, operation: WriteOperation):
+        self.operation = operation
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    """
+    Dueño único de la conexión de escritura.
+
+    Las peticiones entregan operaciones (funciones que reciben una Session) y
+    esperan su future. El hilo escritor toma todo lo que llegue dentro de una
+    ventana de `window` segundos, o hasta `max_batch` operaciones, y lo ejecuta
+    en una sola transacción: un solo commit (y un solo fsync) por grupo. Cada
+    operación corre en su propio SAVEPOINT, de modo que el fallo de una no
+    arrastra al resto del grupo.
+    """
+
+    def __init__(self, app, max_batch: int = 256, window: float = 0.002):
+        """
+        Inicializa el escritor.
+
+        Args:
+            app: Aplicación Flask (se usa para obtener el engine)
+            max_batch: Número máximo de operaciones por transacción
+            window: Segundos que se espera a más operaciones tras la primera
+        """
+        self.app = app
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._commits = 0
+        self._operations = 0
+        self._failed_commits = 0
+
+    @property
+    def running(self) -> bool:
+        """Indica si el hilo escritor está activo."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Arranca el hilo escritor."""
+        if self.running:
+            return
+        with self.app.app_context():
+            engine = db.engine
+        self._thread = threading.Thread(
+            target=self._run, args=(engine,), name='sqlite-group-commit-writer', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Procesa lo pendiente y detiene el hilo escritor."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """
+        Encola una operación de escritura.
+
+        Args:
+            operation: Función que recibe la Session del escritor y devuelve un resultado
+
+        Returns:
+            Future: Se resuelve con el resultado una vez confirmado el grupo
+        """
+        if not self.running:
+            raise RuntimeError("El escritor de SQLite no está en ejecución")
+        pending = _PendingWrite(operation)
+        self._queue.put(pending)
+        return pending.future
+
+    def execute(self, operation: WriteOperation, timeout: Optional[float] = None) -> Any:
+        """Encola una operación y espera a que su grupo se confirme."""
+        return self.submit(operation).result(timeout)
+
+    def _run(self, engine) -> None:
+        """Bucle del hilo escritor."""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit_batch(engine, batch)
+
+    def _commit_batch(self, engine, batch: List[_PendingWrite]) -> None:
+        """Ejecuta un grupo de operaciones en una sola transacción."""
+        outcomes = []
+        session = Session(bind=engine, expire_on_commit=False)
+        try:
+            # pysqlite no abre transacción antes de un SAVEPOINT: sin un BEGIN
+            # explícito el primer SAVEPOINT sería el más externo y su RELEASE
+            # equivaldría a un COMMIT por operación. IMMEDIATE toma el lock de
+            # escritura desde el inicio.
+            session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+            for pending in batch:
+                try:
+                    with session.begin_nested():
+                        outcomes.append((True, pending.operation(session)))
+                except Exception as e:
+                    outcomes.append((False, e))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error("Fallo al confirmar un grupo de %s escrituras: %s", len(batch), e)
+            with self._stats_lock:
+                self._failed_commits += 1
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+        finally:
+            session.close()
+
+        with self._stats_lock:
+            self._commits += 1
+            self._operations += len(batch)
+
+        for pending, (succeeded, value) in zip(batch, outcomes):
+            if succeeded:
+                pending.future.set_result(value)
+            else:
+                pending.future.set_exception(value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del escritor."""
+        with self._stats_lock:
+            commits = self._commits
+            operations = self._operations
+            failed_commits = self._failed_commits
+        return {
+            'running': self.running,
+            'commits': commits,
+            'operations': operations,
+            'failed_commits': failed_commits,
+            'avg_operations_per_commit': round(operations / commits, 2) if commits else 0,
+            'queue_depth': self._queue.qsize()
+        }
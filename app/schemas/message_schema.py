@@ -28,6 +28,15 @@ class MessageInputSchema(Schema):
             raise ValidationError("timestamp debe estar en formato ISO 8601 (ej: 2023-06-15T14:30:00Z)")
 
 
+class MessageLookupSchema(Schema):
+    """Esquema para el cuerpo de POST /api/messages/lookup."""
+    
+    message_ids = fields.List(
+        fields.Str(validate=validate.Length(min=1, max=255)),
+        required=True,
+        validate=validate.Length(min=1)
+    )
+
 class MessageMetadataSchema(Schema):
     """Esquema para metadatos del mensaje."""
     
@@ -74,6 +83,7 @@ class ErrorResponseSchema(Schema):
 
 # Instancias de esquemas para reutilizar
 message_input_schema = MessageInputSchema()
+message_lookup_schema = MessageLookupSchema()
 message_output_schema = MessageOutputSchema()
 message_response_schema = MessageResponseSchema()
 message_list_response_schema = MessageListResponseSchema()
@@ -0,0 +1,301 @@
+"""
+Lista de palabras bloqueadas recargable en caliente.
+Este módulo carga la lista desde su origen (configuración, archivo o base de
+datos), la compila fuera del camino de las peticiones y publica el filtro
+compilado con un número de versión mediante un intercambio atómico.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from eventlet import patcher, tpool
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.blocklist_term import BlocklistTerm
+from app.models.message import db
+from app.utils.exceptions import BlocklistLoadError
+from app.utils.validators import ContentFilter
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigBlocklistSource:
+    """Lista fija tomada de la configuración (INAPPROPRIATE_WORDS)."""
+
+    name = 'config'
+
+    def __init__(self, words: List[str]):
+        self.words = list(words)
+
+    def load(self) -> List[str]:
+        return list(self.words)
+
+    def fingerprint(self) -> str:
+        return 'static'
+
+
+class FileBlocklistSource:
+    """Archivo de texto UTF-8 con un término por línea ('#' inicia un comentario)."""
+
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> List[str]:
+        try:
+            with open(self.path, encoding='utf-8') as blocklist_file:
+                lines = [line.strip() for line in blocklist_file]
+        except OSError as e:
+            raise BlocklistLoadError(f"No se pudo leer la lista de palabras {self.path}: {e}")
+        return [line for line in lines if line and not line.startswith('#')]
+
+    def fingerprint(self) -> str:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return 'missing'
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+class DatabaseBlocklistSource:
+    """Tabla blocklist_terms."""
+
+    name = 'database'
+
+    def __init__(self, app):
+        self.app = app
+
+    def load(self) -> List[str]:
+        with self.app.app_context():
+            try:
+                rows = db.session.query(BlocklistTerm.term).order_by(BlocklistTerm.id).all()
+            except SQLAlchemyError as e:
+                raise BlocklistLoadError(f"No se pudo leer la tabla blocklist_terms: {e}")
+        return [row[0] for row in rows]
+
+    def fingerprint(self) -> str:
+        # Huella del contenido (id y término de cada fila): el número de filas y
+        # el id máximo no cambian si se reemplaza la última fila (SQLite
+        # reutiliza el rowid sin AUTOINCREMENT) o se edita un término
+        rows = select(BlocklistTerm.id, BlocklistTerm.term).order_by(BlocklistTerm.id).subquery()
+        with self.app.app_context():
+            try:
+                content = db.session.execute(
+                    select(func.group_concat(cast(rows.c.id, String) + ':' + rows.c.term, '\n'))
+                ).scalar()
+            except SQLAlchemyError:
+                return 'unavailable'
+        return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def _run_outside_hub(function, *args):
+    """
+    Ejecuta function en un hilo del sistema si eventlet parcheó threading
+    (main.py): ahí un threading.Thread es un green thread, y compilar la lista
+    es trabajo de CPU que nunca cede el control, así que congelaría el servidor.
+    Sin parchear se ejecuta directamente en el hilo actual.
+    """
+    if patcher.is_monkey_patched('thread'):
+        return tpool.execute(function, *args)
+    return function(*args)
+
+
+class BlocklistSnapshot(NamedTuple):
+    """Versión publicada de la lista: nunca se modifica una vez creada."""
+    version: int
+    content_filter: ContentFilter
+    checksum: str
+    term_count: int
+    compile_seconds: float
+    loaded_at: datetime
+
+
+class BlocklistManager:
+    """
+    Mantiene el filtro de contenido activo y lo recarga sin reiniciar.
+
+    La lista se lee y se compila en un hilo del sistema (también bajo eventlet);
+    el filtro nuevo se publica desde el hilo que pidió la recarga reemplazando
+    una única referencia (active), de modo que cada petición usa
+    de principio a fin el filtro completo que leyó al empezar. Si la carga o la
+    compilación fallan se conserva la versión anterior.
+    """
+
+    def __init__(self, source, word_boundary: bool = False, mode: str = ContentFilter.MODE_REJECT,
+                 normalize: bool = False):
+        """
+        Inicializa el gestor (sin lista cargada).
+
+        Args:
+            source: Origen de la lista (ConfigBlocklistSource, FileBlocklistSource
+                o DatabaseBlocklistSource)
+            word_boundary: Si el filtro compilado solo detecta palabras completas
+            mode: Modo del filtro compilado ('reject' o 'mask')
+            normalize: Si el filtro compilado normaliza acentos, leetspeak y separadores
+        """
+        self.source = source
+        self.word_boundary = word_boundary
+        self.mode = mode
+        self.normalize = normalize
+        self._active: Optional[BlocklistSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self._last_error: Optional[str] = None
+        self._source_fingerprint: Optional[str] = None
+        self._polling = False
+
+    @property
+    def active(self) -> BlocklistSnapshot:
+        """Versión activa de la lista."""
+        return self._active
+
+    @property
+    def content_filter(self) -> ContentFilter:
+        """Filtro compilado de la versión activa."""
+        return self._active.content_filter
+
+    def load(self, fallback_words: Optional[List[str]] = None) -> BlocklistSnapshot:
+        """
+        Carga y publica la lista de forma síncrona (arranque).
+
+        Args:
+            fallback_words: Lista a usar si el origen aún no está disponible
+                (p. ej. la tabla no existe todavía)
+
+        Returns:
+            BlocklistSnapshot: La versión activa
+        """
+        try:
+            return self.reload()
+        except BlocklistLoadError as e:
+            if fallback_words is None:
+                raise
+            logger.warning("%s; se usa la lista de la configuración", e.message)
+            return self._publish(self._compile(list(fallback_words), time.perf_counter()))
+
+    def reload(self) -> BlocklistSnapshot:
+        """
+        Lee el origen, compila y publica la lista si cambió.
+
+        Returns:
+            BlocklistSnapshot: La versión activa tras la recarga
+
+        Raises:
+            BlocklistLoadError: Si no se pudo cargar (se conserva la versión anterior)
+        """
+        with self._reload_lock:
+            self._reloading = True
+            try:
+                fingerprint = self.source.fingerprint()
+                snapshot = self._publish(_run_outside_hub(self._load_and_compile))
+                self._source_fingerprint = fingerprint
+                self._last_error = None
+                return snapshot
+            except BlocklistLoadError as e:
+                self._last_error = e.message
+                raise
+            except Exception as e:
+                self._last_error = f"Error al compilar la lista de palabras: {e}"
+                raise BlocklistLoadError(self._last_error)
+            finally:
+                self._reloading = False
+
+    def reload_in_background(self) -> bool:
+        """
+        Lanza una recarga en un hilo aparte (un green thread bajo eventlet: la
+        lectura y la compilación pasan igualmente a un hilo del sistema).
+
+        Returns:
+            bool: False si ya había una recarga en curso
+        """
+        if self._reloading:
+            return False
+        thread = threading.Thread(target=self._reload_logged, name='blocklist-reload', daemon=True)
+        thread.start()
+        return True
+
+    def start_polling(self, socketio, interval: float) -> None:
+        """
+        Comprueba periódicamente si el origen cambió y recarga en ese caso, para
+        que todos los procesos adopten la nueva lista sin intervención.
+        """
+        if self._polling or interval <= 0:
+            return
+        self._polling = True
+
+        def poll():
+            while self._polling:
+                socketio.sleep(interval)
+                if self.source.fingerprint() != self._source_fingerprint:
+                    self._reload_logged()
+
+        socketio.start_background_task(poll)
+
+    def stop_polling(self) -> None:
+        self._polling = False
+
+    def status(self) -> Dict[str, Any]:
+        """Estado de la lista activa y de la última recarga."""
+        snapshot = self._active
+        status = {
+            'source': self.source.name,
+            'reloading': self._reloading,
+            'last_error': self._last_error
+        }
+        if snapshot is not None:
+            status.update({
+                'version': snapshot.version,
+                'checksum': snapshot.checksum,
+                'term_count': snapshot.term_count,
+                'compile_ms': round(snapshot.compile_seconds * 1000, 2),
+                'loaded_at': snapshot.loaded_at.isoformat().replace('+00:00', 'Z')
+            })
+        return status
+
+    def _load_and_compile(self) -> BlocklistSnapshot:
+        """Lee el origen y compila la lista (se ejecuta fuera del hub de eventlet)."""
+        started = time.perf_counter()
+        return self._compile(self.source.load(), started)
+
+    def _compile(self, terms: List[str], started: float) -> BlocklistSnapshot:
+        """Compila la lista en una versión nueva, o devuelve la activa si no cambió."""
+        checksum = hashlib.sha256('\n'.join(sorted(set(terms))).encode('utf-8')).hexdigest()
+        current = self._active
+        if current is not None and current.checksum == checksum:
+            return current
+
+        content_filter = ContentFilter(
+            terms, word_boundary=self.word_boundary, mode=self.mode, normalize=self.normalize
+        )
+        return BlocklistSnapshot(
+            version=current.version + 1 if current is not None else 1,
+            content_filter=content_filter,
+            checksum=checksum,
+            term_count=len(content_filter.matcher),
+            compile_seconds=time.perf_counter() - started,
+            loaded_at=datetime.now(timezone.utc)
+        )
+
+    def _publish(self, snapshot: BlocklistSnapshot) -> BlocklistSnapshot:
+        """Publica la versión compilada si es nueva."""
+        if snapshot is self._active:
+            return snapshot
+        # Intercambio atómico: una sola asignación de referencia
+        self._active = snapshot
+        logger.info(
+            "Lista de palabras v%s activa: %s términos compilados en %.1f ms",
+            snapshot.version, snapshot.term_count, snapshot.compile_seconds * 1000
+        )
+        return snapshot
+
+    def _reload_logged(self) -> None:
+        try:
+            self.reload()
+        except BlocklistLoadError as e:
+            logger.error("Recarga de la lista de palabras fallida: %s", e.message)
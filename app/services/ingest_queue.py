@@ -0,0 +1,245 @@
+"""
+Ingesta asíncrona (write-behind) de mensajes.
+Este módulo encola mensajes ya validados y los persiste en lotes desde una tarea de fondo.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models.message import Message
+from app.services.message_service import CONFLICT_LOOKUP_FAILED, MessageService
+from app.utils.exceptions import DatabaseError, QueueFullError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_STORED = 'stored'
+STATUS_FAILED = 'failed'
+
+
+class WriteBehindQueue:
+    """
+    Cola acotada en memoria con un vaciador de fondo que agrupa commits.
+
+    Las peticiones validan y filtran el mensaje, lo encolan y responden 202; la
+    tarea de fondo (un green thread de SocketIO) vacía la cola en lotes de
+    ASYNC_INGEST_BATCH_SIZE, los guarda en una sola transacción y solo después
+    notifica cada mensaje con on_stored.
+    """
+
+    def __init__(
+        self,
+        app,
+        message_service: MessageService,
+        socketio,
+        on_stored: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """
+        Inicializa la cola.
+
+        Args:
+            app: Aplicación Flask (se usa su contexto y su configuración)
+            message_service: Servicio usado para validar y guardar los mensajes
+            socketio: Instancia de SocketIO que provee la tarea de fondo
+            on_stored: Callback invocado con cada mensaje una vez confirmado
+        """
+        self.app = app
+        self.message_service = message_service
+        self.socketio = socketio
+        self.on_stored = on_stored
+        self._pending = deque()
+        self._pending_ids = set()
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._accepting = True
+        self._running = False
+
+    @property
+    def capacity(self) -> int:
+        """Capacidad máxima de la cola."""
+        return self.app.config.get('ASYNC_INGEST_QUEUE_SIZE', 10000)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Valida, filtra y encola un mensaje.
+
+        Args:
+            message_data: Datos del mensaje (ya validados por el esquema)
+
+        Returns:
+            Dict: Estado inicial del mensaje encolado
+
+        Raises:
+            ValidationError: Si la validación falla o el message_id ya está encolado
+            InvalidFormatError: Si el formato es incorrecto
+            InappropriateContentError: Si se encuentra contenido inapropiado
+            QueueFullError: Si la cola está llena o en proceso de cierre
+        """
+        message = self.message_service.prepare_message(message_data)
+
+        with self._lock:
+            if not self._accepting:
+                raise QueueFullError("La ingesta asíncrona se está cerrando, intente más tarde")
+            if len(self._pending) >= self.capacity:
+                raise QueueFullError()
+            if message.message_id in self._pending_ids:
+                raise ValidationError(f"Ya existe un mensaje con ID: {message.message_id}")
+
+            self._pending.append(message)
+            self._pending_ids.add(message.message_id)
+            self._set_status(message.message_id, STATUS_QUEUED)
+
+        return self.get_status(message.message_id)
+
+    def flush(self) -> int:
+        """
+        Persiste un lote de mensajes pendientes en una sola transacción.
+
+        Returns:
+            int: Número de mensajes retirados de la cola
+        """
+        with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return 0
+
+            with self.app.app_context():
+                stored = self._store_batch(batch)
+
+            for message_data in stored:
+                self._notify(message_data)
+
+            return len(batch)
+
+    def _take_batch(self) -> List[Message]:
+        """Retira de la cola hasta ASYNC_INGEST_BATCH_SIZE mensajes."""
+        batch_size = self.app.config.get('ASYNC_INGEST_BATCH_SIZE', 500)
+        with self._lock:
+            count = min(batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _store_batch(self, batch: List[Message]) -> List[Dict[str, Any]]:
+        """
+        Guarda el lote; los reintentos idénticos cuentan como guardados y los
+        conflictos fallan. Solo un fallo de la transacción marca todo el lote
+        como fallido: los insertados se notifican aunque luego falle la lectura
+        de los conflictos.
+        """
+        try:
+            outcomes = self.message_service.store_messages(batch)
+        except DatabaseError as e:
+            logger.error("Error al vaciar la cola de ingesta: %s", e.message)
+            self._finish(batch, STATUS_FAILED, e.message)
+            return []
+
+        created = [stored for stored, outcome in outcomes if outcome == 'created']
+        replayed = [message for message, (_, outcome) in zip(batch, outcomes) if outcome == 'replayed']
+        duplicates = [message for message, (_, outcome) in zip(batch, outcomes) if outcome == 'duplicate']
+        unchecked = [message for message, (_, outcome) in zip(batch, outcomes) if outcome == 'failed']
+        self._finish(duplicates, STATUS_FAILED, "Ya existe un mensaje con ese ID")
+        self._finish(unchecked, STATUS_FAILED, CONFLICT_LOOKUP_FAILED)
+        self._finish(created + replayed, STATUS_STORED)
+        return [message.to_dict() for message in created]
+
+    def _finish(self, messages: List[Message], status: str, error: Optional[str] = None) -> None:
+        """Marca el estado final de los mensajes y los libera de la cola."""
+        with self._lock:
+            for message in messages:
+                self._pending_ids.discard(message.message_id)
+                self._set_status(message.message_id, status, error)
+
+    def _notify(self, message_data: Dict[str, Any]) -> None:
+        """Invoca on_stored sin dejar que un fallo detenga el vaciado."""
+        if not self.on_stored:
+            return
+        try:
+            self.on_stored(message_data)
+        except Exception as e:
+            logger.warning("No se pudo notificar el mensaje %s: %s", message_data.get('message_id'), e)
+
+    def _set_status(self, message_id: str, status: str, error: Optional[str] = None) -> None:
+        """Registra el estado de un mensaje acotando el historial (llamar con _lock)."""
+        entry = {'message_id': message_id, 'status': status, 'updated_at': time.time()}
+        if error:
+            entry['error'] = error
+        self._statuses[message_id] = entry
+        self._statuses.move_to_end(message_id)
+
+        max_statuses = self.app.config.get('ASYNC_INGEST_STATUS_MAX', 100000)
+        while len(self._statuses) > max_statuses:
+            self._statuses.popitem(last=False)
+
+    def get_status(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene el estado de un mensaje enviado en modo asíncrono.
+
+        Returns:
+            Dict or None: Estado del mensaje o None si no está registrado
+        """
+        with self._lock:
+            entry = self._statuses.get(message_id)
+            return dict(entry) if entry else None
+
+    def start(self) -> None:
+        """Arranca la tarea de fondo que vacía la cola."""
+        if self._running:
+            return
+        self._running = True
+        self._accepting = True
+        self.socketio.start_background_task(self._run)
+
+    def _run(self) -> None:
+        """Bucle de la tarea de fondo."""
+        interval = self.app.config.get('ASYNC_INGEST_FLUSH_INTERVAL', 0.05)
+        while self._running or self._pending:
+            try:
+                flushed = self.flush()
+            except Exception as e:
+                logger.exception("Error inesperado en la cola de ingesta: %s", e)
+                flushed = 0
+            if not flushed:
+                if not self._running:
+                    break
+                self.socketio.sleep(interval)
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """
+        Deja de aceptar mensajes y persiste todo lo pendiente (cierre ordenado).
+
+        Args:
+            timeout: Tiempo máximo en segundos (ASYNC_INGEST_DRAIN_TIMEOUT por defecto)
+
+        Returns:
+            int: Mensajes que quedaron sin persistir al agotarse el tiempo
+        """
+        if timeout is None:
+            timeout = self.app.config.get('ASYNC_INGEST_DRAIN_TIMEOUT', 30)
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            self._accepting = False
+        self._running = False
+
+        while self._pending and time.monotonic() < deadline:
+            self.flush()
+
+        remaining = len(self._pending)
+        if remaining:
+            logger.error("Cierre de la cola de ingesta con %s mensajes sin persistir", remaining)
+        return remaining
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas básicas de la cola."""
+        return {
+            'enabled': bool(self.app.config.get('ASYNC_INGEST_ENABLED')),
+            'running': self._running,
+            'accepting': self._accepting,
+            'depth': len(self._pending),
+            'capacity': self.capacity
+        }
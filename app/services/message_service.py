@@ -2,28 +2,83 @@
 Lógica de negocio para el procesamiento de mensajes - Versión corregida.
 Este módulo contiene toda la lógica de negocio para el manejo de mensajes.
 """
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, Iterator, List, NamedTuple, Tuple, Optional
 from datetime import datetime, timezone
+import csv
+import io
+import json
 import logging
 
-from app.models.message import Message
+from app.models.message import MESSAGE_FIELDS, Message, message_dict
+from app.models.message_search import SEARCH_COUNTS, SEARCH_MODES, SEARCH_SORTS, requirement_expression
+from app.models.session_analytics import SessionAggregate
 from app.repositories.message_repository import MessageRepository
-from app.utils.validators import MessageValidator, ContentFilter, PaginationValidator
-from app.utils.exceptions import ValidationError, InvalidFormatError, InappropriateContentError, MessageNotFoundError
+from app.services.blocklist import BlocklistManager
+from app.utils.cursor import decode_cursor, encode_cursor
+from app.utils import json_provider
+from app.utils.etag import message_etag, session_etag
+from app.utils.lru_cache import LRUCache
+from app.utils.safe_regex import SafeRegex
+from app.utils.validators import MessageValidator, ContentFilter, FieldsValidator, PaginationValidator
+from app.utils.exceptions import (
+    MessageProcessingError,
+    ValidationError,
+    InvalidFormatError,
+    InappropriateContentError,
+    MessageNotFoundError,
+    DatabaseError,
+    DuplicateMessageError
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+# Error de los mensajes en conflicto cuando no se pudo leer el mensaje existente
+CONFLICT_LOOKUP_FAILED = "No se pudo comprobar el mensaje existente con ese ID"
+
+
+class SerializedMessage(NamedTuple):
+    """Mensaje serializado en JSON (UTF-8) junto con su ETag."""
+    body: bytes
+    etag: str
+
 
 class MessageService:
     """Servicio para procesamiento de mensajes."""
     
-    def __init__(self, message_repository: MessageRepository, inappropriate_words: List[str]):
+    def __init__(
+        self,
+        message_repository: MessageRepository,
+        inappropriate_words: List[str],
+        content_filter: Optional[ContentFilter] = None,
+        blocklist: Optional[BlocklistManager] = None,
+        message_cache: Optional[LRUCache] = None
+    ):
         """
         Inicializa el servicio de mensajes.
         
         Args:
             message_repository: Repositorio para operaciones de base de datos
             inappropriate_words: Lista de palabras inapropiadas para filtrado
+            content_filter: Filtro ya compilado; por defecto se compila uno con
+                inappropriate_words en modo 'reject'
+            blocklist: Gestor de la lista recargable; si se proporciona, cada
+                mensaje usa su filtro activo en lugar de content_filter
+            message_cache: Caché LRU de mensajes serializados para
+                get_message_json (None = sin caché)
         """
         self.message_repository = message_repository
         self.inappropriate_words = inappropriate_words
+        self.blocklist = blocklist
+        self._content_filter = content_filter or ContentFilter(inappropriate_words)
+        self.message_cache = message_cache
+    
+    @property
+    def content_filter(self) -> ContentFilter:
+        """Filtro de contenido vigente (el de la versión activa de la lista, si la hay)."""
+        if self.blocklist is not None:
+            return self.blocklist.content_filter
+        return self._content_filter
     
     def process_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -35,6 +90,39 @@ class MessageService:
         Returns:
             Dict: Mensaje procesado con metadatos
             
+        Raises:
+            ValidationError: Si la validación falla
+            InvalidFormatError: Si el formato es incorrecto
+            InappropriateContentError: Si se encuentra contenido inapropiado
+            DuplicateMessageError: Si el message_id ya existe; is_replay indica
+                que es un reintento idéntico y existing trae el mensaje almacenado
+        """
+        # 1-4. Validar, filtrar y crear el mensaje
+        message = self.prepare_message(message_data)
+        
+        # 5. Guardar mensaje (el índice único detecta duplicados de forma atómica)
+        try:
+            saved_message = self.message_repository.save(message)
+        except DuplicateMessageError as e:
+            e.is_replay = e.existing is not None and message.is_same_message(e.existing)
+            raise
+        
+        # 6. Retornar mensaje procesado
+        return saved_message.to_dict()
+
+    def prepare_message(self, message_data: Dict[str, Any]) -> Message:
+        """
+        Valida y filtra un mensaje sin guardarlo.
+        
+        Los duplicados no se verifican aquí: los detecta el índice único de
+        message_id al insertar.
+        
+        Args:
+            message_data: Datos del mensaje a procesar
+            
+        Returns:
+            Message: Instancia lista para guardarse
+            
         Raises:
             ValidationError: Si la validación falla
             InvalidFormatError: Si el formato es incorrecto
@@ -44,25 +132,137 @@ class MessageService:
         self._validate_basic_fields(message_data)
         MessageValidator.validate_message_data(message_data)
         
-        # 2. Verificar si el message_id ya existe (solo si se proporciona)
-        if message_data.get('message_id') and self.message_repository.exists_by_message_id(message_data['message_id']):
-            raise ValidationError(f"Ya existe un mensaje con ID: {message_data['message_id']}")
+        # 2. Filtrar contenido inapropiado (en modo 'mask' se guarda enmascarado).
+        # Se lee el filtro una sola vez: una recarga concurrente no afecta a este mensaje
+        content = self.content_filter.apply(message_data['content'])
+        if content != message_data['content']:
+            message_data = {**message_data, 'content': content}
         
-        # 3. Filtrar contenido inapropiado
-        ContentFilter.check_inappropriate_content(
-            message_data['content'], 
-            self.inappropriate_words
-        )
+        # 3. Crear mensaje con metadatos calculados automáticamente
+        return self._create_message_from_data(message_data)
+    
+    def process_message_batch(self, messages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Procesa un lote de mensajes: valida todos en una pasada y guarda los
+        válidos en una transacción, detectando duplicados en el propio INSERT.
         
-        # 4. Crear mensaje con metadatos calculados automáticamente
-        message = self._create_message_from_data(message_data)
+        Los errores de un mensaje no afectan al resto del lote; cada elemento
+        recibe su propio resultado en el mismo orden de entrada. Un reintento
+        idéntico de un mensaje ya almacenado se reporta como 'replayed' junto
+        con el mensaje almacenado.
         
-        # 5. Guardar mensaje
-        saved_message = self.message_repository.save(message)
+        Args:
+            messages_data: Lista con los datos de cada mensaje
+            
+        Returns:
+            List[Dict]: Un resultado por mensaje con 'index', 'message_id',
+            'status' ('created', 'replayed' o 'error') y 'data' o 'error'
+            
+        Raises:
+            DatabaseError: Si falla la transacción (no se guarda ningún mensaje)
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages_data)
+        candidates = []
+        seen_ids = set()
         
-        # 6. Retornar mensaje procesado
-        return saved_message.to_dict()
-
+        # 1. Validar y filtrar cada mensaje
+        for index, message_data in enumerate(messages_data):
+            try:
+                message = self.prepare_message(message_data)
+                if message.message_id in seen_ids:
+                    raise ValidationError(
+                        f"message_id duplicado dentro del lote: {message.message_id}"
+                    )
+            except MessageProcessingError as e:
+                results[index] = self._batch_error_result(index, message_data, e)
+                continue
+            
+            seen_ids.add(message.message_id)
+            candidates.append((index, message))
+        
+        # 2. Guardar todos los mensajes válidos en una única transacción
+        outcomes = self.store_messages([message for _, message in candidates])
+        
+        for (index, message), (stored, outcome) in zip(candidates, outcomes):
+            if outcome == 'duplicate':
+                results[index] = self._batch_error_result(
+                    index, {'message_id': message.message_id}, DuplicateMessageError(message.message_id)
+                )
+            elif outcome == 'failed':
+                results[index] = self._batch_error_result(
+                    index, {'message_id': message.message_id}, DatabaseError(CONFLICT_LOOKUP_FAILED)
+                )
+            else:
+                results[index] = {
+                    'index': index,
+                    'message_id': message.message_id,
+                    'status': outcome,
+                    'data': stored.to_dict()
+                }
+        
+        return results
+    
+    def store_messages(self, messages: List[Message]) -> List[Tuple[Message, str]]:
+        """
+        Guarda mensajes ya validados en una transacción y clasifica los conflictos.
+        
+        Args:
+            messages: Mensajes a guardar (con message_id únicos entre sí)
+            
+        Returns:
+            List[Tuple[Message, str]]: Por cada mensaje, el mensaje almacenado y
+            'created', 'replayed' (ya existía idéntico), 'duplicate' (ya existía
+            con otro contenido) o 'failed' (ya existía, pero no se pudo leer para
+            compararlo; el mensaje almacenado es None)
+            
+        Raises:
+            DatabaseError: Si falla la transacción (no se ha guardado ninguno)
+        """
+        inserted_ids = {message.message_id for message in self.message_repository.save_all(messages)}
+        
+        # Los insertados ya están confirmados: un fallo al leer los conflictos
+        # solo deja sin clasificar a estos
+        conflicts = [message for message in messages if message.message_id not in inserted_ids]
+        existing = {}
+        lookup_failed = False
+        if conflicts:
+            try:
+                existing = {
+                    stored.message_id: stored
+                    for stored in self.message_repository.find_by_message_ids(m.message_id for m in conflicts)
+                }
+            except DatabaseError as e:
+                logger.error("Error al leer los mensajes en conflicto del lote: %s", e.message)
+                lookup_failed = True
+        
+        outcomes = []
+        for message in messages:
+            if message.message_id in inserted_ids:
+                outcomes.append((message, 'created'))
+                continue
+            if lookup_failed:
+                outcomes.append((None, 'failed'))
+                continue
+            stored = existing.get(message.message_id)
+            if stored is not None and message.is_same_message(stored):
+                outcomes.append((stored, 'replayed'))
+            else:
+                outcomes.append((stored, 'duplicate'))
+        return outcomes
+    
+    def _batch_error_result(self, index: int, message_data: Any, error: MessageProcessingError) -> Dict[str, Any]:
+        """Construye el resultado de error de un elemento del lote."""
+        message_id = message_data.get('message_id') if isinstance(message_data, dict) else None
+        return {
+            'index': index,
+            'message_id': message_id,
+            'status': 'error',
+            'error': {
+                'code': error.code,
+                'message': error.message,
+                'details': getattr(error, 'details', None)
+            }
+        }
     
     def _validate_all_required_fields(self, data: Dict[str, Any]) -> None:
         """
@@ -97,22 +297,44 @@ class MessageService:
         session_id: str, 
         limit: int = 10, 
         offset: int = 0, 
-        sender: Optional[str] = None
+        sender: Optional[str] = None,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        tail: bool = False,
+        rendered: bool = False,
+        fields: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Obtiene mensajes por session_id con paginación.
         
+        Sin after, before ni tail se pagina por offset (con total). Con ellos se
+        pagina por cursor: cada página se lee desde su posición en el índice,
+        con coste constante sea cual sea su profundidad, y sin total.
+        
+        Con rendered=True los mensajes se devuelven como el JSON guardado al
+        insertarlos (str), listo para concatenar en la respuesta sin construir
+        objetos ni diccionarios por fila. Con fields solo se leen de la base de
+        datos las columnas de esos campos y se devuelven diccionarios parciales
+        (rendered se ignora).
+        
         Args:
             session_id: ID de la sesión
             limit: Límite de resultados por página
             offset: Desplazamiento para paginación  
             sender: Filtro opcional por remitente
+            after: Cursor; devuelve los mensajes posteriores ('' = desde el principio)
+            before: Cursor; devuelve los mensajes anteriores ('' = hasta el final)
+            tail: Si es True devuelve los últimos mensajes de la sesión
+            rendered: Si es True 'messages' es una lista de JSON (str) en lugar de dicts
+            fields: Campos a devolver, separados por comas (None = todos)
             
         Returns:
             Dict: Respuesta con mensajes y metadatos de paginación
             
         Raises:
             ValidationError: Si los parámetros son inválidos
+            InvalidCursorError: Si el cursor está mal formado
+            InvalidFieldsError: Si fields contiene campos desconocidos
         """
         # Validar parámetros de paginación
         limit, offset = PaginationValidator.validate_pagination_params(limit, offset, 100)
@@ -121,23 +343,94 @@ class MessageService:
         if sender and sender not in MessageValidator.VALID_SENDERS:
             raise ValidationError(f"sender debe ser uno de: {MessageValidator.VALID_SENDERS}")
         
+        projection = FieldsValidator.validate_fields(fields)
+        if projection is not None:
+            rendered = False
+        
+        if after is not None or before is not None or tail:
+            return self._get_messages_by_cursor(
+                session_id, limit, offset, sender, after, before, tail, rendered, projection
+            )
+        
         # Obtener mensajes y total
         messages, total_count = self.message_repository.find_by_session_id(
-            session_id, limit, offset, sender
+            session_id, limit, offset, sender, rendered=rendered, fields=projection
         )
         
         # Preparar respuesta
         return {
-            'messages': [message.to_dict() for message in messages],
+            'messages': self._page_messages(messages, rendered, projection),
             'pagination': {
                 'total': total_count,
                 'limit': limit,
                 'offset': offset,
                 'has_next': (offset + limit) < total_count,
-                'has_prev': offset > 0
+                'has_prev': offset > 0,
+                **self._page_cursors(messages)
+            }
+        }
+    
+    def _get_messages_by_cursor(
+        self,
+        session_id: str,
+        limit: int,
+        offset: int,
+        sender: Optional[str],
+        after: Optional[str],
+        before: Optional[str],
+        tail: bool,
+        rendered: bool = False,
+        projection: Optional[Tuple[str, ...]] = None
+    ) -> Dict[str, Any]:
+        """Paginación por cursor de get_messages_by_session."""
+        # 1. Validar la combinación de parámetros
+        if sum([after is not None, before is not None, tail]) > 1:
+            raise ValidationError("after, before y tail no se pueden combinar")
+        if offset:
+            raise ValidationError("offset no se puede combinar con after, before o tail")
+        
+        # 2. Leer desde la posición del cursor
+        backward = after is None
+        token = after if after is not None else before
+        cursor = decode_cursor(token) if token else None
+        messages, has_more = self.message_repository.find_by_session_keyset(
+            session_id, limit, cursor, backward, sender, rendered=rendered, fields=projection
+        )
+        
+        # 3. Hay página en el otro sentido si se partió de un cursor
+        has_next, has_prev = (cursor is not None, has_more) if backward else (has_more, cursor is not None)
+        return {
+            'messages': self._page_messages(messages, rendered, projection),
+            'pagination': {
+                'limit': limit,
+                'has_next': has_next,
+                'has_prev': has_prev,
+                **self._page_cursors(messages)
             }
         }
     
+    @staticmethod
+    def _page_messages(messages: list, rendered: bool, projection: Optional[Tuple[str, ...]] = None) -> list:
+        """Mensajes de una página: JSON guardado (rendered), diccionarios parciales o completos."""
+        if projection is not None:
+            return [message_dict(row, projection) for row in messages]
+        if rendered:
+            return [message.json for message in messages]
+        return [message.to_dict() for message in messages]
+    
+    @staticmethod
+    def _page_cursors(messages: List[Message]) -> Dict[str, Optional[str]]:
+        """
+        Cursores de la página: next_cursor (usar con after) apunta al último
+        mensaje y prev_cursor (usar con before) al primero.
+        """
+        if not messages:
+            return {'next_cursor': None, 'prev_cursor': None}
+        return {
+            'next_cursor': encode_cursor(messages[-1].timestamp, messages[-1].id),
+            'prev_cursor': encode_cursor(messages[0].timestamp, messages[0].id)
+        }
+    
     def get_message_by_id(self, message_id: str) -> Dict[str, Any]:
         """
         Obtiene un mensaje por su ID.
@@ -157,6 +450,135 @@ class MessageService:
         
         return message.to_dict()
     
+    def get_message_json(self, message_id: str, fields: Optional[str] = None) -> SerializedMessage:
+        """
+        Obtiene un mensaje por su ID ya serializado en JSON (UTF-8).
+        
+        Los mensajes completos se sirven desde la caché LRU mientras no se
+        borren ni modifiquen; solo un fallo de caché consulta la base de datos.
+        Con fields se leen solo las columnas de esos campos (sin caché).
+        
+        Args:
+            message_id: ID del mensaje
+            fields: Campos a devolver, separados por comas (None = todos)
+            
+        Returns:
+            SerializedMessage: El mensaje serializado y su ETag
+            
+        Raises:
+            MessageNotFoundError: Si el mensaje no existe (no se guarda en caché)
+            InvalidFieldsError: Si fields contiene campos desconocidos
+        """
+        projection = FieldsValidator.validate_fields(fields)
+        if projection is not None:
+            row = self.message_repository.find_message_fields(message_id, projection)
+            if row is None:
+                raise MessageNotFoundError(f"No se encontró mensaje con ID: {message_id}")
+            return SerializedMessage(
+                json_provider.dumps_bytes(message_dict(row, projection)),
+                message_etag(row.updated_at, ','.join(projection))
+            )
+        
+        if self.message_cache is not None:
+            cached = self.message_cache.get(message_id)
+            if cached is not None:
+                return cached
+        
+        data = self.get_message_by_id(message_id)
+        serialized = SerializedMessage(
+            json_provider.dumps_bytes(data),
+            message_etag(data['metadata']['updated_at'])
+        )
+        if self.message_cache is not None:
+            self.message_cache.put(message_id, serialized, size=len(serialized.body))
+        return serialized
+    
+    def lookup_messages(self, message_ids: List[str]) -> Dict[str, Optional[SerializedMessage]]:
+        """
+        Resuelve varios mensajes por ID ya serializados en JSON (UTF-8).
+        
+        Los que están en la caché LRU se sirven desde ella; el resto se busca
+        con una sola consulta IN sobre el JSON guardado y se añade a la caché.
+        
+        Args:
+            message_ids: IDs de los mensajes (los repetidos se resuelven una vez)
+            
+        Returns:
+            Dict[str, Optional[SerializedMessage]]: Un elemento por ID distinto,
+                en el orden recibido; None si el mensaje no existe
+        """
+        # 1. Servir desde la caché lo que se pueda
+        results: Dict[str, Optional[SerializedMessage]] = dict.fromkeys(message_ids)
+        missing = list(results)
+        if self.message_cache is not None:
+            missing = []
+            for message_id in results:
+                cached = self.message_cache.get(message_id)
+                if cached is None:
+                    missing.append(message_id)
+                else:
+                    results[message_id] = cached
+        
+        # 2. Resolver el resto con una consulta y guardarlo en la caché
+        for message_id, updated_at, body in self.message_repository.find_rendered_by_message_ids(missing):
+            serialized = SerializedMessage(body.encode('utf-8'), message_etag(updated_at))
+            results[message_id] = serialized
+            if self.message_cache is not None:
+                self.message_cache.put(message_id, serialized, size=len(serialized.body))
+        
+        return results
+    
+    def get_message_etag(self, message_id: str, fields: Optional[str] = None) -> Optional[str]:
+        """
+        Obtiene la ETag actual de un mensaje sin serializarlo.
+        
+        Se toma de la caché si el mensaje está en ella y, si no, de su
+        updated_at (consulta por el índice único de message_id).
+        
+        Args:
+            message_id: ID del mensaje
+            fields: Campos de la representación pedida (None = todos)
+            
+        Returns:
+            Optional[str]: La ETag, o None si el mensaje no existe
+            
+        Raises:
+            InvalidFieldsError: Si fields contiene campos desconocidos
+        """
+        projection = FieldsValidator.validate_fields(fields)
+        variant = ','.join(projection) if projection is not None else ''
+        if self.message_cache is not None and not variant:
+            cached = self.message_cache.get(message_id)
+            if cached is not None:
+                return cached.etag
+        
+        updated_at = self.message_repository.get_message_updated_at(message_id)
+        return message_etag(updated_at, variant) if updated_at is not None else None
+    
+    def get_session_etag(self, session_id: str, variant: bytes = b'') -> str:
+        """
+        Obtiene la ETag actual de una lectura de la sesión.
+        
+        Se deriva de la version de session_counters, que los triggers aumentan
+        con cada inserción, borrado o actualización de la sesión. Debe
+        obtenerse antes de leer los datos: si una escritura se cuela entre
+        ambas lecturas, la ETag queda anticuada y la siguiente validación
+        devuelve los datos de nuevo en lugar de un 304 incorrecto.
+        
+        Args:
+            session_id: ID de la sesión
+            variant: Parámetros que distinguen la representación (página, filtros)
+            
+        Returns:
+            str: La ETag (sin comillas)
+        """
+        return session_etag(self.message_repository.get_session_version(session_id), variant)
+    
+    def invalidate_message(self, message_id: str) -> None:
+        """Descarta la copia en caché de un mensaje; debe llamarse en todo borrado o actualización."""
+        if self.message_cache is not None:
+            self.message_cache.invalidate(message_id)
+    
     def _create_message_from_data(self, message_data: Dict[str, Any]) -> Message:
         """
         Crea una instancia de Message desde los datos.
@@ -185,37 +607,103 @@ class MessageService:
         """
         Obtiene estadísticas de una sesión.
         
+        Las cifras se leen de la fila de session_counters de la sesión y de
+        sus agregados incrementales (session_analytics), que se mantienen al
+        día con cada escritura: nunca se recorren los mensajes.
+        
         Args:
             session_id: ID de la sesión
             
         Returns:
             Dict: Estadísticas de la sesión
         """
-        total_messages = self.message_repository.count_by_session_id(session_id)
-        user_messages = self.message_repository.count_by_session_id(session_id, 'user')
-        system_messages = self.message_repository.count_by_session_id(session_id, 'system')
+        counters = self.message_repository.get_session_counters(session_id)
+        if counters is None or counters.total == 0:
+            return {
+                'session_id': session_id,
+                'total_messages': 0,
+                'user_messages': 0,
+                'system_messages': 0,
+                'total_words': 0,
+                'total_characters': 0,
+                'first_message_at': None,
+                'last_message_at': None,
+                'duration_seconds': 0,
+                'messages_per_minute': None,
+                **SessionAggregate().summary()
+            }
         
+        analytics = self.message_repository.get_session_analytics(session_id) or SessionAggregate()
+        duration = (counters.last_timestamp - counters.first_timestamp).total_seconds()
         return {
             'session_id': session_id,
-            'total_messages': total_messages,
-            'user_messages': user_messages,
-            'system_messages': system_messages
+            'total_messages': counters.total,
+            'user_messages': counters.user_messages,
+            'system_messages': counters.system_messages,
+            'total_words': counters.word_count_sum,
+            'total_characters': counters.character_count_sum,
+            'first_message_at': counters.first_timestamp.isoformat() + 'Z',
+            'last_message_at': counters.last_timestamp.isoformat() + 'Z',
+            'duration_seconds': duration,
+            'messages_per_minute': round(counters.total / (duration / 60), 2) if duration > 0 else None,
+            **analytics.summary()
         }
     
-    def search_messages_globally(self, query: str, limit: int, offset: int) -> Dict[str, Any]:
+    def search_messages_globally(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        fields: Optional[str] = None,
+        mode: str = 'words',
+        max_candidates: int = 10000,
+        sort: str = 'recent',
+        snippets: bool = False,
+        count: str = 'exact'
+    ) -> Dict[str, Any]:
         """
         Busca mensajes globalmente y devuelve resultados paginados.
         
+        Modos de búsqueda:
+        - words: mensajes con todas las palabras del texto (índice de palabras).
+        - substring: mensajes que contienen el texto tal cual, también dentro
+          de una palabra (índice de trigramas).
+        - regex: mensajes en los que coincide la expresión regular, sin
+          distinguir mayúsculas. Los literales que exige el patrón filtran los
+          candidatos en el índice de trigramas y cada candidato se verifica con
+          un autómata de tiempo lineal (SafeRegex).
+        
+        Con sort='relevance' (modos words y substring) los resultados se
+        ordenan por BM25 en lugar de por fecha, y con snippets=True cada
+        mensaje incluye un fragmento con las coincidencias marcadas con <mark>
+        (null mientras el índice se rellena).
+        
+        count elige el total de la paginación: 'exact' lo cuenta, 'estimate'
+        lo extrapola de una muestra de los mensajes recientes (exacto en la
+        última página) y 'none' no lo calcula. Con 'estimate' y 'none' se pide
+        un mensaje de más para saber si hay otra página (has_more).
+        
         Args:
-            query: Texto de búsqueda.
+            query: Texto de búsqueda (o expresión regular con mode='regex').
             limit: Límite de resultados por página.
             offset: Desplazamiento.
+            fields: Campos a devolver, separados por comas (None = todos).
+            mode: Modo de búsqueda (SEARCH_MODES).
+            max_candidates: Candidatos que se verifican como máximo con mode='regex'.
+            sort: 'recent' (más recientes primero) o 'relevance' (BM25).
+            snippets: Si es True, añade a cada mensaje su fragmento resaltado.
+            count: 'exact', 'estimate' o 'none' (SEARCH_COUNTS).
             
         Returns:
             Dict: Un diccionario con los mensajes y datos de paginación.
             
         Raises:
-            ValidationError: Si la consulta es inválida.
+            ValidationError: Si la consulta, el modo, el orden, el tipo de total
+                o la expresión regular son inválidos, o si el patrón es
+                demasiado amplio.
+            InvalidFieldsError: Si fields contiene campos desconocidos.
+            SearchIndexNotReadyError: Si con mode='regex' o sort='relevance'
+                el índice necesario aún se está rellenando.
         """
         # Validar la consulta de búsqueda
         if not query or len(query.strip()) < 3:
@@ -223,31 +711,213 @@ class MessageService:
                 "La consulta de búsqueda debe tener al menos 3 caracteres.",
                 code="SEARCH_QUERY_TOO_SHORT"
             )
+        if mode not in SEARCH_MODES:
+            raise ValidationError(
+                f"Modo de búsqueda no válido: {mode}",
+                details={'allowed_modes': list(SEARCH_MODES)},
+                code="INVALID_SEARCH_MODE"
+            )
+        if sort not in SEARCH_SORTS:
+            raise ValidationError(
+                f"Orden de búsqueda no válido: {sort}",
+                details={'allowed_sorts': list(SEARCH_SORTS)},
+                code="INVALID_SORT"
+            )
+        if count not in SEARCH_COUNTS:
+            raise ValidationError(
+                f"Tipo de total no válido: {count}",
+                details={'allowed_counts': list(SEARCH_COUNTS)},
+                code="INVALID_COUNT"
+            )
+        if mode == 'regex' and (sort == 'relevance' or snippets):
+            raise ValidationError(
+                "La búsqueda por expresión regular no admite sort=relevance ni snippets.",
+                code="INVALID_SEARCH_OPTIONS"
+            )
         
         # Validar y normalizar parámetros de paginación
         limit, offset = PaginationValidator.validate_pagination_params(
             limit, offset, max_limit=100
         )
 
-        messages, total_results = self.message_repository.search_globally(
-            query, limit, offset
-        )
+        projection = FieldsValidator.validate_fields(fields)
+        # Sin recuento exacto se pide un mensaje de más para saber si hay otra página
+        page_limit = limit if count == 'exact' else limit + 1
+        if mode == 'regex':
+            # La verificación de los candidatos ya da el total exacto
+            messages, total_results = self._search_regex(query, page_limit, offset, projection, max_candidates)
+            if count == 'none':
+                total_results = None
+        else:
+            options = {} if projection is None else {'fields': projection}
+            if mode != 'words':
+                options['mode'] = mode
+            if count != 'exact':
+                options['count'] = count
+            search = self.message_repository.search_ranked if sort == 'relevance' \
+                else self.message_repository.search_globally
+            messages, total_results = search(query, page_limit, offset, **options)
 
-        next_offset = offset + limit if (offset + limit) < total_results else None
+        if count == 'exact':
+            has_more = (offset + limit) < total_results
+        else:
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+        pagination = {
+            "total_results": total_results,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + limit if has_more else None,
+            "has_more": has_more
+        }
+        if count == 'estimate':
+            if not has_more and (messages or offset == 0):
+                # Última página: el total se conoce
+                pagination['total_results'], pagination['total_is_estimate'] = offset + len(messages), False
+            elif not messages:
+                # Página más allá del final: hay como mucho offset coincidencias
+                pagination['total_results'] = min(total_results, offset)
+                pagination['total_is_estimate'] = True
+            else:
+                pagination['total_results'] = max(total_results, offset + len(messages) + has_more)
+                pagination['total_is_estimate'] = True
+
+        data = [message_dict(msg, projection) for msg in messages]
+        if snippets:
+            fragments = self.message_repository.find_search_snippets(query, [msg.id for msg in messages], mode)
+            for item, msg in zip(data, messages):
+                item['snippet'] = fragments.get(msg.id)
 
         return {
-            "data": [msg.to_dict() for msg in messages],
-            "pagination": {
-                "total_results": total_results,
-                "limit": limit,
-                "offset": offset,
-                "next_offset": next_offset
-            }
+            "data": data,
+            "pagination": pagination
         }
 
+    def _search_regex(
+        self,
+        pattern: str,
+        limit: int,
+        offset: int,
+        projection: Optional[Tuple[str, ...]],
+        max_candidates: int
+    ) -> Tuple[List[Any], int]:
+        """
+        Búsqueda por expresión regular: candidatos del índice de trigramas,
+        verificación con SafeRegex y paginación sobre los que coinciden.
+        
+        Raises:
+            ValidationError: Si el patrón es inválido (INVALID_REGEX) o no exige
+                ningún literal de 3 caracteres o deja más de max_candidates
+                candidatos (REGEX_TOO_BROAD): ambos casos obligarían a recorrer
+                toda la tabla.
+        """
+        regex = SafeRegex(pattern, ignore_case=True)
+        expression = requirement_expression(regex.requirement)
+        if expression is None:
+            raise ValidationError(
+                "La expresión regular debe contener algún texto literal de al menos "
+                "3 caracteres que toda coincidencia incluya.",
+                code="REGEX_TOO_BROAD"
+            )
+        
+        candidates = self.message_repository.find_regex_candidates(expression, max_candidates + 1)
+        if len(candidates) > max_candidates:
+            raise ValidationError(
+                "La expresión regular es demasiado amplia: añada texto literal para acotarla.",
+                details={'max_candidates': max_candidates},
+                code="REGEX_TOO_BROAD"
+            )
+        
+        matches = [row_id for row_id, content in candidates if regex.search(content)]
+        page = self.message_repository.find_by_ids(matches[offset:offset + limit], projection)
+        return page, len(matches)
+
+    def export_session(
+        self,
+        session_id: str,
+        export_format: str = 'ndjson',
+        fields: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[str]:
+        """
+        Exporta todos los mensajes de una sesión como NDJSON o CSV.
+        
+        Los parámetros y la existencia de la sesión se validan al llamar; el
+        contenido se produce después, de forma perezosa, con un fragmento de
+        texto por bloque de batch_size mensajes.
+        
+        Args:
+            session_id: ID de la sesión
+            export_format: 'ndjson' (un mensaje JSON por línea) o 'csv'
+            fields: Campos a exportar, separados por comas (None = todos)
+            batch_size: Mensajes por bloque
+            
+        Returns:
+            Iterator[str]: Fragmentos del documento exportado
+            
+        Raises:
+            InvalidFormatError: Si el formato no está soportado
+            InvalidFieldsError: Si fields contiene campos desconocidos
+            MessageNotFoundError: Si la sesión no tiene mensajes
+        """
+        # 1. Validar parámetros
+        if export_format not in EXPORT_FORMATS:
+            raise InvalidFormatError(
+                f"Formato de exportación no soportado: {export_format}",
+                details={'allowed_formats': list(EXPORT_FORMATS)}
+            )
+        projection = FieldsValidator.validate_fields(fields)
+        
+        # 2. Comprobar que la sesión existe sin recorrer sus mensajes
+        counters = self.message_repository.get_session_counters(session_id)
+        if counters is None or counters.total == 0:
+            raise MessageNotFoundError(f"No se encontró la sesión: {session_id}")
+        
+        # 3. Generar el documento por bloques
+        if export_format == 'csv':
+            return self._export_csv(session_id, projection or tuple(MESSAGE_FIELDS), batch_size)
+        return self._export_ndjson(session_id, projection, batch_size)
+    
+    def _export_ndjson(
+        self, session_id: str, projection: Optional[Tuple[str, ...]], batch_size: int
+    ) -> Iterator[str]:
+        """Una línea por mensaje; sin proyección se usa el JSON guardado en rendered_json."""
+        batches = self.message_repository.iter_session_messages(session_id, projection, batch_size)
+        for batch in batches:
+            if projection is None:
+                lines = [message.json for message in batch]
+            else:
+                lines = [json_provider.dumps(message_dict(row, projection)) for row in batch]
+            lines.append('')
+            yield '\n'.join(lines)
+    
+    def _export_csv(self, session_id: str, projection: Tuple[str, ...], batch_size: int) -> Iterator[str]:
+        """Cabecera con las rutas de los campos y una fila por mensaje."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        columns = [MESSAGE_FIELDS[field] for field in projection]
+        writer.writerow(projection)
+        
+        batches = self.message_repository.iter_session_messages(session_id, projection, batch_size)
+        for batch in batches:
+            for row in batch:
+                writer.writerow([
+                    value.isoformat() + 'Z' if isinstance(value, datetime) else value
+                    for value in (getattr(row, column) for column in columns)
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # Sesión vaciada entre la validación y la lectura: solo la cabecera
+        if buffer.tell():
+            yield buffer.getvalue()
+    
     def delete_message(self, message_id: str) -> bool:
         """Elimina un mensaje por ID y retorna True si se eliminó, False si no se encontró."""
-        return self.message_repository.delete_by_message_id(message_id)
+        deleted = self.message_repository.delete_by_message_id(message_id)
+        self.invalidate_message(message_id)
+        return deleted
 
     def _validate_basic_fields(self, message_data):
         """Valida que los campos básicos requeridos no estén vacíos o ausentes."""
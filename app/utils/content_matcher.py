@@ -0,0 +1,245 @@
+"""
+Búsqueda simultánea de múltiples términos (Aho–Corasick).
+Este módulo compila una lista de términos en un autómata que encuentra todas
+sus apariciones en un texto con una sola pasada.
+"""
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.utils.text_normalizer import TextNormalizer
+
+# Con listas de pocos términos, buscar cada uno con str.find (en C) es más
+# rápido que recorrer el autómata carácter a carácter en Python
+SMALL_TERM_COUNT = 64
+
+
+class ContentMatch(NamedTuple):
+    """Aparición de un término: posiciones [start, end) sobre el texto original."""
+    start: int
+    end: int
+    term: str
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class AhoCorasickMatcher:
+    """
+    Autómata de Aho–Corasick insensible a mayúsculas.
+
+    Se compila una sola vez; cada búsqueda recorre el texto una vez con coste
+    O(longitud + apariciones), independiente del número de términos. Con
+    listas de hasta SMALL_TERM_COUNT términos se usa str.find por término.
+    """
+
+    def __init__(self, terms: Iterable[str], word_boundary: bool = False, normalizer: Optional[TextNormalizer] = None):
+        """
+        Compila los términos.
+
+        Args:
+            terms: Términos a buscar (se ignoran los vacíos y los repetidos)
+            word_boundary: Si es True solo cuentan apariciones que sean palabras
+                completas (sin letras, dígitos ni '_' pegados a los extremos)
+            normalizer: Si se proporciona, términos y texto se normalizan con él
+                (acentos, leetspeak, separadores) en lugar de solo pasar a minúsculas
+        """
+        self.word_boundary = word_boundary
+        self.normalizer = normalizer
+        self.terms: List[str] = []
+        self._keys: List[str] = []
+        self._term_lengths: List[int] = []
+        self._term_gaps: List[FrozenSet[int]] = []
+
+        # Trie: transiciones por estado y términos que terminan en él
+        self._goto: List[Dict[str, int]] = [{}]
+        own_outputs: List[List[int]] = [[]]
+        seen = set()
+        for term in terms:
+            if not isinstance(term, str):
+                continue
+            key = normalizer.normalize_term(term) if normalizer is not None else term.lower()
+            if not key.strip() or key in seen:
+                continue
+            seen.add(key)
+
+            state = 0
+            for char in key:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    own_outputs.append([])
+                state = next_state
+            own_outputs[state].append(len(self.terms))
+            self.terms.append(term)
+            self._keys.append(key)
+            self._term_lengths.append(len(key))
+            self._term_gaps.append(normalizer.term_gaps(term) if normalizer is not None else frozenset())
+
+        self._fail, self._outputs = self._build_failure_links(own_outputs)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    @property
+    def state_count(self) -> int:
+        """Número de estados del autómata."""
+        return len(self._goto)
+
+    def _build_failure_links(self, own_outputs: List[List[int]]) -> Tuple[List[int], List[Tuple[int, ...]]]:
+        """Calcula los enlaces de fallo en anchura y propaga las salidas por ellos."""
+        fail = [0] * len(self._goto)
+        outputs: List[Tuple[int, ...]] = [()] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            outputs[state] = tuple(own_outputs[state])
+
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, child in self._goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                fail[child] = target if target != child else 0
+                inherited = outputs[fail[child]]
+                outputs[child] = tuple(own_outputs[child]) + inherited if own_outputs[child] else inherited
+                queue.append(child)
+        return fail, outputs
+
+    def find_all(self, text: str, limit: Optional[int] = None) -> List[ContentMatch]:
+        """
+        Encuentra todas las apariciones de los términos.
+
+        Args:
+            text: Texto a analizar
+            limit: Número máximo de apariciones a devolver (None = todas)
+
+        Returns:
+            List[ContentMatch]: Apariciones ordenadas por posición final
+        """
+        if not self.terms or not text:
+            return []
+
+        if self.normalizer is not None:
+            subject = self.normalizer.normalize(text)
+        else:
+            subject = text.lower()
+
+        if len(self.terms) <= SMALL_TERM_COUNT:
+            hits = self._scan_small(subject)
+        else:
+            hits = self._scan_automaton(subject)
+        if not hits:
+            return []
+
+        # Solo con coincidencias se calcula la posición original de cada carácter
+        # analizado: lower() puede cambiar la longitud (p. ej. 'İ') y la
+        # normalización elimina separadores y acentos
+        positions = None
+        if self.normalizer is not None:
+            positions = self.normalizer.origin_map(text)
+        elif len(subject) != len(text):
+            positions = [index for index, char in enumerate(text) for _ in char.lower()]
+
+        matches = []
+        for start, end, term_index in hits:
+            if positions is None:
+                match = ContentMatch(start, end, self.terms[term_index])
+            else:
+                if self.normalizer is not None and not self._is_contiguous(text, positions, start, end, term_index):
+                    continue
+                match = ContentMatch(positions[start], positions[end - 1] + 1, self.terms[term_index])
+            if self.word_boundary and not self._is_whole_word(text, match):
+                continue
+            matches.append(match)
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+    def _scan_automaton(self, subject: str) -> List[Tuple[int, int, int]]:
+        """Recorre el autómata; devuelve (inicio, fin, término) ordenados por fin."""
+        hits = []
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        lengths = self._term_lengths
+        root = goto[0]
+        state = 0
+        for index, char in enumerate(subject):
+            if state == 0 and char not in root:
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term_index in outputs[state]:
+                hits.append((index - lengths[term_index] + 1, index + 1, term_index))
+        return hits
+
+    def _scan_small(self, subject: str) -> List[Tuple[int, int, int]]:
+        """Búsqueda con str.find por término; mismo resultado y orden que el autómata."""
+        found = []
+        for term_index, key in enumerate(self._keys):
+            start = subject.find(key)
+            while start != -1:
+                found.append((start + len(key), -len(key), term_index, start))
+                start = subject.find(key, start + 1)
+        # El autómata emite por posición final y, en cada una, del término más largo al más corto
+        found.sort()
+        return [(start, end, term_index) for end, _, term_index, start in found]
+
+    def _is_contiguous(self, text: str, positions: List[int], start: int, end: int, term_index: int) -> bool:
+        """
+        Descarta coincidencias formadas al unir palabras distintas ("es pam" → "espam").
+
+        Una coincidencia que atraviesa separadores eliminados solo es válida si
+        los separadores están donde el propio término los tiene, o si separan
+        cada una de sus letras ("s p a m").
+        """
+        gaps = {
+            position - start
+            for position in range(start + 1, end)
+            if self.normalizer.has_separator_gap(text, positions, position)
+        }
+        return gaps <= self._term_gaps[term_index] or len(gaps) == end - start - 1
+
+    def contains_any(self, text: str) -> bool:
+        """Indica si el texto contiene al menos uno de los términos."""
+        return bool(self.find_all(text, limit=1))
+
+    def mask(self, text: str, matches: Optional[List[ContentMatch]] = None, mask_char: str = '*') -> str:
+        """
+        Reemplaza cada aparición por mask_char repetido (conserva la longitud).
+
+        Args:
+            text: Texto original
+            matches: Apariciones ya calculadas con find_all (se calculan si faltan)
+            mask_char: Carácter de reemplazo
+        """
+        if matches is None:
+            matches = self.find_all(text)
+        if not matches:
+            return text
+
+        pieces = []
+        cursor = 0
+        for start, end, _ in sorted(matches):
+            if end <= cursor:
+                continue
+            start = max(start, cursor)
+            pieces.append(text[cursor:start])
+            pieces.append(mask_char * (end - start))
+            cursor = end
+        pieces.append(text[cursor:])
+        return ''.join(pieces)
+
+    @staticmethod
+    def _is_whole_word(text: str, match: ContentMatch) -> bool:
+        if match.start > 0 and _is_word_char(text[match.start - 1]):
+            return False
+        if match.end < len(text) and _is_word_char(text[match.end]):
+            return False
+        return True
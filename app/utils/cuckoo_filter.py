@@ -0,0 +1,168 @@
+"""
+Filtro de cuckoo para pruebas de pertenencia aproximadas.
+Este módulo implementa un filtro probabilístico que, a diferencia de un filtro
+de Bloom, admite borrados.
+"""
+import random
+from array import array
+from typing import Any, Dict, Hashable
+
+_FINGERPRINT_BITS = 16
+_FINGERPRINT_MASK = (1 << _FINGERPRINT_BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+_MURMUR_MULTIPLIER = 0x5bd1e995
+_GOLDEN_RATIO_64 = 0x9e3779b97f4a7c15
+
+
+class CuckooFilter:
+    """
+    Filtro de cuckoo con huellas de 16 bits y cubetas de 4 entradas.
+
+    Cada clave se reduce a una huella que puede vivir en una de dos cubetas
+    (i1 e i2 = i1 XOR hash(huella)), de modo que una búsqueda revisa como mucho
+    8 entradas. contains nunca da falsos negativos para claves añadidas y no
+    borradas; la tasa de falsos positivos está acotada por 2·b / 2^f (≈0,012 %).
+
+    El filtro no es thread-safe: quien lo comparta debe sincronizar el acceso.
+    """
+
+    def __init__(self, capacity: int, bucket_size: int = 4, max_kicks: int = 500):
+        """
+        Inicializa el filtro.
+
+        Args:
+            capacity: Número de claves que se espera almacenar
+            bucket_size: Entradas por cubeta
+            max_kicks: Desalojos máximos antes de declarar el filtro lleno
+        """
+        num_buckets = 1
+        # Ocupación objetivo del 95 % (el máximo práctico con cubetas de 4)
+        while num_buckets * bucket_size * 0.95 < capacity:
+            num_buckets <<= 1
+
+        self.bucket_size = bucket_size
+        self.max_kicks = max_kicks
+        self._mask = num_buckets - 1
+        self._slots = array('H', bytes(2 * num_buckets * bucket_size))
+        self._count = 0
+        self._random = random.Random(0)
+
+    @property
+    def num_buckets(self) -> int:
+        return self._mask + 1
+
+    @property
+    def capacity(self) -> int:
+        """Número de entradas disponibles."""
+        return len(self._slots)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, key: Hashable) -> bool:
+        """
+        Añade una clave.
+
+        Returns:
+            bool: False si el filtro está lleno (la clave no se pudo añadir y
+            el filtro debe considerarse saturado)
+        """
+        fingerprint, i1, i2 = self._locate(key)
+        if self._insert_into(i1, fingerprint) or self._insert_into(i2, fingerprint):
+            self._count += 1
+            return True
+
+        # Ambas cubetas llenas: desalojar huellas hacia su cubeta alternativa
+        index = self._random.choice((i1, i2))
+        evicted = []
+        for _ in range(self.max_kicks):
+            slot = index * self.bucket_size + self._random.randrange(self.bucket_size)
+            fingerprint, self._slots[slot] = self._slots[slot], fingerprint
+            evicted.append(slot)
+            index = self._alternate(index, fingerprint)
+            if self._insert_into(index, fingerprint):
+                self._count += 1
+                return True
+
+        # Deshacer los desalojos para no perder ninguna huella ya almacenada
+        for slot in reversed(evicted):
+            fingerprint, self._slots[slot] = self._slots[slot], fingerprint
+        return False
+
+    def contains(self, key: Hashable) -> bool:
+        """Indica si la clave puede estar en el filtro (False es definitivo)."""
+        fingerprint, i1, i2 = self._locate(key)
+        return self._bucket_has(i1, fingerprint) or self._bucket_has(i2, fingerprint)
+
+    __contains__ = contains
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        Elimina una clave añadida previamente.
+
+        Borrar una clave que nunca se añadió puede eliminar la huella de otra
+        clave y provocar un falso negativo; solo se deben borrar claves
+        confirmadas.
+
+        Returns:
+            bool: True si se encontró y eliminó su huella
+        """
+        fingerprint, i1, i2 = self._locate(key)
+        for index in (i1, i2):
+            start = index * self.bucket_size
+            for slot in range(start, start + self.bucket_size):
+                if self._slots[slot] == fingerprint:
+                    self._slots[slot] = 0
+                    self._count -= 1
+                    return True
+        return False
+
+    def memory_bytes(self) -> int:
+        """Memoria ocupada por la tabla de huellas."""
+        return self._slots.itemsize * len(self._slots)
+
+    def load_factor(self) -> float:
+        """Fracción de entradas ocupadas."""
+        return self._count / len(self._slots)
+
+    def estimated_false_positive_rate(self) -> float:
+        """
+        Tasa teórica de falsos positivos con la ocupación actual: una búsqueda
+        compara contra 2·b·ocupación huellas, cada una con probabilidad 1/2^f.
+        """
+        compared = 2 * self.bucket_size * self.load_factor()
+        return 1 - (1 - 1 / (_FINGERPRINT_MASK + 1)) ** compared
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del filtro."""
+        return {
+            'items': self._count,
+            'capacity': self.capacity,
+            'load_factor': round(self.load_factor(), 4),
+            'memory_bytes': self.memory_bytes(),
+            'estimated_false_positive_rate': self.estimated_false_positive_rate()
+        }
+
+    def _locate(self, key: Hashable):
+        """Calcula la huella y las dos cubetas candidatas de una clave."""
+        # Mezclar el hash: el de los enteros pequeños es el propio valor
+        value = (hash(key) * _GOLDEN_RATIO_64) & _HASH_MASK
+        fingerprint = (value >> 48) & _FINGERPRINT_MASK or 1
+        i1 = value & self._mask
+        return fingerprint, i1, self._alternate(i1, fingerprint)
+
+    def _alternate(self, index: int, fingerprint: int) -> int:
+        """Cubeta alternativa de una huella (la operación es su propia inversa)."""
+        return (index ^ (fingerprint * _MURMUR_MULTIPLIER)) & self._mask
+
+    def _bucket_has(self, index: int, fingerprint: int) -> bool:
+        start = index * self.bucket_size
+        return fingerprint in self._slots[start:start + self.bucket_size]
+
+    def _insert_into(self, index: int, fingerprint: int) -> bool:
+        start = index * self.bucket_size
+        for slot in range(start, start + self.bucket_size):
+            if not self._slots[slot]:
+                self._slots[slot] = fingerprint
+                return True
+        return False
@@ -0,0 +1,47 @@
+"""
+Cursores de paginación por clave (keyset).
+Este módulo codifica la posición (timestamp, id) de un mensaje en un token
+opaco para que el cliente pida la página siguiente o anterior sin OFFSET.
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+from .exceptions import InvalidCursorError
+
+_SEPARATOR = '|'
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Codifica la posición de un mensaje.
+
+    Args:
+        timestamp: Timestamp del mensaje (UTC sin tzinfo, como se almacena)
+        row_id: Clave primaria del mensaje (desempata timestamps iguales)
+
+    Returns:
+        str: Cursor en base64 URL-safe sin relleno
+    """
+    raw = f"{timestamp.isoformat()}{_SEPARATOR}{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Returns:
+        tuple: (timestamp, id)
+
+    Raises:
+        InvalidCursorError: Si el cursor está mal formado
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        timestamp, row_id = raw.split(_SEPARATOR)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursorError()
@@ -0,0 +1,56 @@
+"""
+ETags de las lecturas de mensajes y sesiones.
+Este módulo construye los valores de ETag a partir de versiones que ya se
+conocen (version de la sesión, updated_at del mensaje), de modo que validar un
+If-None-Match no requiere cargar ni serializar mensajes.
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Union
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def message_etag(updated_at: Union[datetime, str], variant: Union[bytes, str] = b'') -> str:
+    """
+    ETag de un mensaje: su updated_at en microsegundos y, si la respuesta es
+    una proyección (?fields=), un resumen de los campos.
+
+    Args:
+        updated_at: updated_at del mensaje (datetime UTC naive o ISO 8601 con 'Z')
+        variant: Parámetros que distinguen la representación
+
+    Returns:
+        str: ETag sin comillas
+    """
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at.rstrip('Z'))
+    if updated_at.tzinfo is not None:
+        updated_at = updated_at.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = updated_at - _EPOCH
+    etag = f"m{(delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds}"
+    return f"{etag}-{_digest(variant)}" if variant else etag
+
+
+def session_etag(version: int, variant: Union[bytes, str] = b'') -> str:
+    """
+    ETag de una lectura de sesión: la version de sus contadores y, si la
+    respuesta depende de parámetros (página, filtro, cursor), un resumen de
+    ellos.
+
+    Args:
+        version: session_counters.version (0 si la sesión nunca tuvo mensajes)
+        variant: Parámetros que distinguen la representación
+
+    Returns:
+        str: ETag sin comillas
+    """
+    if not variant:
+        return f"s{version}"
+    return f"s{version}-{_digest(variant)}"
+
+
+def _digest(variant: Union[bytes, str]) -> str:
+    if isinstance(variant, str):
+        variant = variant.encode('utf-8')
+    return hashlib.sha1(variant).hexdigest()[:16]
@@ -15,10 +15,38 @@ class MessageProcessingError(Exception):
 class ValidationError(MessageProcessingError):
     """Excepción para errores de validación."""
     
-    def __init__(self, message, details=None):
-        super().__init__(message, 'VALIDATION_ERROR', 400)
+    def __init__(self, message, details=None, code='VALIDATION_ERROR'):
+        super().__init__(message, code, 400)
         self.details = details
 
+class DuplicateMessageError(ValidationError):
+    """
+    Excepción para un message_id que ya está almacenado.
+    
+    existing contiene el mensaje almacenado; is_replay indica que el mensaje
+    recibido es idéntico al almacenado (un reintento del cliente).
+    """
+    
+    def __init__(self, message_id, existing=None, is_replay=False):
+        super().__init__(f"Ya existe un mensaje con ID: {message_id}")
+        self.message_id = message_id
+        self.existing = existing
+        self.is_replay = is_replay
+
+class InvalidCursorError(ValidationError):
+    """Excepción para un cursor de paginación mal formado."""
+    
+    def __init__(self, message="Cursor de paginación inválido"):
+        super().__init__(message)
+        self.code = 'INVALID_CURSOR'
+
+class InvalidFieldsError(ValidationError):
+    """Excepción para un parámetro fields con campos desconocidos."""
+    
+    def __init__(self, message, details=None):
+        super().__init__(message, details)
+        self.code = 'INVALID_FIELDS'
+
 class InvalidFormatError(MessageProcessingError):
     """Excepción para errores de formato inválido."""
     
@@ -43,4 +71,39 @@ class DatabaseError(MessageProcessingError):
     """Excepción para errores de base de datos."""
     
     def __init__(self, message="Error en la base de datos"):
-        super().__init__(message, 'DATABASE_ERROR', 500)
\ No newline at end of file
+        super().__init__(message, 'DATABASE_ERROR', 500)
+class QueueFullError(MessageProcessingError):
+    """Excepción para cuando la cola de ingesta asíncrona está llena."""
+    
+    def __init__(self, message="La cola de ingesta está llena, intente más tarde"):
+        super().__init__(message, 'QUEUE_FULL', 503)
+
+class SearchIndexNotReadyError(MessageProcessingError):
+    """Excepción para una búsqueda que necesita un índice que aún se está rellenando."""
+    
+    def __init__(self, message="El índice de búsqueda aún se está construyendo, intente más tarde"):
+        super().__init__(message, 'SEARCH_INDEX_NOT_READY', 503)
+
+class IdempotencyKeyReuseError(MessageProcessingError):
+    """Excepción para una Idempotency-Key reutilizada con otro cuerpo de petición."""
+    
+    def __init__(self, message="La Idempotency-Key ya se usó con una petición distinta"):
+        super().__init__(message, 'IDEMPOTENCY_KEY_REUSED', 422)
+
+class IdempotencyInProgressError(MessageProcessingError):
+    """Excepción para cuando la petición original con la misma Idempotency-Key sigue en curso."""
+    
+    def __init__(self, message="La petición original con esta Idempotency-Key sigue en curso"):
+        super().__init__(message, 'IDEMPOTENCY_IN_PROGRESS', 409)
+
+class BlocklistLoadError(MessageProcessingError):
+    """Excepción para errores al cargar o compilar la lista de palabras bloqueadas."""
+    
+    def __init__(self, message="No se pudo cargar la lista de palabras bloqueadas"):
+        super().__init__(message, 'BLOCKLIST_LOAD_ERROR', 500)
+
+class MigrationError(MessageProcessingError):
+    """Excepción para un paso de migración del esquema que no se puede aplicar."""
+    
+    def __init__(self, message="No se pudo migrar el esquema de la base de datos"):
+        super().__init__(message, 'MIGRATION_ERROR', 500)
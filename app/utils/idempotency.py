@@ -0,0 +1,141 @@
+"""
+Caché de respuestas para peticiones con cabecera Idempotency-Key.
+Este módulo permite responder a los reintentos con la respuesta original sin
+volver a procesar la petición.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.utils.exceptions import IdempotencyInProgressError, IdempotencyKeyReuseError
+
+
+class CachedResponse(NamedTuple):
+    """Respuesta ya serializada, lista para reenviarse byte a byte."""
+    body: bytes
+    status: int
+    headers: List[Tuple[str, str]]
+
+
+class _InFlight:
+    """Petición en curso: las duplicadas esperan a que termine."""
+
+    __slots__ = ('fingerprint', 'done')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+
+
+class IdempotencyCache:
+    """
+    Caché acotada con TTL de respuestas por Idempotency-Key.
+
+    La primera petición con una clave la reserva (acquire devuelve None) y al
+    terminar entrega su respuesta con complete, o libera la clave con release
+    si no debe guardarse. Las peticiones con la misma clave que llegan mientras
+    tanto esperan a la primera; las posteriores reciben la respuesta guardada
+    hasta que expira el TTL. Cada clave va ligada a la huella del cuerpo de la
+    petición original.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries: Número máximo de respuestas guardadas
+            ttl: Segundos durante los que se reenvía una respuesta
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Las respuestas se insertan en orden de expiración (el TTL es fijo)
+        self._responses = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+
+    def acquire(self, key: str, fingerprint: str, timeout: float) -> Optional[CachedResponse]:
+        """
+        Obtiene la respuesta guardada para la clave o la reserva para esta petición.
+
+        Args:
+            key: Idempotency-Key (ya acotada al cliente)
+            fingerprint: Huella del cuerpo de la petición
+            timeout: Segundos máximos de espera a una petición en curso
+
+        Returns:
+            CachedResponse or None: La respuesta a reenviar, o None si esta
+            petición debe procesarse (y después llamar a complete o release)
+
+        Raises:
+            IdempotencyKeyReuseError: Si la clave se usó con otro cuerpo
+            IdempotencyInProgressError: Si la petición original no terminó a tiempo
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._evict_expired()
+                cached = self._responses.get(key)
+                if cached is not None:
+                    stored_fingerprint, _, response = cached
+                    if stored_fingerprint != fingerprint:
+                        raise IdempotencyKeyReuseError()
+                    self._hits += 1
+                    return response
+
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    self._in_flight[key] = _InFlight(fingerprint)
+                    self._misses += 1
+                    return None
+                if in_flight.fingerprint != fingerprint:
+                    raise IdempotencyKeyReuseError()
+                self._waits += 1
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not in_flight.done.wait(remaining):
+                raise IdempotencyInProgressError()
+
+    def complete(self, key: str, response: CachedResponse) -> None:
+        """Guarda la respuesta de la petición que reservó la clave y despierta a las que esperan."""
+        with self._lock:
+            in_flight = self._in_flight.pop(key, None)
+            if in_flight is None:
+                return
+            self._responses[key] = (in_flight.fingerprint, time.monotonic() + self.ttl, response)
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+        in_flight.done.set()
+
+    def release(self, key: str) -> None:
+        """Libera la clave sin guardar respuesta; la siguiente petición con ella se procesará."""
+        with self._lock:
+            in_flight = self._in_flight.pop(key, None)
+        if in_flight is not None:
+            in_flight.done.set()
+
+    def _evict_expired(self) -> None:
+        """Descarta las respuestas expiradas (llamar con _lock)."""
+        now = time.monotonic()
+        while self._responses:
+            _, (_, expires_at, _) = next(iter(self._responses.items()))
+            if expires_at > now:
+                break
+            self._responses.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la caché."""
+        with self._lock:
+            return {
+                'entries': len(self._responses),
+                'in_flight': len(self._in_flight),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits
+            }
@@ -0,0 +1,82 @@
+"""
+Codificación JSON rápida para respuestas y cuerpos de petición.
+Este módulo define el proveedor JSON de Flask de la aplicación y las funciones
+dumps/loads que usan el resto de módulos. Se codifica y decodifica con
+orjson (incluido en requirements.txt); en entornos sin él, con la biblioteca
+estándar y la misma salida compacta en UTF-8.
+"""
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Tipos que JSON no conoce: los mismos que admite Flask (fechas HTTP, Decimal, UUID, dataclasses)."""
+    return DefaultJSONProvider.default(value)
+
+
+if orjson is not None:
+    # Las fechas pasan por _default para conservar el formato de Flask
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(value: Any) -> bytes:
+        """Serializa en JSON compacto (UTF-8 sin escapar)."""
+        try:
+            return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits y otros casos que orjson rechaza
+            return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(data: Any) -> Any:
+        """Decodifica JSON desde str o bytes (ValueError si está mal formado)."""
+        return orjson.loads(data)
+else:
+    def dumps_bytes(value: Any) -> bytes:
+        """Serializa en JSON compacto (UTF-8 sin escapar)."""
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(data: Any) -> Any:
+        """Decodifica JSON desde str o bytes (ValueError si está mal formado)."""
+        return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """Serializa en JSON compacto como str."""
+    return dumps_bytes(value).decode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de la aplicación (app.json): lo usan jsonify, las vistas
+    que devuelven dict y request.get_json.
+
+    La salida es compacta y conserva el orden de las claves y los caracteres
+    no ASCII. Con compact=False (o None en modo debug) se sangra con la
+    biblioteca estándar, solo pensado para desarrollo.
+    """
+
+    ensure_ascii = False
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Como jsonify: crea la Response sin pasar por str si la salida es compacta."""
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
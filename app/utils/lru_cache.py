@@ -0,0 +1,121 @@
+"""
+Caché LRU acotada por número de entradas y por bytes.
+Este módulo guarda respuestas ya serializadas para servir las lecturas
+repetidas sin consultar la base de datos ni volver a serializar.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Caché LRU segura entre hilos (valores bytes, o cualquier objeto con su
+    tamaño indicado en put).
+
+    Se expulsa la entrada usada hace más tiempo cuando se supera max_entries o
+    max_bytes. Las entradas caducan a los ttl segundos, lo que acota cuánto
+    puede servir un proceso un valor que otro proceso modificó o borró.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl: float = 300):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries: Número máximo de entradas
+            max_bytes: Tamaño máximo total de los valores guardados
+            ttl: Segundos de validez de cada entrada (0 = sin caducidad)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Devuelve el valor guardado (y lo marca como usado) o None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """
+        Guarda un valor; los mayores que max_bytes no se guardan.
+
+        Args:
+            key: Clave
+            value: Valor a guardar
+            size: Bytes que ocupa el valor (por defecto len(value))
+        """
+        if size is None:
+            size = len(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Elimina una entrada (llamar en cada borrado o actualización del valor).
+
+        Returns:
+            bool: True si la entrada estaba guardada
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            self._invalidations += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        """Elimina una entrada (llamar con _lock)."""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la caché."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else None,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations
+            }
@@ -0,0 +1,75 @@
+"""
+Utilidades para flujos NDJSON (JSON delimitado por saltos de línea).
+Este módulo permite leer cuerpos de petición línea a línea sin cargarlos en memoria.
+"""
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional
+
+from app.utils import json_provider
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+class NDJSONLine:
+    """Línea de un flujo NDJSON ya decodificada (o con su error de lectura)."""
+
+    __slots__ = ('line_number', 'data', 'error')
+
+    def __init__(self, line_number: int, data: Any = None, error: Optional[str] = None):
+        self.line_number = line_number
+        self.data = data
+        self.error = error
+
+
+def iter_ndjson_lines(stream, max_line_bytes: int) -> Iterator[NDJSONLine]:
+    """
+    Lee un flujo binario línea a línea y decodifica cada línea como JSON.
+
+    Nunca mantiene en memoria más de una línea (acotada a max_line_bytes);
+    las líneas vacías se ignoran y las que superan el límite se descartan
+    leyendo el resto en fragmentos.
+
+    Args:
+        stream: Flujo binario con soporte de readline (p. ej. request.stream)
+        max_line_bytes: Tamaño máximo permitido por línea
+
+    Yields:
+        NDJSONLine: Una entrada por línea no vacía
+    """
+    line_number = 0
+    while True:
+        raw_line = stream.readline(max_line_bytes + 1)
+        if not raw_line:
+            return
+        line_number += 1
+
+        if len(raw_line) > max_line_bytes and not raw_line.endswith(b'\n'):
+            # Descartar el resto de la línea sin acumularla
+            while raw_line and not raw_line.endswith(b'\n'):
+                raw_line = stream.readline(max_line_bytes)
+            yield NDJSONLine(line_number, error=f"La línea supera el máximo de {max_line_bytes} bytes")
+            continue
+
+        raw_line = raw_line.strip()
+        if not raw_line:
+            continue
+
+        try:
+            yield NDJSONLine(line_number, data=json_provider.loads(raw_line))
+        except (ValueError, UnicodeDecodeError):
+            yield NDJSONLine(line_number, error="JSON malformado")
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Agrupa un iterable en listas de como máximo size elementos."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def dumps_line(data: Any) -> str:
+    """Serializa un objeto como una línea NDJSON."""
+    return json_provider.dumps(data) + '\n'
@@ -0,0 +1,484 @@
+"""
+Expresiones regulares de tiempo lineal para la búsqueda por regex.
+Este módulo compila un subconjunto de la sintaxis de re (literales, ., clases,
+\\d \\w \\s, anclas ^ $ \\b, grupos, alternativas y cuantificadores) a un
+autómata que se simula en paralelo (máquina de Pike): el tiempo es
+O(longitud del patrón × longitud del texto) para cualquier patrón, sin
+retroceso catastrófico. Si el patrón no tiene anclas, los conjuntos de estados
+ya visitados se guardan como un autómata determinista construido bajo demanda
+(como RE2), con una transición por carácter del texto. No admite referencias hacia atrás ni aserciones
+lookahead/lookbehind, que no son regulares.
+
+También extrae del patrón los literales que toda coincidencia debe contener,
+con los que se filtran los candidatos en el índice de trigramas antes de
+ejecutar el autómata.
+"""
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from app.utils.exceptions import ValidationError
+
+MAX_PATTERN_LENGTH = 500
+MAX_REPEAT = 100
+MAX_PROGRAM_SIZE = 5000
+# Transiciones del autómata determinista que se guardan como máximo por patrón
+MAX_DFA_TRANSITIONS = 10000
+# Longitud mínima de un literal para poder buscarlo en el índice de trigramas
+MIN_LITERAL_LENGTH = 3
+
+# Nodos del árbol sintáctico
+_LITERAL, _ANY, _CLASS, _CONCAT, _ALTERNATE, _REPEAT, _ASSERT = range(7)
+# Instrucciones del programa
+_CHAR, _ANYCHAR, _SET, _SPLIT, _JUMP, _CHECK, _MATCH = range(7)
+
+_CATEGORIES = {
+    'd': str.isdigit,
+    'w': lambda char: char.isalnum() or char == '_',
+    's': str.isspace,
+}
+
+# Requisito de literales: None = ninguno; ('lit', s), ('and', [...]), ('or', [...])
+Requirement = Optional[Tuple[str, Union[str, list]]]
+
+
+def _invalid(message: str, position: Optional[int] = None) -> ValidationError:
+    details = {'position': position} if position is not None else None
+    return ValidationError(message, details, code='INVALID_REGEX')
+
+
+class _CharClass:
+    """Clase de caracteres: rangos, categorías (\\d, \\w, \\s) y negación."""
+
+    __slots__ = ('negated', 'ranges', 'categories')
+
+    def __init__(self, negated: bool = False):
+        self.negated = negated
+        self.ranges: List[Tuple[str, str]] = []
+        self.categories: List[Tuple[Callable[[str], bool], bool]] = []
+
+    def matches(self, char: str, ignore_case: bool) -> bool:
+        candidates = (char, char.lower(), char.upper()) if ignore_case else (char,)
+        found = any(
+            low <= candidate <= high for candidate in candidates for low, high in self.ranges
+        ) or any(test(char) != negated for test, negated in self.categories)
+        return found != self.negated
+
+
+class _Parser:
+    """Analizador descendente recursivo del patrón."""
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.position = 0
+
+    def parse(self):
+        node = self._alternation()
+        if self.position < len(self.pattern):
+            raise _invalid("Paréntesis de cierre sin apertura", self.position)
+        return node
+
+    def _peek(self) -> Optional[str]:
+        return self.pattern[self.position] if self.position < len(self.pattern) else None
+
+    def _next(self) -> str:
+        char = self.pattern[self.position]
+        self.position += 1
+        return char
+
+    def _alternation(self):
+        branches = [self._concatenation()]
+        while self._peek() == '|':
+            self._next()
+            branches.append(self._concatenation())
+        return branches[0] if len(branches) == 1 else (_ALTERNATE, branches)
+
+    def _concatenation(self):
+        items = []
+        while self._peek() not in (None, '|', ')'):
+            items.append(self._quantified())
+        return (_CONCAT, items)
+
+    def _quantified(self):
+        start = self.position
+        node = self._atom()
+        char = self._peek()
+        if char in ('*', '+', '?'):
+            self._next()
+            minimum, maximum = {'*': (0, None), '+': (1, None), '?': (0, 1)}[char]
+        elif char == '{' and self._is_counted_repeat():
+            minimum, maximum = self._counted_repeat()
+        else:
+            return node
+        if node[0] == _ASSERT:
+            raise _invalid("No se puede repetir una ancla", start)
+        # Los cuantificadores perezosos coinciden en las mismas filas
+        if self._peek() == '?':
+            self._next()
+        if self._peek() in ('*', '+', '?'):
+            raise _invalid("Cuantificador repetido", self.position)
+        return (_REPEAT, node, minimum, maximum)
+
+    def _is_counted_repeat(self) -> bool:
+        end = self.pattern.find('}', self.position)
+        body = self.pattern[self.position + 1:end] if end != -1 else ''
+        parts = body.split(',')
+        return end != -1 and len(parts) <= 2 and parts[0].isdigit() and all(p.isdigit() or p == '' for p in parts)
+
+    def _counted_repeat(self) -> Tuple[int, Optional[int]]:
+        start = self.position
+        end = self.pattern.index('}', self.position)
+        parts = self.pattern[self.position + 1:end].split(',')
+        self.position = end + 1
+        minimum = int(parts[0])
+        maximum = minimum if len(parts) == 1 else (int(parts[1]) if parts[1] else None)
+        if (maximum if maximum is not None else minimum) > MAX_REPEAT:
+            raise _invalid(f"Las repeticiones no pueden superar {MAX_REPEAT}", start)
+        if maximum is not None and maximum < minimum:
+            raise _invalid("Rango de repetición inválido", start)
+        return minimum, maximum
+
+    def _atom(self):
+        start = self.position
+        char = self._next()
+        if char == '(':
+            if self.pattern.startswith('?:', self.position):
+                self.position += 2
+            elif self._peek() == '?':
+                raise _invalid("Grupo no soportado (lookaround, flags o nombre)", start)
+            node = self._alternation()
+            if self._peek() != ')':
+                raise _invalid("Falta el paréntesis de cierre", start)
+            self._next()
+            return node
+        if char == '[':
+            return (_CLASS, self._char_class(start))
+        if char == '.':
+            return (_ANY,)
+        if char == '^':
+            return (_ASSERT, 'start')
+        if char == '$':
+            return (_ASSERT, 'end')
+        if char == '\\':
+            return self._escape(start)
+        if char in ('*', '+', '?') or (char == '{' and self._is_counted_repeat_at(start)):
+            raise _invalid("Cuantificador sin nada que repetir", start)
+        return (_LITERAL, char)
+
+    def _is_counted_repeat_at(self, position: int) -> bool:
+        saved, self.position = self.position, position
+        try:
+            return self._is_counted_repeat()
+        finally:
+            self.position = saved
+
+    def _escape(self, start: int):
+        if self._peek() is None:
+            raise _invalid("Barra invertida al final del patrón", start)
+        char = self._next()
+        if char.lower() in _CATEGORIES:
+            char_class = _CharClass()
+            char_class.categories.append((_CATEGORIES[char.lower()], char.isupper()))
+            return (_CLASS, char_class)
+        if char in ('b', 'B'):
+            return (_ASSERT, 'boundary' if char == 'b' else 'not_boundary')
+        if char.isalnum():
+            special = {'n': '\n', 't': '\t', 'r': '\r'}
+            if char in special:
+                return (_LITERAL, special[char])
+            raise _invalid(f"Secuencia de escape no soportada: \\{char}", start)
+        return (_LITERAL, char)
+
+    def _char_class(self, start: int) -> _CharClass:
+        char_class = _CharClass(negated=self._peek() == '^')
+        if char_class.negated:
+            self._next()
+        first = True
+        while True:
+            char = self._peek()
+            if char is None:
+                raise _invalid("Falta el corchete de cierre", start)
+            if char == ']' and not first:
+                self._next()
+                return char_class
+            first = False
+            low = self._class_char(char_class)
+            if low is None:
+                continue
+            if self._peek() == '-' and self.pattern[self.position + 1:self.position + 2] not in ('', ']'):
+                self._next()
+                high = self._class_char(char_class)
+                if high is None or high < low:
+                    raise _invalid("Rango de caracteres inválido", start)
+                char_class.ranges.append((low, high))
+            else:
+                char_class.ranges.append((low, low))
+
+    def _class_char(self, char_class: _CharClass) -> Optional[str]:
+        """Lee un carácter de una clase; las categorías se añaden y devuelven None."""
+        char = self._next()
+        if char != '\\':
+            return char
+        if self._peek() is None:
+            raise _invalid("Barra invertida al final del patrón", self.position)
+        char = self._next()
+        if char.lower() in _CATEGORIES:
+            char_class.categories.append((_CATEGORIES[char.lower()], char.isupper()))
+            return None
+        return {'n': '\n', 't': '\t', 'r': '\r'}.get(char, char)
+
+
+class _Compiler:
+    """Traduce el árbol a instrucciones de la máquina de Pike."""
+
+    def __init__(self):
+        self.program: list = []
+
+    def emit(self, *instruction) -> int:
+        if len(self.program) >= MAX_PROGRAM_SIZE:
+            raise _invalid("El patrón es demasiado complejo")
+        self.program.append(list(instruction))
+        return len(self.program) - 1
+
+    def compile(self, node) -> list:
+        self._node(node)
+        self.emit(_MATCH)
+        return self.program
+
+    def _node(self, node) -> None:
+        kind = node[0]
+        if kind == _LITERAL:
+            self.emit(_CHAR, node[1])
+        elif kind == _ANY:
+            self.emit(_ANYCHAR)
+        elif kind == _CLASS:
+            self.emit(_SET, node[1])
+        elif kind == _ASSERT:
+            self.emit(_CHECK, node[1])
+        elif kind == _CONCAT:
+            for item in node[1]:
+                self._node(item)
+        elif kind == _ALTERNATE:
+            jumps = []
+            for branch in node[1][:-1]:
+                split = self.emit(_SPLIT, None, None)
+                self.program[split][1] = len(self.program)
+                self._node(branch)
+                jumps.append(self.emit(_JUMP, None))
+                self.program[split][2] = len(self.program)
+            self._node(node[1][-1])
+            for jump in jumps:
+                self.program[jump][1] = len(self.program)
+        else:
+            self._repeat(node[1], node[2], node[3])
+
+    def _repeat(self, child, minimum: int, maximum: Optional[int]) -> None:
+        for _ in range(minimum):
+            self._node(child)
+        if maximum is None:
+            # L1: split L2, L3; L2: child; jmp L1; L3:
+            split = self.emit(_SPLIT, None, None)
+            self.program[split][1] = len(self.program)
+            self._node(child)
+            self.emit(_JUMP, split)
+            self.program[split][2] = len(self.program)
+            return
+        splits = []
+        for _ in range(maximum - minimum):
+            split = self.emit(_SPLIT, None, None)
+            self.program[split][1] = len(self.program)
+            splits.append(split)
+            self._node(child)
+        for split in splits:
+            self.program[split][2] = len(self.program)
+
+
+def _is_word(text: str, index: int) -> bool:
+    return 0 <= index < len(text) and (text[index].isalnum() or text[index] == '_')
+
+
+class SafeRegex:
+    """
+    Patrón compilado. search() indica si hay alguna coincidencia en el texto
+    (búsqueda no anclada, como re.search).
+    """
+
+    def __init__(self, pattern: str, ignore_case: bool = False):
+        """
+        Compila el patrón.
+
+        Args:
+            pattern: Expresión regular (subconjunto de re, sin referencias ni lookaround)
+            ignore_case: Si es True, ignora mayúsculas y minúsculas
+
+        Raises:
+            ValidationError: Con código INVALID_REGEX si el patrón es inválido,
+                no está soportado o es demasiado complejo
+        """
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            raise _invalid(f"El patrón no puede superar {MAX_PATTERN_LENGTH} caracteres")
+        self.pattern = pattern
+        self.ignore_case = ignore_case
+        tree = _Parser(pattern).parse()
+        self.program = _Compiler().compile(tree)
+        if ignore_case:
+            for instruction in self.program:
+                if instruction[0] == _CHAR:
+                    instruction[1] = instruction[1].lower()
+        self.requirement = _requirement(tree)
+        # Las anclas dependen del contexto de cada posición: solo la máquina de Pike
+        self._deterministic = not any(instruction[0] == _CHECK for instruction in self.program)
+        self._states: Dict[frozenset, int] = {}
+        self._state_threads: List[Tuple[int, ...]] = []
+        self._state_matches: List[bool] = []
+        self._transitions: Dict[Tuple[int, str], int] = {}
+
+    def search(self, text: str) -> bool:
+        """True si el patrón coincide en alguna posición del texto."""
+        if self._deterministic:
+            return self._search_deterministic(text)
+        program = self.program
+        # marks[pc] = última posición en la que pc ya está en la lista de hilos
+        marks = [-1] * len(program)
+        current: List[int] = []
+        for position in range(len(text) + 1):
+            # Un hilo nuevo en cada posición: búsqueda no anclada
+            if self._add(current, 0, position, text, marks):
+                return True
+            if position == len(text):
+                return False
+            char = text[position]
+            following: List[int] = []
+            for pc in current:
+                if self._step(program[pc], char) and self._add(following, pc + 1, position + 1, text, marks):
+                    return True
+            current = following
+        return False
+
+    def _step(self, instruction: list, char: str) -> bool:
+        """True si la instrucción (CHAR, ANYCHAR o SET) acepta char."""
+        opcode = instruction[0]
+        if opcode == _CHAR:
+            # Carácter a carácter: lower() puede cambiar la longitud del texto ("İ")
+            return (char.lower() if self.ignore_case else char) == instruction[1]
+        if opcode == _ANYCHAR:
+            return char != '\n'
+        return instruction[1].matches(char, self.ignore_case)
+
+    def _search_deterministic(self, text: str) -> bool:
+        """search() con las transiciones ya calculadas guardadas por (estado, carácter)."""
+        transitions = self._transitions
+        matches = self._state_matches
+        state = self._state(())
+        if matches[state]:
+            return True
+        for char in text:
+            following = transitions.get((state, char))
+            if following is None:
+                following = self._transition(state, char)
+            if matches[following]:
+                return True
+            state = following
+        return False
+
+    def _transition(self, state: int, char: str) -> int:
+        """Calcula el estado siguiente a state con char y guarda la transición."""
+        program = self.program
+        targets = tuple(pc + 1 for pc in self._state_threads[state] if self._step(program[pc], char))
+        if len(self._transitions) >= MAX_DFA_TRANSITIONS:
+            # Memoria acotada: se empieza de nuevo (el estado se recalcula abajo)
+            self._states.clear()
+            self._state_threads.clear()
+            self._state_matches.clear()
+            self._transitions.clear()
+            following = self._state(targets)
+        else:
+            following = self._state(targets)
+            self._transitions[(state, char)] = following
+        return following
+
+    def _state(self, targets: Tuple[int, ...]) -> int:
+        """Número del estado formado por targets más un hilo nuevo (búsqueda no anclada)."""
+        marks = [-1] * len(self.program)
+        threads: List[int] = []
+        matched = False
+        for pc in targets + (0,):
+            matched = self._add(threads, pc, 0, '', marks) or matched
+        key = frozenset(threads) if not matched else frozenset((-1,))
+        state = self._states.get(key)
+        if state is None:
+            state = len(self._state_threads)
+            self._states[key] = state
+            self._state_threads.append(tuple(sorted(key)) if not matched else ())
+            self._state_matches.append(matched)
+        return state
+
+    def _add(self, threads: List[int], pc: int, position: int, text: str, marks: List[int]) -> bool:
+        """Añade el hilo pc en position y sus transiciones vacías; True si alcanza MATCH."""
+        stack = [pc]
+        program = self.program
+        while stack:
+            pc = stack.pop()
+            if marks[pc] == position:
+                continue
+            marks[pc] = position
+            instruction = program[pc]
+            opcode = instruction[0]
+            if opcode == _MATCH:
+                return True
+            if opcode == _JUMP:
+                stack.append(instruction[1])
+            elif opcode == _SPLIT:
+                stack.append(instruction[2])
+                stack.append(instruction[1])
+            elif opcode == _CHECK:
+                if _check(instruction[1], text, position):
+                    stack.append(pc + 1)
+            else:
+                threads.append(pc)
+        return False
+
+
+def _check(kind: str, text: str, position: int) -> bool:
+    if kind == 'start':
+        return position == 0
+    if kind == 'end':
+        # Como en re: final del texto o justo antes de un salto de línea final
+        return position == len(text) or (position == len(text) - 1 and text[position] == '\n')
+    boundary = _is_word(text, position - 1) != _is_word(text, position)
+    return boundary if kind == 'boundary' else not boundary
+
+
+def _requirement(node) -> Requirement:
+    """Literales que toda coincidencia de node debe contener (None = ninguno)."""
+    kind = node[0]
+    if kind == _CONCAT:
+        parts = []
+        run = ''
+        for item in node[1]:
+            if item[0] == _LITERAL:
+                run += item[1]
+                continue
+            if len(run) >= MIN_LITERAL_LENGTH:
+                parts.append(('lit', run))
+            run = ''
+            requirement = _requirement(item)
+            if requirement is not None:
+                parts.append(requirement)
+        if len(run) >= MIN_LITERAL_LENGTH:
+            parts.append(('lit', run))
+        return _combine('and', parts)
+    if kind == _ALTERNATE:
+        branches = [_requirement(branch) for branch in node[1]]
+        if any(branch is None for branch in branches):
+            return None
+        return _combine('or', branches)
+    if kind == _REPEAT:
+        return _requirement(node[1]) if node[2] >= 1 else None
+    return None
+
+
+def _combine(operator: str, parts: list) -> Requirement:
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return (operator, parts)
@@ -0,0 +1,169 @@
+"""
+Agregados estadísticos incrementales y combinables.
+Este módulo define los momentos acumulados (media y varianza de Welford) y un
+sketch de cuantiles con error relativo acotado (DDSketch). Ambos se actualizan
+valor a valor, admiten retirar valores y se pueden combinar entre sí, de modo
+que las estadísticas de una sesión nunca requieren recorrer sus mensajes.
+"""
+import math
+from typing import Any, Dict, Optional
+
+
+class RunningMoments:
+    """Número de valores, media y suma de cuadrados de las desviaciones (Welford)."""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float) -> None:
+        """Retira un valor añadido previamente (inverso exacto de add)."""
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        previous_mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(self.m2 - (value - previous_mean) * (value - self.mean), 0.0)
+        self.mean = previous_mean
+        self.count -= 1
+
+    def merge(self, other: 'RunningMoments') -> None:
+        """Combina otro agregado en este (fórmula de Chan)."""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'RunningMoments':
+        if not data:
+            return cls()
+        return cls(data['count'], data['mean'], data['m2'])
+
+
+class QuantileSketch:
+    """
+    Sketch de cuantiles DDSketch para valores no negativos.
+
+    Cada valor positivo cae en el cubo ceil(log_gamma(valor)), con
+    gamma = (1 + precisión) / (1 - precisión): cualquier cuantil se estima con
+    un error relativo máximo igual a la precisión. Los cubos son contadores,
+    así que el sketch admite retirar valores y combinarse con otro sumando cubos.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 1024):
+        """
+        Args:
+            relative_accuracy: Error relativo máximo de los cuantiles
+            max_bins: Número máximo de cubos; al superarlo se juntan los más bajos
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("QuantileSketch solo admite valores no negativos")
+        self.count += count
+        if value == 0:
+            self.zero_count += count
+            return
+        index = self._index(value)
+        self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse_lowest()
+
+    def remove(self, value: float) -> None:
+        """Retira un valor añadido previamente (si su cubo ya está vacío no hace nada)."""
+        if value == 0:
+            if self.zero_count:
+                self.zero_count -= 1
+                self.count -= 1
+            return
+        index = self._index(value)
+        if self.bins and index < min(self.bins):
+            # Su cubo se juntó con el más bajo al superar max_bins
+            index = min(self.bins)
+        if self.bins.get(index):
+            self.bins[index] -= 1
+            self.count -= 1
+            if not self.bins[index]:
+                del self.bins[index]
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Combina otro sketch con la misma precisión."""
+        if other.gamma != self.gamma:
+            raise ValueError("Solo se pueden combinar sketches con la misma precisión")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        while len(self.bins) > self.max_bins:
+            self._collapse_lowest()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estima el cuantil q (0 <= q <= 1).
+
+        Returns:
+            Optional[float]: El valor estimado, o None si el sketch está vacío
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def _collapse_lowest(self) -> None:
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'bins': sorted(self.bins.items())
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], relative_accuracy: float = 0.01) -> 'QuantileSketch':
+        if not data:
+            return cls(relative_accuracy)
+        sketch = cls(data['relative_accuracy'])
+        sketch.zero_count = data['zero_count']
+        sketch.bins = {int(index): count for index, count in data['bins']}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
@@ -0,0 +1,127 @@
+"""
+Normalización de texto para el filtro de contenido.
+Este módulo pliega mayúsculas, acentos, leetspeak y separadores para que
+variantes como "m4lw4re", "vírus" o "s p a m" coincidan con su término.
+"""
+import re
+import unicodedata
+from typing import FrozenSet, List
+
+# Sustituciones leetspeak (un carácter por carácter para conservar posiciones)
+LEET_MAP = {
+    '4': 'a', '@': 'a',
+    '8': 'b',
+    '3': 'e', '€': 'e',
+    '6': 'g', '9': 'g',
+    '1': 'i', '!': 'i', '|': 'i',
+    '0': 'o',
+    '5': 's', '$': 's',
+    '7': 't', '+': 't',
+    '2': 'z',
+}
+
+# Caracteres que se eliminan: espacios y signos usados para separar letras
+SEPARATORS = frozenset(' \t\r\n\f\v.,;:-_*·~\'"`^/\\')
+
+# Marcas diacríticas combinantes (acentos tras la descomposición NFKD)
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]+')
+
+_TRANSLATION = str.maketrans({
+    **LEET_MAP,
+    **{separator: None for separator in SEPARATORS},
+})
+
+
+def _normalize_unicode(text: str) -> str:
+    """Normalización completa: casefold, NFKD sin acentos y translate."""
+    folded = text.casefold()
+    if not folded.isascii():
+        folded = _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', folded))
+    return folded.translate(_TRANSLATION)
+
+
+def _build_latin1_tables():
+    """
+    Precalcula _normalize_unicode para los 256 caracteres Latin-1 como tabla de
+    bytes.translate. Los caracteres que se expanden a varios (p. ej. 'ß' → 'ss')
+    no caben en la tabla y obligan a usar la normalización completa.
+    """
+    table = bytearray(range(256))
+    deleted = bytearray()
+    expanding = []
+    for code in range(256):
+        normalized = _normalize_unicode(chr(code))
+        if not normalized:
+            deleted.append(code)
+        elif len(normalized) == 1 and ord(normalized) < 256:
+            table[code] = ord(normalized)
+        else:
+            expanding.append(chr(code))
+    return bytes(table), bytes(deleted), tuple(expanding)
+
+
+_LATIN1_TABLE, _LATIN1_DELETED, _LATIN1_EXPANDING = _build_latin1_tables()
+
+
+class TextNormalizer:
+    """
+    Normalizador de texto: casefold, descomposición NFKD sin acentos,
+    leetspeak y eliminación de separadores.
+
+    normalize se ejecuta íntegramente con operaciones implementadas en C: el
+    texto Latin-1 (el caso habitual en español) se resuelve con un único
+    bytes.translate precalculado, y el resto con casefold, NFKD y translate.
+    origin_map, que recorre el texto carácter a carácter, solo se calcula
+    cuando hay coincidencias.
+    """
+
+    def normalize(self, text: str) -> str:
+        """Devuelve el texto normalizado."""
+        for char in _LATIN1_EXPANDING:
+            if char in text:
+                return _normalize_unicode(text)
+        try:
+            encoded = text.encode('latin-1')
+        except UnicodeEncodeError:
+            return _normalize_unicode(text)
+        return encoded.translate(_LATIN1_TABLE, _LATIN1_DELETED).decode('latin-1')
+
+    def normalize_term(self, term: str) -> str:
+        """Normaliza un término de la lista igual que el contenido."""
+        return self.normalize(term)
+
+    def term_gaps(self, term: str) -> FrozenSet[int]:
+        """
+        Posiciones del término normalizado precedidas por un separador en el
+        término original (p. ej. {4} para "anti spam" → "antispam").
+        """
+        gaps = set()
+        length = 0
+        pending_gap = False
+        for char in term:
+            piece = self.normalize(char)
+            if not piece:
+                pending_gap = pending_gap or char in SEPARATORS
+                continue
+            if pending_gap and length:
+                gaps.add(length)
+            pending_gap = False
+            length += len(piece)
+        return frozenset(gaps)
+
+    def origin_map(self, text: str) -> List[int]:
+        """
+        Índice en el texto original de cada carácter del texto normalizado.
+
+        Returns:
+            List[int]: Lista de la misma longitud que normalize(text)
+        """
+        origins = []
+        for index, char in enumerate(text):
+            origins.extend([index] * len(self.normalize(char)))
+        return origins
+
+    def has_separator_gap(self, text: str, origins: List[int], position: int) -> bool:
+        """Indica si entre el carácter normalizado position-1 y position había un separador."""
+        previous, current = origins[position - 1], origins[position]
+        return any(char in SEPARATORS for char in text[previous + 1:current])
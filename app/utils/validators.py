@@ -3,8 +3,13 @@ Validadores para la aplicación.
 Este módulo contiene funciones de validación para mensajes y otros datos.
 """
 import re
-from typing import Dict, List, Any
-from .exceptions import ValidationError, InvalidFormatError, InappropriateContentError
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+from .content_matcher import AhoCorasickMatcher, ContentMatch
+from .text_normalizer import TextNormalizer
+from .exceptions import ValidationError, InvalidFieldsError, InvalidFormatError, InappropriateContentError
+from app.models.message import MESSAGE_FIELDS
+from app.models.message_search import SNIPPET_MARKERS
 from datetime import datetime
 
 class MessageValidator:
@@ -92,6 +97,10 @@ class MessageValidator:
         
         if len(content) > 5000:
             raise InvalidFormatError("content no puede exceder 5000 caracteres")
+        
+        # Reservados para delimitar las coincidencias en los fragmentos de búsqueda
+        if any(marker in content for marker in SNIPPET_MARKERS):
+            raise InvalidFormatError("content no puede contener los caracteres U+FDD0 ni U+FDD1")
     
     @staticmethod
     def validate_sender(sender: str) -> None:
@@ -109,7 +118,76 @@ class MessageValidator:
             )
 
 class ContentFilter:
-    """Filtro de contenido para mensajes."""
+    """
+    Filtro de contenido para mensajes.
+    
+    La lista de palabras se compila una sola vez en un autómata de
+    Aho–Corasick, de modo que cada mensaje se analiza en una pasada sin
+    importar cuántas palabras haya en la lista.
+    """
+    
+    MODE_REJECT = 'reject'
+    MODE_MASK = 'mask'
+    
+    def __init__(self, inappropriate_words: List[str], word_boundary: bool = False, mode: str = MODE_REJECT,
+                 normalize: bool = False):
+        """
+        Compila el filtro.
+        
+        Args:
+            inappropriate_words: Lista de palabras inapropiadas
+            word_boundary: Si es True solo se detectan palabras completas
+            mode: 'reject' lanza InappropriateContentError; 'mask' reemplaza
+                las apariciones por asteriscos
+            normalize: Si es True también se detectan variantes con acentos,
+                leetspeak o letras separadas ("vírus", "m4lw4re", "s p a m")
+        """
+        if mode not in (self.MODE_REJECT, self.MODE_MASK):
+            raise ValueError(f"Modo de filtro de contenido no soportado: {mode}")
+        
+        self.inappropriate_words = list(inappropriate_words)
+        self.mode = mode
+        self.normalize = normalize
+        self.matcher = AhoCorasickMatcher(
+            self.inappropriate_words,
+            word_boundary=word_boundary,
+            normalizer=TextNormalizer() if normalize else None
+        )
+    
+    def find_matches(self, content: str) -> List[ContentMatch]:
+        """Devuelve las apariciones de palabras inapropiadas con sus posiciones."""
+        return self.matcher.find_all(content)
+    
+    def apply(self, content: str) -> str:
+        """
+        Aplica el filtro a un contenido.
+        
+        Args:
+            content: Contenido a verificar
+            
+        Returns:
+            str: El contenido sin cambios, o enmascarado en modo 'mask'
+            
+        Raises:
+            InappropriateContentError: Si se encuentra contenido inapropiado en modo 'reject'
+        """
+        matches = self.find_matches(content)
+        if not matches:
+            return content
+        
+        if self.mode == self.MODE_MASK:
+            return self.matcher.mask(content, matches)
+        
+        raise InappropriateContentError(
+            "El mensaje contiene contenido inapropiado",
+            details={
+                "inappropriate_words_found": ContentFilter._found_words(self.matcher, matches),
+                "matches": [
+                    {"word": match.term, "start": match.start, "end": match.end}
+                    for match in matches
+                ]
+            }
+        )
     
     @staticmethod
     def check_inappropriate_content(content: str, inappropriate_words: List[str]) -> None:
@@ -118,23 +196,24 @@ class ContentFilter:
         
         Args:
             content: Contenido a verificar
-            inappropriate_words: Lista de palabras inapropiadas
+            inappropriate_words: Lista de palabras inapropiadas (el autómata
+                compilado se reutiliza entre llamadas con la misma lista)
             
         Raises:
             InappropriateContentError: Si se encuentra contenido inapropiado
         """
-        content_lower = content.lower()
-        found_words = []
-        
-        for word in inappropriate_words:
-            if word.lower() in content_lower:
-                found_words.append(word)
-        
-        if found_words:
-            raise InappropriateContentError(
-                "El mensaje contiene contenido inapropiado",
-                details={"inappropriate_words_found": found_words}
-            )
+        ContentFilter._compiled(tuple(inappropriate_words)).apply(content)
+    
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _compiled(inappropriate_words: Tuple[str, ...]) -> 'ContentFilter':
+        return ContentFilter(list(inappropriate_words))
+    
+    @staticmethod
+    def _found_words(matcher: AhoCorasickMatcher, matches: List[ContentMatch]) -> List[str]:
+        """Palabras encontradas, sin repetir y en el orden de la lista configurada."""
+        found = {match.term for match in matches}
+        return [term for term in matcher.terms if term in found]
 
 class PaginationValidator:
     """Validador para parámetros de paginación."""
@@ -157,4 +236,48 @@ class PaginationValidator:
         if offset < 0:
             offset = 0
         
-        return limit, offset
\ No newline at end of file
+        return limit, offset
+
+
+class FieldsValidator:
+    """Validador del parámetro fields (proyección de campos de los mensajes)."""
+    
+    @staticmethod
+    def validate_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        Valida y normaliza una lista de campos separada por comas.
+        
+        'metadata' equivale a todos sus subcampos; también se admiten sueltos
+        ('metadata.word_count'). El resultado sigue el orden de la respuesta
+        completa, sin repetidos.
+        
+        Args:
+            fields: Valor del parámetro (None o vacío = todos los campos)
+            
+        Returns:
+            Optional[Tuple[str, ...]]: Rutas de MESSAGE_FIELDS, o None para todos
+            
+        Raises:
+            InvalidFieldsError: Si algún campo no existe
+        """
+        if fields is None or not fields.strip():
+            return None
+        
+        requested = set()
+        unknown = []
+        for field in (part.strip() for part in fields.split(',')):
+            if not field:
+                continue
+            if field == 'metadata':
+                requested.update(path for path in MESSAGE_FIELDS if path.startswith('metadata.'))
+            elif field in MESSAGE_FIELDS:
+                requested.add(field)
+            else:
+                unknown.append(field)
+        
+        if unknown:
+            raise InvalidFieldsError(
+                f"Campos desconocidos: {', '.join(unknown)}",
+                details={'invalid_fields': unknown, 'allowed_fields': list(MESSAGE_FIELDS) + ['metadata']}
+            )
+        return tuple(path for path in MESSAGE_FIELDS if path in requested)
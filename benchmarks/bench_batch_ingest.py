@@ -0,0 +1,92 @@
+"""
+Benchmark de ingesta: POST /api/messages (uno a uno) frente a POST /api/messages/batch.
+
+Usa una base de datos SQLite en archivo temporal para que cada commit pague su
+fsync real, igual que en producción.
+
+Uso:
+    python benchmarks/bench_batch_ingest.py --messages 2000 --batch-size 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+
+HEADERS = {'Authorization': 'Bearer bench-key'}
+
+
+def build_messages(prefix, count):
+    """Genera mensajes válidos con IDs únicos."""
+    return [
+        {
+            'message_id': f'{prefix}-{i}',
+            'session_id': f'bench-session-{i % 50}',
+            'content': f'Mensaje de benchmark número {i} con algo de texto',
+            'timestamp': '2023-06-15T14:30:00Z',
+            'sender': 'user' if i % 2 == 0 else 'system',
+        }
+        for i in range(count)
+    ]
+
+
+def bench_single(client, messages):
+    """Envía cada mensaje en su propia petición."""
+    start = time.perf_counter()
+    for message in messages:
+        response = client.post('/api/messages', data=json.dumps(message),
+                               content_type='application/json', headers=HEADERS)
+        assert response.status_code == 201, response.data
+    return time.perf_counter() - start
+
+
+def bench_batch(client, messages, batch_size):
+    """Envía los mensajes en lotes de batch_size."""
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        chunk = messages[i:i + batch_size]
+        response = client.post('/api/messages/batch', data=json.dumps(chunk),
+                               content_type='application/json', headers=HEADERS)
+        assert response.status_code == 201, response.data
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    app.config['BATCH_MAX_SIZE'] = max(args.batch_size, app.config['BATCH_MAX_SIZE'])
+
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+
+        single_time = bench_single(client, build_messages('single', args.messages))
+        batch_time = bench_batch(client, build_messages('batch', args.messages), args.batch_size)
+
+        assert Message.query.count() == 2 * args.messages
+
+    single_rate = args.messages / single_time
+    batch_rate = args.messages / batch_time
+    print(f"Mensajes: {args.messages}  |  tamaño de lote: {args.batch_size}")
+    print(f"POST /api/messages        {single_rate:10.0f} msg/s  ({single_time:.2f}s)")
+    print(f"POST /api/messages/batch  {batch_rate:10.0f} msg/s  ({batch_time:.2f}s)")
+    print(f"Mejora: x{batch_rate / single_rate:.1f}")
+
+
+if __name__ == '__main__':
+    main()
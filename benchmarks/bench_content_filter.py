@@ -0,0 +1,84 @@
+"""
+Microbenchmark del filtro de contenido: búsqueda lineal de cada palabra frente
+al autómata de Aho–Corasick, con listas de 5 a 100k términos, y coste de la
+normalización (acentos, leetspeak, separadores) frente al análisis sin ella.
+
+Para cada tamaño se mide el tiempo de compilación y el tiempo medio por
+mensaje (contenido limpio de ~500 caracteres, el caso habitual). La columna
+"norm/raw" debe quedar por debajo de x2.
+
+Uso:
+    python benchmarks/bench_content_filter.py --messages 200
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.validators import ContentFilter  # noqa: E402
+
+SIZES = [5, 100, 1000, 10000, 100000]
+
+
+def build_terms(count, rng):
+    """Genera términos aleatorios de 5 a 12 letras (con las palabras por defecto al inicio)."""
+    terms = ['spam', 'malware', 'virus', 'hack', 'phishing']
+    while len(terms) < count:
+        terms.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))))
+    return terms[:count]
+
+
+def build_messages(count, rng):
+    """Genera mensajes en español sin palabras inapropiadas."""
+    vocabulary = ('hola que tal el envío llegó ayer por la tarde gracias por '
+                  'la ayuda necesito cambiar la dirección de mi pedido número').split()
+    return [' '.join(rng.choice(vocabulary) for _ in range(80))[:500] for _ in range(count)]
+
+
+def linear_scan(content, words):
+    """Implementación anterior: un `in` por palabra, bajando a minúsculas cada vez."""
+    content_lower = content.lower()
+    return [word for word in words if word.lower() in content_lower]
+
+
+def timed(function, messages):
+    start = time.perf_counter()
+    for message in messages:
+        function(message)
+    return (time.perf_counter() - start) / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    messages = build_messages(args.messages, rng)
+
+    print(f"{'términos':>9} | {'compilación':>12} | {'lineal/msg':>11} | {'AC/msg':>9} | {'mejora':>7} | "
+          f"{'norm/msg':>9} | {'norm/raw':>8}")
+    for size in SIZES:
+        terms = build_terms(size, rng)
+
+        start = time.perf_counter()
+        content_filter = ContentFilter(terms)
+        compile_time = time.perf_counter() - start
+
+        normalized_filter = ContentFilter(terms, normalize=True)
+
+        linear = timed(lambda message: linear_scan(message, terms), messages)
+        automaton = timed(content_filter.find_matches, messages)
+        normalized = timed(normalized_filter.find_matches, messages)
+
+        print(f"{size:>9} | {compile_time * 1000:>9.1f} ms | {linear * 1e6:>8.0f} µs | "
+              f"{automaton * 1e6:>6.0f} µs | x{linear / automaton:>5.1f} | "
+              f"{normalized * 1e6:>6.0f} µs | x{normalized / automaton:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
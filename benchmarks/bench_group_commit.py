@@ -0,0 +1,107 @@
+"""
+Benchmark de escrituras concurrentes: commit por petición frente a GroupCommitWriter.
+
+Cada escritor concurrente inserta mensajes uno a uno a través de
+MessageRepository.save. Se mide el throughput (mensajes/s), los commits/s
+y los errores ("database is locked") para cada nivel de concurrencia.
+
+Con --eventlet se aplica eventlet.monkey_patch() antes de importar la
+aplicación, como en main.py: los escritores y el hilo del GroupCommitWriter
+pasan a ser green threads. Sin la opción se miden hilos del sistema.
+
+Uso:
+    python benchmarks/bench_group_commit.py --writers 1 2 4 8 16 --per-writer 100
+    python benchmarks/bench_group_commit.py --eventlet
+"""
+import sys
+
+if '--eventlet' in sys.argv:
+    import eventlet
+
+    eventlet.monkey_patch()
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config import ProductionConfig  # noqa: E402
+from app.models.message import Message, db  # noqa: E402
+from app.repositories.message_repository import MessageRepository  # noqa: E402
+from app.repositories.sqlite_writer import GroupCommitWriter  # noqa: E402
+
+
+def build_app(db_path):
+    """Crea una aplicación sobre un archivo SQLite nuevo y sin escritor propio."""
+    ProductionConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+    ProductionConfig.GROUP_COMMIT_ENABLED = False
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def run(app, repository, writers, per_writer, prefix):
+    """Lanza `writers` hilos que insertan `per_writer` mensajes cada uno."""
+    errors = []
+    barrier = threading.Barrier(writers)
+
+    def worker(worker_id):
+        barrier.wait()
+        with app.app_context():
+            for i in range(per_writer):
+                message = Message(
+                    message_id=f"{prefix}-{worker_id}-{i}",
+                    session_id=f"bench-{worker_id}",
+                    content="Mensaje de benchmark de escritura concurrente",
+                    timestamp=datetime.now(timezone.utc),
+                    sender="user",
+                )
+                try:
+                    repository.save(message)
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--per-writer', type=int, default=100)
+    parser.add_argument('--eventlet', action='store_true', help="Green threads de eventlet, como main.py")
+    args = parser.parse_args()
+
+    print(f"{'escritores':>10} | {'modo':>12} | {'msg/s':>9} | {'commits/s':>9} | {'msg/commit':>10} | errores")
+    for writers in args.writers:
+        total = writers * args.per_writer
+
+        app = build_app(os.path.join(tempfile.mkdtemp(), 'direct.db'))
+        elapsed, errors = run(app, MessageRepository(), writers, args.per_writer, 'direct')
+        ok = total - errors
+        print(f"{writers:>10} | {'directo':>12} | {ok / elapsed:>9.0f} | {ok / elapsed:>9.0f} | {1:>10.1f} | {errors}")
+
+        app = build_app(os.path.join(tempfile.mkdtemp(), 'group.db'))
+        writer = GroupCommitWriter(app)
+        writer.start()
+        elapsed, errors = run(app, MessageRepository(writer), writers, args.per_writer, 'group')
+        writer.stop()
+        stats = writer.stats()
+        ok = total - errors
+        print(f"{writers:>10} | {'group commit':>12} | {ok / elapsed:>9.0f} | "
+              f"{stats['commits'] / elapsed:>9.0f} | {stats['avg_operations_per_commit']:>10.1f} | {errors}")
+
+
+if __name__ == '__main__':
+    main()
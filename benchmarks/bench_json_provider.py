@@ -0,0 +1,111 @@
+"""
+Benchmark de los endpoints de listado con el proveedor JSON de la biblioteca
+estándar de Flask frente a FastJSONProvider (orjson si está instalado).
+
+Mide peticiones por segundo de GET /api/messages/search/all y
+GET /api/messages/<session_id> con cada proveedor, y el coste por petición de
+la serialización marshmallow que la búsqueda hacía antes sobre to_dict.
+
+Uso:
+    python benchmarks/bench_json_provider.py --messages 20000 --requests 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+from app.schemas.message_schema import message_list_response_schema  # noqa: E402
+from app.utils import json_provider  # noqa: E402
+from app.utils.json_provider import FastJSONProvider  # noqa: E402
+
+HEADERS = {'Authorization': 'Bearer bench-key'}
+WORDS = ['hola', 'pedido', 'envío', 'factura', 'cuenta', 'problema', 'gracias', 'ayuda', 'canción', 'número']
+
+
+def populate(count, sessions, rng):
+    """Inserta count mensajes repartidos en sessions sesiones."""
+    start = datetime(2023, 1, 1)
+    messages = [
+        Message(f'bench-{i}', f'session-{i % sessions}', ' '.join(rng.choices(WORDS, k=12)),
+                start + timedelta(seconds=i), 'user' if i % 2 == 0 else 'system')
+        for i in range(count)
+    ]
+    db.session.execute(Message.__table__.insert(), [message.to_row() for message in messages])
+    db.session.commit()
+
+
+def bench(client, urls):
+    start = time.perf_counter()
+    for url in urls:
+        response = client.get(url, headers=HEADERS)
+        assert response.status_code == 200, response.data
+    return len(urls) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    rng = random.Random(42)
+    endpoints = {
+        'search/all (50)': [
+            f'/api/messages/search/all?query={rng.choice(WORDS)}&limit=50&offset={rng.randrange(0, 500)}'
+            for _ in range(args.requests)
+        ],
+        'session (100)': [
+            f'/api/messages/session-{rng.randrange(args.sessions)}?limit=100&offset={rng.randrange(0, 800)}'
+            for _ in range(args.requests)
+        ],
+    }
+
+    with app.app_context():
+        db.create_all()
+        populate(args.messages, args.sessions, rng)
+        client = app.test_client()
+
+        # Rondas alternas; se queda la mejor de cada proveedor
+        providers = {'stdlib': DefaultJSONProvider(app), 'fast': FastJSONProvider(app)}
+        results = {name: dict.fromkeys(endpoints, 0.0) for name in providers}
+        for _ in range(args.rounds):
+            for name, provider in providers.items():
+                app.json = provider
+                for endpoint, urls in endpoints.items():
+                    results[name][endpoint] = max(results[name][endpoint], bench(client, urls))
+
+        # Coste de la serialización marshmallow eliminada de la búsqueda
+        service = app.extensions['message_service']
+        page = service.search_messages_globally('pedido', 50, 0)
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            message_list_response_schema.dump(page)
+        dump_us = (time.perf_counter() - start) * 1e6 / args.requests
+
+    print(f"Mensajes: {args.messages}  |  peticiones por endpoint: {args.requests}  |  "
+          f"orjson: {'sí' if json_provider.orjson is not None else 'no'}")
+    for endpoint in endpoints:
+        before, after = results['stdlib'][endpoint], results['fast'][endpoint]
+        print(f"{endpoint:<18} stdlib {before:>7.0f} req/s  ->  rápido {after:>7.0f} req/s  (x{after / before:.2f})")
+    print(f"marshmallow dump eliminado de la búsqueda: {dump_us:.0f} µs por página de 50")
+
+
+if __name__ == '__main__':
+    main()
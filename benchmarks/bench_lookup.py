@@ -0,0 +1,102 @@
+"""
+Benchmark de POST /api/messages/lookup frente a una petición
+GET /api/message/<message_id> por mensaje.
+
+Resuelve --ids IDs (un 10 % inexistentes) de las dos formas, con la caché de
+mensajes vacía (fría) y llena (caliente), y muestra la latencia total de cada
+una.
+
+Uso:
+    python benchmarks/bench_lookup.py --messages 50000 --ids 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+
+HEADERS = {'Authorization': 'Bearer bench-key'}
+
+
+def populate(count, sessions):
+    """Inserta count mensajes repartidos en sessions sesiones."""
+    start = datetime(2023, 1, 1)
+    messages = [
+        Message(f'bench-{i}', f'session-{i % sessions}',
+                f'Mensaje de benchmark número {i} con algo de texto y acentos: canción, añejo',
+                start + timedelta(seconds=i), 'user' if i % 2 == 0 else 'system')
+        for i in range(count)
+    ]
+    db.session.execute(Message.__table__.insert(), [message.to_row() for message in messages])
+    db.session.commit()
+
+
+def bench_single(client, ids):
+    start = time.perf_counter()
+    for message_id in ids:
+        response = client.get(f'/api/message/{message_id}', headers=HEADERS)
+        assert response.status_code in (200, 404), response.data
+    return time.perf_counter() - start
+
+
+def bench_lookup(client, ids):
+    start = time.perf_counter()
+    response = client.post('/api/messages/lookup', json={'message_ids': ids}, headers=HEADERS)
+    assert response.status_code == 200, response.data
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--ids', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    cache = app.extensions['message_service'].message_cache
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.create_all()
+        populate(args.messages, args.sessions)
+        client = app.test_client()
+
+        # Rondas con IDs distintos; se queda la mejor de cada variante
+        results = {}
+        for _ in range(args.rounds):
+            ids = [
+                f'bench-{rng.randrange(args.messages)}' if rng.random() < 0.9 else f'missing-{rng.random()}'
+                for _ in range(args.ids)
+            ]
+            for name, run in (('GET x N', bench_single), ('lookup', bench_lookup)):
+                if cache is not None:
+                    cache.clear()
+                cold = run(client, ids)
+                warm = run(client, ids)
+                best = results.get(name, (float('inf'), float('inf')))
+                results[name] = (min(best[0], cold), min(best[1], warm))
+
+    print(f"Mensajes: {args.messages}  |  IDs por consulta: {args.ids}  |  "
+          f"caché: {'sí' if cache is not None else 'no'}")
+    for name, (cold, warm) in results.items():
+        print(f"{name:<8} fría {cold * 1e3:>8.1f} ms  |  caliente {warm * 1e3:>8.1f} ms")
+    single, lookup = results['GET x N'], results['lookup']
+    print(f"Mejora: x{single[0] / lookup[0]:.1f} fría, x{single[1] / lookup[1]:.1f} caliente")
+
+
+if __name__ == '__main__':
+    main()
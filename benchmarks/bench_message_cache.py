@@ -0,0 +1,105 @@
+"""
+Benchmark de GET /api/message/<message_id> con y sin la caché LRU.
+
+Las lecturas siguen una distribución de Zipf sobre los mensajes almacenados
+(unos pocos mensajes recientes concentran la mayoría de lecturas), el patrón
+habitual de los clientes que releen los últimos mensajes.
+
+Uso:
+    python benchmarks/bench_message_cache.py --messages 20000 --reads 20000 --zipf 1.1
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+from app.utils.lru_cache import LRUCache  # noqa: E402
+
+HEADERS = {'Authorization': 'Bearer bench-key'}
+
+
+def populate(count):
+    """Inserta count mensajes repartidos en 100 sesiones."""
+    start = datetime(2023, 1, 1)
+    messages = [
+        Message(f'bench-{i}', f'session-{i % 100}', f'Mensaje de benchmark número {i} con algo de texto',
+                start + timedelta(seconds=i), 'user' if i % 2 == 0 else 'system')
+        for i in range(count)
+    ]
+    db.session.execute(Message.__table__.insert(), [message.to_row() for message in messages])
+    db.session.commit()
+
+
+def zipf_reads(count, reads, exponent, rng):
+    """IDs a leer: el rango k (1 = el más reciente) se elige con peso 1/k^exponent."""
+    weights = [1 / rank ** exponent for rank in range(1, count + 1)]
+    ranks = rng.choices(range(count), weights=weights, k=reads)
+    return [f'bench-{count - 1 - rank}' for rank in ranks]
+
+
+def bench(client, message_ids):
+    start = time.perf_counter()
+    for message_id in message_ids:
+        response = client.get(f'/api/message/{message_id}', headers=HEADERS)
+        assert response.status_code == 200, response.data
+    return time.perf_counter() - start
+
+
+def bench_service(service, message_ids):
+    """Mismo recorrido llamando directamente a MessageService (sin la capa HTTP)."""
+    start = time.perf_counter()
+    for message_id in message_ids:
+        service.get_message_json(message_id)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--reads', type=int, default=20000)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--cache-entries', type=int, default=10000)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    service = app.extensions['message_service']
+
+    with app.app_context():
+        db.create_all()
+        populate(args.messages)
+        message_ids = zipf_reads(args.messages, args.reads, args.zipf, random.Random(42))
+        client = app.test_client()
+
+        service.message_cache = None
+        uncached = bench(client, message_ids)
+        uncached_service = bench_service(service, message_ids)
+
+        cache = LRUCache(max_entries=args.cache_entries)
+        service.message_cache = cache
+        cached = bench(client, message_ids)
+        stats = cache.stats()
+        service.message_cache = LRUCache(max_entries=args.cache_entries)
+        cached_service = bench_service(service, message_ids)
+
+    print(f"Mensajes: {args.messages}  |  lecturas: {args.reads}  |  Zipf s={args.zipf}")
+    print(f"Sin caché   {args.reads / uncached:>8.0f} req/s  ({uncached * 1e6 / args.reads:.0f} µs/req)")
+    print(f"Con caché   {args.reads / cached:>8.0f} req/s  ({cached * 1e6 / args.reads:.0f} µs/req)")
+    print(f"Aciertos: {stats['hit_rate']:.1%}  |  expulsiones: {stats['evictions']}  |  mejora: x{uncached / cached:.2f}")
+    print(f"Solo servicio: {uncached_service * 1e6 / args.reads:.1f} µs -> "
+          f"{cached_service * 1e6 / args.reads:.1f} µs por lectura (x{uncached_service / cached_service:.1f})")
+
+
+if __name__ == '__main__':
+    main()
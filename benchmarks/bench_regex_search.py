@@ -0,0 +1,175 @@
+"""
+Benchmark de GET /api/messages/search/all con mode=substring y mode=regex.
+
+Llena la tabla con --messages mensajes de texto aleatorio que incluyen números
+de pedido (PED-2023-00042) y correos (nombre.apellido@dominio.com), rellena
+los índices y mide una página de 10 resultados más su recuento:
+
+- substring: LIKE '%q%' (la búsqueda sin índice de trigramas) frente a
+  messages_trigram, para fragmentos del interior de un número y de un correo.
+- regex: re.search sobre todos los mensajes (lo que costaría sin índice)
+  frente a filtrar candidatos en messages_trigram y verificarlos con
+  SafeRegex.
+
+Además mide un patrón con retroceso catastrófico para re sobre un solo texto.
+
+Uso:
+    python benchmarks/bench_regex_search.py --messages 1000000
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from sqlalchemy import text  # noqa: E402
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+from app.models.message_search import INDEX_COMPLETE, TRIGRAM_TABLE  # noqa: E402
+from app.utils.safe_regex import SafeRegex  # noqa: E402
+
+INSERT_CHUNK = 50000
+WORDS = [
+    'hola', 'gracias', 'pedido', 'envío', 'factura', 'cuenta', 'problema', 'ayuda', 'cliente', 'pago',
+    'tarjeta', 'devolución', 'dirección', 'correo', 'entrega', 'retraso', 'paquete', 'seguimiento',
+]
+NAMES = ['ana', 'luis', 'marta', 'jorge', 'lucia', 'pablo', 'elena', 'diego']
+SURNAMES = ['garcia', 'martinez', 'lopez', 'sanchez', 'perez', 'gomez', 'ruiz', 'diaz']
+DOMAINS = ['example.com', 'correo.es', 'empresa.org']
+SUBSTRING_QUERIES = {
+    'número de pedido': '2023-0004',
+    'correo parcial': 'tinez@empre',
+}
+REGEX_QUERIES = {
+    'pedidos de un año': r'PED-2023-0004\d',
+    'correo de un dominio': r'\w+\.garcia@correo\.es',
+    'pedido o factura': r'(PED|FAC)-2024-0123\d',
+}
+PATHOLOGICAL = (r'(a+)+$', 'a' * 25 + '!')
+
+
+def populate(count, rng):
+    """Inserta count mensajes por bloques, directamente como filas."""
+    start = datetime(2023, 1, 1)
+    now = datetime(2024, 1, 1)
+    table = Message.__table__
+    for first in range(0, count, INSERT_CHUNK):
+        rows = []
+        for i in range(first, min(first + INSERT_CHUNK, count)):
+            words = rng.choices(WORDS, k=rng.randint(4, 12))
+            if i % 3 == 0:
+                words.append(f"{rng.choice(('PED', 'FAC'))}-{rng.choice((2023, 2024))}-{rng.randint(0, 9999):05d}")
+            if i % 5 == 0:
+                words.append(f"{rng.choice(NAMES)}.{rng.choice(SURNAMES)}@{rng.choice(DOMAINS)}")
+            rng.shuffle(words)
+            content = ' '.join(words)
+            rows.append({
+                'message_id': f'bench-{i}', 'session_id': f'session-{i % 1000}', 'content': content,
+                'timestamp': start + timedelta(seconds=i), 'sender': 'user' if i % 2 == 0 else 'system',
+                'word_count': len(words), 'character_count': len(content),
+                'processed_at': now, 'updated_at': now
+            })
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def set_trigram_mark(value):
+    db.session.execute(
+        text("UPDATE search_indexes SET indexed_upto = :value WHERE name = :name"),
+        {'value': value, 'name': TRIGRAM_TABLE}
+    )
+    db.session.commit()
+
+
+def bench(call, repeat):
+    """Mediana de call() y su último resultado."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def full_scan_regex(pattern):
+    """re.search sobre todos los mensajes: el coste de una búsqueda por regex sin índice."""
+    compiled = re.compile(pattern, re.IGNORECASE)
+    matches = 0
+    for (content,) in db.session.execute(text("SELECT content FROM messages")).yield_per(10000):
+        if compiled.search(content):
+            matches += 1
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.create_all()
+        repository = app.extensions['message_repository']
+        service = app.extensions['message_service']
+        max_candidates = app.config['SEARCH_REGEX_MAX_CANDIDATES']
+
+        # Mensajes "anteriores a los índices": los triggers no los indexan
+        db.session.execute(text("UPDATE search_indexes SET indexed_upto = 0"))
+        db.session.commit()
+        populate(args.messages, rng)
+        start = time.perf_counter()
+        indexed = repository.backfill_search_index(app.config['SEARCH_BACKFILL_CHUNK_SIZE'])
+        backfill_time = time.perf_counter() - start
+        index_bytes = db.session.execute(text(f"SELECT SUM(LENGTH(block)) FROM {TRIGRAM_TABLE}_data")).scalar()
+        content_bytes = db.session.execute(text("SELECT SUM(LENGTH(CAST(content AS BLOB))) FROM messages")).scalar()
+        print(f"Mensajes: {args.messages}  |  relleno de los dos índices {indexed / backfill_time:.0f} filas/s  |  "
+              f"{TRIGRAM_TABLE}: {index_bytes / 2 ** 20:.0f} MB ({index_bytes / content_bytes:.1f}x el contenido)")
+
+        def search(query, mode):
+            return lambda: service.search_messages_globally(
+                query, 10, 0, mode=mode, max_candidates=max_candidates
+            )['pagination']['total_results']
+
+        for name, query in SUBSTRING_QUERIES.items():
+            set_trigram_mark(0)
+            like, like_total = bench(search(query, 'substring'), args.repeat)
+            set_trigram_mark(INDEX_COMPLETE)
+            trigram, trigram_total = bench(search(query, 'substring'), args.repeat)
+            print(f"substring {name:<22} '{query}': LIKE {like * 1e3:>8.1f} ms ({like_total} res.)  |  "
+                  f"trigramas {trigram * 1e3:>7.1f} ms ({trigram_total} res.)  |  x{like / trigram:.0f}")
+
+        for name, pattern in REGEX_QUERIES.items():
+            scan, scan_total = bench(lambda: full_scan_regex(pattern), 1)
+            indexed_search, indexed_total = bench(search(pattern, 'regex'), args.repeat)
+            print(f"regex {name:<26} '{pattern}': re sobre la tabla {scan * 1e3:>8.1f} ms ({scan_total} res.)  |  "
+                  f"trigramas + SafeRegex {indexed_search * 1e3:>7.1f} ms ({indexed_total} res.)  |  "
+                  f"x{scan / indexed_search:.0f}")
+
+        pattern, sample = PATHOLOGICAL
+        start = time.perf_counter()
+        re.search(pattern, sample)
+        backtracking = time.perf_counter() - start
+        start = time.perf_counter()
+        SafeRegex(pattern).search(sample)
+        linear = time.perf_counter() - start
+        print(f"patrón patológico '{pattern}' sobre {len(sample)} caracteres: re {backtracking * 1e3:.0f} ms  |  "
+              f"SafeRegex {linear * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark de páginas de 100 mensajes: to_dict + codificación JSON frente al
+JSON guardado en rendered_json concatenado, y la proyección ?fields= de una
+línea de tiempo (message_id, timestamp, sender).
+
+Los dos primeros caminos producen el cuerpo completo de
+GET /api/messages/<session_id>: el anterior construye un objeto Message y un
+diccionario por fila y codifica la página con el proveedor JSON de Flask; el
+nuevo lee solo (id, timestamp, rendered_json) y concatena. El tercero lee solo
+las columnas de los campos pedidos.
+
+Uso:
+    python benchmarks/bench_rendered_pages.py --messages 20000 --pages 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+
+HEADERS = {'Authorization': 'Bearer bench-key'}
+PAGE_SIZE = 100
+TIMELINE_FIELDS = 'message_id,timestamp,sender'
+
+
+def populate(count, sessions):
+    """Inserta count mensajes repartidos en sessions sesiones."""
+    start = datetime(2023, 1, 1)
+    messages = [
+        Message(f'bench-{i}', f'session-{i % sessions}',
+                f'Mensaje de benchmark número {i} con algo de texto y acentos: canción, añejo',
+                start + timedelta(seconds=i), 'user' if i % 2 == 0 else 'system')
+        for i in range(count)
+    ]
+    db.session.execute(Message.__table__.insert(), [message.to_row() for message in messages])
+    db.session.commit()
+
+
+def dict_page(app, service, session_id, offset):
+    """Camino anterior: objetos Message, to_dict por fila y jsonify de la página."""
+    result = service.get_messages_by_session(session_id, PAGE_SIZE, offset)
+    return app.json.dumps({'status': 'success', 'data': result['messages'], 'pagination': result['pagination']})
+
+
+def rendered_page(app, service, session_id, offset):
+    """Camino nuevo: JSON guardado por mensaje, concatenado."""
+    result = service.get_messages_by_session(session_id, PAGE_SIZE, offset, rendered=True)
+    return ''.join([
+        '{"status":"success","data":[', ','.join(result['messages']), '],"pagination":',
+        json.dumps(result['pagination'], separators=(',', ':')), '}'
+    ])
+
+
+def fields_page(app, service, session_id, offset):
+    """Proyección ?fields=message_id,timestamp,sender (línea de tiempo)."""
+    result = service.get_messages_by_session(session_id, PAGE_SIZE, offset, fields=TIMELINE_FIELDS)
+    return app.json.dumps({'status': 'success', 'data': result['messages'], 'pagination': result['pagination']})
+
+
+def bench(build, app, service, requests):
+    start = time.perf_counter()
+    for session_id, offset in requests:
+        build(app, service, session_id, offset)
+    return time.perf_counter() - start
+
+
+def bench_http(client, requests):
+    start = time.perf_counter()
+    for session_id, offset in requests:
+        response = client.get(f'/api/messages/{session_id}?limit={PAGE_SIZE}&offset={offset}', headers=HEADERS)
+        assert response.status_code == 200, response.data
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    service = app.extensions['message_service']
+    rng = random.Random(42)
+    per_session = args.messages // args.sessions
+    requests = [
+        (f'session-{rng.randrange(args.sessions)}', rng.randrange(0, max(per_session - PAGE_SIZE, 1)))
+        for _ in range(args.pages)
+    ]
+
+    with app.app_context():
+        db.create_all()
+        populate(args.messages, args.sessions)
+
+        # Los dos caminos devuelven el mismo documento
+        session_id, offset = requests[0]
+        assert json.loads(dict_page(app, service, session_id, offset)) == \
+            json.loads(rendered_page(app, service, session_id, offset))
+
+        dicts = bench(dict_page, app, service, requests)
+        rendered = bench(rendered_page, app, service, requests)
+        fields = bench(fields_page, app, service, requests)
+        full_size = len(rendered_page(app, service, session_id, offset))
+        fields_size = len(fields_page(app, service, session_id, offset))
+        http = bench_http(app.test_client(), requests)
+
+    print(f"Mensajes: {args.messages}  |  páginas de {PAGE_SIZE}: {args.pages}")
+    print(f"to_dict + JSON      {dicts * 1e3 / args.pages:>7.2f} ms/página  ({args.pages / dicts:>6.0f} páginas/s)")
+    print(f"rendered_json       {rendered * 1e3 / args.pages:>7.2f} ms/página  ({args.pages / rendered:>6.0f} páginas/s)")
+    print(f"fields={TIMELINE_FIELDS}  {fields * 1e3 / args.pages:>5.2f} ms/página  ({args.pages / fields:>6.0f} páginas/s)")
+    print(f"Mejora: x{dicts / rendered:.2f}  |  HTTP completo: {args.pages / http:.0f} req/s")
+    print(f"Tamaño de página: {full_size} bytes completa, {fields_size} bytes con fields")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark de GET /api/messages/search/all: LIKE '%q%' sobre messages.content
+frente a los índices de texto completo (messages_fts y messages_trigram).
+
+Llena la tabla con --messages mensajes (texto aleatorio con un vocabulario en
+español de frecuencias Zipf) sin indexarlos, mide el relleno de los índices por
+bloques y después el tiempo de una página de 10 resultados más su recuento con
+cada camino, para un término raro, uno frecuente, una consulta de dos palabras
+y una subcadena (mode=substring). Para medir LIKE se baja la marca de los
+índices (la búsqueda vuelve a LIKE mientras el índice está incompleto); durante
+las mediciones no hay escrituras, así que los índices no cambian. Con el índice completo mide también
+count=estimate y count=none, sort=relevance (BM25) y sort=relevance con
+snippets=true.
+
+Uso:
+    python benchmarks/bench_search_index.py --messages 1000000
+    python benchmarks/bench_search_index.py --messages 10000000 --repeat 1
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from sqlalchemy import text  # noqa: E402
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+from app.models.message_search import INDEX_COMPLETE  # noqa: E402
+
+INSERT_CHUNK = 50000
+VOCABULARY = [
+    'hola', 'gracias', 'pedido', 'envío', 'factura', 'cuenta', 'problema', 'ayuda', 'canción', 'número',
+    'cliente', 'pago', 'tarjeta', 'devolución', 'dirección', 'correo', 'contraseña', 'acceso', 'error',
+    'producto', 'precio', 'descuento', 'oferta', 'reembolso', 'entrega', 'retraso', 'almacén', 'paquete',
+    'seguimiento', 'teléfono', 'horario', 'tienda', 'garantía', 'reparación', 'técnico', 'instalación',
+] + [f'palabra{i}' for i in range(2000)]
+QUERIES = {
+    'término raro': ('palabra1999', 'words'),
+    'término frecuente': ('pedido', 'words'),
+    'dos palabras': ('factura devolución', 'words'),
+    'subcadena': ('edid', 'substring'),
+}
+
+
+def populate(count, rng):
+    """Inserta count mensajes por bloques, directamente como filas."""
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    start = datetime(2023, 1, 1)
+    now = datetime(2024, 1, 1)
+    table = Message.__table__
+    for first in range(0, count, INSERT_CHUNK):
+        rows = []
+        for i in range(first, min(first + INSERT_CHUNK, count)):
+            content = ' '.join(rng.choices(VOCABULARY, weights, k=rng.randint(5, 20)))
+            rows.append({
+                'message_id': f'bench-{i}', 'session_id': f'session-{i % 1000}', 'content': content,
+                'timestamp': start + timedelta(seconds=i), 'sender': 'user' if i % 2 == 0 else 'system',
+                'word_count': content.count(' ') + 1, 'character_count': len(content),
+                'processed_at': now, 'updated_at': now
+            })
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def set_index_mark(value):
+    db.session.execute(text("UPDATE search_indexes SET indexed_upto = :value"), {'value': value})
+    db.session.commit()
+
+
+def bench(service, query, mode, repeat, **kwargs):
+    """Mediana de search_messages_globally (página de 10 + recuento)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = service.search_messages_globally(query, 10, 0, mode=mode, **kwargs)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result['pagination']['total_results']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.create_all()
+        repository = app.extensions['message_repository']
+        service = app.extensions['message_service']
+        chunk_size = args.chunk_size or app.config['SEARCH_BACKFILL_CHUNK_SIZE']
+
+        # Mensajes "anteriores al índice": los triggers no los indexan
+        set_index_mark(0)
+        start = time.perf_counter()
+        populate(args.messages, rng)
+        populate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = repository.backfill_search_index(chunk_size)
+        backfill_time = time.perf_counter() - start
+
+        print(f"Mensajes: {args.messages}  |  carga {args.messages / populate_time:.0f} filas/s  |  "
+              f"relleno del índice {indexed / backfill_time:.0f} filas/s "
+              f"({backfill_time:.1f} s en bloques de {chunk_size})")
+        for name, (query, mode) in QUERIES.items():
+            set_index_mark(0)
+            like, like_total = bench(service, query, mode, args.repeat)
+            set_index_mark(INDEX_COMPLETE)
+            fts, fts_total = bench(service, query, mode, args.repeat)
+            print(f"{name:<18} '{query}': LIKE {like * 1e3:>9.1f} ms ({like_total} res.)  |  "
+                  f"FTS5 {fts * 1e3:>8.1f} ms ({fts_total} res.)  |  x{like / fts:.0f}")
+            estimate, estimate_total = bench(service, query, mode, args.repeat, count='estimate')
+            no_count, _ = bench(service, query, mode, args.repeat, count='none')
+            print(f"{'':<18} recientes: count=exact {fts * 1e3:>7.1f} ms  |  count=estimate {estimate * 1e3:>7.1f} ms "
+                  f"(~{estimate_total})  |  count=none {no_count * 1e3:>7.1f} ms")
+            relevance, _ = bench(service, query, mode, args.repeat, sort='relevance')
+            relevance_none, _ = bench(service, query, mode, args.repeat, sort='relevance', count='none')
+            snippets, _ = bench(service, query, mode, args.repeat, sort='relevance', snippets=True)
+            print(f"{'':<18} relevancia: count=exact {relevance * 1e3:>7.1f} ms  |  count=none "
+                  f"{relevance_none * 1e3:>7.1f} ms  |  + fragmentos {snippets * 1e3:>7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
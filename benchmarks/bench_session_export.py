@@ -0,0 +1,126 @@
+"""
+Benchmark de GET /api/sessions/<session_id>/export sobre una sesión grande.
+
+Mide, para NDJSON y CSV, el tiempo hasta el primer byte, las filas por segundo
+de la descarga completa y la memoria: el pico de tracemalloc durante la
+descarga y el crecimiento del RSS máximo del proceso. Como referencia mide lo
+mismo construyendo la sesión entera en memoria con to_dict, que es lo que
+haría falta para exportarla con los endpoints paginados en una sola respuesta.
+
+Uso:
+    python benchmarks/bench_session_export.py --messages 200000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+from app.utils import json_provider  # noqa: E402
+
+HEADERS = {'Authorization': 'Bearer bench-key'}
+SESSION_ID = 'session-export'
+INSERT_CHUNK = 10000
+
+
+def populate(count):
+    """Inserta count mensajes en una única sesión, por bloques."""
+    start = datetime(2023, 1, 1)
+    for first in range(0, count, INSERT_CHUNK):
+        messages = [
+            Message(f'bench-{i}', SESSION_ID,
+                    f'Mensaje de benchmark número {i} con algo de texto y acentos: canción, añejo',
+                    start + timedelta(seconds=i), 'user' if i % 2 == 0 else 'system')
+            for i in range(first, min(first + INSERT_CHUNK, count))
+        ]
+        db.session.execute(Message.__table__.insert(), [message.to_row() for message in messages])
+        db.session.commit()
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_export(client, query):
+    """Descarga la exportación en streaming; devuelve (primer byte, total, bytes, líneas)."""
+    start = time.perf_counter()
+    response = client.get(f'/api/sessions/{SESSION_ID}/export{query}', headers=HEADERS, buffered=False)
+    assert response.status_code == 200, response.data
+    first_byte = None
+    size = lines = 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    response.close()
+    return first_byte, time.perf_counter() - start, size, lines
+
+
+def bench_in_memory(service):
+    """Referencia: toda la sesión como lista de diccionarios y un único documento JSON."""
+    start = time.perf_counter()
+    messages, _ = service.message_repository.find_by_session_id(SESSION_ID, limit=None)
+    body = json_provider.dumps_bytes([message.to_dict() for message in messages])
+    return time.perf_counter() - start, len(body)
+
+
+def measure(run):
+    """
+    Ejecuta run con tracemalloc; devuelve (resultado, pico en MB, crecimiento
+    del RSS máximo en MB). Los tiempos se toman en otra ejecución, sin
+    tracemalloc.
+    """
+    rss_before = max_rss_kb()
+    tracemalloc.start()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 2 ** 20, (max_rss_kb() - rss_before) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+    if args.batch_size:
+        app.config['EXPORT_BATCH_SIZE'] = args.batch_size
+
+    with app.app_context():
+        db.create_all()
+        populate(args.messages)
+        client = app.test_client()
+        service = app.extensions['message_service']
+
+        print(f"Mensajes en la sesión: {args.messages}  |  bloque: {app.config['EXPORT_BATCH_SIZE']}")
+        # Las exportaciones van primero: el RSS máximo solo crece y la
+        # referencia en memoria lo dispara
+        for name, query in (('ndjson', ''), ('csv', '?format=csv')):
+            first_byte, total, size, lines = bench_export(client, query)
+            _, peak, rss = measure(lambda: bench_export(client, query))
+            print(f"{name:<7} primer byte {first_byte * 1e3:>7.1f} ms  |  {args.messages / total:>8.0f} filas/s  |  "
+                  f"{size / 2 ** 20:>6.1f} MB  |  pico {peak:>6.1f} MB  |  RSS +{rss:.1f} MB  ({lines} líneas)")
+
+        total, size = bench_in_memory(service)
+        _, peak, rss = measure(lambda: bench_in_memory(service))
+        print(f"{'memoria':<7} primer byte {total * 1e3:>7.1f} ms  |  {args.messages / total:>8.0f} filas/s  |  "
+              f"{size / 2 ** 20:>6.1f} MB  |  pico {peak:>6.1f} MB  |  RSS +{rss:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de paginación de una sesión: OFFSET frente a cursor (keyset).
+
+Llena una sesión con muchos mensajes en una base de datos SQLite en archivo y
+mide la latencia de una página a distintas profundidades en los dos modos:
+offset (OFFSET + COUNT, como GET /api/messages/<session_id>?offset=N) y
+cursor (?after=<cursor>). Con cursor la latencia debe ser plana.
+
+Uso:
+    python benchmarks/bench_session_pagination.py --messages 200000 --limit 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['API_KEYS'] = 'bench-key'
+
+from app import create_app, limiter  # noqa: E402
+from app.models.message import db, Message  # noqa: E402
+
+SESSION_ID = 'bench-session'
+DEPTHS = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.99]
+BAR_WIDTH = 40
+
+
+def populate(count):
+    """Inserta count mensajes en una sola sesión (más ruido en otra)."""
+    start = datetime(2023, 1, 1)
+    now = datetime.now()
+    rows = [
+        {
+            'message_id': f'bench-{i}',
+            'session_id': SESSION_ID if i % 10 else 'other-session',
+            'content': f'Mensaje de benchmark número {i}',
+            'timestamp': start + timedelta(seconds=i // 3),
+            'sender': 'user' if i % 2 == 0 else 'system',
+            'word_count': 4,
+            'character_count': 30,
+            'processed_at': now,
+            'updated_at': now,
+        }
+        for i in range(count)
+    ]
+    for i in range(0, len(rows), 20000):
+        db.session.execute(Message.__table__.insert(), rows[i:i + 20000])
+    db.session.commit()
+
+
+def timed(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('production')
+    limiter.enabled = False
+
+    with app.app_context():
+        db.create_all()
+        populate(args.messages)
+        repository = app.extensions['message_repository']
+        total = repository.count_by_session_id(SESSION_ID)
+
+        results = []
+        for fraction in DEPTHS:
+            offset = int(total * fraction)
+            # La posición del cursor se obtiene fuera de la medición
+            anchor = (
+                Message.query.filter_by(session_id=SESSION_ID)
+                .order_by(Message.timestamp.asc(), Message.id.asc())
+                .offset(max(offset - 1, 0)).first()
+            )
+            cursor = (anchor.timestamp, anchor.id) if offset else None
+
+            offset_time = timed(lambda: repository.find_by_session_id(SESSION_ID, args.limit, offset), args.repeat)
+            cursor_time = timed(lambda: repository.find_by_session_keyset(SESSION_ID, args.limit, cursor), args.repeat)
+            results.append((offset, offset_time, cursor_time))
+
+    print(f"Sesión con {total} mensajes, páginas de {args.limit}")
+    print(f"{'profundidad':>11} | {'offset':>9} | {'cursor':>9}")
+    scale = max(max(offset_time, cursor_time) for _, offset_time, cursor_time in results)
+    for offset, offset_time, cursor_time in results:
+        print(f"{offset:>11} | {offset_time * 1000:>6.2f} ms | {cursor_time * 1000:>6.2f} ms")
+        print(f"{'':>11}   offset {'#' * max(1, round(offset_time / scale * BAR_WIDTH))}")
+        print(f"{'':>11}   cursor {'#' * max(1, round(cursor_time / scale * BAR_WIDTH))}")
+
+
+if __name__ == '__main__':
+    main()
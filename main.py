@@ -2,11 +2,19 @@
 Punto de entrada principal de la aplicación.
 Este módulo inicia la aplicación Flask con soporte completo para UTF-8.
 """
+import eventlet
+
+# Parchear la librería estándar antes de cualquier otro import para que los
+# hilos, colas y locks (escritor de SQLite, cola de ingesta) sean cooperativos
+eventlet.monkey_patch()
+
 import os
+import signal
 import sys
-import eventlet
 from app import create_app, socketio
 from app.models.message import db
+from app.models.message_search import SEARCH_INDEXES, search_index_ready
+from app.models.migrations import run_migrations
 
 # Configurar encoding para Windows
 if sys.platform.startswith('win'):
@@ -23,19 +31,43 @@ if sys.platform.startswith('win'):
 # Crear aplicación
 app = create_app()
 
+
+def backfill_search_index():
+    """Rellena los índices de búsqueda en segundo plano (la búsqueda usa LIKE hasta terminar)."""
+    with app.app_context():
+        indexed = app.extensions['message_repository'].backfill_search_index(
+            app.config['SEARCH_BACKFILL_CHUNK_SIZE']
+        )
+        print(f"🔎 Índice de búsqueda completo ({indexed} mensajes indexados)")
+
+
 if __name__ == '__main__':
     # Obtener host y puerto desde las variables de entorno
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
     debug_mode = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     with app.app_context():
-        db.create_all()
+        # Crear o actualizar el esquema (tablas, índice único, índices compuestos)
+        applied = run_migrations()
+        if applied:
+            print(f"🗄️  Migraciones aplicadas: {', '.join(applied)}")
+        # Calentar el filtro de message_id antes de aceptar peticiones
+        app.extensions['message_repository'].warm_id_filter()
+        # Con BLOCKLIST_SOURCE=database la lista se lee ahora que existe la tabla
+        app.extensions['blocklist'].load(fallback_words=app.config['INAPPROPRIATE_WORDS'])
+        # Mensajes anteriores a los índices de búsqueda: se indexan sin bloquear el arranque
+        if not all(search_index_ready(db.session, name) for name in SEARCH_INDEXES):
+            socketio.start_background_task(backfill_search_index)
     print("🚀 Iniciando Message Processing API con SocketIO")
     print(f"📍 Servidor: http://{host}:{port}")
     print(f"🔧 Modo debug: {debug_mode}")
     print(f"❤️  Health check: http://{host}:{port}/health")
     print("🌍 Encoding: UTF-8 ✓")
     
+    # SIGTERM (docker stop) debe cerrar de forma ordenada para que los
+    # manejadores atexit vacíen la cola de ingesta asíncrona
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     # Usar eventlet para ejecutar el servidor con SocketIO
     eventlet.wsgi.server(
         eventlet.listen(('', port)),
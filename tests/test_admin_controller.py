@@ -0,0 +1,86 @@
+"""
+Pruebas para los endpoints de administración.
+Este módulo prueba la consulta y la recarga de la lista de palabras bloqueadas.
+"""
+import json
+import time
+
+import pytest
+
+from app.services.blocklist import FileBlocklistSource
+
+
+@pytest.fixture
+def file_blocklist(app, tmp_path):
+    """Cambia el origen de la lista a un archivo temporal."""
+    path = tmp_path / "blocklist.txt"
+    path.write_text("spam\n", encoding="utf-8")
+    app.extensions["blocklist"].source = FileBlocklistSource(str(path))
+    return path
+
+
+def _post_message(client, content, message_id):
+    return client.post(
+        "/api/messages",
+        data=json.dumps({
+            "message_id": message_id,
+            "session_id": "session-admin",
+            "content": content,
+            "timestamp": "2023-06-15T14:30:00Z",
+            "sender": "user",
+        }),
+        content_type="application/json",
+    )
+
+
+def test_get_blocklist_status(authenticated_client):
+    response = authenticated_client.get("/api/admin/blocklist")
+
+    assert response.status_code == 200
+    data = json.loads(response.data)["data"]
+    assert data["version"] == 1
+    assert data["source"] == "config"
+    assert "compile_ms" in data
+
+
+def test_reload_and_wait_swaps_filter(authenticated_client, file_blocklist):
+    file_blocklist.write_text("estafa\n", encoding="utf-8")
+
+    response = authenticated_client.post("/api/admin/blocklist/reload?wait=true")
+
+    assert response.status_code == 200
+    data = json.loads(response.data)["data"]
+    assert data["version"] == 2
+    assert data["changed"] is True
+    assert data["term_count"] == 1
+    assert _post_message(authenticated_client, "esto es una estafa", "adm-1").status_code == 400
+    assert _post_message(authenticated_client, "esto es spam", "adm-2").status_code == 201
+
+
+def test_reload_in_background(app, authenticated_client, file_blocklist):
+    file_blocklist.write_text("estafa\nfraude\n", encoding="utf-8")
+
+    response = authenticated_client.post("/api/admin/blocklist/reload")
+    assert response.status_code == 202
+
+    blocklist = app.extensions["blocklist"]
+    deadline = time.monotonic() + 5
+    while blocklist.active.version < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert blocklist.status()["term_count"] == 2
+
+
+def test_reload_failure_keeps_active_version(authenticated_client, file_blocklist):
+    file_blocklist.unlink()
+
+    response = authenticated_client.post("/api/admin/blocklist/reload?wait=true")
+
+    assert response.status_code == 500
+    error = json.loads(response.data)["error"]
+    assert error["code"] == "BLOCKLIST_LOAD_ERROR"
+    assert error["details"]["version"] == 1
+
+
+def test_admin_requires_api_key(client):
+    response = client.post("/api/admin/blocklist/reload", headers={"Authorization": ""})
+    assert response.status_code == 401
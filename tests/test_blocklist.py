@@ -0,0 +1,158 @@
+"""
+Pruebas unitarias para BlocklistManager y sus orígenes.
+Este módulo prueba la carga versionada, el intercambio atómico y la recarga fallida.
+"""
+import pytest
+
+from app.models.blocklist_term import BlocklistTerm
+from app.models.message import db
+from app.services.blocklist import (
+    BlocklistManager,
+    ConfigBlocklistSource,
+    DatabaseBlocklistSource,
+    FileBlocklistSource,
+)
+from app.utils.exceptions import BlocklistLoadError, InappropriateContentError
+
+
+@pytest.fixture
+def blocklist_file(tmp_path):
+    path = tmp_path / "blocklist.txt"
+    path.write_text("# términos\nspam\n\nvirus\n", encoding="utf-8")
+    return path
+
+
+def test_file_source_skips_comments_and_blank_lines(blocklist_file):
+    assert FileBlocklistSource(str(blocklist_file)).load() == ["spam", "virus"]
+
+
+def test_reload_publishes_new_version(blocklist_file):
+    manager = BlocklistManager(FileBlocklistSource(str(blocklist_file)))
+    first = manager.load()
+    assert first.version == 1
+    assert first.term_count == 2
+
+    blocklist_file.write_text("spam\nvirus\nphishing\n", encoding="utf-8")
+    second = manager.reload()
+
+    assert second.version == 2
+    assert manager.active is second
+    with pytest.raises(InappropriateContentError):
+        manager.content_filter.apply("un intento de phishing")
+
+
+def test_unchanged_list_keeps_version(blocklist_file):
+    manager = BlocklistManager(FileBlocklistSource(str(blocklist_file)))
+    manager.load()
+
+    blocklist_file.write_text("virus\nspam\n", encoding="utf-8")
+    assert manager.reload().version == 1
+
+
+def test_snapshot_in_use_is_not_modified_by_reload(blocklist_file):
+    """Quien leyó el filtro antes de la recarga sigue usando la versión completa anterior."""
+    manager = BlocklistManager(FileBlocklistSource(str(blocklist_file)))
+    manager.load()
+    in_flight = manager.content_filter
+
+    blocklist_file.write_text("otro\n", encoding="utf-8")
+    manager.reload()
+
+    with pytest.raises(InappropriateContentError):
+        in_flight.apply("spam")
+    assert manager.content_filter.apply("spam") == "spam"
+
+
+def test_failed_reload_keeps_previous_version(blocklist_file):
+    manager = BlocklistManager(FileBlocklistSource(str(blocklist_file)))
+    manager.load()
+
+    blocklist_file.unlink()
+    with pytest.raises(BlocklistLoadError):
+        manager.reload()
+
+    status = manager.status()
+    assert status["version"] == 1
+    assert "No se pudo leer" in status["last_error"]
+
+
+def test_load_falls_back_to_configured_words(tmp_path):
+    manager = BlocklistManager(FileBlocklistSource(str(tmp_path / "no-existe.txt")))
+
+    snapshot = manager.load(fallback_words=["spam"])
+    assert snapshot.term_count == 1
+
+
+def test_database_source(app):
+    with app.app_context():
+        db.session.add_all([BlocklistTerm(term="spam"), BlocklistTerm(term="estafa")])
+        db.session.commit()
+
+        source = DatabaseBlocklistSource(app)
+        before = source.fingerprint()
+        manager = BlocklistManager(source)
+        assert manager.load().term_count == 2
+
+        db.session.add(BlocklistTerm(term="fraude"))
+        db.session.commit()
+        assert source.fingerprint() != before
+        assert manager.reload().term_count == 3
+
+
+def test_database_source_detects_replaced_and_edited_terms(app):
+    with app.app_context():
+        db.session.add_all([BlocklistTerm(term="spam"), BlocklistTerm(term="virus")])
+        db.session.commit()
+        manager = BlocklistManager(DatabaseBlocklistSource(app))
+        manager.load()
+
+        # Se borra el último término y se inserta otro: SQLite reutiliza su id
+        db.session.delete(BlocklistTerm.query.filter_by(term="virus").one())
+        db.session.commit()
+        db.session.add(BlocklistTerm(term="phishing"))
+        db.session.commit()
+        assert BlocklistTerm.query.filter_by(term="phishing").one().id == 2
+        # La misma comprobación que hace start_polling antes de recargar
+        assert manager.source.fingerprint() != manager._source_fingerprint
+        assert manager.reload().content_filter.find_matches("phishing")
+
+        # Edición de un término sin cambiar el número de filas ni los ids
+        db.session.execute(db.text("UPDATE blocklist_terms SET term = 'scam' WHERE term = 'spam'"))
+        db.session.commit()
+        assert manager.source.fingerprint() != manager._source_fingerprint
+        assert manager.reload().content_filter.find_matches("scam")
+
+
+def test_status_reports_compile_time():
+    manager = BlocklistManager(ConfigBlocklistSource(["spam"]))
+    manager.load()
+
+    status = manager.status()
+    assert status["source"] == "config"
+    assert status["compile_ms"] >= 0
+    assert status["reloading"] is False
+
+
+def test_reload_compiles_in_os_thread_under_eventlet(blocklist_file, monkeypatch):
+    """Con threading parcheado por eventlet la lectura y la compilación no corren en el hub."""
+    import threading
+
+    from app.services import blocklist as blocklist_module
+
+    manager = BlocklistManager(FileBlocklistSource(str(blocklist_file)))
+    manager.load()
+    compile_threads = []
+    original_compile = manager._compile
+
+    def tracking_compile(terms, started):
+        compile_threads.append(threading.get_ident())
+        return original_compile(terms, started)
+
+    monkeypatch.setattr(manager, "_compile", tracking_compile)
+    monkeypatch.setattr(blocklist_module.patcher, "is_monkey_patched", lambda module: True)
+    blocklist_file.write_text("spam\nvirus\nphishing\n", encoding="utf-8")
+
+    snapshot = manager.reload()
+
+    assert compile_threads and compile_threads[0] != threading.get_ident()
+    assert manager.active is snapshot and snapshot.version == 2
@@ -0,0 +1,114 @@
+"""
+Pruebas unitarias para AhoCorasickMatcher.
+Este módulo prueba las apariciones solapadas, los límites de palabra y el enmascarado.
+"""
+import random
+
+import pytest
+
+from app.utils import content_matcher
+from app.utils.content_matcher import AhoCorasickMatcher, ContentMatch
+from app.utils.text_normalizer import TextNormalizer
+
+
+@pytest.fixture(params=["automaton", "small"])
+def search_path(request, monkeypatch):
+    """Ejecuta cada prueba con el autómata y con la búsqueda para listas pequeñas."""
+    if request.param == "automaton":
+        monkeypatch.setattr(content_matcher, "SMALL_TERM_COUNT", 0)
+    return request.param
+
+
+def test_finds_overlapping_terms_with_offsets(search_path):
+    matcher = AhoCorasickMatcher(["he", "she", "his", "hers"])
+
+    matches = matcher.find_all("ushers")
+
+    assert sorted(matches) == [
+        ContentMatch(1, 4, "she"),
+        ContentMatch(2, 4, "he"),
+        ContentMatch(2, 6, "hers"),
+    ]
+
+
+def test_case_insensitive_and_reports_configured_term(search_path):
+    matcher = AhoCorasickMatcher(["Malware"])
+
+    assert matcher.find_all("un MALWARE aquí") == [ContentMatch(3, 10, "Malware")]
+
+
+def test_ignores_empty_and_repeated_terms(search_path):
+    matcher = AhoCorasickMatcher(["spam", "", "  ", "SPAM", "spam"])
+
+    assert matcher.terms == ["spam"]
+    assert len(matcher.find_all("spam spam")) == 2
+
+
+def test_word_boundary(search_path):
+    matcher = AhoCorasickMatcher(["spam"], word_boundary=True)
+
+    assert matcher.find_all("spam, spammer, antispam, _spam y spam.") == [
+        ContentMatch(0, 4, "spam"),
+        ContentMatch(33, 37, "spam"),
+    ]
+
+
+def test_offsets_when_lowercase_changes_length(search_path):
+    text = "AİX spam"
+    matcher = AhoCorasickMatcher(["spam"])
+
+    [match] = matcher.find_all(text)
+    assert text[match.start:match.end] == "spam"
+
+
+def test_mask_merges_overlapping_matches(search_path):
+    matcher = AhoCorasickMatcher(["abc", "bcd"])
+
+    assert matcher.mask("xabcdx") == "x****x"
+    assert matcher.mask("sin coincidencias") == "sin coincidencias"
+
+
+def test_limit_and_contains_any(search_path):
+    matcher = AhoCorasickMatcher(["a"])
+
+    assert len(matcher.find_all("aaaa", limit=2)) == 2
+    assert matcher.contains_any("xa")
+    assert not AhoCorasickMatcher([]).contains_any("texto")
+
+
+def test_matches_naive_search_on_random_input(search_path):
+    """Con muchos términos aleatorios coincide con la búsqueda ingenua."""
+    rng = random.Random(7)
+    terms = list({"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(60)})
+    text = "".join(rng.choice("abcd") for _ in range(400))
+    matcher = AhoCorasickMatcher(terms)
+
+    expected = sorted(
+        (start, start + len(term), term)
+        for term in terms
+        for start in range(len(text))
+        if text.startswith(term, start)
+    )
+    assert sorted(matcher.find_all(text)) == expected
+
+
+def test_normalized_matches_variants_with_original_offsets(search_path):
+    matcher = AhoCorasickMatcher(["malware", "virus", "spam"], normalizer=TextNormalizer())
+
+    assert matcher.find_all("un m4lw4re") == [ContentMatch(3, 10, "malware")]
+    assert matcher.find_all("el VÍRUS") == [ContentMatch(3, 8, "virus")]
+    assert matcher.find_all("s p a m") == [ContentMatch(0, 7, "spam")]
+
+
+def test_normalized_does_not_join_separate_words(search_path):
+    matcher = AhoCorasickMatcher(["spam", "anti spam"], normalizer=TextNormalizer())
+
+    assert matcher.find_all("es pa mucho") == []
+    assert matcher.find_all("anti-spam") == [ContentMatch(0, 9, "anti spam"), ContentMatch(5, 9, "spam")]
+
+
+def test_normalized_word_boundary_uses_original_text(search_path):
+    matcher = AhoCorasickMatcher(["hack"], word_boundary=True, normalizer=TextNormalizer())
+
+    assert matcher.find_all("h4ck aquí") == [ContentMatch(0, 4, "hack")]
+    assert matcher.find_all("h4cker") == []
@@ -0,0 +1,63 @@
+"""
+Pruebas unitarias para CuckooFilter.
+Este módulo prueba la pertenencia, los borrados, la saturación y las métricas.
+"""
+from app.utils.cuckoo_filter import CuckooFilter
+
+
+def test_added_keys_are_always_found():
+    """No hay falsos negativos para claves añadidas."""
+    cuckoo = CuckooFilter(10000)
+    keys = [f"msg-{i}" for i in range(10000)]
+
+    assert all(cuckoo.add(key) for key in keys)
+    assert all(key in cuckoo for key in keys)
+    assert len(cuckoo) == 10000
+
+
+def test_false_positive_rate_is_low():
+    """La tasa de falsos positivos queda muy por debajo del 1 %."""
+    cuckoo = CuckooFilter(10000)
+    for i in range(10000):
+        cuckoo.add(f"msg-{i}")
+
+    false_positives = sum(cuckoo.contains(f"otro-{i}") for i in range(20000))
+    assert false_positives / 20000 < 0.001
+    assert cuckoo.estimated_false_positive_rate() < 0.001
+
+
+def test_remove_only_affects_removed_key():
+    """Borrar una clave no afecta al resto."""
+    cuckoo = CuckooFilter(1000)
+    for i in range(1000):
+        cuckoo.add(f"msg-{i}")
+
+    for i in range(0, 1000, 2):
+        assert cuckoo.remove(f"msg-{i}")
+
+    assert all(f"msg-{i}" in cuckoo for i in range(1, 1000, 2))
+    assert len(cuckoo) == 500
+
+
+def test_add_returns_false_when_full_without_losing_keys():
+    """Un filtro lleno rechaza la clave sin perder ninguna de las anteriores."""
+    cuckoo = CuckooFilter(100, max_kicks=50)
+    added = []
+    for i in range(10 * cuckoo.capacity):
+        if not cuckoo.add(i):
+            break
+        added.append(i)
+
+    assert len(added) < 10 * cuckoo.capacity
+    assert all(key in cuckoo for key in added)
+
+
+def test_stats():
+    """Las métricas reportan ocupación y memoria."""
+    cuckoo = CuckooFilter(1000)
+    cuckoo.add("a")
+
+    stats = cuckoo.stats()
+    assert stats["items"] == 1
+    assert stats["memory_bytes"] == 2 * stats["capacity"]
+    assert 0 < stats["load_factor"] < 0.01
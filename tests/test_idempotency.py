@@ -0,0 +1,80 @@
+"""
+Pruebas unitarias para IdempotencyCache.
+Este módulo prueba la reserva de claves, la espera de duplicados en curso y el TTL.
+"""
+import threading
+import time
+
+import pytest
+
+from app.utils.exceptions import IdempotencyInProgressError, IdempotencyKeyReuseError
+from app.utils.idempotency import CachedResponse, IdempotencyCache
+
+RESPONSE = CachedResponse(b'{"status": "success"}', 201, [("Content-Type", "application/json")])
+
+
+def test_first_request_reserves_and_replays_after_complete():
+    cache = IdempotencyCache()
+
+    assert cache.acquire("k", "body", timeout=1) is None
+    cache.complete("k", RESPONSE)
+
+    assert cache.acquire("k", "body", timeout=1) == RESPONSE
+    assert cache.stats()["hits"] == 1
+
+
+def test_reused_key_with_other_body_is_rejected():
+    cache = IdempotencyCache()
+    cache.acquire("k", "body", timeout=1)
+
+    with pytest.raises(IdempotencyKeyReuseError):
+        cache.acquire("k", "otro", timeout=1)
+
+    cache.complete("k", RESPONSE)
+    with pytest.raises(IdempotencyKeyReuseError):
+        cache.acquire("k", "otro", timeout=1)
+
+
+def test_concurrent_duplicate_waits_for_first_request():
+    cache = IdempotencyCache()
+    assert cache.acquire("k", "body", timeout=1) is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.acquire("k", "body", timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    assert results == []
+
+    cache.complete("k", RESPONSE)
+    waiter.join(1)
+    assert results == [RESPONSE]
+    assert cache.stats()["waits"] >= 1
+
+
+def test_release_lets_next_request_process():
+    cache = IdempotencyCache()
+    cache.acquire("k", "body", timeout=1)
+    cache.release("k")
+
+    assert cache.acquire("k", "body", timeout=1) is None
+
+
+def test_wait_timeout_raises_in_progress():
+    cache = IdempotencyCache()
+    cache.acquire("k", "body", timeout=1)
+
+    with pytest.raises(IdempotencyInProgressError):
+        cache.acquire("k", "body", timeout=0.01)
+
+
+def test_entries_expire_and_are_bounded():
+    cache = IdempotencyCache(max_entries=2, ttl=0.05)
+    for key in ("a", "b", "c"):
+        cache.acquire(key, "body", timeout=1)
+        cache.complete(key, RESPONSE)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.acquire("a", "body", timeout=1) is None
+
+    time.sleep(0.06)
+    assert cache.acquire("b", "body", timeout=1) is None
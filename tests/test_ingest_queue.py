@@ -0,0 +1,188 @@
+"""
+Pruebas para la ingesta asíncrona (WriteBehindQueue) y su endpoint.
+Este módulo prueba el encolado, el vaciado por lotes, la contrapresión y el cierre ordenado.
+"""
+import json
+import pytest
+
+from app.models.message import Message
+from app.utils.exceptions import QueueFullError, ValidationError
+
+
+@pytest.fixture
+def async_app(app):
+    """Aplicación con la ingesta asíncrona activa (sin tarea de fondo)."""
+    app.config['ASYNC_INGEST_ENABLED'] = True
+    return app
+
+
+@pytest.fixture
+def ingest_queue(async_app):
+    return async_app.extensions['ingest_queue']
+
+
+def _message(i, session_id="session-async"):
+    return {
+        "message_id": f"msg-async-{i}",
+        "session_id": session_id,
+        "content": f"Mensaje asíncrono {i}",
+        "timestamp": "2023-06-15T14:30:00Z",
+        "sender": "user",
+    }
+
+
+class TestWriteBehindQueue:
+    """Suite de pruebas para WriteBehindQueue."""
+
+    def test_post_returns_202_and_queues(self, async_app, authenticated_client, ingest_queue):
+        """POST /api/messages responde 202 sin escribir en la base de datos."""
+        response = authenticated_client.post(
+            "/api/messages", data=json.dumps(_message(1)), content_type="application/json"
+        )
+
+        assert response.status_code == 202
+        data = json.loads(response.data)
+        assert data["status"] == "accepted"
+        assert data["data"]["status"] == "queued"
+        assert response.headers["Location"] == "/api/ingest/status/msg-async-1"
+        assert len(ingest_queue) == 1
+        assert Message.query.count() == 0
+
+    def test_flush_stores_batch_then_broadcasts(self, async_app, authenticated_client, ingest_queue):
+        """El vaciado guarda el lote en un commit y solo después notifica."""
+        notified = []
+        ingest_queue.on_stored = lambda data: notified.append((data["message_id"], Message.query.count()))
+        async_app.config['ASYNC_INGEST_BATCH_SIZE'] = 2
+
+        for i in range(3):
+            authenticated_client.post(
+                "/api/messages", data=json.dumps(_message(i)), content_type="application/json"
+            )
+
+        assert ingest_queue.flush() == 2
+        assert ingest_queue.flush() == 1
+        assert ingest_queue.flush() == 0
+        assert Message.query.count() == 3
+        assert [message_id for message_id, _ in notified] == ["msg-async-0", "msg-async-1", "msg-async-2"]
+        assert notified[0][1] == 2  # el lote ya estaba confirmado al notificar
+
+    def test_status_lookup(self, async_app, authenticated_client, ingest_queue):
+        """El estado pasa de queued a stored y es consultable por ID."""
+        authenticated_client.post(
+            "/api/messages", data=json.dumps(_message(1)), content_type="application/json"
+        )
+
+        queued = json.loads(authenticated_client.get("/api/ingest/status/msg-async-1").data)
+        assert queued["data"]["status"] == "queued"
+
+        ingest_queue.flush()
+        stored = json.loads(authenticated_client.get("/api/ingest/status/msg-async-1").data)
+        assert stored["data"]["status"] == "stored"
+
+        missing = authenticated_client.get("/api/ingest/status/no-existe")
+        assert missing.status_code == 404
+
+    def test_queue_full_returns_503(self, async_app, authenticated_client):
+        """Con la cola llena se aplica contrapresión con 503."""
+        async_app.config['ASYNC_INGEST_QUEUE_SIZE'] = 1
+        authenticated_client.post(
+            "/api/messages", data=json.dumps(_message(1)), content_type="application/json"
+        )
+        response = authenticated_client.post(
+            "/api/messages", data=json.dumps(_message(2)), content_type="application/json"
+        )
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert json.loads(response.data)["error"]["code"] == "QUEUE_FULL"
+
+    def test_validation_runs_before_queueing(self, async_app, authenticated_client, ingest_queue):
+        """El contenido inapropiado y los duplicados se rechazan en la petición."""
+        bad = {**_message(1), "content": "esto es spam"}
+        response = authenticated_client.post(
+            "/api/messages", data=json.dumps(bad), content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INAPPROPRIATE_CONTENT"
+
+        authenticated_client.post(
+            "/api/messages", data=json.dumps(_message(2)), content_type="application/json"
+        )
+        duplicate = authenticated_client.post(
+            "/api/messages", data=json.dumps(_message(2)), content_type="application/json"
+        )
+        assert duplicate.status_code == 400
+        assert len(ingest_queue) == 1
+
+    def test_drain_flushes_everything_and_stops_accepting(self, async_app, ingest_queue):
+        """drain persiste todo lo pendiente y rechaza nuevos mensajes."""
+        async_app.config['ASYNC_INGEST_BATCH_SIZE'] = 2
+        for i in range(5):
+            ingest_queue.submit(_message(i))
+
+        assert ingest_queue.drain(timeout=5) == 0
+        assert Message.query.count() == 5
+        with pytest.raises(QueueFullError):
+            ingest_queue.submit(_message(9))
+
+    def test_flush_treats_identical_message_stored_meanwhile_as_stored(self, async_app, ingest_queue, message_service):
+        """Un reintento idéntico guardado por otra vía mientras esperaba se marca como stored."""
+        ingest_queue.submit(_message(1))
+        message_service.process_message(_message(1))
+
+        ingest_queue.flush()
+        status = ingest_queue.get_status("msg-async-1")
+        assert status["status"] == "stored"
+        assert Message.query.count() == 1
+
+    def test_flush_conflicting_message_stored_meanwhile_fails(self, async_app, ingest_queue, message_service):
+        """Un message_id guardado con otro contenido mientras esperaba se marca como failed."""
+        ingest_queue.submit(_message(1))
+        message_service.process_message({**_message(1), "content": "Otro contenido"})
+
+        ingest_queue.flush()
+        status = ingest_queue.get_status("msg-async-1")
+        assert status["status"] == "failed"
+        assert Message.query.count() == 1
+
+    def test_flush_database_error_marks_failed(self, async_app, ingest_queue, monkeypatch):
+        """Si falla la transacción los mensajes del lote quedan como failed."""
+        from app.repositories.message_repository import MessageRepository
+        from app.utils.exceptions import DatabaseError
+
+        def mock_save_all(*args, **kwargs):
+            raise DatabaseError("fallo al vaciar")
+
+        monkeypatch.setattr(MessageRepository, "save_all", mock_save_all)
+        ingest_queue.submit(_message(1))
+
+        assert ingest_queue.flush() == 1
+        status = ingest_queue.get_status("msg-async-1")
+        assert status["status"] == "failed"
+        assert status["error"] == "fallo al vaciar"
+
+    def test_flush_conflict_lookup_error_keeps_inserted_messages_stored(
+        self, async_app, ingest_queue, message_service, monkeypatch
+    ):
+        """Si falla la lectura de los conflictos, los insertados siguen como stored y se notifican."""
+        from app.repositories.message_repository import MessageRepository
+        from app.utils.exceptions import DatabaseError
+
+        notified = []
+        monkeypatch.setattr(ingest_queue, "on_stored", notified.append)
+        message_service.process_message({**_message(1), "content": "Otro contenido"})
+        ingest_queue.submit(_message(1))
+        ingest_queue.submit(_message(2))
+
+        def mock_find_by_message_ids(*args, **kwargs):
+            raise DatabaseError("fallo al leer")
+
+        monkeypatch.setattr(MessageRepository, "find_by_message_ids", mock_find_by_message_ids)
+        assert ingest_queue.flush() == 2
+
+        assert ingest_queue.get_status("msg-async-2")["status"] == "stored"
+        assert [message["message_id"] for message in notified] == ["msg-async-2"]
+        status = ingest_queue.get_status("msg-async-1")
+        assert status["status"] == "failed"
+        assert status["error"] == "No se pudo comprobar el mensaje existente con ese ID"
+        assert Message.query.count() == 2
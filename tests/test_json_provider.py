@@ -0,0 +1,67 @@
+"""
+Pruebas del proveedor JSON de la aplicación.
+Este módulo prueba que la salida es compacta, conserva el orden y los
+caracteres no ASCII, y que la decodificación de peticiones usa el mismo camino.
+"""
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask import jsonify
+
+from app.utils import json_provider
+from app.utils.json_provider import FastJSONProvider
+
+
+def test_dumps_is_compact_ordered_and_utf8():
+    data = {'z': 1, 'a': 'canción', 'lista': [1, None, True]}
+
+    assert json_provider.dumps(data) == '{"z":1,"a":"canción","lista":[1,null,true]}'
+    assert json_provider.dumps_bytes(data) == json_provider.dumps(data).encode('utf-8')
+
+
+def test_dumps_handles_flask_types_and_big_integers():
+    data = {
+        'fecha': datetime(2023, 6, 15, 14, 30, tzinfo=timezone.utc),
+        'importe': Decimal('1.50'),
+        'grande': 2 ** 70
+    }
+
+    assert json.loads(json_provider.dumps(data)) == {
+        'fecha': 'Thu, 15 Jun 2023 14:30:00 GMT',
+        'importe': '1.50',
+        'grande': 2 ** 70
+    }
+
+
+def test_loads_accepts_bytes_and_rejects_malformed_json():
+    assert json_provider.loads(b'{"a": "\xc3\xb1"}') == {'a': 'ñ'}
+    with pytest.raises(ValueError):
+        json_provider.loads(b'{"a": ')
+
+
+def test_app_responses_are_compact(app):
+    assert isinstance(app.json, FastJSONProvider)
+
+    with app.test_request_context():
+        response = jsonify(status='success', data={'texto': 'año'})
+
+    assert response.get_data() == '{"status":"success","data":{"texto":"año"}}\n'.encode('utf-8')
+
+
+def test_debug_responses_are_indented(app):
+    app.debug = True
+    with app.test_request_context():
+        body = jsonify(a=1).get_data(as_text=True)
+
+    assert body == '{\n  "a": 1\n}\n'
+
+
+def test_request_bodies_are_decoded_by_the_provider(authenticated_client):
+    response = authenticated_client.post(
+        '/api/messages', data=b'{"message_id": ', content_type='application/json'
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
@@ -0,0 +1,52 @@
+"""
+Pruebas unitarias para LRUCache.
+Este módulo prueba la expulsión por entradas y por bytes, la caducidad y las métricas.
+"""
+from app.utils import lru_cache
+from app.utils.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_entries():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+
+    cache.put("c", b"3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_by_bytes_and_skips_oversized_values():
+    cache = LRUCache(max_entries=10, max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"123")
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 8
+
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+
+def test_invalidate_and_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru_cache.time, "monotonic", lambda: now[0])
+    cache = LRUCache(ttl=10)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    assert cache.get("a") is None
+
+    now[0] += 11
+    assert cache.get("b") is None
+
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["entries"] == 0
+    assert stats["misses"] == 2
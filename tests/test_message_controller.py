@@ -159,6 +159,91 @@ class TestMessageController:
         assert data2["pagination"]["has_next"] is True
         assert data2["pagination"]["has_prev"] is True
 
+    def test_get_messages_by_session_with_cursor(self, authenticated_client):
+        """Prueba la paginación por cursor hacia delante, hacia atrás y desde el final."""
+        session_id = "session-cursor"
+
+        for i in range(7):
+            authenticated_client.post(
+                "/api/messages",
+                data=json.dumps({
+                    "message_id": f"msg-cur-{i}",
+                    "session_id": session_id,
+                    "content": f"Contenido {i}",
+                    "timestamp": "2023-06-15T14:30:00Z",
+                    "sender": "user",
+                }),
+                content_type="application/json",
+            )
+
+        seen = []
+        url = f"/api/messages/{session_id}?limit=3&after="
+        while True:
+            data = json.loads(authenticated_client.get(url).data)
+            seen.extend(message["message_id"] for message in data["data"])
+            assert "total" not in data["pagination"]
+            if not data["pagination"]["has_next"]:
+                break
+            url = f"/api/messages/{session_id}?limit=3&after={data['pagination']['next_cursor']}"
+        assert seen == [f"msg-cur-{i}" for i in range(7)]
+
+        tail = json.loads(authenticated_client.get(f"/api/messages/{session_id}?limit=3&tail=true").data)
+        assert [m["message_id"] for m in tail["data"]] == ["msg-cur-4", "msg-cur-5", "msg-cur-6"]
+        assert tail["pagination"]["has_prev"] is True
+        assert tail["pagination"]["has_next"] is False
+
+        before = json.loads(authenticated_client.get(
+            f"/api/messages/{session_id}?limit=3&before={tail['pagination']['prev_cursor']}"
+        ).data)
+        assert [m["message_id"] for m in before["data"]] == ["msg-cur-1", "msg-cur-2", "msg-cur-3"]
+        assert before["pagination"]["has_next"] is True
+
+    def test_get_messages_by_session_not_modified(self, authenticated_client, monkeypatch):
+        """La ETag de la página cambia con cada escritura en la sesión y con los parámetros."""
+        from app.controllers import message_controller
+
+        session_id = "etag-session"
+        message = {
+            "message_id": "etag-1",
+            "session_id": session_id,
+            "content": "Hola",
+            "timestamp": "2023-06-15T14:30:00Z",
+            "sender": "user",
+        }
+        authenticated_client.post("/api/messages", data=json.dumps(message), content_type="application/json")
+        url = f"/api/messages/{session_id}?limit=5"
+
+        first = authenticated_client.get(url)
+        etag = first.headers["ETag"]
+        assert first.status_code == 200
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        assert authenticated_client.get(f"/api/messages/{session_id}?limit=6").headers["ETag"] != etag
+
+        def fail(*args, **kwargs):
+            raise AssertionError("no debe leer los mensajes")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(message_controller.MessageService, "get_messages_by_session", fail)
+            response = authenticated_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+        message["message_id"] = "etag-2"
+        authenticated_client.post("/api/messages", data=json.dumps(message), content_type="application/json")
+        response = authenticated_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(json.loads(response.data)["data"]) == 2
+
+    def test_get_messages_by_session_invalid_cursor(self, authenticated_client):
+        """Prueba cursores mal formados y combinaciones inválidas."""
+        response = authenticated_client.get("/api/messages/session-x?after=no-es-un-cursor")
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_CURSOR"
+
+        response = authenticated_client.get("/api/messages/session-x?after=&tail=true")
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "VALIDATION_ERROR"
+
     def test_get_messages_by_session_with_sender_filter(self, authenticated_client):
         """Prueba obtención con filtro por sender."""
         session_id = "session-filter"
@@ -216,6 +301,59 @@ class TestMessageController:
         assert data["status"] == "success"
         assert data["data"]["message_id"] == message_id
 
+    def test_get_message_by_id_served_from_cache(self, authenticated_client, sample_message_data):
+        """Las lecturas repetidas se sirven desde la caché LRU."""
+        authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+        url = f"/api/message/{sample_message_data['message_id']}"
+
+        first = authenticated_client.get(url)
+        second = authenticated_client.get(url)
+
+        assert first.status_code == second.status_code == 200
+        assert first.data == second.data
+        assert json.loads(second.data)["data"]["content"] == sample_message_data["content"]
+        cache_stats = json.loads(authenticated_client.get("/api/metrics").data)["data"]["message_cache"]
+        assert cache_stats["hits"] == 1
+        assert cache_stats["misses"] == 1
+
+    def test_get_message_by_id_not_modified(self, authenticated_client, sample_message_data, monkeypatch):
+        """Un If-None-Match vigente responde 304 sin serializar el mensaje."""
+        from app.controllers import message_controller
+
+        authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+        url = f"/api/message/{sample_message_data['message_id']}"
+        etag = authenticated_client.get(url).headers["ETag"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("no debe serializar el mensaje")
+
+        monkeypatch.setattr(message_controller.MessageService, "get_message_json", fail)
+        response = authenticated_client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+
+    def test_get_message_by_id_stale_etag(self, authenticated_client, sample_message_data):
+        """Una ETag que no coincide devuelve el mensaje completo."""
+        authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+        url = f"/api/message/{sample_message_data['message_id']}"
+
+        response = authenticated_client.get(url, headers={"If-None-Match": '"m0"'})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != '"m0"'
+
     def test_get_message_by_id_not_found(self, authenticated_client):
         """Prueba obtención de mensaje inexistente."""
         response = authenticated_client.get("/api/message/non-existent")
@@ -265,7 +403,7 @@ class TestMessageController:
             authenticated_client.post("/api/messages", data=json.dumps(msg), content_type="application/json")
     
     def test_create_message_duplicate_id(self, authenticated_client, sample_message_data):
-        """Prueba que no se permiten mensajes con message_id duplicado."""
+        """Prueba que no se permiten mensajes con message_id duplicado y distinto contenido."""
         response1 = authenticated_client.post(
             "/api/messages",
             data=json.dumps(sample_message_data),
@@ -275,7 +413,7 @@ class TestMessageController:
 
         response2 = authenticated_client.post(
             "/api/messages",
-            data=json.dumps(sample_message_data),
+            data=json.dumps({**sample_message_data, "content": "Otro contenido"}),
             content_type="application/json",
         )
 
@@ -284,6 +422,31 @@ class TestMessageController:
         assert error_data["status"] == "error"
         
         assert "ya existe" in error_data["error"]["message"].lower()
+
+    def test_create_message_identical_replay(self, authenticated_client, sample_message_data, monkeypatch):
+        """Un reintento idéntico devuelve 200 con el mensaje almacenado y no se retransmite."""
+        from app.controllers import message_controller
+
+        response1 = authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+        assert response1.status_code == 201
+
+        broadcasts = []
+        monkeypatch.setattr(message_controller, "broadcast_new_message", broadcasts.append)
+        response2 = authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+
+        assert response2.status_code == 200
+        data = json.loads(response2.data)
+        assert data["status"] == "success"
+        assert data["data"] == json.loads(response1.data)["data"]
+        assert broadcasts == []
         
 # 🔹 Nuevas pruebas adicionales para mejorar cobertura
 class TestMessageControllerExtra:
@@ -361,6 +524,20 @@ class TestMessageControllerExtra:
         assert d["error"]["code"] == "INTERNAL_ERROR"
 
     
+    def test_get_session_stats_not_modified(self, authenticated_client, monkeypatch):
+        """Las estadísticas se validan con la versión de la sesión."""
+        from app.controllers import message_controller
+
+        url = "/api/sessions/stats-etag/stats"
+        etag = authenticated_client.get(url).headers["ETag"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("no debe calcular las estadísticas")
+
+        monkeypatch.setattr(message_controller.MessageService, "get_session_statistics", fail)
+        response = authenticated_client.get(url, headers={"If-None-Match": f'W/{etag}, "otro"'})
+        assert response.status_code == 304
+
     def test_get_session_stats_with_data(self, authenticated_client):
         """Prueba estadísticas con mensajes presentes."""
         session_id = "stats-session"
@@ -378,6 +555,9 @@ class TestMessageControllerExtra:
         assert r.status_code == 200
         d = json.loads(r.data)
         assert d["data"]["total_messages"] == 2
+        assert d["data"]["message_length"]["p50"] == pytest.approx(10, rel=0.02)
+        assert d["data"]["words_by_sender"] == {"user": 4}
+        assert d["data"]["response_time_seconds"]["count"] == 0
         
     def test_get_messages_empty_session_id(self, authenticated_client):
         """Prueba error cuando el session_id está vacío."""
@@ -411,6 +591,56 @@ class TestMessageControllerExtra:
         assert len(data["data"]) >= 1
         assert "pagination" in data
 
+    def test_fields_projection_on_list_search_and_get(self, authenticated_client, sample_message_data):
+        """fields limita los campos en listados, búsqueda y lectura individual."""
+        authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+        session_id = sample_message_data["session_id"]
+        message_id = sample_message_data["message_id"]
+
+        page = json.loads(authenticated_client.get(
+            f"/api/messages/{session_id}?fields=sender,message_id,timestamp"
+        ).data)
+        assert page["data"] == [{
+            "message_id": message_id,
+            "timestamp": "2023-06-15T14:30:00Z",
+            "sender": "user"
+        }]
+        assert page["pagination"]["total"] == 1
+
+        tail = json.loads(authenticated_client.get(f"/api/messages/{session_id}?tail=true&fields=message_id").data)
+        assert tail["data"] == [{"message_id": message_id}]
+        assert tail["pagination"]["prev_cursor"] is not None
+
+        search = json.loads(authenticated_client.get("/api/messages/search/all?query=prueba&fields=message_id,metadata.word_count").data)
+        assert search["data"][0] == {"message_id": message_id, "metadata": {"word_count": 6}}
+
+        url = f"/api/message/{message_id}?fields=content"
+        single = authenticated_client.get(url)
+        assert json.loads(single.data)["data"] == {"content": sample_message_data["content"]}
+        full = authenticated_client.get(f"/api/message/{message_id}")
+        assert single.headers["ETag"] != full.headers["ETag"]
+        assert authenticated_client.get(url, headers={"If-None-Match": single.headers["ETag"]}).status_code == 304
+
+    def test_fields_projection_rejects_unknown_fields(self, authenticated_client, sample_message_data):
+        """Un campo desconocido devuelve 400 INVALID_FIELDS en todos los endpoints."""
+        authenticated_client.post(
+            "/api/messages",
+            data=json.dumps(sample_message_data),
+            content_type="application/json",
+        )
+        for url in (
+            f"/api/messages/{sample_message_data['session_id']}?fields=id",
+            f"/api/message/{sample_message_data['message_id']}?fields=id",
+            "/api/messages/search/all?query=prueba&fields=id",
+        ):
+            response = authenticated_client.get(url)
+            assert response.status_code == 400, url
+            assert json.loads(response.data)["error"]["code"] == "INVALID_FIELDS"
+
     def test_search_messages_internal_error(self, authenticated_client, monkeypatch):
         """Prueba que búsqueda global maneja errores inesperados."""
         from app.controllers import message_controller
@@ -427,6 +657,94 @@ class TestMessageControllerExtra:
         assert response.status_code == 500
         assert data["error"]["code"] == "INTERNAL_ERROR"
 
+    def test_search_modes(self, authenticated_client, sample_message_data):
+        """mode=substring busca dentro de las palabras y mode=regex verifica el patrón."""
+        for i, content in enumerate(["Pedido PED-2023-00042 enviado", "Pedido PED-pendiente"]):
+            authenticated_client.post(
+                "/api/messages",
+                data=json.dumps({**sample_message_data, "message_id": f"modo-{i}", "content": content}),
+                content_type="application/json",
+            )
+
+        def search(params):
+            response = authenticated_client.get(f"/api/messages/search/all?{params}")
+            return response.status_code, json.loads(response.data)
+
+        status, data = search("query=2023-000&mode=substring")
+        assert status == 200
+        assert [message["message_id"] for message in data["data"]] == ["modo-0"]
+
+        status, data = search("query=PED-%5Cd%2B&mode=regex")
+        assert status == 200
+        assert [message["message_id"] for message in data["data"]] == ["modo-0"]
+        assert data["pagination"]["total_results"] == 1
+
+        for params, code in (
+            ("query=pedido&mode=fuzzy", "INVALID_SEARCH_MODE"),
+            ("query=ab", "SEARCH_QUERY_TOO_SHORT"),
+            ("query=%5Cd%2B&mode=regex", "REGEX_TOO_BROAD"),
+            ("query=PED(&mode=regex", "INVALID_REGEX"),
+        ):
+            status, data = search(params)
+            assert status == 400, params
+            assert data["error"]["code"] == code
+
+    def test_search_relevance_with_snippets(self, authenticated_client, sample_message_data):
+        """sort=relevance ordena por BM25 y snippets=true añade el fragmento resaltado."""
+        for i, content in enumerate(["Factura y pedido", "Pedido, pedido y más pedido"]):
+            authenticated_client.post(
+                "/api/messages",
+                data=json.dumps({**sample_message_data, "message_id": f"rel-{i}", "content": content}),
+                content_type="application/json",
+            )
+
+        response = authenticated_client.get("/api/messages/search/all?query=pedido&sort=relevance&snippets=true")
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [message["message_id"] for message in data["data"]] == ["rel-1", "rel-0"]
+        assert data["data"][1]["snippet"] == "Factura y <mark>pedido</mark>"
+
+        response = authenticated_client.get("/api/messages/search/all?query=pedido&sort=random")
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_SORT"
+
+    def test_search_count_none_reports_has_more(self, authenticated_client, sample_message_data):
+        """count=none no calcula el total y responde has_more."""
+        for i in range(3):
+            authenticated_client.post(
+                "/api/messages",
+                data=json.dumps({**sample_message_data, "message_id": f"count-{i}", "content": f"Pedido número {i}"}),
+                content_type="application/json",
+            )
+
+        response = authenticated_client.get("/api/messages/search/all?query=pedido&limit=2&count=none")
+        assert response.status_code == 200
+        pagination = json.loads(response.data)["pagination"]
+        assert pagination["total_results"] is None
+        assert pagination["has_more"] is True
+        assert pagination["next_offset"] == 2
+
+        response = authenticated_client.get("/api/messages/search/all?query=pedido&count=all")
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_COUNT"
+
+    def test_search_regex_index_not_ready(self, authenticated_client, monkeypatch):
+        """La búsqueda por regex responde 503 mientras se rellena el índice de trigramas."""
+        from app.controllers import message_controller
+        from app.utils.exceptions import SearchIndexNotReadyError
+
+        def mock_search(*args, **kwargs):
+            raise SearchIndexNotReadyError()
+
+        monkeypatch.setattr(
+            message_controller.MessageService, "search_messages_globally", mock_search
+        )
+
+        response = authenticated_client.get("/api/messages/search/all?query=PED-%5Cd&mode=regex")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "60"
+        assert json.loads(response.data)["error"]["code"] == "SEARCH_INDEX_NOT_READY"
+
     def test_create_message_database_error(self, authenticated_client, monkeypatch, sample_message_data):
         """Prueba que create_message maneja DatabaseError."""
         from app.controllers import message_controller
@@ -449,3 +767,533 @@ class TestMessageControllerExtra:
         # 🔹 DatabaseError usa code fijo
         assert data["error"]["code"] in ("DATABASE_ERROR", "INTERNAL_ERROR")
         assert "fallo de base de datos" in data["error"]["message"]
+
+
+class TestBatchIngestion:
+    """Pruebas para POST /api/messages/batch."""
+
+    def _batch(self, session_id, count, prefix="msg-batch"):
+        return [
+            {
+                "message_id": f"{prefix}-{i}",
+                "session_id": session_id,
+                "content": f"Mensaje de lote {i}",
+                "timestamp": "2023-06-15T14:30:00Z",
+                "sender": "user" if i % 2 == 0 else "system",
+            }
+            for i in range(count)
+        ]
+
+    def test_create_batch_success(self, authenticated_client):
+        """Todos los mensajes válidos se crean y se devuelven en orden."""
+        batch = self._batch("session-batch", 5)
+        response = authenticated_client.post(
+            "/api/messages/batch", data=json.dumps(batch), content_type="application/json"
+        )
+
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert data["status"] == "success"
+        assert data["summary"] == {"total": 5, "created": 5, "replayed": 0, "failed": 0}
+        assert [r["message_id"] for r in data["data"]] == [m["message_id"] for m in batch]
+        assert all(r["status"] == "created" for r in data["data"])
+
+        listed = json.loads(authenticated_client.get("/api/messages/session-batch").data)
+        assert listed["pagination"]["total"] == 5
+
+    def test_create_batch_partial_failure(self, authenticated_client, sample_message_data):
+        """Los errores por elemento no impiden guardar el resto del lote."""
+        authenticated_client.post(
+            "/api/messages", data=json.dumps(sample_message_data), content_type="application/json"
+        )
+        batch = self._batch("session-batch-partial", 2)
+        batch.append({**batch[0]})  # duplicado dentro del lote
+        batch.append({**sample_message_data, "content": "Otro contenido"})  # ya existe con otro contenido
+        batch.append({**batch[1], "message_id": "msg-batch-spam", "content": "esto es spam"})
+        batch.append({"message_id": "msg-batch-bad", "sender": "otro"})
+
+        response = authenticated_client.post(
+            "/api/messages/batch", data=json.dumps(batch), content_type="application/json"
+        )
+
+        assert response.status_code == 207
+        data = json.loads(response.data)
+        assert data["status"] == "partial"
+        assert data["summary"] == {"total": 6, "created": 2, "replayed": 0, "failed": 4}
+        codes = [r.get("error", {}).get("code") for r in data["data"]]
+        assert codes == [
+            None,
+            None,
+            "VALIDATION_ERROR",
+            "VALIDATION_ERROR",
+            "INAPPROPRIATE_CONTENT",
+            "SCHEMA_VALIDATION_ERROR",
+        ]
+        assert [r["index"] for r in data["data"]] == list(range(6))
+
+    def test_create_batch_identical_replay(self, authenticated_client):
+        """Reenviar un lote ya guardado responde 200 con los mensajes almacenados."""
+        batch = self._batch("session-batch-replay", 3)
+        first = authenticated_client.post(
+            "/api/messages/batch", data=json.dumps(batch), content_type="application/json"
+        )
+        assert first.status_code == 201
+
+        response = authenticated_client.post(
+            "/api/messages/batch", data=json.dumps(batch), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["summary"] == {"total": 3, "created": 0, "replayed": 3, "failed": 0}
+        assert all(r["status"] == "replayed" for r in data["data"])
+        assert [r["data"] for r in data["data"]] == [r["data"] for r in json.loads(first.data)["data"]]
+
+    def test_create_batch_all_failed(self, authenticated_client):
+        """Si ningún mensaje es válido se responde 400."""
+        response = authenticated_client.post(
+            "/api/messages/batch",
+            data=json.dumps([{"message_id": "x"}, "no-es-un-objeto"]),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert data["status"] == "error"
+        assert data["summary"]["failed"] == 2
+
+    def test_create_batch_requires_array(self, authenticated_client, sample_message_data):
+        """El cuerpo debe ser un arreglo JSON."""
+        response = authenticated_client.post(
+            "/api/messages/batch", data=json.dumps(sample_message_data), content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_PAYLOAD"
+
+    def test_create_batch_empty(self, authenticated_client):
+        """Un arreglo vacío se rechaza."""
+        response = authenticated_client.post(
+            "/api/messages/batch", data="[]", content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "EMPTY_PAYLOAD"
+
+    def test_create_batch_too_large(self, app, authenticated_client):
+        """Los lotes que superan BATCH_MAX_SIZE se rechazan completos."""
+        app.config["BATCH_MAX_SIZE"] = 3
+        response = authenticated_client.post(
+            "/api/messages/batch",
+            data=json.dumps(self._batch("session-batch-big", 4)),
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "BATCH_TOO_LARGE"
+
+    def test_create_batch_database_error(self, authenticated_client, monkeypatch):
+        """Un fallo de la transacción devuelve 500 y no guarda nada."""
+        from app.repositories.message_repository import MessageRepository
+        from app.utils.exceptions import DatabaseError
+
+        def mock_save_all(*args, **kwargs):
+            raise DatabaseError("fallo en lote")
+
+        monkeypatch.setattr(MessageRepository, "save_all", mock_save_all)
+
+        response = authenticated_client.post(
+            "/api/messages/batch",
+            data=json.dumps(self._batch("session-batch-err", 2)),
+            content_type="application/json",
+        )
+        assert response.status_code == 500
+        assert json.loads(response.data)["error"]["code"] == "DATABASE_ERROR"
+
+
+class TestNDJSONImport:
+    """Pruebas para POST /api/messages/ndjson."""
+
+    def _ndjson(self, messages):
+        return "\n".join(json.dumps(m) for m in messages) + "\n"
+
+    def _messages(self, count, session_id="session-ndjson"):
+        return [
+            {
+                "message_id": f"msg-ndjson-{i}",
+                "session_id": session_id,
+                "content": f"Mensaje importado {i}",
+                "timestamp": "2023-06-15T14:30:00Z",
+                "sender": "user",
+            }
+            for i in range(count)
+        ]
+
+    def _report(self, response):
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_import_ndjson_in_chunks(self, authenticated_client):
+        """Se emite un reporte por bloque y un resumen final."""
+        response = authenticated_client.post(
+            "/api/messages/ndjson?chunk_size=2",
+            data=self._ndjson(self._messages(5)),
+            content_type="application/x-ndjson",
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        report = self._report(response)
+        assert [line["status"] for line in report] == ["chunk", "chunk", "chunk", "completed"]
+        assert [(line["first_line"], line["last_line"]) for line in report[:3]] == [(1, 2), (3, 4), (5, 5)]
+        assert report[-1]["summary"] == {"lines": 5, "created": 5, "replayed": 0, "failed": 0, "chunks": 3}
+
+        listed = json.loads(authenticated_client.get("/api/messages/session-ndjson").data)
+        assert listed["pagination"]["total"] == 5
+
+    def test_import_ndjson_reports_line_errors(self, authenticated_client):
+        """Las líneas inválidas se reportan por número de línea sin detener la importación."""
+        messages = self._messages(2)
+        body = (
+            json.dumps(messages[0]) + "\n"
+            + "\n"
+            + "{esto no es json\n"
+            + json.dumps({**messages[1], "content": "contiene malware"}) + "\n"
+            + json.dumps(messages[1]) + "\n"
+            + json.dumps({"message_id": "sin-campos"}) + "\n"
+        )
+        response = authenticated_client.post(
+            "/api/messages/ndjson", data=body, content_type="application/x-ndjson"
+        )
+
+        report = self._report(response)
+        chunk = report[0]
+        assert chunk["created"] == 2
+        assert [(e["line"], e["error"]["code"]) for e in chunk["errors"]] == [
+            (3, "INVALID_JSON"),
+            (4, "INAPPROPRIATE_CONTENT"),
+            (6, "SCHEMA_VALIDATION_ERROR"),
+        ]
+        assert report[-1]["summary"]["failed"] == 3
+
+    def test_import_ndjson_line_too_long(self, app, authenticated_client):
+        """Las líneas que superan el límite se descartan sin cargarlas completas."""
+        app.config["NDJSON_MAX_LINE_BYTES"] = 200
+        messages = self._messages(2)
+        long_line = json.dumps({**messages[0], "content": "x" * 1000})
+        response = authenticated_client.post(
+            "/api/messages/ndjson",
+            data=long_line + "\n" + json.dumps(messages[1]) + "\n",
+            content_type="application/x-ndjson",
+        )
+
+        report = self._report(response)
+        assert report[0]["errors"][0]["line"] == 1
+        assert report[0]["created"] == 1
+
+    def test_import_ndjson_requires_content_type(self, authenticated_client):
+        """Solo se acepta application/x-ndjson."""
+        response = authenticated_client.post(
+            "/api/messages/ndjson", data="{}", content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_CONTENT_TYPE"
+
+    def test_import_ndjson_database_error(self, authenticated_client, monkeypatch):
+        """Un fallo de base de datos termina el flujo con una línea de error."""
+        from app.repositories.message_repository import MessageRepository
+        from app.utils.exceptions import DatabaseError
+
+        def mock_save_all(*args, **kwargs):
+            raise DatabaseError("fallo en bloque")
+
+        monkeypatch.setattr(MessageRepository, "save_all", mock_save_all)
+
+        response = authenticated_client.post(
+            "/api/messages/ndjson",
+            data=self._ndjson(self._messages(2)),
+            content_type="application/x-ndjson",
+        )
+        report = self._report(response)
+        assert report[-1]["status"] == "error"
+        assert report[-1]["error"]["code"] == "DATABASE_ERROR"
+
+
+class TestMessageLookup:
+    """Pruebas para POST /api/messages/lookup."""
+
+    def test_lookup_returns_found_and_not_found(self, authenticated_client, sample_message_data):
+        """Un elemento por ID distinto, en el orden recibido, igual que GET /api/message/<id>."""
+        authenticated_client.post("/api/messages", json=sample_message_data)
+        authenticated_client.post("/api/messages", json={**sample_message_data, "message_id": "msg-test-456"})
+
+        response = authenticated_client.post("/api/messages/lookup", json={
+            "message_ids": ["msg-test-456", "no-existe", "msg-test-123", "msg-test-456"]
+        })
+
+        assert response.status_code == 200
+        body = json.loads(response.data)
+        assert list(body["data"]) == ["msg-test-456", "no-existe", "msg-test-123"]
+        assert body["data"]["no-existe"] == {"status": "not_found", "data": None}
+        single = json.loads(authenticated_client.get("/api/message/msg-test-123").data)["data"]
+        assert body["data"]["msg-test-123"] == {"status": "found", "data": single}
+        assert body["summary"] == {"requested": 3, "found": 2, "not_found": 1}
+
+    def test_lookup_fills_and_uses_the_message_cache(self, app, authenticated_client, sample_message_data):
+        authenticated_client.post("/api/messages", json=sample_message_data)
+        cache = app.extensions["message_service"].message_cache
+
+        first = authenticated_client.post("/api/messages/lookup", json={"message_ids": ["msg-test-123"]})
+        assert cache.get("msg-test-123") is not None
+        second = authenticated_client.post("/api/messages/lookup", json={"message_ids": ["msg-test-123"]})
+
+        assert first.data == second.data
+        etag = authenticated_client.get("/api/message/msg-test-123").headers["ETag"]
+        assert etag == f'"{cache.get("msg-test-123").etag}"'
+
+    def test_lookup_validates_payload(self, app, authenticated_client):
+        response = authenticated_client.post("/api/messages/lookup", json={"message_ids": []})
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "SCHEMA_VALIDATION_ERROR"
+
+        response = authenticated_client.post("/api/messages/lookup", json=["msg-1"])
+        assert response.status_code == 400
+
+        app.config["LOOKUP_MAX_IDS"] = 2
+        response = authenticated_client.post("/api/messages/lookup", json={"message_ids": ["a", "b", "c"]})
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["details"] == {"max_ids": 2, "received": 3}
+
+    def test_lookup_database_error(self, authenticated_client, monkeypatch):
+        from app.repositories.message_repository import MessageRepository
+        from app.utils.exceptions import DatabaseError
+
+        def mock_find(*args, **kwargs):
+            raise DatabaseError("fallo")
+
+        monkeypatch.setattr(MessageRepository, "find_rendered_by_message_ids", mock_find)
+
+        response = authenticated_client.post("/api/messages/lookup", json={"message_ids": ["x"]})
+        assert response.status_code == 500
+        assert json.loads(response.data)["error"]["code"] == "DATABASE_ERROR"
+
+
+class TestSessionExport:
+    """Pruebas para GET /api/sessions/<session_id>/export."""
+
+    def _create(self, client, count, session_id="session-export"):
+        for i in range(count):
+            response = client.post("/api/messages", json={
+                "message_id": f"msg-export-{i}",
+                "session_id": session_id,
+                "content": f"Mensaje, exportado \"{i}\"",
+                "timestamp": f"2023-06-15T14:3{i}:00Z",
+                "sender": "user" if i % 2 == 0 else "system",
+            })
+            assert response.status_code == 201
+
+    def test_export_ndjson_matches_listing(self, app, authenticated_client):
+        """El NDJSON contiene los mismos documentos que el listado, en orden, leídos por bloques."""
+        app.config["EXPORT_BATCH_SIZE"] = 2
+        self._create(authenticated_client, 5)
+
+        response = authenticated_client.get("/api/sessions/session-export/export")
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.headers["Content-Disposition"].startswith("attachment")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        listed = json.loads(authenticated_client.get("/api/messages/session-export").data)["data"]
+        assert lines == listed
+        assert [line["message_id"] for line in lines] == [f"msg-export-{i}" for i in range(5)]
+
+    def test_export_csv_with_fields(self, app, authenticated_client):
+        """El CSV lleva una cabecera con las rutas de los campos y escapa el contenido."""
+        import csv
+        import io
+
+        app.config["EXPORT_BATCH_SIZE"] = 2
+        self._create(authenticated_client, 3)
+
+        response = authenticated_client.get(
+            "/api/sessions/session-export/export?format=csv&fields=message_id,content,metadata.word_count"
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/csv"
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert rows[0] == ["message_id", "content", "metadata.word_count"]
+        assert rows[1:] == [[f"msg-export-{i}", f'Mensaje, exportado "{i}"', "3"] for i in range(3)]
+
+    def test_export_csv_all_fields(self, authenticated_client):
+        """Sin fields el CSV incluye todos los campos publicados."""
+        self._create(authenticated_client, 1)
+
+        body = authenticated_client.get("/api/sessions/session-export/export?format=csv").get_data(as_text=True)
+
+        header, row = body.splitlines()
+        assert header.split(",")[:5] == ["message_id", "session_id", "content", "timestamp", "sender"]
+        assert "2023-06-15T14:30:00Z" in row
+
+    def test_export_unknown_session_returns_404(self, authenticated_client):
+        response = authenticated_client.get("/api/sessions/no-existe/export")
+
+        assert response.status_code == 404
+        assert json.loads(response.data)["error"]["code"] == "NOT_FOUND"
+
+    def test_export_rejects_invalid_format_and_fields(self, authenticated_client):
+        self._create(authenticated_client, 1)
+
+        response = authenticated_client.get("/api/sessions/session-export/export?format=xml")
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_FORMAT"
+
+        response = authenticated_client.get("/api/sessions/session-export/export?fields=secreto")
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_FIELDS"
+
+    def test_export_database_error_mid_stream(self, authenticated_client, monkeypatch):
+        """Un fallo de base de datos tras enviar las cabeceras termina el NDJSON con una línea de error."""
+        from app.repositories.message_repository import MessageRepository
+        from app.utils.exceptions import DatabaseError
+
+        self._create(authenticated_client, 1)
+
+        def mock_iter(*args, **kwargs):
+            raise DatabaseError("fallo al leer")
+            yield
+
+        monkeypatch.setattr(MessageRepository, "iter_session_messages", mock_iter)
+
+        response = authenticated_client.get("/api/sessions/session-export/export")
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert lines[-1]["error"]["code"] == "DATABASE_ERROR"
+
+
+    def test_write_while_export_is_streaming(self, monkeypatch, tmp_path):
+        """Una exportación a medias no bloquea al escritor (ni en modo rollback, sin WAL)."""
+        from app import create_app
+        from app.config import TestingConfig
+        from app.models.message import db
+
+        monkeypatch.setattr(TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'export.db'}")
+        monkeypatch.setattr(TestingConfig, "SQLITE_JOURNAL_MODE", "delete")
+        monkeypatch.setattr(TestingConfig, "GROUP_COMMIT_ENABLED", True)
+        monkeypatch.setattr(TestingConfig, "API_KEYS", ["test-api-key"])
+        file_app = create_app("testing")
+        file_app.config["EXPORT_BATCH_SIZE"] = 2
+        writer = file_app.extensions["sqlite_writer"]
+        with file_app.app_context():
+            db.create_all()
+        client = file_app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = "Bearer test-api-key"
+        self._create(client, 5)
+
+        response = client.get("/api/sessions/session-export/export", buffered=False)
+        chunks = iter(response.response)
+        first = next(chunks)
+
+        written = client.post("/api/messages", json={
+            "message_id": "msg-export-durante",
+            "session_id": "otra-sesion",
+            "content": "Escrito durante la exportación",
+            "timestamp": "2023-06-15T15:00:00Z",
+            "sender": "user",
+        })
+        body = first + b"".join(chunks)
+        response.close()
+        writer.stop()
+
+        assert written.status_code == 201
+        lines = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        assert [line["message_id"] for line in lines] == [f"msg-export-{i}" for i in range(5)]
+
+class TestMessageIdFilter:
+    """Pruebas del filtro de message_id a través de la API."""
+
+    def test_unknown_id_404_and_metrics(self, app, authenticated_client, sample_message_data):
+        """Un ID inexistente responde 404 descartado por el filtro y se refleja en /api/metrics."""
+        authenticated_client.post(
+            "/api/messages", data=json.dumps(sample_message_data), content_type="application/json"
+        )
+
+        assert authenticated_client.get("/api/message/no-existe").status_code == 404
+        assert authenticated_client.get(f"/api/message/{sample_message_data['message_id']}").status_code == 200
+
+        response = authenticated_client.get("/api/metrics")
+        assert response.status_code == 200
+        metrics = json.loads(response.data)["data"]["message_id_filter"]
+        assert metrics["ready"] is True
+        assert metrics["items"] == 1
+        assert metrics["negatives"] == 1
+        assert metrics["memory_bytes"] > 0
+        assert "observed_false_positive_rate" in metrics
+        assert "estimated_false_positive_rate" in metrics
+
+    def test_metrics_requires_api_key(self, client):
+        """/api/metrics exige clave de API."""
+        response = client.get("/api/metrics", headers={"Authorization": ""})
+        assert response.status_code == 401
+
+
+class TestIdempotencyKey:
+    """Pruebas para la cabecera Idempotency-Key en POST /api/messages."""
+
+    def _post(self, client, data, key="idem-1"):
+        return client.post(
+            "/api/messages",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_replay_returns_original_response_without_service(
+        self, authenticated_client, monkeypatch, sample_message_data
+    ):
+        """Un reintento recibe la respuesta original byte a byte sin llegar al servicio."""
+        from app.controllers import message_controller
+
+        first = self._post(authenticated_client, sample_message_data)
+        assert first.status_code == 201
+
+        def fail(*args, **kwargs):
+            raise AssertionError("no debe llamarse al servicio")
+
+        monkeypatch.setattr(message_controller.MessageService, "process_message", fail)
+        replay = self._post(authenticated_client, sample_message_data)
+
+        assert replay.status_code == 201
+        assert replay.data == first.data
+        assert replay.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+
+    def test_same_key_different_body_returns_422(self, authenticated_client, sample_message_data):
+        """Reutilizar la clave con otro cuerpo responde 422."""
+        self._post(authenticated_client, sample_message_data)
+        response = self._post(authenticated_client, {**sample_message_data, "content": "Otro"})
+
+        assert response.status_code == 422
+        assert json.loads(response.data)["error"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+
+    def test_errors_are_not_cached(self, authenticated_client, sample_message_data):
+        """Una respuesta de error no se guarda: el reintento se procesa de nuevo."""
+        invalid = {**sample_message_data, "content": "esto es spam"}
+        assert self._post(authenticated_client, invalid).status_code == 400
+
+        response = self._post(authenticated_client, invalid)
+        assert response.status_code == 400
+        assert "Idempotent-Replayed" not in response.headers
+
+    def test_keys_are_scoped_by_api_key(self, app, authenticated_client, sample_message_data):
+        """La misma clave con otra API key no reenvía la respuesta de otro cliente."""
+        app.config["API_KEYS"] = ["test-api-key", "other-key"]
+        self._post(authenticated_client, sample_message_data)
+
+        other = app.test_client()
+        other.environ_base["HTTP_AUTHORIZATION"] = "Bearer other-key"
+        response = self._post(other, sample_message_data)
+
+        assert "Idempotent-Replayed" not in response.headers
+        assert response.status_code == 200
+
+    def test_invalid_key_returns_400(self, authenticated_client, sample_message_data):
+        response = self._post(authenticated_client, sample_message_data, key="x" * 300)
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"]["code"] == "INVALID_IDEMPOTENCY_KEY"
@@ -154,7 +154,7 @@ class TestMessageRepository:
             # Crear 3 mensajes
             for i in range(3):
                 message = Message(
-                    message_id="test-exists",
+                    message_id=f"test-exists-{i}",
                     session_id=session_id,
                     content=f"Contenido {i}",
                     timestamp=datetime.now(timezone.utc),
@@ -370,12 +370,12 @@ def test_count_by_session_id_database_error(monkeypatch, app):
 
     repo = MessageRepository()
 
-    class DummyQuery:
-        def filter_by(self, **kwargs):
-            raise SQLAlchemyError("count fail")
+    def failing_query(*args, **kwargs):
+        raise SQLAlchemyError("count fail")
 
     with app.app_context():
-        monkeypatch.setattr(Message, "query", DummyQuery())
+        # El recuento se lee de session_counters
+        monkeypatch.setattr(db.session, "query", failing_query)
         with pytest.raises(DatabaseError):
             repo.count_by_session_id("s1")
 
@@ -446,3 +446,257 @@ def test_search_globally_database_error(monkeypatch, app):
         monkeypatch.setattr(Message, "search_globally", bad_search)
         with pytest.raises(DatabaseError):
             repo.search_globally("x", 10, 0)
+
+
+def test_save_all_and_find_by_message_ids(app, message_repository):
+    """save_all guarda el lote completo y find_by_message_ids usa un IN."""
+    with app.app_context():
+        messages = [
+            Message(
+                message_id=f"bulk-{i}",
+                session_id="bulk-session",
+                content=f"Contenido {i}",
+                timestamp=datetime.now(timezone.utc),
+                sender="user",
+            )
+            for i in range(3)
+        ]
+        saved = message_repository.save_all(messages)
+
+        assert all(message.id is not None for message in saved)
+        assert message_repository.count_by_session_id("bulk-session") == 3
+        found = message_repository.find_by_message_ids(["bulk-0", "bulk-2", "otro"])
+        assert {message.message_id for message in found} == {"bulk-0", "bulk-2"}
+        assert message_repository.find_by_message_ids([]) == []
+        assert message_repository.save_all([]) == []
+
+
+def test_save_all_database_error_rolls_back(monkeypatch, app, message_repository):
+    """Si falla el commit no queda ningún mensaje del lote."""
+    with app.app_context():
+        def bad_commit(*args, **kwargs):
+            raise SQLAlchemyError("falla en commit")
+
+        monkeypatch.setattr(db.session, "commit", bad_commit)
+        with pytest.raises(DatabaseError):
+            message_repository.save_all([
+                Message(
+                    message_id="bulk-fail",
+                    session_id="bulk-session",
+                    content="x",
+                    timestamp=datetime.now(timezone.utc),
+                    sender="user",
+                )
+            ])
+        monkeypatch.undo()
+        assert message_repository.count_by_session_id("bulk-session") == 0
+
+
+def test_save_duplicate_raises_with_existing(app, message_repository):
+    """save detecta el duplicado en el INSERT y adjunta el mensaje almacenado."""
+    from app.utils.exceptions import DuplicateMessageError
+
+    with app.app_context():
+        message_repository.save(Message(
+            message_id="dup-1", session_id="dup-session", content="original",
+            timestamp=datetime(2023, 6, 15, 14, 30), sender="user",
+        ))
+        with pytest.raises(DuplicateMessageError) as exc_info:
+            message_repository.save(Message(
+                message_id="dup-1", session_id="dup-session", content="otro",
+                timestamp=datetime(2023, 6, 15, 14, 30), sender="user",
+            ))
+
+        assert exc_info.value.existing.content == "original"
+        assert message_repository.count_by_session_id("dup-session") == 1
+
+
+def test_save_all_skips_conflicts(app, message_repository):
+    """save_all devuelve solo los mensajes insertados y conserva los existentes."""
+    with app.app_context():
+        def make(message_id, content):
+            return Message(
+                message_id=message_id, session_id="conflict-session", content=content,
+                timestamp=datetime.now(timezone.utc), sender="user",
+            )
+
+        message_repository.save(make("conflict-0", "original"))
+        inserted = message_repository.save_all([make("conflict-0", "nuevo"), make("conflict-1", "nuevo")])
+
+        assert [m.message_id for m in inserted] == ["conflict-1"]
+        assert message_repository.find_by_message_id("conflict-0").content == "original"
+        assert [m.message_id for m in message_repository.find_by_message_ids(["conflict-1", "x"])] == ["conflict-1"]
+
+
+def _filtered_repository():
+    from app.repositories.message_id_filter import MessageIdFilter
+    return MessageRepository(id_filter=MessageIdFilter(capacity=1000))
+
+
+def test_id_filter_warms_from_table_and_skips_missing_ids(app, monkeypatch):
+    """El filtro se calienta con los IDs existentes y evita consultar IDs inexistentes."""
+    with app.app_context():
+        MessageRepository().save(Message(
+            message_id="filter-old", session_id="filter-session", content="x",
+            timestamp=datetime.now(timezone.utc), sender="user",
+        ))
+        repo = _filtered_repository()
+
+        assert repo.exists_by_message_id("filter-old")
+        assert repo.id_filter.ready
+
+        queries = []
+        monkeypatch.setattr(Message, "query", property(lambda self: queries.append(1)))
+        assert repo.find_by_message_id("filter-missing") is None
+        assert repo.exists_by_message_id("filter-missing") is False
+        assert repo.find_by_message_ids(["filter-missing"]) == []
+        assert queries == []
+        assert repo.id_filter.stats()["negatives"] == 3
+
+
+def test_id_filter_tracks_inserts_and_deletes(app):
+    """Las inserciones y borrados confirmados actualizan el filtro."""
+    with app.app_context():
+        repo = _filtered_repository()
+        repo.warm_id_filter()
+
+        def make(message_id):
+            return Message(
+                message_id=message_id, session_id="filter-session", content="x",
+                timestamp=datetime.now(timezone.utc), sender="user",
+            )
+
+        repo.save(make("filter-1"))
+        repo.save_all([make("filter-2"), make("filter-3")])
+        assert repo.find_by_message_id("filter-1") is not None
+        found = repo.find_by_message_ids(["filter-2", "filter-3", "x"])
+        assert {message.message_id for message in found} == {"filter-2", "filter-3"}
+
+        assert repo.delete_by_message_id("filter-2")
+        assert not repo.id_filter.might_contain("filter-2")
+        assert repo.find_by_message_id("filter-2") is None
+
+
+def test_id_filter_saturation_falls_back_to_database(app):
+    """Un filtro saturado no descarta consultas y se reconstruye al usarlo."""
+    from app.repositories.message_id_filter import MessageIdFilter
+
+    with app.app_context():
+        repo = MessageRepository(id_filter=MessageIdFilter(capacity=4))
+        repo.warm_id_filter()
+        repo.save_all([
+            Message(
+                message_id=f"sat-{i}", session_id="sat-session", content="x",
+                timestamp=datetime.now(timezone.utc), sender="user",
+            )
+            for i in range(200)
+        ])
+
+        found = repo.find_by_message_ids([f"sat-{i}" for i in range(200)])
+        assert {message.message_id for message in found} == {f"sat-{i}" for i in range(200)}
+        stats = repo.id_filter.stats()
+        assert stats["ready"] and stats["rebuilds"] == 1 and stats["items"] == 200
+
+
+def test_find_by_session_keyset_walks_both_directions(app, message_repository):
+    """Los cursores (timestamp, id) recorren la sesión sin huecos aunque haya timestamps repetidos."""
+    with app.app_context():
+        timestamp = datetime(2023, 6, 15, 14, 30)
+        db.session.add_all([
+            Message(message_id=f"k{i}", session_id="keyset", content="hola", sender="user",
+                    timestamp=timestamp.replace(minute=30 + i // 2))
+            for i in range(5)
+        ])
+        db.session.commit()
+
+        assert [m.message_id for m in message_repository.find_by_session_keyset("keyset", limit=2)[0]] == ["k0", "k1"]
+
+        first, has_more = message_repository.find_by_session_keyset("keyset", limit=2, backward=True)
+        assert [m.message_id for m in first] == ["k3", "k4"]
+        assert has_more is True
+
+        cursor = (first[0].timestamp, first[0].id)
+        previous, has_more = message_repository.find_by_session_keyset("keyset", limit=2, cursor=cursor, backward=True)
+        assert [m.message_id for m in previous] == ["k1", "k2"]
+        assert has_more is True
+
+        cursor = (previous[0].timestamp, previous[0].id)
+        following, has_more = message_repository.find_by_session_keyset("keyset", limit=10, cursor=cursor)
+        assert [m.message_id for m in following] == ["k2", "k3", "k4"]
+        assert has_more is False
+
+
+def test_rendered_pages_match_to_dict(app, message_repository):
+    import json
+    from sqlalchemy import text
+
+    with app.app_context():
+        message_repository.save_all([
+            Message(f"rj-{i}", "rendered", f"mensaje número {i}", datetime(2023, 6, 15, 14, i), "user")
+            for i in range(4)
+        ])
+        # Un UPDATE invalida el JSON guardado: se vuelve a renderizar al leer
+        db.session.execute(text("UPDATE messages SET content = 'editado' WHERE message_id = 'rj-1'"))
+        db.session.commit()
+        assert db.session.execute(
+            text("SELECT rendered_json FROM messages WHERE message_id = 'rj-1'")
+        ).scalar() is None
+
+        messages, total = message_repository.find_by_session_id("rendered", limit=10)
+        rendered, rendered_total = message_repository.find_by_session_id("rendered", limit=10, rendered=True)
+        assert rendered_total == total == 4
+        assert [json.loads(row.json) for row in rendered] == [message.to_dict() for message in messages]
+        assert json.loads(rendered[1].json)["content"] == "editado"
+        assert [(row.id, row.timestamp) for row in rendered] == [(m.id, m.timestamp) for m in messages]
+
+        tail, has_more = message_repository.find_by_session_keyset("rendered", limit=2, backward=True, rendered=True)
+        assert has_more is True
+        assert [json.loads(row.json)["message_id"] for row in tail] == ["rj-2", "rj-3"]
+
+
+def test_iter_session_messages_yields_ordered_batches(app, message_repository):
+    import json
+
+    with app.app_context():
+        message_repository.save_all([
+            Message(f"it-{i}", "iterada", f"mensaje {i}", datetime(2023, 6, 15, 14, 10 - i), "user")
+            for i in range(5)
+        ])
+        message_repository.save(Message("otra", "otra-sesion", "fuera", datetime(2023, 6, 15), "user"))
+
+        batches = list(message_repository.iter_session_messages("iterada", batch_size=2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        ids = [json.loads(row.json)["message_id"] for batch in batches for row in batch]
+        assert ids == [f"it-{i}" for i in reversed(range(5))]
+
+        projected = list(message_repository.iter_session_messages("iterada", ("sender",), batch_size=10))
+        assert [row.sender for row in projected[0]] == ["user"] * 5
+
+
+def test_field_projection_reads_only_requested_columns(app, message_repository):
+    from sqlalchemy import event
+
+    with app.app_context():
+        message_repository.save_all([
+            Message(f"fp-{i}", "projected", "contenido largo " * 50, datetime(2023, 6, 15, 14, i), "user")
+            for i in range(3)
+        ])
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            rows, total = message_repository.find_by_session_id("projected", fields=("message_id", "sender"))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+
+        assert total == 3
+        assert [row.message_id for row in rows] == ["fp-0", "fp-1", "fp-2"]
+        page_query = next(statement for statement in statements if "ORDER BY" in statement)
+        assert "content" not in page_query and "rendered_json" not in page_query
+
+        row = message_repository.find_message_fields("fp-1", ("metadata.word_count",))
+        assert (row.word_count, row.updated_at is not None) == (100, True)
+        assert message_repository.find_message_fields("no-existe", ("sender",)) is None
@@ -0,0 +1,371 @@
+"""
+Pruebas de los índices de la búsqueda global.
+Este módulo prueba que messages_fts y messages_trigram se mantienen al día con
+cada escritura, la tokenización (acentos, prefijos, puntuación), las búsquedas
+por subcadena y por expresión regular, el orden por relevancia, los fragmentos
+resaltados, los totales exactos, estimados u omitidos, y el relleno por
+bloques de una base de datos que ya tenía mensajes.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.models import message as message_model
+from app.models.message import Message, db
+from app.models.message_search import (
+    FTS_TABLE,
+    INDEX_COMPLETE,
+    SEARCH_INDEXES,
+    TRIGRAM_TABLE,
+    create_search_index,
+    match_expression,
+    render_snippet,
+    search_index_ready
+)
+from app.utils.exceptions import InvalidFormatError, SearchIndexNotReadyError, ValidationError
+
+
+def _save(repository, *contents):
+    repository.save_all([
+        Message(f"fts-{i}", "fts", content, datetime(2023, 6, 15, 14, i), "user")
+        for i, content in enumerate(contents)
+    ])
+
+
+def _search(repository, query, mode='words'):
+    messages, total = repository.search_globally(query, 10, 0, mode=mode)
+    assert total == len(messages)
+    return [message.message_id for message in messages]
+
+
+def _integrity_check():
+    # FTS5 lanza un error si el índice no coincide con messages.content
+    for name in SEARCH_INDEXES:
+        db.session.execute(text(f"INSERT INTO {name} ({name}, rank) VALUES ('integrity-check', 1)"))
+
+
+def test_match_expression_tokenizes_like_the_index():
+    assert match_expression("Pedido-123, ¿envío?") == '"Pedido"* "123"* "envío"*'
+    assert match_expression("hola_mundo") == '"hola"* "mundo"*'
+    assert match_expression("¡¿...?!") is None
+
+
+def test_search_uses_index_with_spanish_folding(app, message_repository):
+    with app.app_context():
+        assert search_index_ready(db.session)
+        _save(message_repository, "La CANCIÓN del año", "Pedidos pendientes: #A-123", "nada que ver")
+
+        assert _search(message_repository, "cancion") == ["fts-0"]
+        assert _search(message_repository, "Año canción") == ["fts-0"]
+        assert _search(message_repository, "pedido") == ["fts-1"]
+        assert _search(message_repository, "a-123") == ["fts-1"]
+        # Todas las palabras deben aparecer
+        assert _search(message_repository, "canción pedido") == []
+
+        plan = db.session.execute(text(
+            f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM messages WHERE id IN "
+            f"(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH 'cancion*')"
+        )).all()
+        assert not any(row[3].startswith('SCAN messages ') or row[3] == 'SCAN messages' for row in plan)
+
+
+def test_index_follows_updates_and_deletes(app, message_repository):
+    with app.app_context():
+        _save(message_repository, "mensaje original", "otro mensaje")
+
+        db.session.execute(text("UPDATE messages SET content = 'texto editado' WHERE message_id = 'fts-0'"))
+        db.session.commit()
+        assert _search(message_repository, "original") == []
+        assert _search(message_repository, "editado") == ["fts-0"]
+
+        message_repository.delete_by_message_id("fts-1")
+        assert _search(message_repository, "mensaje") == []
+        _integrity_check()
+
+
+def _service_search(service, query, mode, **kwargs):
+    result = service.search_messages_globally(query, 10, 0, mode=mode, **kwargs)
+    assert result['pagination']['total_results'] == len(result['data'])
+    return [message['message_id'] for message in result['data']]
+
+
+def test_substring_search_matches_inside_words(app, message_repository):
+    with app.app_context():
+        assert search_index_ready(db.session, TRIGRAM_TABLE)
+        _save(
+            message_repository,
+            "Pedido PED-2023-00042 enviado",
+            "Escriba a ana_garcia@example.com",
+            "anagrama de 100% algodón",
+        )
+
+        assert _search(message_repository, "2023-000", mode='substring') == ["fts-0"]
+        assert _search(message_repository, "GARCIA@EXA", mode='substring') == ["fts-1"]
+        # El índice de palabras no encuentra fragmentos del interior de una palabra
+        assert _search(message_repository, "arcia@exa") == []
+        assert _search(message_repository, "arcia@exa", mode='substring') == ["fts-1"]
+        # Los comodines de LIKE se buscan literalmente
+        assert _search(message_repository, "a_g", mode='substring') == ["fts-1"]
+        assert _search(message_repository, "0% a", mode='substring') == ["fts-2"]
+
+        plan = db.session.execute(text(
+            f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM messages WHERE id IN "
+            f"(SELECT rowid FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH '\"2023-000\"')"
+        )).all()
+        assert not any(row[3].startswith('SCAN messages ') or row[3] == 'SCAN messages' for row in plan)
+
+
+def test_regex_search_verifies_trigram_candidates(app, message_repository, message_service):
+    with app.app_context():
+        _save(
+            message_repository,
+            "pedido PED-2023-00042 enviado",
+            "pedido PED-pendiente",
+            "ped-2024-7 sin enviar",
+            "otro mensaje",
+        )
+
+        # PED- filtra tres candidatos; el autómata descarta el que no tiene cifras
+        assert _service_search(message_service, r"PED-\d{4}-\d+", 'regex') == ["fts-2", "fts-0"]
+        assert _service_search(message_service, r"^ped-\d+-\d\b", 'regex') == ["fts-2"]
+        assert _service_search(message_service, r"(enviado|pendiente)$", 'regex') == ["fts-1", "fts-0"]
+
+
+def test_regex_search_rejects_broad_or_invalid_patterns(app, message_repository, message_service):
+    with app.app_context():
+        _save(message_repository, *[f"mensaje {i}" for i in range(5)])
+
+        for pattern, code in ((r"\d+", "REGEX_TOO_BROAD"), (r"(men|\w)sa", "REGEX_TOO_BROAD"), (r"(?=men)", "INVALID_REGEX")):
+            with pytest.raises(ValidationError) as error:
+                _service_search(message_service, pattern, 'regex')
+            assert error.value.code == code, pattern
+
+        # Más candidatos que el límite: se rechaza en lugar de verificarlos todos
+        assert len(_service_search(message_service, r"mensaje \d", 'regex', max_candidates=5)) == 5
+        with pytest.raises(ValidationError) as error:
+            _service_search(message_service, r"mensaje \d", 'regex', max_candidates=4)
+        assert error.value.code == "REGEX_TOO_BROAD"
+        assert error.value.details == {'max_candidates': 4}
+
+
+def test_regex_search_requires_complete_trigram_index(app, message_repository, message_service):
+    with app.app_context():
+        _save(message_repository, "pedido 42")
+        db.session.execute(text("UPDATE search_indexes SET indexed_upto = 0 WHERE name = :name"), {'name': TRIGRAM_TABLE})
+        db.session.commit()
+
+        # La subcadena vuelve a LIKE; la expresión regular no recorre la tabla
+        assert _search(message_repository, "do 4", mode='substring') == ["fts-0"]
+        with pytest.raises(SearchIndexNotReadyError):
+            _service_search(message_service, r"pedido \d+", 'regex')
+
+
+def test_relevance_sort_ranks_with_bm25(app, message_repository, message_service):
+    with app.app_context():
+        _save(
+            message_repository,
+            "pedido pedido pedido",
+            "un texto largo que menciona el pedido una sola vez entre muchas otras palabras",
+            "pedido retrasado",
+            "nada que ver",
+        )
+
+        assert _service_search(message_service, "pedido", 'words') == ["fts-2", "fts-1", "fts-0"]
+        assert _service_search(message_service, "pedido", 'words', sort='relevance') == ["fts-0", "fts-2", "fts-1"]
+        assert _service_search(message_service, "pedido", 'substring', sort='relevance')[0] == "fts-0"
+
+        page = message_service.search_messages_globally("pedido", 2, 1, sort='relevance', fields='message_id')
+        assert page['data'] == [{'message_id': "fts-2"}, {'message_id': "fts-1"}]
+        assert page['pagination'] == {
+            'total_results': 3, 'limit': 2, 'offset': 1, 'next_offset': None, 'has_more': False
+        }
+
+
+def test_snippets_mark_matches_and_escape_html(app, message_repository, message_service):
+    with app.app_context():
+        _save(message_repository, "Envío <b>urgente</b> del PEDIDO PED-2023-00042", "otro pedido")
+
+        result = message_service.search_messages_globally("pedido", 10, 0, snippets=True, sort='relevance')
+        assert result['data'][1]['snippet'] == (
+            "Envío &lt;b&gt;urgente&lt;/b&gt; del <mark>PEDIDO</mark> PED-2023-00042"
+        )
+        assert result['data'][0]['snippet'] == "otro <mark>pedido</mark>"
+
+        result = message_service.search_messages_globally(
+            "2023-000", 10, 0, mode='substring', snippets=True, fields='message_id'
+        )
+        assert result['data'] == [{
+            'message_id': "fts-0",
+            'snippet': "Envío &lt;b&gt;urgente&lt;/b&gt; del PEDIDO PED-<mark>2023-000</mark>42"
+        }]
+
+        # Sin índice completo la búsqueda usa LIKE: no hay posiciones que resaltar
+        db.session.execute(text("UPDATE search_indexes SET indexed_upto = 0"))
+        db.session.commit()
+        result = message_service.search_messages_globally("otro", 10, 0, snippets=True)
+        assert result['data'][0]['snippet'] is None
+        with pytest.raises(SearchIndexNotReadyError):
+            message_service.search_messages_globally("otro", 10, 0, sort='relevance')
+
+
+def test_snippets_stay_balanced_with_marker_characters_in_content(app, message_repository, message_service):
+    with app.app_context():
+        # Guardado directamente, como los mensajes anteriores a la validación
+        _save(message_repository, "abre \ufdd0 <i> pedido \ufdd1\ufdd1 cierra")
+
+        result = message_service.search_messages_globally("pedido", 10, 0, snippets=True)
+        assert result['data'][0]['snippet'] == "abre  &lt;i&gt; <mark>pedido</mark>  cierra"
+
+        with pytest.raises(InvalidFormatError):
+            message_service.process_message({
+                "message_id": "fts-marcadores",
+                "session_id": "session-fts",
+                "content": "pedido \ufdd0",
+                "timestamp": "2023-06-15T14:30:00Z",
+                "sender": "user"
+            })
+
+    assert render_snippet("\ufdd1a\ufdd0b\ufdd0c\ufdd1d\ufdd0") == "ab<mark>c</mark>d"
+
+
+def test_recent_search_walks_newest_messages_first(app, message_repository, monkeypatch):
+    monkeypatch.setattr(message_model, 'RECENT_SCAN_BATCH', 2)
+    monkeypatch.setattr(message_model, 'RECENT_SCAN_MAX_BATCH', 4)
+    monkeypatch.setattr(message_model, 'RECENT_SCAN_LIMIT', 6)
+    with app.app_context():
+        # Los ids no siguen el orden de timestamp (mensajes que llegan tarde) y
+        # dos mensajes comparten timestamp
+        start = datetime(2023, 6, 15)
+        minutes = [5, 0, 11, 3, 9, 9, 1, 7, 2, 10, 4, 6]
+        message_repository.save_all([
+            Message(f"walk-{i}", "walk", f"pedido {i}" if i % 3 else f"nota {i}", start + timedelta(minutes=m), "user")
+            for i, m in enumerate(minutes)
+        ])
+        expected = [f"walk-{i}" for i in sorted(range(12), key=lambda i: (minutes[i], i), reverse=True) if i % 3]
+        assert len(expected) == 8
+
+        for limit, offset in ((3, 0), (3, 3), (3, 6), (10, 0)):
+            messages, total = message_repository.search_globally("pedido", limit, offset)
+            assert [message.message_id for message in messages] == expected[offset:offset + limit]
+            assert total == 8
+
+        table, expression = Message._search_index("pedido", 'words')
+        assert Message._recent_matches(table, expression, 3) == [int(m.split('-')[1]) + 1 for m in expected[:3]]
+        # Un término raro no reúne la página dentro del recorrido: se ordenan todas
+        table, expression = Message._search_index("nota 0", 'words')
+        assert Message._recent_matches(table, expression, 1) is None
+        assert [message.message_id for message in message_repository.search_globally("nota 0", 10, 0)[0]] == ["walk-0"]
+
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT timestamp, id FROM messages ORDER BY timestamp DESC, id DESC LIMIT 2"
+        )).all()
+        assert [row[3] for row in plan] == ['SCAN messages USING COVERING INDEX ix_messages_timestamp_id']
+
+
+def test_count_modes(app, message_repository, message_service, monkeypatch):
+    monkeypatch.setattr(message_model, 'ESTIMATE_SAMPLE_ROWS', 4)
+    monkeypatch.setattr(message_model, 'ESTIMATE_MIN_HITS', 2)
+    with app.app_context():
+        # 20 mensajes: coinciden los 4 últimos y 2 antiguos
+        _save(message_repository, *[
+            "pedido urgente" if i >= 16 or i in (3, 7) else f"mensaje {i}" for i in range(20)
+        ])
+
+        page = message_service.search_messages_globally("pedido", 2, 0, count='none')
+        assert [message['message_id'] for message in page['data']] == ["fts-19", "fts-18"]
+        assert page['pagination'] == {
+            'total_results': None, 'limit': 2, 'offset': 0, 'next_offset': 2, 'has_more': True
+        }
+        page = message_service.search_messages_globally("pedido", 2, 4, count='none')
+        assert page['pagination']['has_more'] is False
+        assert page['pagination']['next_offset'] is None
+
+        # La muestra (últimos 4 ids, todos coincidentes) extrapola 4 * 20 / 4
+        assert message_repository.search_globally("pedido", 2, 0, count='estimate')[1] == 20
+        page = message_service.search_messages_globally("pedido", 2, 0, count='estimate')
+        assert page['pagination']['total_results'] == 20
+        assert page['pagination']['total_is_estimate'] is True
+        # En la última página el total se conoce
+        page = message_service.search_messages_globally("pedido", 4, 4, count='estimate')
+        assert page['pagination']['total_results'] == 6
+        assert page['pagination']['total_is_estimate'] is False
+        # Más allá del final la estimación no supera el offset
+        for offset, total in ((50, 20), (10, 10)):
+            page = message_service.search_messages_globally("pedido", 2, offset, count='estimate')
+            assert page['data'] == []
+            assert page['pagination']['total_results'] == total
+            assert page['pagination']['total_is_estimate'] is True
+            assert page['pagination']['has_more'] is False
+        # Menos de ESTIMATE_MIN_HITS en la muestra: se cuenta en el índice
+        assert message_repository.search_globally("mensaje 5", 2, 0, count='estimate')[1] == 1
+
+        ranked = message_service.search_messages_globally("pedido", 5, 0, sort='relevance', count='none')
+        assert len(ranked['data']) == 5
+        assert ranked['pagination']['has_more'] is True
+        regex = message_service.search_messages_globally(r"pedido \w+", 5, 5, mode='regex', count='estimate')
+        assert regex['pagination']['total_results'] == 6
+        assert regex['pagination']['has_more'] is False
+
+
+def test_search_options_validation(app, message_service):
+    with app.app_context():
+        for kwargs, code in (
+            ({'sort': 'oldest'}, "INVALID_SORT"),
+            ({'count': 'approx'}, "INVALID_COUNT"),
+            ({'mode': 'regex', 'sort': 'relevance'}, "INVALID_SEARCH_OPTIONS"),
+            ({'mode': 'regex', 'snippets': True}, "INVALID_SEARCH_OPTIONS"),
+        ):
+            with pytest.raises(ValidationError) as error:
+                message_service.search_messages_globally("pedido", 10, 0, **kwargs)
+            assert error.value.code == code
+
+
+def test_backfill_existing_messages_in_chunks(app, message_repository):
+    with app.app_context():
+        # Base de datos anterior a los índices: cinco mensajes sin indexar
+        for name in SEARCH_INDEXES:
+            db.session.execute(text(f"DROP TABLE {name}"))
+            for event in ('insert', 'delete', 'update'):
+                db.session.execute(text(f"DROP TRIGGER trg_{name}_{event}"))
+        db.session.execute(text("DROP TABLE search_indexes"))
+        db.session.commit()
+        _save(message_repository, *[f"mensaje antiguo {i}" for i in range(5)])
+        for name in SEARCH_INDEXES:
+            create_search_index(db.session, name)
+        db.session.commit()
+        assert not search_index_ready(db.session)
+        assert not search_index_ready(db.session, TRIGRAM_TABLE)
+
+        # Relleno parcial: la búsqueda sigue con LIKE y no pierde resultados
+        assert message_repository.backfill_search_index(chunk_size=2, max_chunks=1) == 2
+        assert len(_search(message_repository, "antiguo")) == 5
+
+        # Escrituras durante el relleno: borrado de una fila indexada y de una
+        # pendiente, edición de una pendiente y un mensaje nuevo
+        message_repository.delete_by_message_id("fts-0")
+        message_repository.delete_by_message_id("fts-4")
+        db.session.execute(text("UPDATE messages SET content = 'mensaje editado' WHERE message_id = 'fts-3'"))
+        db.session.commit()
+        message_repository.save(Message("fts-nuevo", "fts", "mensaje antiguo nuevo", datetime(2023, 6, 16), "user"))
+
+        # Quedan 3 mensajes en messages_fts y 4 en messages_trigram
+        assert message_repository.backfill_search_index(chunk_size=2) == 7
+        assert db.session.execute(text("SELECT DISTINCT indexed_upto FROM search_indexes")).scalars().all() == [
+            INDEX_COMPLETE
+        ]
+        assert search_index_ready(db.session)
+        assert search_index_ready(db.session, TRIGRAM_TABLE)
+        assert message_repository.backfill_search_index() == 0
+
+        assert sorted(_search(message_repository, "antiguo")) == ["fts-1", "fts-2", "fts-nuevo"]
+        assert _search(message_repository, "editado") == ["fts-3"]
+        assert _search(message_repository, "ado", mode='substring') == ["fts-3"]
+        _integrity_check()
+
+
+def test_cli_backfill_command(runner):
+    result = runner.invoke(args=['backfill-search-index'])
+
+    assert result.exit_code == 0
+    assert 'Índice de búsqueda completo' in result.output
@@ -77,6 +77,25 @@ class TestMessageService:
             
             assert "contenido inapropiado" in str(exc_info.value).lower()
     
+    def test_process_message_mask_mode(self, app, message_repository):
+        """En modo 'mask' el mensaje se guarda con las palabras enmascaradas."""
+        from app.services.message_service import MessageService
+        from app.utils.validators import ContentFilter
+
+        service = MessageService(
+            message_repository, ["spam"], ContentFilter(["spam"], mode=ContentFilter.MODE_MASK)
+        )
+        with app.app_context():
+            result = service.process_message({
+                "message_id": "msg-masked",
+                "session_id": "session-test",
+                "content": "Esto no es SPAM",
+                "timestamp": "2023-06-15T14:30:00Z",
+                "sender": "user"
+            })
+
+        assert result["content"] == "Esto no es ****"
+    
     def test_process_message_invalid_sender(self, app, message_service):
         """Prueba procesamiento de mensaje con sender inválido."""
         with app.app_context():
@@ -254,6 +273,8 @@ class TestMessageService:
             assert stats['total_messages'] == 5
             assert stats['user_messages'] == 2
             assert stats['system_messages'] == 3
+            assert stats['total_words'] > 0
+            assert stats['first_message_at'] is not None
     
     def test_process_message_database_error(self, app, message_service, sample_message_data, monkeypatch):
         """Simula un fallo de base de datos durante process_message."""
@@ -349,11 +370,11 @@ def test_delete_message_not_found(app, message_service, monkeypatch):
 
 def test_get_session_stats_error(app, message_service, monkeypatch):
     """Debe propagar DatabaseError si ocurre fallo en repositorio al obtener stats."""
-    def mock_count_by_session_id(session_id, sender=None):
-        raise DatabaseError("Error al contar mensajes")
+    def mock_get_session_counters(*args, **kwargs):
+        raise DatabaseError("Error al leer los contadores de la sesión")
 
     from app.repositories.message_repository import MessageRepository
-    monkeypatch.setattr(MessageRepository, "count_by_session_id", mock_count_by_session_id)
+    monkeypatch.setattr(MessageRepository, "get_session_counters", mock_get_session_counters)
 
     with app.app_context():
         with pytest.raises(DatabaseError):
@@ -379,3 +400,119 @@ class MockMessage:
             assert [msg["content"] for msg in results] == ["m1", "m2"]
             assert total == 2
 
+
+
+def test_process_message_batch_single_insert_without_existence_query(app, message_service, monkeypatch):
+    """El lote guarda en una sola llamada y deja la detección de duplicados al INSERT."""
+    from app.repositories.message_repository import MessageRepository
+
+    calls = {"exists": 0, "find_by_ids": 0, "save_all": 0}
+    original_find_by_ids = MessageRepository.find_by_message_ids
+    original_save_all = MessageRepository.save_all
+
+    def count_exists(self, message_id):
+        calls["exists"] += 1
+        return False
+
+    def count_find_by_ids(self, message_ids):
+        calls["find_by_ids"] += 1
+        return original_find_by_ids(self, message_ids)
+
+    def count_save_all(self, messages):
+        calls["save_all"] += 1
+        return original_save_all(self, messages)
+
+    monkeypatch.setattr(MessageRepository, "exists_by_message_id", count_exists)
+    monkeypatch.setattr(MessageRepository, "find_by_message_ids", count_find_by_ids)
+    monkeypatch.setattr(MessageRepository, "save_all", count_save_all)
+
+    batch = [
+        {
+            "message_id": f"svc-batch-{i}",
+            "session_id": "svc-batch",
+            "content": "Contenido de prueba",
+            "timestamp": "2023-06-15T14:30:00Z",
+            "sender": "user",
+        }
+        for i in range(10)
+    ]
+
+    with app.app_context():
+        results = message_service.process_message_batch(batch)
+        assert [r["status"] for r in results] == ["created"] * 10
+        assert results[0]["data"]["timestamp"] == "2023-06-15T14:30:00Z"
+        assert calls == {"exists": 0, "find_by_ids": 0, "save_all": 1}
+
+        # Al reenviar, los conflictos se resuelven con una sola consulta IN
+        results = message_service.process_message_batch(batch)
+        assert [r["status"] for r in results] == ["replayed"] * 10
+        assert calls == {"exists": 0, "find_by_ids": 1, "save_all": 2}
+
+
+def test_process_message_batch_reports_errors_per_item(app, message_service, sample_message_data):
+    """Cada elemento inválido recibe su propio error sin afectar al resto."""
+    with app.app_context():
+        message_service.process_message(sample_message_data)
+        results = message_service.process_message_batch([
+            {**sample_message_data, "content": "Otro contenido"},
+            {**sample_message_data, "message_id": "svc-batch-ok"},
+            {**sample_message_data, "message_id": "svc-batch-bad", "timestamp": "ayer"},
+        ])
+
+    assert [r["status"] for r in results] == ["error", "created", "error"]
+    assert "ya existe" in results[0]["error"]["message"].lower()
+    assert results[2]["error"]["code"] == "INVALID_FORMAT"
+
+
+def test_get_message_json_is_cached_until_deleted(app, message_repository, sample_message_data):
+    """La caché sirve las lecturas repetidas y el borrado la invalida."""
+    import json
+    from app.services.message_service import MessageService
+    from app.utils.lru_cache import LRUCache
+
+    cache = LRUCache(max_entries=10)
+    service = MessageService(message_repository, [], message_cache=cache)
+
+    with app.app_context():
+        service.process_message(sample_message_data)
+        message_id = sample_message_data["message_id"]
+
+        first = service.get_message_json(message_id)
+        assert json.loads(first.body)["message_id"] == message_id
+        assert service.get_message_json(message_id) is first
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["bytes"] == len(first.body)
+        assert service.get_message_etag(message_id) == first.etag
+
+        assert service.delete_message(message_id) is True
+        assert cache.stats()["invalidations"] == 1
+        with pytest.raises(MessageNotFoundError):
+            service.get_message_json(message_id)
+        assert service.get_message_etag(message_id) is None
+
+
+def test_lookup_messages_queries_only_cache_misses(app, message_repository, sample_message_data, monkeypatch):
+    """Los IDs en caché no se consultan; el resto se resuelve con una sola consulta."""
+    from app.services.message_service import MessageService
+    from app.utils.lru_cache import LRUCache
+
+    service = MessageService(message_repository, [], message_cache=LRUCache(max_entries=10))
+
+    with app.app_context():
+        service.process_message(sample_message_data)
+        service.process_message({**sample_message_data, "message_id": "msg-test-456"})
+        cached = service.get_message_json("msg-test-123")
+
+        queried = []
+        original = message_repository.find_rendered_by_message_ids
+        monkeypatch.setattr(
+            message_repository, "find_rendered_by_message_ids",
+            lambda ids: queried.append(list(ids)) or original(ids)
+        )
+
+        results = service.lookup_messages(["msg-test-123", "msg-test-456", "no-existe"])
+
+        assert queried == [["msg-test-456", "no-existe"]]
+        assert results["msg-test-123"] is cached
+        assert results["msg-test-456"] == service.get_message_json("msg-test-456")
+        assert results["no-existe"] is None
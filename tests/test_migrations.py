@@ -0,0 +1,122 @@
+"""
+Pruebas de las migraciones del esquema.
+Este módulo prueba la actualización de una base de datos anterior a los
+índices únicos y compuestos, y que las migraciones solo se aplican una vez.
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.models.message import db
+from app.models.migrations import MIGRATIONS, applied_versions, run_migrations
+from app.utils.exceptions import MigrationError
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE messages (id INTEGER NOT NULL PRIMARY KEY, message_id VARCHAR(255) NOT NULL, "
+    "session_id VARCHAR(255) NOT NULL, content TEXT NOT NULL, timestamp DATETIME NOT NULL, "
+    "sender VARCHAR(10) NOT NULL, word_count INTEGER NOT NULL, character_count INTEGER NOT NULL, "
+    "processed_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)",
+    "CREATE INDEX ix_messages_message_id ON messages (message_id)",
+    "CREATE INDEX ix_messages_session_id ON messages (session_id)",
+]
+
+LEGACY_ROW = (
+    "INSERT INTO messages (message_id, session_id, content, timestamp, sender, word_count, "
+    "character_count, processed_at, updated_at) VALUES (:message_id, 's1', 'hola', "
+    "'2023-06-15 14:30:00', 'user', 1, 4, '2023-06-15 14:30:00', '2023-06-15 14:30:00')"
+)
+
+
+@pytest.fixture
+def legacy_db(app):
+    """Base de datos con el esquema anterior a las migraciones."""
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+            for statement in LEGACY_SCHEMA:
+                connection.execute(text(statement))
+        yield app
+
+
+def _search_total(app, query):
+    return app.extensions['message_repository'].search_globally(query, 10, 0)[1]
+
+
+def _indexes():
+    with db.engine.connect() as connection:
+        return {
+            row['name']: bool(row['unique'])
+            for row in connection.execute(text("PRAGMA index_list('messages')")).mappings()
+        }
+
+
+def test_upgrades_legacy_schema(legacy_db):
+    with db.engine.begin() as connection:
+        connection.execute(text(LEGACY_ROW), {'message_id': 'm1'})
+
+    applied = run_migrations()
+
+    assert applied == [migration.name for migration in MIGRATIONS]
+    indexes = _indexes()
+    assert indexes['ix_messages_message_id'] is True
+    assert 'ix_messages_session_timestamp_id' in indexes
+    assert 'ix_messages_session_sender_timestamp' in indexes
+    assert 'ix_messages_session_id' not in indexes
+    assert db.session.execute(text("SELECT COUNT(*) FROM messages")).scalar() == 1
+    assert db.session.execute(text("SELECT COUNT(*) FROM blocklist_terms")).scalar() == 0
+    assert db.session.execute(text("SELECT total FROM session_counters WHERE session_id = 's1'")).scalar() == 1
+    rendered = db.session.execute(text("SELECT rendered_json FROM messages WHERE message_id = 'm1'")).scalar()
+    assert json.loads(rendered)["timestamp"] == "2023-06-15T14:30:00Z"
+    # El índice de búsqueda se crea vacío y se rellena después, por bloques
+    assert db.session.execute(text("SELECT indexed_upto FROM search_indexes")).scalar() == 0
+    assert _search_total(legacy_db, 'hola') == 1
+    legacy_db.extensions['message_repository'].backfill_search_index()
+    assert db.session.execute(text("SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH 'hola'")).scalar() == 1
+
+
+def test_migrations_run_once(legacy_db):
+    run_migrations()
+
+    assert run_migrations() == []
+    assert applied_versions() == [migration.version for migration in MIGRATIONS]
+
+
+def test_adds_session_versions_to_existing_counters(legacy_db):
+    # Base de datos migrada hasta session_counters sin la columna version
+    run_migrations()
+    with db.engine.begin() as connection:
+        for name in ('insert', 'delete', 'update'):
+            connection.execute(text(f"DROP TRIGGER trg_messages_counters_{name}"))
+        connection.execute(text("ALTER TABLE session_counters DROP COLUMN version"))
+        connection.execute(text("DELETE FROM schema_migrations WHERE version = 6"))
+        connection.execute(text(LEGACY_ROW), {'message_id': 'm1'})
+
+    assert run_migrations() == ['session_versions']
+    version = "SELECT version FROM session_counters WHERE session_id = 's1'"
+    assert db.session.execute(text(version)).scalar() == 1
+    with db.engine.begin() as connection:
+        connection.execute(text("DELETE FROM messages"))
+    assert db.session.execute(text(version)).scalar() == 2
+
+
+def test_duplicate_message_ids_stop_the_migration(legacy_db):
+    with db.engine.begin() as connection:
+        connection.execute(text(LEGACY_ROW), {'message_id': 'dup'})
+        connection.execute(text(LEGACY_ROW), {'message_id': 'dup'})
+
+    with pytest.raises(MigrationError) as error:
+        run_migrations()
+
+    assert 'dup' in error.value.message
+    # El paso fallido no queda registrado y el índice anterior se conserva
+    assert applied_versions() == [1]
+    assert _indexes()['ix_messages_message_id'] is False
+
+
+def test_cli_command(runner):
+    result = runner.invoke(args=['db-upgrade'])
+
+    assert result.exit_code == 0
+    assert 'Migraciones aplicadas' in result.output or 'al día' in result.output
@@ -0,0 +1,98 @@
+"""
+Pruebas de los planes de consulta del repositorio.
+Este módulo ejecuta EXPLAIN QUERY PLAN sobre cada consulta frecuente de
+MessageRepository y falla si alguna recorre la tabla entera o necesita un
+B-tree temporal para ordenar.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models.message import Message, db
+from app.models.migrations import run_migrations
+
+CURSOR = (datetime(2023, 6, 15, 14, 30), 1)
+
+HOT_QUERIES = {
+    'find_by_message_id': lambda repo: repo.find_by_message_id('plan-1'),
+    'find_by_message_ids': lambda repo: repo.find_by_message_ids(['plan-1', 'plan-2']),
+    'find_rendered_by_message_ids': lambda repo: repo.find_rendered_by_message_ids(['plan-1', 'plan-2']),
+    'find_by_ids': lambda repo: repo.find_by_ids([2, 1]),
+    'find_by_ids_fields': lambda repo: repo.find_by_ids([2, 1], ('message_id', 'content')),
+    'search_globally': lambda repo: repo.search_globally('hola', 10, 0),
+    'search_globally_estimate': lambda repo: repo.search_globally('hola', 10, 0, count='estimate'),
+    'search_ranked': lambda repo: repo.search_ranked('hola', 10, 0),
+    'search_ranked_substring': lambda repo: repo.search_ranked('hola', 10, 0, mode='substring'),
+    'find_search_snippets': lambda repo: repo.find_search_snippets('hola', [2, 1]),
+    'exists_by_message_id': lambda repo: repo.exists_by_message_id('plan-1'),
+    'find_by_session_id': lambda repo: repo.find_by_session_id('plan-session', 10, 5),
+    'find_by_session_id_sender': lambda repo: repo.find_by_session_id('plan-session', 10, 5, 'user'),
+    'keyset_after': lambda repo: repo.find_by_session_keyset('plan-session', 10, CURSOR),
+    'keyset_before': lambda repo: repo.find_by_session_keyset('plan-session', 10, CURSOR, backward=True),
+    'keyset_tail': lambda repo: repo.find_by_session_keyset('plan-session', 10, backward=True),
+    'keyset_sender': lambda repo: repo.find_by_session_keyset('plan-session', 10, CURSOR, True, 'system'),
+    'find_by_session_id_rendered': lambda repo: repo.find_by_session_id('plan-session', 10, 5, rendered=True),
+    'keyset_fields': lambda repo: repo.find_by_session_keyset(
+        'plan-session', 10, CURSOR, fields=('message_id', 'timestamp', 'sender')
+    ),
+    'find_message_fields': lambda repo: repo.find_message_fields('plan-1', ('message_id', 'sender')),
+    'get_message_updated_at': lambda repo: repo.get_message_updated_at('plan-1'),
+    'get_session_version': lambda repo: repo.get_session_version('plan-session'),
+    'iter_session_messages': lambda repo: list(repo.iter_session_messages('plan-session', batch_size=2)),
+    'iter_session_messages_fields': lambda repo: list(repo.iter_session_messages('plan-session', ('content',))),
+    'count_by_session_id': lambda repo: repo.count_by_session_id('plan-session'),
+    'count_by_session_id_sender': lambda repo: repo.count_by_session_id('plan-session', 'user'),
+    'get_session_counters': lambda repo: repo.get_session_counters('plan-session'),
+    'get_session_analytics': lambda repo: repo.get_session_analytics('plan-session'),
+    'delete_by_message_id': lambda repo: repo.delete_by_message_id('plan-2'),
+}
+
+
+def _captured_statements(repository, call):
+    """Ejecuta call y devuelve las sentencias de lectura/borrado que lanzó."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'DELETE', 'UPDATE')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        call(repository)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def _scans_table(step, statement):
+    # En los índices FTS5 el plan muestra SCAN ... VIRTUAL TABLE; con MATCH
+    # (M en idxStr) es una búsqueda en el índice, no un recorrido
+    if ' VIRTUAL TABLE INDEX ' in step:
+        return 'M' not in step.rsplit(':', 1)[-1]
+    # Recorrer un índice en su orden hasta el LIMIT no lee la tabla entera
+    if step.startswith('SCAN messages USING ') and ' INDEX ' in step and ' LIMIT ' in statement:
+        return False
+    return step.startswith('SCAN messages')
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes(app, name):
+    with app.app_context():
+        run_migrations()
+        repository = app.extensions['message_repository']
+        repository.save_all([
+            Message(f'plan-{i}', 'plan-session', 'hola', datetime(2023, 6, 15, 14, 30 + i), 'user')
+            for i in range(3)
+        ])
+        # La carga del filtro de message_id recorre la tabla a propósito: fuera de la medición
+        repository.warm_id_filter()
+
+        statements = _captured_statements(repository, HOT_QUERIES[name])
+        assert statements
+
+        connection = db.session.connection().connection.driver_connection
+        for statement, parameters in statements:
+            plan = [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters)]
+            assert not any(_scans_table(step, statement) for step in plan), (statement, plan)
+            assert not any('TEMP B-TREE' in step for step in plan), (statement, plan)
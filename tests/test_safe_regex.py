@@ -0,0 +1,95 @@
+"""
+Pruebas de las expresiones regulares de tiempo lineal.
+Este módulo comprueba que SafeRegex coincide igual que re en el subconjunto
+soportado, que rechaza lo que no soporta, que no sufre retroceso catastrófico
+y los literales que extrae para filtrar candidatos en el índice de trigramas.
+"""
+import re
+import time
+
+import pytest
+
+from app.models.message_search import requirement_expression
+from app.utils.exceptions import ValidationError
+from app.utils.safe_regex import MAX_REPEAT, SafeRegex
+
+TEXTS = [
+    "",
+    "pedido PED-2023-00042 enviado",
+    "Escríbeme a ana.garcia@example.com\n",
+    "factura 12/05 devolución",
+    "aaa bbb\nccc",
+    "ÑANDÚ ñandú",
+]
+
+PATTERNS = [
+    r"PED-\d{4}-\d+",
+    r"[a-z.]+@example\.com$",
+    r"^pedido",
+    r"^ccc",
+    r"\bbbb\b",
+    r"\Bbb",
+    r"(factura|pedido) \d+",
+    r"a{2,3} b+",
+    r"(?:ab|aa)+a?",
+    r"[^\s]+@[\w.]+",
+    r"ñandú",
+    r"x*",
+    r"devoluci.n$",
+    r"\d\d/\d\d",
+    r"a.*?c",
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_matches_like_re(pattern):
+    for ignore_case, flags in ((False, 0), (True, re.IGNORECASE)):
+        regex = SafeRegex(pattern, ignore_case=ignore_case)
+        for text in TEXTS:
+            assert regex.search(text) == bool(re.search(pattern, text, flags)), (pattern, text, ignore_case)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a", r"a)", r"[abc", r"*a", r"a**", r"(?=a)", r"(a)\1", r"z-\p", "a\\",
+    r"[z-a]", r"a{3,2}", f"a{{{MAX_REPEAT + 1}}}", r"^*", "a" * 501,
+])
+def test_rejects_invalid_or_unsupported_patterns(pattern):
+    with pytest.raises(ValidationError) as error:
+        SafeRegex(pattern)
+    assert error.value.code == "INVALID_REGEX"
+
+
+def test_rejects_patterns_that_compile_too_large():
+    with pytest.raises(ValidationError) as error:
+        SafeRegex(r"((a{100}){100}){100}")
+    assert error.value.code == "INVALID_REGEX"
+
+
+def test_pathological_patterns_run_in_linear_time():
+    text = "a" * 20000 + "!"
+    start = time.perf_counter()
+    for pattern in (r"(a+)+$", r"(a|aa)+$", r"(a*)*b", r"(?:a|a)*c"):
+        assert SafeRegex(pattern).search(text) is False
+    # Con re, (a+)+$ sobre 30 'a' ya tarda segundos; aquí 20 000 caracteres
+    assert time.perf_counter() - start < 10
+
+
+def test_requirement_extracts_literals_every_match_contains():
+    assert SafeRegex(r"PED-\d+").requirement == ('lit', 'PED-')
+    assert SafeRegex(r"ab\d+").requirement is None
+    assert SafeRegex(r"(foo|barbaz)qux.*\d").requirement == (
+        'and', [('or', [('lit', 'foo'), ('lit', 'barbaz')]), ('lit', 'qux')]
+    )
+    # Una alternativa o una repetición opcional sin literal no exige nada
+    assert SafeRegex(r"(foo|\d+)x").requirement is None
+    assert SafeRegex(r"(?:pedido)?\d+").requirement is None
+    assert SafeRegex(r"(?:pedido)+\d+").requirement == ('lit', 'pedido')
+    assert SafeRegex(r".*").requirement is None
+
+
+def test_requirement_expression_builds_trigram_query():
+    assert requirement_expression(SafeRegex(r'di"jo.+f').requirement) == '"di""jo"'
+    assert requirement_expression(SafeRegex(r"(foo|barbaz)qux").requirement) == (
+        '(("foo") OR ("barbaz")) AND ("qux")'
+    )
+    assert requirement_expression(None) is None
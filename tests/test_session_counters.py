@@ -0,0 +1,123 @@
+"""
+Pruebas de los contadores por sesión.
+Este módulo prueba que session_counters sigue a las inserciones, borrados y
+actualizaciones de messages y que se puede reconstruir desde cero.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.models.message import Message, db
+
+
+def _message(message_id, sender="user", minute=0, content="hola mundo", session_id="counted"):
+    return Message(message_id, session_id, content, datetime(2023, 6, 15, 14, minute), sender)
+
+
+def test_counters_follow_inserts_and_deletes(app, message_repository):
+    with app.app_context():
+        message_repository.save_all([
+            _message("c1", minute=5),
+            _message("c2", sender="system", minute=1, content="uno dos tres"),
+            _message("c3", minute=9),
+        ])
+
+        counters = message_repository.get_session_counters("counted")
+        assert (counters.total, counters.user_messages, counters.system_messages) == (3, 2, 1)
+        assert counters.word_count_sum == 7
+        assert counters.first_timestamp == datetime(2023, 6, 15, 14, 1)
+        assert counters.last_timestamp == datetime(2023, 6, 15, 14, 9)
+
+        message_repository.delete_by_message_id("c3")
+        counters = message_repository.get_session_counters("counted")
+        assert counters.total == 2
+        assert counters.last_timestamp == datetime(2023, 6, 15, 14, 5)
+
+        message_repository.delete_by_message_id("c1")
+        message_repository.delete_by_message_id("c2")
+        counters = message_repository.get_session_counters("counted")
+        assert (counters.total, counters.first_timestamp, counters.last_timestamp) == (0, None, None)
+        assert message_repository.count_by_session_id("counted") == 0
+
+
+def test_counters_follow_updates(app, message_repository):
+    with app.app_context():
+        message_repository.save(_message("u1"))
+
+        db.session.execute(text("UPDATE messages SET session_id = 'moved', sender = 'system' WHERE message_id = 'u1'"))
+        db.session.commit()
+
+        assert message_repository.get_session_counters("counted").total == 0
+        counters = message_repository.get_session_counters("moved")
+        assert (counters.total, counters.user_messages, counters.system_messages) == (1, 0, 1)
+
+
+def test_version_never_goes_back(app, message_repository):
+    with app.app_context():
+        assert message_repository.get_session_version("counted") == 0
+
+        message_repository.save_all([_message("v1"), _message("v2", minute=1)])
+        assert message_repository.get_session_version("counted") == 2
+
+        message_repository.delete_by_message_id("v1")
+        message_repository.delete_by_message_id("v2")
+        assert message_repository.get_session_version("counted") == 4
+
+        # Una sesión vaciada y vuelta a llenar no repite versiones anteriores
+        message_repository.save(_message("v3"))
+        assert message_repository.get_session_version("counted") == 5
+
+        message_repository.rebuild_session_counters()
+        assert message_repository.get_session_version("counted") == 6
+
+
+def test_rebuild_fixes_drift(app, message_repository, runner):
+    with app.app_context():
+        message_repository.save_all([_message("r1"), _message("r2", session_id="other")])
+        db.session.execute(text("UPDATE session_counters SET total = 99"))
+        db.session.execute(text("DELETE FROM session_counters WHERE session_id = 'other'"))
+        db.session.commit()
+
+        assert message_repository.rebuild_session_counters() == 2
+        assert message_repository.count_by_session_id("counted") == 1
+        assert message_repository.count_by_session_id("other") == 1
+
+        result = runner.invoke(args=["rebuild-session-counters"])
+        assert result.exit_code == 0
+        assert "2 sesiones" in result.output
+
+
+def test_analytics_track_lengths_words_and_response_times(app, message_repository):
+    with app.app_context():
+        message_repository.save_all([
+            _message("a1", minute=0, content="hola"),
+            _message("a2", sender="system", minute=2, content="buenas tardes"),
+            _message("a3", minute=3, content="tengo una duda"),
+        ])
+        message_repository.save(_message("a4", sender="system", minute=8, content="dime"))
+
+        summary = message_repository.get_session_analytics("counted").summary()
+        assert summary["message_length"]["count"] == 4
+        assert summary["message_length"]["mean"] == pytest.approx((4 + 13 + 14 + 4) / 4)
+        assert summary["words_by_sender"] == {"user": 4, "system": 3}
+        assert summary["response_time_seconds"]["count"] == 2
+        assert summary["response_time_seconds"]["mean"] == pytest.approx(210)
+
+        message_repository.delete_by_message_id("a3")
+        summary = message_repository.get_session_analytics("counted").summary()
+        assert summary["message_length"]["count"] == 3
+        assert summary["words_by_sender"] == {"user": 1, "system": 3}
+
+
+def test_rebuild_matches_incremental_analytics(app, message_repository):
+    with app.app_context():
+        message_repository.save_all([
+            _message(f"i{i}", sender="user" if i % 3 else "system", minute=i, content="x" * (i + 1))
+            for i in range(12)
+        ])
+        incremental = message_repository.get_session_analytics("counted").to_state()
+
+        message_repository.rebuild_session_counters()
+
+        assert message_repository.get_session_analytics("counted").to_state() == incremental
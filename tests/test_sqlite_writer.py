@@ -0,0 +1,176 @@
+"""
+Pruebas para GroupCommitWriter.
+Este módulo prueba el agrupamiento de escrituras concurrentes en una sola transacción.
+"""
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.models.message import Message, db
+from app.repositories.message_repository import MessageRepository
+from app.repositories.sqlite_writer import GroupCommitWriter
+from app.utils.exceptions import DatabaseError
+
+
+@pytest.fixture
+def file_app(monkeypatch, tmp_path):
+    """Aplicación sobre un archivo SQLite real (el escritor necesita su propia conexión)."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'writer.db'}")
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def writer(file_app):
+    writer = GroupCommitWriter(file_app, max_batch=64, window=0.05)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def _message(message_id, session_id="writer-session"):
+    return Message(
+        message_id=message_id,
+        session_id=session_id,
+        content="Contenido de prueba",
+        timestamp=datetime.now(timezone.utc),
+        sender="user",
+    )
+
+
+def test_concurrent_saves_are_group_committed(file_app, writer):
+    """Las escrituras concurrentes se confirman en menos commits que operaciones."""
+    repository = MessageRepository(writer)
+    barrier = threading.Barrier(20)
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            repository.save(_message(f"writer-{i}"))
+        except Exception as e:  # pragma: no cover - se reporta abajo
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    stats = writer.stats()
+    assert stats['operations'] == 20
+    assert stats['commits'] < 20
+    with file_app.app_context():
+        assert repository.count_by_session_id("writer-session") == 20
+
+
+def test_saved_message_is_usable_after_commit(writer):
+    """El mensaje devuelto conserva su ID y se puede serializar."""
+    repository = MessageRepository(writer)
+    saved = repository.save(_message("writer-dict"))
+
+    assert saved.id is not None
+    assert saved.to_dict()["message_id"] == "writer-dict"
+
+
+def test_failed_operation_does_not_abort_group(file_app, writer):
+    """Una operación que falla se aísla en su SAVEPOINT."""
+    def failing(session):
+        session.add(_message("writer-bad"))
+        session.flush()
+        raise ValueError("falla de la operación")
+
+    bad = writer.submit(failing)
+    good = writer.submit(lambda session: MessageRepository()._insert(session, [_message("writer-good")]))
+
+    with pytest.raises(ValueError):
+        bad.result(5)
+    assert good.result(5)[0].message_id == "writer-good"
+    with file_app.app_context():
+        assert MessageRepository().exists_by_message_id("writer-good")
+        assert not MessageRepository().exists_by_message_id("writer-bad")
+
+
+def test_delete_through_writer(file_app, writer):
+    """Las eliminaciones también pasan por el escritor."""
+    repository = MessageRepository(writer)
+    repository.save_all([_message("writer-del-1"), _message("writer-del-2")])
+
+    assert repository.delete_by_message_id("writer-del-1") is True
+    assert repository.delete_by_message_id("writer-del-1") is False
+    with file_app.app_context():
+        assert repository.count_by_session_id("writer-session") == 1
+
+
+def test_operation_errors_become_database_errors(writer):
+    """Los errores de la operación se exponen como DatabaseError."""
+    repository = MessageRepository(writer)
+
+    with pytest.raises(DatabaseError):
+        repository._write(lambda session: session.execute(db.text("SELECT * FROM no_existe")), "leer")
+
+
+def test_submit_requires_running_writer(file_app):
+    """No se aceptan operaciones con el escritor detenido."""
+    writer = GroupCommitWriter(file_app)
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda session: None)
+
+
+def test_group_is_committed_once(file_app, writer):
+    """Las operaciones de un grupo no son visibles hasta el commit común."""
+    import sqlite3
+
+    db_path = file_app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+    def visible_from_other_connection(session):
+        connection = sqlite3.connect(db_path)
+        try:
+            return connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE message_id = 'writer-group'"
+            ).fetchone()[0]
+        finally:
+            connection.close()
+
+    first = writer.submit(lambda session: MessageRepository()._insert(session, [_message("writer-group")]))
+    second = writer.submit(visible_from_other_connection)
+
+    first.result(5)
+    assert second.result(5) == 0
+    assert visible_from_other_connection(None) == 1
+
+
+def test_connections_use_wal(file_app):
+    """Cada conexión del engine usa WAL y synchronous=NORMAL."""
+    with file_app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1
+        finally:
+            connection.close()
+
+
+def test_open_read_transaction_does_not_block_writer(file_app, writer):
+    """Una lectura en curso no bloquea el BEGIN IMMEDIATE ni el COMMIT del escritor."""
+    repository = MessageRepository(writer)
+    repository.save(_message("writer-read-1"))
+
+    with file_app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            connection.execute("BEGIN")
+            assert connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 1
+            repository.save(_message("writer-read-2"))
+            # La lectura sigue viendo su foto hasta terminar la transacción
+            assert connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 1
+            connection.rollback()
+        finally:
+            connection.close()
+        assert repository.count_by_session_id("writer-session") == 2
@@ -0,0 +1,72 @@
+"""
+Pruebas unitarias para RunningMoments y QuantileSketch.
+Este módulo prueba la precisión, la retirada de valores, la combinación y la serialización.
+"""
+import random
+import statistics
+
+import pytest
+
+from app.utils.streaming_stats import QuantileSketch, RunningMoments
+
+
+def _values(count=5000, seed=3):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(4, 1) for _ in range(count)]
+
+
+def test_moments_add_remove_and_merge():
+    values = _values(200)
+    moments = RunningMoments()
+    for value in values:
+        moments.add(value)
+    assert moments.mean == pytest.approx(statistics.fmean(values))
+    assert moments.stddev == pytest.approx(statistics.pstdev(values))
+
+    for value in values[:50]:
+        moments.remove(value)
+    assert moments.count == 150
+    assert moments.mean == pytest.approx(statistics.fmean(values[50:]))
+    assert moments.stddev == pytest.approx(statistics.pstdev(values[50:]))
+
+    left, right = RunningMoments(), RunningMoments()
+    for value in values[:70]:
+        left.add(value)
+    for value in values[70:]:
+        right.add(value)
+    left.merge(right)
+    assert left.count == 200
+    assert left.stddev == pytest.approx(statistics.pstdev(values))
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    values = _values()
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+
+
+def test_sketch_remove_merge_and_roundtrip():
+    values = _values(1000)
+    full, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for index, value in enumerate(values):
+        full.add(value)
+        (first if index % 2 else second).add(value)
+    first.merge(second)
+    assert first.to_dict() == full.to_dict()
+
+    for value in values[:500]:
+        full.remove(value)
+    restored = QuantileSketch.from_dict(full.to_dict())
+    assert restored.count == 500
+    assert restored.quantile(0.5) == full.quantile(0.5)
+
+    empty = QuantileSketch()
+    assert empty.quantile(0.5) is None
+    empty.add(0)
+    assert empty.quantile(0.5) == 0.0
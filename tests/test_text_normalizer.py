@@ -0,0 +1,36 @@
+"""
+Pruebas unitarias para TextNormalizer.
+Este módulo prueba el plegado de acentos, leetspeak y separadores y el mapa de posiciones.
+"""
+from app.utils.text_normalizer import TextNormalizer
+
+
+def test_folds_case_accents_leet_and_separators():
+    normalizer = TextNormalizer()
+
+    assert normalizer.normalize("VÍRUS") == "virus"
+    assert normalizer.normalize("m4lw4re") == "malware"
+    assert normalizer.normalize("s p.a-m") == "spam"
+    assert normalizer.normalize("$pam!") == "spami"
+
+
+def test_origin_map_points_to_original_characters():
+    normalizer = TextNormalizer()
+    text = "a Éß-x"
+
+    normalized = normalizer.normalize(text)
+    origins = normalizer.origin_map(text)
+
+    assert normalized == "aessx"
+    assert origins == [0, 2, 3, 3, 5]
+
+
+def test_term_gaps_and_separator_gaps():
+    normalizer = TextNormalizer()
+    text = "es pa"
+    origins = normalizer.origin_map(text)
+
+    assert normalizer.term_gaps("anti spam") == frozenset({4})
+    assert normalizer.term_gaps("spam") == frozenset()
+    assert normalizer.has_separator_gap(text, origins, 2)
+    assert not normalizer.has_separator_gap(text, origins, 1)
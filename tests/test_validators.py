@@ -0,0 +1,74 @@
+"""
+Pruebas unitarias para ContentFilter y FieldsValidator.
+Este módulo prueba los modos de rechazo y enmascarado del filtro de contenido
+y la validación del parámetro fields.
+"""
+import pytest
+
+from app.utils.exceptions import InappropriateContentError, InvalidFieldsError
+from app.utils.validators import ContentFilter, FieldsValidator
+
+
+def test_reject_mode_reports_words_and_offsets():
+    content_filter = ContentFilter(["virus", "spam"])
+
+    with pytest.raises(InappropriateContentError) as exc_info:
+        content_filter.apply("SPAM con virus y spam")
+
+    details = exc_info.value.details
+    assert details["inappropriate_words_found"] == ["virus", "spam"]
+    assert details["matches"][0] == {"word": "spam", "start": 0, "end": 4}
+    assert len(details["matches"]) == 3
+
+
+def test_mask_mode_returns_masked_content():
+    content_filter = ContentFilter(["spam"], mode=ContentFilter.MODE_MASK)
+
+    assert content_filter.apply("esto es Spam!") == "esto es ****!"
+    assert content_filter.apply("limpio") == "limpio"
+
+
+def test_word_boundary_mode():
+    content_filter = ContentFilter(["spam"], word_boundary=True)
+
+    assert content_filter.apply("spammer") == "spammer"
+    with pytest.raises(InappropriateContentError):
+        content_filter.apply("es spam")
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        ContentFilter(["spam"], mode="ignorar")
+
+
+def test_static_check_keeps_substring_semantics():
+    with pytest.raises(InappropriateContentError):
+        ContentFilter.check_inappropriate_content("antiSPAMbot", ["spam"])
+    ContentFilter.check_inappropriate_content("limpio", ["spam"])
+
+
+def test_normalize_detects_and_masks_obfuscated_words():
+    content_filter = ContentFilter(["malware", "spam"], mode=ContentFilter.MODE_MASK, normalize=True)
+
+    assert content_filter.apply("hay m4lw4re y s p a m") == "hay ******* y *******"
+    assert content_filter.apply("es pa mucho") == "es pa mucho"
+    assert ContentFilter(["malware"]).apply("m4lw4re") == "m4lw4re"
+
+
+def test_fields_are_normalized_to_response_order():
+    assert FieldsValidator.validate_fields(None) is None
+    assert FieldsValidator.validate_fields(" ") is None
+    assert FieldsValidator.validate_fields("sender, timestamp,message_id,sender") == (
+        "message_id", "timestamp", "sender"
+    )
+    assert FieldsValidator.validate_fields("metadata.updated_at,metadata") == (
+        "metadata.word_count", "metadata.character_count", "metadata.processed_at", "metadata.updated_at"
+    )
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(InvalidFieldsError) as error:
+        FieldsValidator.validate_fields("message_id,id,contenido")
+
+    assert error.value.code == "INVALID_FIELDS"
+    assert error.value.details["invalid_fields"] == ["id", "contenido"]